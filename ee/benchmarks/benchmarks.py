@@ -23,6 +23,8 @@ from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.filters.filter import Filter
 from posthog.models.property import PropertyName, TableWithProperties
 from posthog.constants import FunnelCorrelationType
+from posthog.hogql.parser import parse_select
+from django.test import override_settings
 
 MATERIALIZED_PROPERTIES: List[Tuple[TableWithProperties, PropertyName]] = [
     ("events", "$host"),
@@ -654,3 +656,37 @@ class QuerySuite:
             )
             cohort.calculate_people_ch(pending_version=0)
         self.cohort = cohort
+
+
+HOGQL_PARSER_QUERY = """
+SELECT
+    start_of_period,
+    countIf(status = 'new') AS new,
+    -countIf(status = 'dormant') AS dormant,
+    if(count() > 0, round(sum(duration) / count(), 2), 0) AS average_duration
+FROM (
+    SELECT
+        person_id,
+        toStartOfDay(timestamp) AS start_of_period,
+        multiIf(person.created_at >= start_of_period, 'new', 'dormant') AS status,
+        dateDiff('second', min(timestamp), max(timestamp)) AS duration
+    FROM events
+    WHERE event = '$pageview' AND timestamp >= now() - INTERVAL 30 DAY AND properties.$browser IN ('Chrome', 'Safari')
+    GROUP BY person_id, start_of_period, status
+) AS periods
+GROUP BY start_of_period
+ORDER BY start_of_period ASC
+LIMIT 100
+"""
+
+
+class HogQLParserSuite:
+    version = "v001"
+
+    def time_parse_select_antlr(self):
+        with override_settings(HOGQL_PRATT_PARSER_ENABLED=False):
+            parse_select(HOGQL_PARSER_QUERY)
+
+    def time_parse_select_pratt(self):
+        with override_settings(HOGQL_PRATT_PARSER_ENABLED=True):
+            parse_select(HOGQL_PARSER_QUERY)
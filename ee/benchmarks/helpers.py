@@ -4,7 +4,6 @@ from contextlib import contextmanager
 from functools import wraps
 from os.path import dirname
 
-from django.utils.timezone import now
 
 os.environ["POSTHOG_DB_NAME"] = "posthog_test"
 os.environ["DJANGO_SETTINGS_MODULE"] = "posthog.settings"
@@ -71,6 +70,9 @@ def benchmark_clickhouse(fn):
 @contextmanager
 def no_materialized_columns():
     "Allows running a function without any materialized columns being used in query"
-    get_materialized_columns._cache = {("events",): (now(), {}), ("person",): (now(), {})}
-    yield
-    get_materialized_columns._cache = {}
+    for table in ("events", "person", "groups", "session_recording_events"):
+        get_materialized_columns.cache_set({}, table)
+    try:
+        yield
+    finally:
+        get_materialized_columns.cache_clear()
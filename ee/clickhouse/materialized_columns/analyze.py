@@ -1,7 +1,7 @@
 import re
 from collections import defaultdict
 from datetime import timedelta
-from typing import Dict, Generator, List, Optional, Set, Tuple
+from typing import Generator, List, Optional, Set, Tuple
 
 import structlog
 
@@ -128,6 +128,7 @@ def _get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
         WHERE
             query NOT LIKE '%%query_log%%'
             AND (query LIKE '/* user_id:%%' OR query LIKE '/* request:%%')
+            AND NOT JSONHas(log_comment, 'property_accesses')
             AND query NOT LIKE '%%INSERT%%'
             AND type = 'QueryFinish'
             AND query_start_time > now() - toIntervalHour(%(since)s)
@@ -139,7 +140,36 @@ def _get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
     return [Query(query, query_duration_ms, min_query_time) for query, query_duration_ms in raw_queries]
 
 
-def _analyze(queries: List[Query]) -> List[Suggestion]:
+def _get_hogql_property_accesses(since_hours_ago: int, min_query_time: int) -> List[Suggestion]:
+    """
+    Finds properties that slow HogQL queries since cutoff extracted from JSON, with the total cost of those queries.
+    HogQL queries are tagged with the properties they read, so there's no need to guess which table they're from.
+    """
+
+    rows = sync_execute(
+        """
+        SELECT
+            access[1] AS table_name,
+            access[2] AS table_column,
+            access[3] AS property_name,
+            sum(intDiv(query_duration_ms - %(min_query_time)s, 1000) + 1) AS cost
+        FROM system.query_log
+        ARRAY JOIN JSONExtract(log_comment, 'property_accesses', 'Array(Array(String))') AS access
+        WHERE
+            JSONHas(log_comment, 'property_accesses')
+            AND type = 'QueryFinish'
+            AND query_start_time > now() - toIntervalHour(%(since)s)
+            AND query_duration_ms > %(min_query_time)s
+            AND table_name IN ('events', 'person')
+        GROUP BY table_name, table_column, property_name
+        ORDER BY cost DESC
+        """,
+        {"since": since_hours_ago, "min_query_time": min_query_time},
+    )
+    return [(table, table_column, property, cost) for table, table_column, property, cost in rows]
+
+
+def _analyze(queries: List[Query], hogql_property_accesses: Optional[List[Suggestion]] = None) -> List[Suggestion]:
     """
     Analyzes query history to find which properties could get materialized.
 
@@ -156,6 +186,9 @@ def _analyze(queries: List[Query]) -> List[Suggestion]:
         for table, table_column, property in query.properties(team_manager):
             costs[(table, table_column, property)] += query.cost
 
+    for table, table_column, property, cost in hogql_property_accesses or []:
+        costs[(table, table_column, property)] += cost
+
     return [
         (table, table_column, property_name, cost)
         for (table, table_column, property_name), cost in sorted(costs.items(), key=lambda kv: -kv[1])
@@ -175,7 +208,10 @@ def materialize_properties_task(
     """
 
     if columns_to_materialize is None:
-        columns_to_materialize = _analyze(_get_queries(time_to_analyze_hours, min_query_time))
+        columns_to_materialize = _analyze(
+            _get_queries(time_to_analyze_hours, min_query_time),
+            _get_hogql_property_accesses(time_to_analyze_hours, min_query_time),
+        )
     result = []
     for suggestion in columns_to_materialize:
         table, table_column, property_name, _ = suggestion
@@ -187,15 +223,16 @@ def materialize_properties_task(
     else:
         logger.info("Found no columns to materialize.")
 
-    properties: Dict[TableWithProperties, List[Tuple[PropertyName, TableColumn]]] = {"events": [], "person": []}
+    properties: List[Tuple[TableWithProperties, PropertyName, TableColumn]] = []
     for table, table_column, property_name, cost in result[:maximum]:
         logger.info(f"Materializing column. table={table}, property_name={property_name}, cost={cost}")
 
         if not dry_run:
             materialize(table, property_name, table_column=table_column)
-        properties[table].append((property_name, table_column))
+        properties.append((table, property_name, table_column))
 
     if backfill_period_days > 0 and not dry_run:
         logger.info(f"Starting backfill for new materialized columns. period_days={backfill_period_days}")
-        backfill_materialized_columns("events", properties["events"], timedelta(days=backfill_period_days))
-        backfill_materialized_columns("person", properties["person"], timedelta(days=backfill_period_days))
+        # Mutations of a table run in the order they're created, so the most costly columns are backfilled first
+        for table, property_name, table_column in properties:
+            backfill_materialized_columns(table, [(property_name, table_column)], timedelta(days=backfill_period_days))
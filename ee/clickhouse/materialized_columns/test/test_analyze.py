@@ -1,5 +1,10 @@
-from ee.clickhouse.materialized_columns.analyze import Query, TeamManager
+from django.test import override_settings
+
+from ee.clickhouse.materialized_columns.analyze import Query, TeamManager, _analyze, _get_hogql_property_accesses
+from posthog.client import sync_execute
 from posthog.clickhouse.kafka_engine import trim_quotes_expr
+from posthog.clickhouse.query_tagging import get_query_tag_value
+from posthog.hogql.query import execute_hogql_query
 from posthog.models import Person, PropertyDefinition
 from posthog.models.event.util import bulk_create_events
 from posthog.test.base import BaseTest, ClickhouseTestMixin
@@ -121,3 +126,39 @@ class TestMaterializedColumnsAnalyze(ClickhouseTestMixin, BaseTest):
             f"SELECT JSONExtractString(, 'prop') FROM events WHERE team_id = {self.team.pk}", 3340
         )
         self.assertEqual(list(query_with_invalid_column.properties(TeamManager())), [])
+
+    @override_settings(PERSON_ON_EVENTS_OVERRIDE=False, PERSON_ON_EVENTS_V2_OVERRIDE=False)
+    def test_hogql_property_accesses(self):
+        execute_hogql_query(
+            "SELECT properties.hogql_event_prop, person.properties.hogql_person_prop FROM events", team=self.team
+        )
+        execute_hogql_query("SELECT properties.hogql_event_prop FROM events", team=self.team)
+        sync_execute("SYSTEM FLUSH LOGS")
+
+        suggestions = [
+            suggestion
+            for suggestion in _get_hogql_property_accesses(since_hours_ago=1, min_query_time=-1)
+            if suggestion[2].startswith("hogql_")
+        ]
+        self.assertEqual(
+            [(table, table_column, property) for table, table_column, property, _ in suggestions],
+            [("events", "properties", "hogql_event_prop"), ("person", "properties", "hogql_person_prop")],
+        )
+        self.assertGreater(suggestions[0][3], suggestions[1][3])
+
+    def test_hogql_property_accesses_are_not_attributed_to_later_queries(self):
+        execute_hogql_query("SELECT properties.hogql_event_prop FROM events", team=self.team)
+
+        self.assertIsNone(get_query_tag_value("property_accesses"))
+
+    def test_analyze_adds_up_costs(self):
+        query = Query(
+            f"SELECT JSONExtractString(properties, 'event_prop') FROM events WHERE team_id = {self.team.pk}", 5500, 3000
+        )
+        self.assertEqual(
+            _analyze(
+                [query],
+                [("events", "properties", "event_prop", 2), ("events", "person_properties", "person_prop", 4)],
+            ),
+            [("events", "properties", "event_prop", 5), ("events", "person_properties", "person_prop", 4)],
+        )
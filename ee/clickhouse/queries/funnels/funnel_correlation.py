@@ -19,8 +19,7 @@ from ee.clickhouse.queries.column_optimizer import EnterpriseColumnOptimizer
 from ee.clickhouse.queries.groups_join_query import GroupsJoinQuery
 from posthog.clickhouse.materialized_columns import get_materialized_columns
 from posthog.constants import AUTOCAPTURE_EVENT, TREND_FILTER_TYPE_ACTIONS, FunnelCorrelationType
-from posthog.models.element.element import chain_to_elements
-from posthog.models.event.util import ElementSerializer
+from posthog.models.element.element import parse_elements_chain
 from posthog.models.filters import Filter
 from posthog.models.property.util import get_property_string_expr
 from posthog.models.team import Team
@@ -898,7 +897,7 @@ class FunnelCorrelation:
             return EventDefinition(
                 event=event,
                 properties={self.AUTOCAPTURE_EVENT_TYPE: event_type},
-                elements=cast(list, ElementSerializer(chain_to_elements(elements_chain), many=True).data),
+                elements=[{"event": None, **element} for element in parse_elements_chain(elements_chain)],
             )
 
         return EventDefinition(event=event, properties={}, elements=[])
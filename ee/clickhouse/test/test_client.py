@@ -2,10 +2,11 @@ from unittest.mock import patch
 
 import fakeredis
 from clickhouse_driver.errors import ServerException
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from posthog.clickhouse.client import execute_async as client
 from posthog.client import sync_execute
+from posthog.storage import object_storage
 from posthog.test.base import ClickhouseTestMixin
 
 
@@ -22,6 +23,61 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
         self.assertTrue(result.complete)
         self.assertEqual(result.results, [[2]])
 
+    @override_settings(OBJECT_STORAGE_ENABLED=True, ASYNC_QUERY_RESULTS_CHUNK_ROWS=2)
+    def test_async_query_client_spools_results_in_chunks(self):
+        query = "SELECT number FROM numbers(5)"
+        team_id = 2
+        query_id = client.enqueue_execute_with_progress(team_id, query, bypass_celery=True, force=True)
+
+        result = client.get_status_or_results(team_id, query_id)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.results_chunks, 3)
+        self.assertEqual(result.results, [[0], [1]])
+        self.assertEqual(client.get_status_or_results(team_id, query_id, chunk=2).results, [[4]])
+
+        result = client.get_status_or_results(team_id, query_id, chunk=3)
+        self.assertTrue(result.error)
+        self.assertEqual(result.error_message, "Results chunk 3 does not exist, there are 3")
+
+    @override_settings(OBJECT_STORAGE_ENABLED=True, ASYNC_QUERY_RESULTS_CHUNK_ROWS=2)
+    @patch("posthog.clickhouse.client.execute_async.delete_clickhouse_query_results")
+    def test_async_query_client_deletes_spooled_results_when_status_expires(self, patched_delete):
+        query = "SELECT number FROM numbers(5)"
+        team_id = 2
+        query_id = client.enqueue_execute_with_progress(team_id, query, bypass_celery=True, force=True)
+
+        start_time = client.get_status_or_results(team_id, query_id).start_time
+        patched_delete.apply_async.assert_called_once_with(
+            (client.generate_results_prefix(team_id, query_id, start_time),), countdown=client.RESULTS_CHUNKS_TTL
+        )
+
+    @override_settings(OBJECT_STORAGE_ENABLED=True, ASYNC_QUERY_RESULTS_CHUNK_ROWS=2)
+    def test_async_query_client_expired_results(self):
+        query = "SELECT number FROM numbers(5)"
+        team_id = 2
+        query_id = client.enqueue_execute_with_progress(team_id, query, bypass_celery=True, force=True)
+
+        with patch(
+            "posthog.storage.object_storage.read_bytes", side_effect=object_storage.ObjectStorageError("read failed")
+        ):
+            with self.assertRaises(client.QueryResultsExpired):
+                client.get_status_or_results(team_id, query_id, chunk=1)
+
+        # The status doesn't need the results
+        updates = list(client.get_status_updates(team_id, query_id, timeout=1))
+        self.assertTrue(updates[0].complete)
+
+    def test_async_query_client_status_updates(self):
+        query = "SELECT 2+2"
+        team_id = 2
+        query_id = client.enqueue_execute_with_progress(team_id, query, with_column_types=True, bypass_celery=True)
+
+        updates = list(client.get_status_updates(team_id, query_id, timeout=1))
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].complete)
+        self.assertIsNone(updates[0].results)
+        self.assertEqual(client.get_status_or_results(team_id, query_id).types, [["plus(2, 2)", "UInt16"]])
+
     def test_async_query_client_errors(self):
         query = "SELECT WOW SUCH DATA FROM NOWHERE THIS WILL CERTAINLY WORK"
         team_id = 2
@@ -46,7 +102,21 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
         query_id = client.enqueue_execute_with_progress(team_id, query, bypass_celery=True)
         result = client.get_status_or_results(wrong_team, query_id)
         self.assertTrue(result.error)
-        self.assertEqual(result.error_message, "Requesting team is not executing team")
+        self.assertEqual(result.error_message, "Query is unknown to backend")
+
+    @patch("posthog.clickhouse.client.execute_async.celery.app.control.revoke")
+    @patch("posthog.clickhouse.client.execute_async.enqueue_clickhouse_execute_with_progress")
+    def test_async_query_client_query_ids_are_scoped_to_teams(self, execute_sync_mock, revoke_mock):
+        query_id = "same_client_query_id"
+        client.enqueue_execute_with_progress(2, "SELECT 1", query_id=query_id, bypass_celery=True)
+
+        # Another team using the same id runs its own query, and neither revokes nor forgets the first one
+        client.enqueue_execute_with_progress(5, "SELECT 2", query_id=query_id, bypass_celery=True, force=True)
+
+        self.assertEqual(execute_sync_mock.call_count, 2)
+        revoke_mock.assert_not_called()
+        self.assertFalse(client.get_status_or_results(2, query_id).error)
+        self.assertFalse(client.get_status_or_results(5, query_id).error)
 
     @patch("posthog.clickhouse.client.execute_async.enqueue_clickhouse_execute_with_progress")
     def test_async_query_client_is_lazy(self, execute_sync_mock):
@@ -43,6 +43,7 @@ export enum NodeKind {
     PersonsNode = 'PersonsNode',
     HogQLQuery = 'HogQLQuery',
     HogQLMetadata = 'HogQLMetadata',
+    HogQLExplain = 'HogQLExplain',
 
     // Interface nodes
     DataTableNode = 'DataTableNode',
@@ -74,6 +75,7 @@ export type AnyDataNode =
     | PersonsNode
     | HogQLQuery
     | HogQLMetadata
+    | HogQLExplain
     | TimeToSeeDataSessionsQuery
 
 export type QuerySchema =
@@ -108,6 +110,7 @@ export type AnyResponseType =
     | Record<string, any>
     | HogQLQueryResponse
     | HogQLMetadataResponse
+    | HogQLExplainResponse
     | EventsNode['response']
     | EventsQueryResponse
 
@@ -164,6 +167,46 @@ export interface HogQLMetadata extends DataNode {
     response?: HogQLMetadataResponse
 }
 
+export interface HogQLExplainProperty {
+    table: string
+    field: string
+    property: string
+    /** The materialized column the property was read from, or null if it was extracted from JSON */
+    materializedColumn: string | null
+}
+
+export interface HogQLExplainTable {
+    table: string
+    /** Parts ClickHouse expects to read from after using the table's indexes */
+    estimatedParts: number
+    /** Rows ClickHouse expects to read after using the table's indexes */
+    estimatedRows: number
+    /** Granules ClickHouse expects to read after using the table's indexes */
+    estimatedMarks: number
+}
+
+export interface HogQLExplainResponse {
+    query?: string
+    hogql?: string
+    clickhouse?: string
+    /** Output of EXPLAIN indexes = 1 */
+    indexes?: string[]
+    /** Output of EXPLAIN PIPELINE */
+    pipeline?: string[]
+    /** Properties read by the query, and the materialized columns they were read from */
+    properties?: HogQLExplainProperty[]
+    /** How much of the tables read by the query ClickHouse expects to read, for the team's data only */
+    tables?: HogQLExplainTable[]
+    timings?: QueryTiming[]
+}
+
+export interface HogQLExplain extends DataNode {
+    kind: NodeKind.HogQLExplain
+    query: string
+    filters?: HogQLFilters
+    response?: HogQLExplainResponse
+}
+
 export interface EntityNode extends DataNode {
     name?: string
     custom_name?: string
@@ -442,6 +485,8 @@ export type LifecycleFilter = Omit<LifecycleFilterType, keyof FilterType> & {
 
 export interface LifecycleQueryResponse {
     result: Record<string, any>[]
+    /** Sampling rate the results were calculated with */
+    samplingFactor?: number | null
     timings?: QueryTiming[]
 }
 
@@ -33,6 +33,7 @@ import {
     InsightVizNode,
     Node,
     QueryContext,
+    QueryTiming,
 } from './queries/schema'
 import { JSONContent } from 'scenes/notebooks/Notebook/utils'
 import { DashboardCompatibleScenes } from 'lib/components/SceneDashboardChoice/sceneDashboardChoiceModalLogic'
@@ -1362,6 +1363,8 @@ export type DashboardTemplateScope = 'team' | 'global' | 'feature_flag'
 export interface DashboardType extends DashboardBasicType {
     tiles: DashboardTile[]
     filters: Record<string, any>
+    /** How long refreshing the tiles took, by stage and insight, if they were refreshed */
+    timings?: QueryTiming[] | null
 }
 
 export interface DashboardTemplateType {
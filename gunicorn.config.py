@@ -54,6 +54,17 @@ def post_fork(server, worker):
     worker_monitor.start()
 
 
+def post_worker_init(worker):
+    """
+    Start opening ClickHouse connections of the worker, now that the app and its
+    settings are loaded. This happens in the background, so that the worker
+    boots within its timeout even when ClickHouse is slow to answer.
+    """
+    from posthog.clickhouse.client.connection import warm_up_pools
+
+    warm_up_pools()
+
+
 def worker_exit(server, worker):
     """
     Ensure that we mark workers as dead with the prometheus_client such that
@@ -4,7 +4,7 @@ import re
 import time
 from datetime import datetime
 from random import random
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import structlog
 from dateutil import parser
@@ -35,6 +35,7 @@ from posthog.kafka_client.topics import (
 from posthog.logging.timing import timed
 from posthog.metrics import LABEL_RESOURCE_TYPE
 from posthog.models.utils import UUIDT
+from posthog.redis_token_bucket import RedisTokenBucketLimiter
 from posthog.session_recordings.session_recording_helpers import (
     legacy_preprocess_session_recording_events_for_clickhouse,
     preprocess_replay_events_for_blob_ingestion,
@@ -45,11 +46,19 @@ from posthog.utils_cors import cors_response
 
 logger = structlog.get_logger(__name__)
 
-LIMITER = Limiter(
-    rate=settings.PARTITION_KEY_BUCKET_REPLENTISH_RATE,
-    capacity=settings.PARTITION_KEY_BUCKET_CAPACITY,
-    storage=MemoryStorage(),
-)
+LIMITER: Union[Limiter, RedisTokenBucketLimiter]
+if settings.PARTITION_KEY_BUCKET_SHARED:
+    LIMITER = RedisTokenBucketLimiter(
+        "capture_partition_key",
+        rate=settings.PARTITION_KEY_BUCKET_REPLENTISH_RATE,
+        capacity=settings.PARTITION_KEY_BUCKET_CAPACITY,
+    )
+else:
+    LIMITER = Limiter(
+        rate=settings.PARTITION_KEY_BUCKET_REPLENTISH_RATE,
+        capacity=settings.PARTITION_KEY_BUCKET_CAPACITY,
+        storage=MemoryStorage(),
+    )
 LOG_RATE_LIMITER = Limiter(
     rate=1 / 60,
     capacity=1,
@@ -16,10 +16,12 @@ from rest_framework.utils.serializer_helpers import ReturnDict
 
 from posthog.api.dashboards.dashboard_template_json_schema_parser import DashboardTemplateCreationJSONSchemaParser
 from posthog.api.forbid_destroy_model import ForbidDestroyModel
-from posthog.api.insight import InsightSerializer, InsightViewSet
+from posthog.api.insight import INSIGHT_REFRESH_INITIATED_COUNTER, InsightSerializer, InsightViewSet
 from posthog.api.routing import StructuredViewSetMixin
 from posthog.api.shared import UserBasicSerializer
 from posthog.api.tagged_item import TaggedItemSerializerMixin, TaggedItemViewSetMixin
+from posthog.caching.batch_results import BatchInsightResults, batch_update_cache
+from posthog.caching.insights_api import should_refresh_insight
 from posthog.constants import AvailableFeature
 from posthog.event_usage import report_user_action
 from posthog.helpers import create_dashboard_from_template
@@ -31,6 +33,7 @@ from posthog.models.team.team import check_is_feature_available_for_team
 from posthog.models.user import User
 from posthog.permissions import ProjectMembershipNecessaryPermissions, TeamMemberAccessPermission
 from posthog.user_permissions import UserPermissionsSerializerMixin
+from posthog.utils import refresh_requested_by_client
 
 logger = structlog.get_logger(__name__)
 
@@ -81,6 +84,7 @@ class DashboardBasicSerializer(TaggedItemSerializerMixin, serializers.ModelSeria
     effective_privilege_level = serializers.SerializerMethodField()
     effective_restriction_level = serializers.SerializerMethodField()
     is_shared = serializers.BooleanField(source="is_sharing_enabled", read_only=True, required=False)
+    timings = serializers.SerializerMethodField()
 
     class Meta:
         model = Dashboard
@@ -121,6 +125,7 @@ class DashboardSerializer(DashboardBasicSerializer):
     effective_privilege_level = serializers.SerializerMethodField()
     effective_restriction_level = serializers.SerializerMethodField()
     is_shared = serializers.BooleanField(source="is_sharing_enabled", read_only=True, required=False)
+    timings = serializers.SerializerMethodField()
 
     class Meta:
         model = Dashboard
@@ -140,6 +145,8 @@ class DashboardSerializer(DashboardBasicSerializer):
             "filters",
             "tags",
             "tiles",
+            # After tiles, which refresh the insights
+            "timings",
             "restriction_level",
             "effective_restriction_level",
             "effective_privilege_level",
@@ -357,6 +364,11 @@ class DashboardSerializer(DashboardBasicSerializer):
         )
         self.user_permissions.set_preloaded_dashboard_tiles(list(tiles))
 
+        if refresh_requested_by_client(self.context["request"]):
+            batch = self._refresh_tiles(dashboard, tiles)
+            # used by insight serializer to skip calculating each tile on its own
+            self.context.update({"batch_insight_results": batch.results, "batch_insight_timings": batch.timings})
+
         for tile in tiles:
             self.context.update({"dashboard_tile": tile})
 
@@ -368,6 +380,29 @@ class DashboardSerializer(DashboardBasicSerializer):
 
         return serialized_tiles
 
+    def get_timings(self, dashboard: Dashboard) -> Optional[List[Dict[str, Any]]]:
+        """How long refreshing the tiles took, by stage and insight. None unless they were refreshed."""
+        timings = self.context.get("batch_insight_timings")
+        if timings is None:
+            return None
+        return [timing.dict() for timing in timings]
+
+    def _refresh_tiles(self, dashboard: Dashboard, tiles: QuerySet) -> BatchInsightResults:
+        is_shared = self.context.get("is_shared", False)
+
+        insights_to_refresh = []
+        for tile in tiles:
+            if tile.insight is None:
+                continue
+            refresh_insight_now, refresh_frequency = should_refresh_insight(
+                tile.insight, tile, request=self.context["request"], is_shared=is_shared
+            )
+            if refresh_insight_now:
+                INSIGHT_REFRESH_INITIATED_COUNTER.labels(is_shared=is_shared).inc()
+                insights_to_refresh.append((tile.insight, refresh_frequency))
+
+        return batch_update_cache(insights_to_refresh, dashboard)
+
     def validate(self, data):
         if data.get("use_dashboard", None) and data.get("use_template", None):
             raise serializers.ValidationError("`use_dashboard` and `use_template` cannot be used together")
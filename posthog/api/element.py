@@ -10,7 +10,7 @@ from posthog.api.routing import StructuredViewSetMixin
 from posthog.auth import PersonalAPIKeyAuthentication, TemporaryTokenAuthentication
 from posthog.client import sync_execute
 from posthog.models import Element, Filter
-from posthog.models.element.element import chain_to_elements
+from posthog.models.element.element import parse_elements_chain
 from posthog.models.element.sql import GET_ELEMENTS, GET_VALUES
 from posthog.models.instance_setting import get_instance_setting
 from posthog.models.property.util import parse_prop_grouped_clauses
@@ -108,7 +108,7 @@ class ElementViewSet(StructuredViewSetMixin, viewsets.ModelViewSet):
                 "count": elements[1],
                 "hash": None,
                 "type": elements[2],
-                "elements": [ElementSerializer(element).data for element in chain_to_elements(elements[0])],
+                "elements": parse_elements_chain(elements[0]),
             }
             for elements in result[:limit]
         ]
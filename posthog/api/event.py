@@ -8,7 +8,7 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter
 from rest_framework import mixins, request, response, serializers, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
 from rest_framework_csv import renderers as csvrenderers
@@ -19,7 +19,7 @@ from posthog.api.routing import StructuredViewSetMixin
 from posthog.client import query_with_columns, sync_execute
 from posthog.hogql.constants import DEFAULT_RETURNED_ROWS, MAX_SELECT_RETURNED_ROWS
 from posthog.models import Element, Filter, Person
-from posthog.models.event.query_event_list import query_events_list
+from posthog.models.event.query_event_list import EventsCursor, query_events_list, query_events_list_by_cursor
 from posthog.models.event.sql import GET_CUSTOM_EVENTS, SELECT_ONE_EVENT_SQL
 from posthog.models.event.util import ClickhouseEventSerializer
 from posthog.models.person.util import get_persons_by_distinct_ids
@@ -58,7 +58,13 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
     permission_classes = [IsAuthenticated, ProjectMembershipNecessaryPermissions, TeamMemberAccessPermission]
     throttle_classes = [ClickHouseBurstRateThrottle, ClickHouseSustainedRateThrottle]
 
-    def _build_next_url(self, request: request.Request, last_event_timestamp: datetime, order_by: List[str]) -> str:
+    def _build_next_url(
+        self,
+        request: request.Request,
+        last_event_timestamp: datetime,
+        order_by: List[str],
+        cursor: Optional[EventsCursor] = None,
+    ) -> str:
         params = request.GET.dict()
         reverse = "-timestamp" in order_by
         timestamp = last_event_timestamp.astimezone().isoformat()
@@ -66,6 +72,8 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
             params["before"] = timestamp
         else:
             params["after"] = timestamp
+        if cursor:
+            params["cursor"] = cursor.encode()
         return request.build_absolute_uri(f"{request.path}?{urllib.parse.urlencode(params)}")
 
     @extend_schema(
@@ -96,6 +104,11 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
                 "after", OpenApiTypes.DATETIME, description="Only return events with a timestamp after this time."
             ),
             OpenApiParameter("limit", OpenApiTypes.INT, description="The maximum number of results to return"),
+            OpenApiParameter(
+                "cursor",
+                OpenApiTypes.STR,
+                description="Opaque cursor from the `next` URL of a previous page, to continue listing from.",
+            ),
             PropertiesSerializer(required=False),
         ]
     )
@@ -117,42 +130,67 @@ class EventViewSet(StructuredViewSetMixin, mixins.RetrieveModelMixin, mixins.Lis
             except ValueError:
                 offset = 0
 
+            try:
+                cursor = EventsCursor.decode(request.GET["cursor"]) if request.GET.get("cursor") else None
+            except ValueError:
+                raise ValidationError({"cursor": "Invalid cursor."})
+
             team = self.team
             filter = Filter(request=request, team=self.team)
             order_by: List[str] = (
                 list(json.loads(request.GET["orderBy"])) if request.GET.get("orderBy") else ["-timestamp"]
             )
+            request_get_query_dict = {key: value for key, value in request.GET.dict().items() if key != "cursor"}
 
-            query_result = query_events_list(
-                filter=filter,
-                team=team,
-                limit=limit,
-                offset=offset,
-                request_get_query_dict=request.GET.dict(),
-                order_by=order_by,
-                action_id=request.GET.get("action_id"),
-            )
-
-            # Retry the query without the 1 day optimization
-            if len(query_result) < limit and not request.GET.get("after"):
+            if offset > 0:
                 query_result = query_events_list(
-                    unbounded_date_from=True,  # only this changed from the query above
                     filter=filter,
                     team=team,
                     limit=limit,
                     offset=offset,
-                    request_get_query_dict=request.GET.dict(),
+                    request_get_query_dict=request_get_query_dict,
                     order_by=order_by,
                     action_id=request.GET.get("action_id"),
                 )
 
+                # Retry the query without the 1 day optimization
+                if len(query_result) < limit and not request.GET.get("after"):
+                    query_result = query_events_list(
+                        unbounded_date_from=True,  # only this changed from the query above
+                        filter=filter,
+                        team=team,
+                        limit=limit,
+                        offset=offset,
+                        request_get_query_dict=request_get_query_dict,
+                        order_by=order_by,
+                        action_id=request.GET.get("action_id"),
+                    )
+            else:
+                query_result = query_events_list_by_cursor(
+                    filter=filter,
+                    team=team,
+                    limit=limit,
+                    request_get_query_dict=request_get_query_dict,
+                    order_by=order_by,
+                    action_id=request.GET.get("action_id"),
+                    cursor=cursor,
+                )
+
             result = ClickhouseEventSerializer(
                 query_result[0:limit], many=True, context={"people": self._get_people(query_result, team)}
             ).data
 
             next_url: Optional[str] = None
             if not is_csv_request and len(query_result) > limit:
-                next_url = self._build_next_url(request, query_result[limit - 1]["timestamp"], order_by)
+                last_event = query_result[limit - 1]
+                next_url = self._build_next_url(
+                    request,
+                    last_event["timestamp"],
+                    order_by,
+                    cursor=EventsCursor(timestamp=last_event["timestamp"], uuid=str(last_event["uuid"]))
+                    if offset == 0
+                    else None,
+                )
             return response.Response({"next": next_url, "results": result})
 
         except Exception as ex:
@@ -74,6 +74,7 @@ from posthog.permissions import (
     ProjectMembershipNecessaryPermissions,
     TeamMemberAccessPermission,
 )
+from posthog.queries.adaptive_sampling import applied_sampling, with_adaptive_sampling
 from posthog.queries.funnels import ClickhouseFunnelTimeToConvert, ClickhouseFunnelTrends
 from posthog.queries.funnels.utils import get_funnel_order_class
 from posthog.queries.paths.paths import Paths
@@ -499,6 +500,11 @@ class InsightSerializer(InsightBasicSerializer, UserPermissionsSerializerMixin):
 
     @lru_cache(maxsize=1)
     def insight_result(self, insight: Insight) -> InsightResult:
+        # Refreshed together with the other tiles of the dashboard
+        batch_result = self.context.get("batch_insight_results", {}).get(insight.pk)
+        if batch_result is not None:
+            return batch_result
+
         dashboard = self.context.get("dashboard", None)
         dashboard_tile = self.dashboard_tile_from_context(insight, dashboard)
         target = insight if dashboard is None else dashboard_tile
@@ -829,20 +835,23 @@ Using the correct cache and enriching the response with dashboard specific confi
     @cached_by_filters
     def calculate_trends(self, request: request.Request) -> Dict[str, Any]:
         team = self.team
-        filter = Filter(request=request, team=self.team)
+        filter = with_adaptive_sampling(Filter(request=request, team=self.team))
 
         if filter.insight == INSIGHT_STICKINESS or filter.shown_as == TRENDS_STICKINESS:
-            stickiness_filter = StickinessFilter(
-                request=request,
-                team=team,
-                get_earliest_timestamp=get_earliest_timestamp,
+            stickiness_filter = with_adaptive_sampling(
+                StickinessFilter(
+                    request=request,
+                    team=team,
+                    get_earliest_timestamp=get_earliest_timestamp,
+                )
             )
             result = self.stickiness_query_class().run(stickiness_filter, team)
+            return {"result": result, "timezone": team.timezone, **applied_sampling(stickiness_filter)}
         else:
             trends_query = Trends()
             result = trends_query.run(filter, team)
 
-        return {"result": result, "timezone": team.timezone}
+        return {"result": result, "timezone": team.timezone, **applied_sampling(filter)}
 
     # ******************************************
     # /projects/:id/insights/funnel
@@ -883,23 +892,26 @@ Using the correct cache and enriching the response with dashboard specific confi
     @cached_by_filters
     def calculate_funnel(self, request: request.Request) -> Dict[str, Any]:
         team = self.team
-        filter = Filter(request=request, data={"insight": INSIGHT_FUNNELS}, team=self.team)
+        filter = with_adaptive_sampling(Filter(request=request, data={"insight": INSIGHT_FUNNELS}, team=self.team))
 
         if filter.funnel_viz_type == FunnelVizType.TRENDS:
             return {
                 "result": ClickhouseFunnelTrends(team=team, filter=filter).run(),
                 "timezone": team.timezone,
+                **applied_sampling(filter),
             }
         elif filter.funnel_viz_type == FunnelVizType.TIME_TO_CONVERT:
             return {
                 "result": ClickhouseFunnelTimeToConvert(team=team, filter=filter).run(),
                 "timezone": team.timezone,
+                **applied_sampling(filter),
             }
         else:
             funnel_order_class = get_funnel_order_class(filter)
             return {
                 "result": funnel_order_class(team=team, filter=filter).run(),
                 "timezone": team.timezone,
+                **applied_sampling(filter),
             }
 
     # ******************************************
@@ -922,10 +934,10 @@ Using the correct cache and enriching the response with dashboard specific confi
         data = {}
         if not request.GET.get("date_from"):
             data.update({"date_from": "-11d"})
-        filter = RetentionFilter(data=data, request=request, team=self.team)
+        filter = with_adaptive_sampling(RetentionFilter(data=data, request=request, team=self.team))
         base_uri = request.build_absolute_uri("/")
         result = self.retention_query_class(base_uri=base_uri).run(filter, team)
-        return {"result": result, "timezone": team.timezone}
+        return {"result": result, "timezone": team.timezone, **applied_sampling(filter)}
 
     # ******************************************
     # /projects/:id/insights/path
@@ -945,7 +957,7 @@ Using the correct cache and enriching the response with dashboard specific confi
     @cached_by_filters
     def calculate_path(self, request: request.Request) -> Dict[str, Any]:
         team = self.team
-        filter = PathFilter(request=request, data={"insight": INSIGHT_PATHS}, team=self.team)
+        filter = with_adaptive_sampling(PathFilter(request=request, data={"insight": INSIGHT_PATHS}, team=self.team))
 
         funnel_filter = None
         funnel_filter_data = request.GET.get("funnel_filter") or request.data.get("funnel_filter")
@@ -959,7 +971,7 @@ Using the correct cache and enriching the response with dashboard specific confi
             filter = filter.shallow_clone({PATHS_INCLUDE_EVENT_TYPES: [filter.path_type]})
         resp = self.paths_query_class(filter=filter, team=team, funnel_filter=funnel_filter).run()
 
-        return {"result": resp, "timezone": team.timezone}
+        return {"result": resp, "timezone": team.timezone, **applied_sampling(filter)}
 
     # ******************************************
     # /projects/:id/insights/:short_id/viewed
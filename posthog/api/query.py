@@ -1,14 +1,17 @@
 import json
 import re
+from dataclasses import asdict as dataclass_asdict
 from typing import Dict, Optional, cast, Any, List
 
-from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter
 from pydantic import BaseModel
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ParseError, ValidationError, NotAuthenticated
+from rest_framework.exceptions import ParseError, ValidationError, NotAuthenticated, NotFound
 from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -18,13 +21,20 @@ from sentry_sdk import capture_exception
 from posthog import schema
 from posthog.api.documentation import extend_schema
 from posthog.api.routing import StructuredViewSetMixin
+from posthog.clickhouse.client.execute_async import (
+    QueryResultsExpired,
+    enqueue_execute_with_progress,
+    get_status_or_results,
+    get_status_updates,
+)
 from posthog.clickhouse.query_tagging import tag_queries
 from posthog.errors import ExposedCHQueryError
 from posthog.hogql.ai import PromptUnclear, write_sql_from_prompt
 from posthog.hogql.database.database import create_hogql_database, serialize_database
 from posthog.hogql.errors import HogQLException
+from posthog.hogql.explain import explain_hogql_query
 from posthog.hogql.metadata import get_hogql_metadata
-from posthog.hogql.query import execute_hogql_query
+from posthog.hogql.query import execute_hogql_query, prepare_hogql_query
 from posthog.hogql_queries.lifecycle_hogql_query import run_lifecycle_query
 from posthog.models import Team
 from posthog.models.event.events_query import run_events_query
@@ -33,7 +43,7 @@ from posthog.permissions import ProjectMembershipNecessaryPermissions, TeamMembe
 from posthog.queries.time_to_see_data.serializers import SessionEventsQuerySerializer, SessionsQuerySerializer
 from posthog.queries.time_to_see_data.sessions import get_session_events, get_sessions
 from posthog.rate_limit import AIBurstRateThrottle, AISustainedRateThrottle, TeamRateThrottle
-from posthog.schema import EventsQuery, HogQLQuery, HogQLMetadata, LifecycleQuery
+from posthog.schema import EventsQuery, HogQLExplain, HogQLQuery, HogQLMetadata, LifecycleQuery
 
 
 class QueryThrottle(TeamRateThrottle):
@@ -71,6 +81,9 @@ class QueryViewSet(StructuredViewSetMixin, viewsets.ViewSet):
     def get_throttles(self):
         if self.action == "draft_sql":
             return [AIBurstRateThrottle(), AISustainedRateThrottle()]
+        elif self.action in ("retrieve", "progress"):
+            # Only look up queries that were already throttled when they were started
+            return []
         else:
             return [QueryThrottle()]
 
@@ -106,6 +119,15 @@ class QueryViewSet(StructuredViewSetMixin, viewsets.ViewSet):
         self._tag_client_query_id(request_json.get("client_query_id"))
         # allow lists as well as dicts in response with safe=False
         try:
+            if request_json.get("async"):
+                return JsonResponse(
+                    enqueue_query(
+                        self.team,
+                        query_json,
+                        query_id=request_json.get("client_query_id"),
+                        refresh=bool(request_json.get("refresh")),
+                    )
+                )
             return JsonResponse(process_query(self.team, query_json), safe=False)
         except HogQLException as e:
             raise ValidationError(str(e))
@@ -116,6 +138,38 @@ class QueryViewSet(StructuredViewSetMixin, viewsets.ViewSet):
             capture_exception(e)
             raise e
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "chunk",
+                OpenApiTypes.INT,
+                description="Chunk of the results to return, if the results were split into chunks.",
+            ),
+        ]
+    )
+    def retrieve(self, request: Request, pk=None, *args, **kwargs) -> JsonResponse:
+        try:
+            chunk = int(request.GET.get("chunk", 0))
+        except ValueError:
+            raise ValidationError({"chunk": ["A valid integer is required."]}, code="invalid")
+        try:
+            query_status = get_status_or_results(self.team.pk, pk, chunk=chunk)
+        except QueryResultsExpired as e:
+            raise NotFound(str(e))
+        return JsonResponse(dataclass_asdict(query_status))
+
+    @action(methods=["GET"], detail=True)
+    def progress(self, request: Request, pk=None, *args, **kwargs) -> StreamingHttpResponse:
+        """
+        Streams the status of a query as server-sent events, until it completes or the stream times out. The stream
+        holds on to a web worker, so it times out well within the request timeout and clients reconnect to follow on.
+        """
+        updates = get_status_updates(self.team.pk, pk, timeout=settings.ASYNC_QUERY_PROGRESS_STREAM_TIMEOUT_SECONDS)
+        return StreamingHttpResponse(
+            (f"data: {json.dumps(dataclass_asdict(update), cls=DjangoJSONEncoder)}\n\n" for update in updates),
+            content_type="text/event-stream",
+        )
+
     @action(methods=["GET"], detail=False)
     def draft_sql(self, request: Request, *args, **kwargs) -> Response:
         if not isinstance(request.user, User):
@@ -195,6 +249,32 @@ def _unwrap_pydantic_dict(response: Any) -> Dict:
     return cast(dict, _unwrap_pydantic(response))
 
 
+def enqueue_query(team: Team, query_json: Dict, query_id: Optional[str] = None, refresh: bool = False) -> Dict:
+    """
+    Starts running a query in the background, returning its id to get its progress and results with. Returns the
+    query as it would be, without results.
+    """
+    # Only queries that run as one ClickHouse query can report their progress
+    if query_json.get("kind") != "HogQLQuery":
+        raise ValidationError(f"Unsupported query kind for async execution: {query_json.get('kind')}")
+
+    tag_queries(query=query_json)
+
+    hogql_query = HogQLQuery.parse_obj(query_json)
+    hogql_response, clickhouse_context = prepare_hogql_query(
+        query=hogql_query.query, team=team, filters=hogql_query.filters
+    )
+    query_id = enqueue_execute_with_progress(
+        team.pk,
+        hogql_response.clickhouse,
+        clickhouse_context.values,
+        with_column_types=True,
+        query_id=query_id,
+        force=refresh,
+    )
+    return {**_unwrap_pydantic_dict(hogql_response), "query_id": query_id}
+
+
 def process_query(team: Team, query_json: Dict, default_limit: Optional[int] = None) -> Dict:
     # query_json has been parsed by QuerySchemaParser
     # it _should_ be impossible to end up in here with a "bad" query
@@ -220,6 +300,10 @@ def process_query(team: Team, query_json: Dict, default_limit: Optional[int] = N
         metadata_query = HogQLMetadata.parse_obj(query_json)
         metadata_response = get_hogql_metadata(query=metadata_query, team=team)
         return _unwrap_pydantic_dict(metadata_response)
+    elif query_kind == "HogQLExplain":
+        explain_query = HogQLExplain.parse_obj(query_json)
+        explain_response = explain_hogql_query(query=explain_query, team=team)
+        return _unwrap_pydantic_dict(explain_response)
     elif query_kind == "LifecycleQuery":
         lifecycle_query = LifecycleQuery.parse_obj(query_json)
         lifecycle_response = run_lifecycle_query(query=lifecycle_query, team=team)
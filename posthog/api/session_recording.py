@@ -23,6 +23,7 @@ from posthog.api.routing import StructuredViewSetMixin
 from posthog.auth import SharingAccessTokenAuthentication
 from posthog.constants import SESSION_RECORDINGS_FILTER_IDS
 from posthog.models import Filter, User
+from posthog.models.filters.mixins.session_recordings import SessionRecordingsCursor
 from posthog.models.filters.session_recordings_filter import SessionRecordingsFilter
 from posthog.models.person.person import PersonDistinctId
 from posthog.models.session_recording.session_recording import SessionRecording
@@ -479,6 +480,7 @@ def list_recordings(filter: SessionRecordingsFilter, request: request.Request, c
     all_session_ids = filter.session_ids
     recordings: List[SessionRecording] = []
     more_recordings_available = False
+    next_cursor = None
     team = context["get_team"]()
 
     if all_session_ids:
@@ -504,6 +506,12 @@ def list_recordings(filter: SessionRecordingsFilter, request: request.Request, c
             filter=filter, team=team
         ).run()
 
+        if more_recordings_available and ch_session_recordings:
+            last_recording = ch_session_recordings[-1]
+            next_cursor = SessionRecordingsCursor(
+                start_time=last_recording["start_time"], session_id=last_recording["session_id"]
+            ).encode()
+
         recordings_from_clickhouse = SessionRecording.get_or_build_from_clickhouse(team, ch_session_recordings)
         recordings = recordings + recordings_from_clickhouse
 
@@ -540,4 +548,4 @@ def list_recordings(filter: SessionRecordingsFilter, request: request.Request, c
     session_recording_serializer = SessionRecordingSerializer(recordings, context=context, many=True)
     results = session_recording_serializer.data
 
-    return {"results": results, "has_next": more_recordings_available, "version": 3}
+    return {"results": results, "has_next": more_recordings_available, "next_cursor": next_cursor, "version": 3}
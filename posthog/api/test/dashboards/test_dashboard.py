@@ -288,6 +288,7 @@ class TestDashboard(APIBaseTest, QueryMatchingTest):
 
         self.assertEqual(response["tiles"][0]["insight"]["result"], None)
         self.assertEqual(response["tiles"][0]["last_refresh"], None)
+        self.assertIsNone(response["timings"])
 
     def test_refresh_cache(self):
         dashboard = Dashboard.objects.create(team=self.team, name="dashboard")
@@ -326,6 +327,10 @@ class TestDashboard(APIBaseTest, QueryMatchingTest):
             self.assertIsNotNone(response_data["tiles"][0]["insight"]["last_refresh"])
             self.assertIsNotNone(response_data["tiles"][0]["last_refresh"])
             self.assertEqual(response_data["tiles"][0]["insight"]["result"][0]["count"], 0)
+            # Refreshing the tiles is timed as one batch
+            timing_keys = [timing["k"] for timing in response_data["timings"]]
+            self.assertIn("./calculate", timing_keys)
+            self.assertIn(f"./calculate/insight_{item_default.pk}", timing_keys)
 
             item_default.refresh_from_db()
             item_trends.refresh_from_db()
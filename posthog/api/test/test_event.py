@@ -1,3 +1,4 @@
+import base64
 import json
 from datetime import datetime
 from unittest.mock import patch
@@ -10,8 +11,11 @@ from django.utils import timezone
 from freezegun import freeze_time
 from rest_framework import status
 
+from posthog.clickhouse.client.connection import Workload
 from posthog.models import Action, ActionStep, Element, Organization, Person, User
 from posthog.models.cohort import Cohort
+from posthog.models.event.query_event_list import EVENTS_LIST_WINDOWS
+from posthog.queries.insight import insight_query_with_columns
 from posthog.test.base import (
     APIBaseTest,
     ClickhouseTestMixin,
@@ -25,6 +29,10 @@ from posthog.test.base import (
 from posthog.test.test_journeys import journeys_for
 
 
+def _encode_cursor(payload: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
 class TestEvents(ClickhouseTestMixin, APIBaseTest):
     ENDPOINT = "event"
 
@@ -332,9 +340,9 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
             )
 
             self.assertEqual(len(page2["results"]), 100)
-            self.assertEqual(
+            self.assertIn(
+                f"http://testserver/api/projects/{self.team.id}/events/?distinct_id=1&before=2020-12-30T12:03:53.829294+00:00&cursor=",
                 unquote(page2["next"]),
-                f"http://testserver/api/projects/{self.team.id}/events/?distinct_id=1&before=2020-12-30T12:03:53.829294+00:00",
             )
 
             page3 = self.client.get(page2["next"]).json()
@@ -552,22 +560,16 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
 
     @patch("posthog.models.event.query_event_list.insight_query_with_columns")
     def test_optimize_query(self, patch_query_with_columns):
-        #  For ClickHouse we normally only query the last day,
+        # For ClickHouse we first only query the last hour, then growing time windows,
         # but if a user doesn't have many events we still want to return events that are older
-        patch_query_with_columns.return_value = [
-            {
-                "uuid": "event",
-                "event": "d",
-                "properties": "{}",
-                "timestamp": timezone.now(),
-                "team_id": "d",
-                "distinct_id": "d",
-                "elements_chain": "d",
-            }
-        ]
+        patch_query_with_columns.return_value = []
         response = self.client.get(f"/api/projects/{self.team.id}/events/").json()
-        self.assertEqual(len(response["results"]), 1)
-        self.assertEqual(patch_query_with_columns.call_count, 2)
+        self.assertEqual(len(response["results"]), 0)
+        self.assertEqual(patch_query_with_columns.call_count, len(EVENTS_LIST_WINDOWS) + 1)
+        self.assertEqual(
+            [call.kwargs["workload"] for call in patch_query_with_columns.call_args_list],
+            [Workload.ONLINE] * len(EVENTS_LIST_WINDOWS) + [Workload.OFFLINE],
+        )
 
         patch_query_with_columns.return_value = [
             {
@@ -579,10 +581,62 @@ class TestEvents(ClickhouseTestMixin, APIBaseTest):
                 "distinct_id": "d",
                 "elements_chain": "d",
             }
-            for _ in range(0, 100)
+            for _ in range(0, 101)
         ]
         response = self.client.get(f"/api/projects/{self.team.id}/events/").json()
-        self.assertEqual(patch_query_with_columns.call_count, 3)
+        self.assertEqual(len(response["results"]), 100)
+        self.assertEqual(patch_query_with_columns.call_count, len(EVENTS_LIST_WINDOWS) + 2)
+
+    def test_pagination_by_cursor_with_identical_timestamps(self):
+        _create_person(team=self.team, distinct_ids=["1"])
+        event_uuids = [
+            _create_event(team=self.team, event="some event", distinct_id="1", timestamp="2021-10-10T12:00:00Z")
+            for _ in range(5)
+        ]
+
+        seen_uuids = []
+        next_url = f"/api/projects/{self.team.id}/events/?distinct_id=1&limit=2"
+        while next_url:
+            response = self.client.get(next_url).json()
+            seen_uuids.extend(event["id"] for event in response["results"])
+            next_url = response["next"]
+            if next_url:
+                self.assertIn("cursor=", next_url)
+
+        self.assertEqual(sorted(seen_uuids), sorted(str(uuid) for uuid in event_uuids))
+
+    def test_events_are_searched_in_growing_time_windows(self):
+        with freeze_time("2021-10-10T12:03:03.829294Z"):
+            _create_person(team=self.team, distinct_ids=["1"])
+            for days in (3, 4, 5):
+                _create_event(
+                    team=self.team,
+                    event="some event",
+                    distinct_id="1",
+                    timestamp=timezone.now() - relativedelta(days=days),
+                )
+
+            with patch(
+                "posthog.models.event.query_event_list.insight_query_with_columns", wraps=insight_query_with_columns
+            ) as query_with_columns:
+                response = self.client.get(f"/api/projects/{self.team.id}/events/?distinct_id=1&limit=2").json()
+
+        self.assertEqual(len(response["results"]), 2)
+        self.assertIsNotNone(response["next"])
+        # The page was filled from the 7 day window, without falling back to scanning all events
+        self.assertEqual(query_with_columns.call_count, 3)
+        self.assertNotIn(Workload.OFFLINE, [call.kwargs["workload"] for call in query_with_columns.call_args_list])
+
+    def test_invalid_cursor(self):
+        for cursor in (
+            "not-a-cursor",
+            _encode_cursor({"t": "2021-01-01T00:00:00+00:00", "u": "1') OR 1=1 --"}),
+            _encode_cursor({"t": "2021-01-01T00:00:00+00:00", "u": 123}),
+            _encode_cursor({"t": "2021-01-01T00:00:00", "u": "0179e4e2-0de6-0000-a0f3-fd0d6d7b0a7b"}),
+            _encode_cursor({"u": "0179e4e2-0de6-0000-a0f3-fd0d6d7b0a7b"}),
+        ):
+            response = self.client.get(f"/api/projects/{self.team.id}/events/?cursor={cursor}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, cursor)
 
     def test_filter_events_by_being_after_properties_with_date_type(self):
         journeys_for(
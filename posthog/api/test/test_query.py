@@ -6,6 +6,8 @@ from freezegun import freeze_time
 from rest_framework import status
 
 from posthog.api.query import process_query
+from posthog.clickhouse.client.execute_async import QueryResultsExpired
+from posthog.models import Team
 from posthog.models.property_definition import PropertyDefinition, PropertyType
 from posthog.models.utils import UUIDT
 from posthog.schema import (
@@ -523,3 +525,47 @@ class TestQuery(ClickhouseTestMixin, APIBaseTest):
                     ["sign out", "4", "test_val3"],
                 ],
             )
+
+    def test_async_hogql_query(self):
+        _create_event(team=self.team, event="sign up", distinct_id="2")
+        _create_event(team=self.team, event="sign out", distinct_id="2")
+        flush_persons_and_events()
+
+        query = HogQLQuery(query="select event from events order by event")
+        response = self.client.post(f"/api/projects/{self.team.id}/query/", {"query": query.dict(), "async": True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        query_id = response.json()["query_id"]
+        self.assertEqual(response.json()["columns"], ["event"])
+        self.assertIsNone(response.json()["results"])
+
+        # Tasks run eagerly in tests, so the query has completed already
+        response = self.client.get(f"/api/projects/{self.team.id}/query/{query_id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["complete"], True)
+        self.assertEqual(response.json()["results"], [["sign out"], ["sign up"]])
+
+        response = self.client.get(f"/api/projects/{self.team.id}/query/{query_id}/progress/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        updates = [
+            json.loads(line[len("data: ") :])
+            for line in b"".join(response.streaming_content).decode().split("\n\n")
+            if line
+        ]
+        self.assertEqual([update["complete"] for update in updates], [True])
+
+    @patch("posthog.api.query.get_status_or_results", side_effect=QueryResultsExpired("Results chunk 1 has expired"))
+    def test_async_query_with_expired_results_is_not_found(self, patched_get_status_or_results):
+        response = self.client.get(f"/api/projects/{self.team.id}/query/some_query_id/?chunk=1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json()["detail"], "Results chunk 1 has expired")
+        patched_get_status_or_results.assert_called_once_with(self.team.pk, "some_query_id", chunk=1)
+
+    def test_async_query_of_other_team_is_not_returned(self):
+        query = HogQLQuery(query="select 1")
+        response = self.client.post(f"/api/projects/{self.team.id}/query/", {"query": query.dict(), "async": True})
+        query_id = response.json()["query_id"]
+
+        other_team = Team.objects.create(organization=self.organization)
+        response = self.client.get(f"/api/projects/{other_team.id}/query/{query_id}/")
+        self.assertEqual(response.json()["error"], True)
+        self.assertEqual(response.json()["error_message"], "Requesting team is not executing team")
@@ -12,7 +12,7 @@ from posthog.async_migrations.definition import AsyncMigrationOperation
 from posthog.async_migrations.setup import DEPENDENCY_TO_ASYNC_MIGRATION
 from posthog.celery import app
 from posthog.clickhouse.client import sync_execute
-from posthog.clickhouse.client.connection import make_ch_pool
+from posthog.clickhouse.client.connection import make_ch_pool, send_receive_timeout
 from posthog.clickhouse.query_tagging import reset_query_tags, tag_queries
 from posthog.email import is_email_available
 from posthog.models.async_migration import AsyncMigration, AsyncMigrationError, MigrationStatus
@@ -97,7 +97,7 @@ def execute_on_each_shard(sql: str, args=None, settings=None) -> None:
 
     async def run_on_connection(connection_pool):
         await asyncio.sleep(0)  # returning control to event loop to make parallelism possible
-        with connection_pool.get_client() as connection:
+        with connection_pool.get_client() as connection, send_receive_timeout(connection, sql, settings):
             connection.execute(sql, args, settings=settings)
 
     asyncio.run(run_on_all_shards())
@@ -1,48 +1,188 @@
+import math
+import os
+import random
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from functools import wraps
-from typing import no_type_check
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, no_type_check
 
-from django.utils.timezone import now
+import structlog
+from django.db import connections
+from prometheus_client import Counter, Histogram
 
 from posthog.settings import TEST
 
+logger = structlog.get_logger(__name__)
+
+CACHE_FOR_HITS_COUNTER = Counter(
+    "posthog_cache_for_hits_total",
+    "Calls to a cache_for function answered from its cache, including expired values served during a refresh",
+    labelnames=["function"],
+)
+CACHE_FOR_MISSES_COUNTER = Counter(
+    "posthog_cache_for_misses_total",
+    "Calls to a cache_for function that computed the value themselves",
+    labelnames=["function"],
+)
+CACHE_FOR_REFRESH_HISTOGRAM = Histogram(
+    "posthog_cache_for_refresh_seconds",
+    "Time taken to compute a value of a cache_for function",
+    labelnames=["function"],
+)
+
+# Expiry is spread over the last part of `cache_time`, so that values cached together don't all expire together
+EXPIRY_JITTER = 0.1
+# With `background_refresh`, values are refreshed once this share of their time to live has passed
+REFRESH_AHEAD = 0.8
+# Background refreshes of all cached functions share this many threads
+REFRESH_WORKERS = 4
+
+
+class _CacheEntry(NamedTuple):
+    value: Any
+    refresh_at: float
+
+
+class _RefreshAheadCache:
+    def __init__(self, fn: Callable, cache_time: timedelta, background_refresh: bool, maxsize: int):
+        self.fn = fn
+        self.function_name = f"{fn.__module__}.{fn.__qualname__}"
+        self.cache_time = cache_time.total_seconds()
+        self.background_refresh = background_refresh
+        self.maxsize = maxsize
+        self.clear()
+
+    def clear(self) -> None:
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Any, _CacheEntry]" = OrderedDict()
+        # Only the holder of a key's lock computes its value
+        self.key_locks: Dict[Any, threading.Lock] = {}
+
+    def get(self, key: Any, args: tuple, kwargs: dict) -> Any:
+        entry = self._get_entry(key)
+        if entry is None:
+            with self._get_key_lock(key):
+                # Another caller may have computed the value while we waited for the lock
+                entry = self._get_entry(key)
+                if entry is None:
+                    CACHE_FOR_MISSES_COUNTER.labels(function=self.function_name).inc()
+                    return self._compute(key, args, kwargs)
+
+        if time.monotonic() >= entry.refresh_at:
+            key_lock = self._get_key_lock(key)
+            # Callers that find a refresh already running get the current value instead of refreshing as well
+            if key_lock.acquire(blocking=False):
+                if self.background_refresh:
+                    _refresh_executor.submit(self._refresh_in_background, key_lock, key, args, kwargs)
+                else:
+                    try:
+                        CACHE_FOR_MISSES_COUNTER.labels(function=self.function_name).inc()
+                        return self._compute(key, args, kwargs)
+                    finally:
+                        key_lock.release()
+
+        CACHE_FOR_HITS_COUNTER.labels(function=self.function_name).inc()
+        return entry.value
+
+    def _get_entry(self, key: Any) -> Optional[_CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def _get_key_lock(self, key: Any) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def set(self, key: Any, value: Any) -> None:
+        # Set values are never refreshed, they're kept until evicted or cleared
+        self._store(key, value, math.inf)
+
+    def _compute(self, key: Any, args: tuple, kwargs: dict) -> Any:
+        started_at = time.monotonic()
+        value = self.fn(*args, **kwargs)
+        computed_at = time.monotonic()
+        CACHE_FOR_REFRESH_HISTOGRAM.labels(function=self.function_name).observe(computed_at - started_at)
+
+        time_to_live = self.cache_time * random.uniform(1 - EXPIRY_JITTER, 1)
+        refresh_after = time_to_live * REFRESH_AHEAD if self.background_refresh else time_to_live
+        self._store(key, value, computed_at + refresh_after)
+        return value
+
+    def _store(self, key: Any, value: Any, refresh_at: float) -> None:
+        with self.lock:
+            self.entries[key] = _CacheEntry(value, refresh_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.key_locks.pop(evicted_key, None)
+
+    def _refresh_in_background(self, key_lock: threading.Lock, key: Any, args: tuple, kwargs: dict) -> None:
+        try:
+            self._compute(key, args, kwargs)
+        except Exception:
+            # The current value keeps being served, and the next call after its refresh time tries again
+            logger.exception("cache_for_refresh_failed", function=self.function_name)
+        finally:
+            key_lock.release()
+            connections.close_all()
+
+
+_caches: List[_RefreshAheadCache] = []
+_refresh_executor: ThreadPoolExecutor
+
+
+def _reset_after_fork() -> None:
+    """
+    Threads don't survive a fork, so a forked process gets a pool of its own, and caches without the locks of
+    refreshes that were running in the parent.
+    """
+    global _refresh_executor
+    _refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="cache-for-refresh")
+    for cache in _caches:
+        cache.clear()
+
+
+_reset_after_fork()
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _cache_key(args: tuple, kwargs: dict) -> Any:
+    return (args, frozenset(sorted(kwargs.items())))
+
+
+def cache_for(cache_time: timedelta, background_refresh=False, maxsize: int = 1024):
+    """
+    Caches the results of the decorated function in process for `cache_time`, for the `maxsize` most recently
+    used arguments.
+
+    Only one caller at a time computes the value for some arguments, concurrent callers wait for it or get the
+    expired value if there is one. With `background_refresh`, values are refreshed in a shared pool shortly before
+    they expire, so that callers never wait for a refresh.
+    """
 
-def cache_for(cache_time: timedelta, background_refresh=False):
     def wrapper(fn):
+        cache = _RefreshAheadCache(fn, cache_time, background_refresh, maxsize)
+        _caches.append(cache)
+
         @wraps(fn)
         @no_type_check
         def memoized_fn(*args, use_cache=not TEST, **kwargs):
             if not use_cache:
                 return fn(*args, **kwargs)
 
-            current_time = now()
-            key = (args, frozenset(sorted(kwargs.items())))
-
-            def refresh():
-                try:
-                    value = fn(*args, **kwargs)
-                    memoized_fn._cache[key] = (now(), value)
-                    memoized_fn._refreshing[key] = None
-                except Exception:
-                    memoized_fn._refreshing[key] = None
-                    raise
-
-            if key not in memoized_fn._cache:
-                refresh()
-            elif current_time - memoized_fn._cache[key][0] > cache_time:
-                if background_refresh:
-                    if not memoized_fn._refreshing.get(key):
-                        memoized_fn._refreshing[key] = current_time
-                        t = threading.Thread(target=refresh)
-                        t.start()
-                else:
-                    refresh()
+            return cache.get(_cache_key(args, kwargs), args, kwargs)
 
-            return memoized_fn._cache[key][1]
+        def cache_set(value, *args, **kwargs):
+            "Caches the value for the arguments until the cache is cleared, e.g. to stub out the function in benchmarks"
+            cache.set(_cache_key(args, kwargs), value)
 
-        memoized_fn._cache = {}
-        memoized_fn._refreshing = {}
+        memoized_fn.cache_clear = cache.clear
+        memoized_fn.cache_set = cache_set
         return memoized_fn
 
     return wrapper
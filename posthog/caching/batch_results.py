@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from django.db import connections
+from django.utils.timezone import now
+from prometheus_client import Counter
+
+from posthog.caching.calculate_results import calculate_result_by_insight
+from posthog.caching.fetch_from_cache import InsightResult
+from posthog.caching.insight_cache import update_cached_state
+from posthog.clickhouse.client.execute import SharedQueryResults, share_query_results
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries
+from posthog.hogql.timings import HogQLTimings
+from posthog.models import Dashboard, Insight
+from posthog.models.insight import generate_insight_cache_key
+from posthog.schema import QueryTiming
+
+logger = structlog.get_logger(__name__)
+
+BATCH_DEDUPLICATED_COUNTER = Counter(
+    "posthog_insight_batch_deduplicated",
+    "Insight calculations or ClickHouse queries skipped in a batch because an identical one was already run",
+    labelnames=["level"],
+)
+
+
+@dataclass
+class BatchInsightResults:
+    # Keyed by insight id
+    results: Dict[int, InsightResult] = field(default_factory=dict)
+    timings: List[QueryTiming] = field(default_factory=list)
+
+
+def batch_update_cache(
+    insights: List[Tuple[Insight, Optional[timedelta]]], dashboard: Optional[Dashboard]
+) -> BatchInsightResults:
+    """
+    Calculates the results of several insights at once, e.g. all tiles of a dashboard being refreshed.
+
+    Insights with the same cache key are only calculated once, and identical ClickHouse queries issued while
+    calculating different insights are only executed once. Distinct calculations run concurrently, bounded by
+    `DASHBOARD_BATCH_QUERY_CONCURRENCY`.
+    """
+    timings = HogQLTimings()
+    batch = BatchInsightResults()
+    if not insights:
+        return batch
+
+    with timings.measure("group_by_cache_key"):
+        insights_by_cache_key: Dict[str, List[Tuple[Insight, Optional[timedelta]]]] = {}
+        for insight, refresh_frequency in insights:
+            cache_key = generate_insight_cache_key(insight, dashboard)
+            insights_by_cache_key.setdefault(cache_key, []).append((insight, refresh_frequency))
+
+    BATCH_DEDUPLICATED_COUNTER.labels(level="insight").inc(len(insights) - len(insights_by_cache_key))
+
+    shared_results = SharedQueryResults()
+    query_tags = get_query_tags().copy()
+    item_durations: Dict[str, float] = {}
+
+    def calculate(insight: Insight) -> Tuple[str, str, Any]:
+        start_time = perf_counter()
+        reset_query_tags()
+        tag_queries(**query_tags)
+        try:
+            with share_query_results(shared_results):
+                cache_key, cache_type, result = calculate_result_by_insight(
+                    team=insight.team, insight=insight, dashboard=dashboard
+                )
+        finally:
+            item_durations[f"insight_{insight.pk}"] = perf_counter() - start_time
+        return cache_key, cache_type, result
+
+    def calculate_in_thread(insight: Insight) -> Tuple[str, str, Any]:
+        try:
+            return calculate(insight)
+        finally:
+            # Worker threads get their own database connections, which would otherwise be left open
+            connections.close_all()
+
+    with timings.measure("calculate"):
+        leaders = [grouped[0][0] for grouped in insights_by_cache_key.values()]
+        max_workers = min(settings.DASHBOARD_BATCH_QUERY_CONCURRENCY, len(leaders))
+        if max_workers <= 1:
+            calculated = [calculate(insight) for insight in leaders]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insight-batch") as executor:
+                calculated = list(executor.map(calculate_in_thread, leaders))
+
+    BATCH_DEDUPLICATED_COUNTER.labels(level="query").inc(shared_results.shared_count)
+
+    with timings.measure("update_cache"):
+        for (cache_key, cache_type, result), grouped in zip(calculated, insights_by_cache_key.values()):
+            timestamp = now()
+            # Tiles sharing a cache key share the cached value, so the shortest refresh frequency wins
+            refresh_frequencies = [frequency for _, frequency in grouped if frequency is not None]
+            next_allowed_client_refresh = timestamp + min(refresh_frequencies) if refresh_frequencies else None
+            update_cached_state(
+                grouped[0][0].team_id,
+                cache_key,
+                timestamp,
+                {
+                    "result": result,
+                    "type": cache_type,
+                    "last_refresh": timestamp,
+                    "next_allowed_client_refresh": next_allowed_client_refresh,
+                },
+                duration=item_durations.get(f"insight_{grouped[0][0].pk}"),
+            )
+            for insight, _ in grouped:
+                batch.results[insight.pk] = InsightResult(
+                    result=result,
+                    last_refresh=timestamp,
+                    cache_key=cache_key,
+                    is_cached=False,
+                    timezone=insight.team.timezone,
+                    next_allowed_client_refresh=next_allowed_client_refresh,
+                )
+
+    batch.timings = timings.to_list() + [
+        QueryTiming(k=f"./calculate/{key}", t=duration) for key, duration in item_durations.items()
+    ]
+
+    logger.info(
+        "insight_batch_calculated",
+        dashboard_id=dashboard.pk if dashboard else None,
+        insight_count=len(insights),
+        calculation_count=len(insights_by_cache_key),
+        query_count=shared_results.executed_count,
+        shared_query_count=shared_results.shared_count,
+        timings={timing.k: timing.t for timing in batch.timings},
+    )
+
+    return batch
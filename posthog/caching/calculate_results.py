@@ -4,6 +4,7 @@ import structlog
 from sentry_sdk import capture_exception
 
 from posthog.caching.utils import ensure_is_date
+from posthog.clickhouse.client.query_cost import tag_predicted_query_cost
 from posthog.clickhouse.query_tagging import tag_queries
 from posthog.constants import (
     INSIGHT_FUNNELS,
@@ -21,6 +22,7 @@ from posthog.models.filters import PathFilter
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.filters.utils import get_filter
 from posthog.models.insight import generate_insight_cache_key
+from posthog.queries.adaptive_sampling import with_adaptive_sampling
 from posthog.queries.funnels import ClickhouseFunnelTimeToConvert, ClickhouseFunnelTrends
 from posthog.queries.funnels.utils import get_funnel_order_class
 from posthog.queries.paths import Paths
@@ -149,11 +151,12 @@ def calculate_for_filter_based_insight(
         cache_type=cache_type,
         cache_key=cache_key,
     )
-
-    return cache_key, cache_type, calculate_result_by_cache_type(cache_type, filter, team)
+    with tag_predicted_query_cost(team, cache_type.value, filter.date_from, filter.date_to):
+        return cache_key, cache_type, calculate_result_by_cache_type(cache_type, filter, team)
 
 
 def calculate_result_by_cache_type(cache_type: CacheType, filter: Filter, team: Team) -> List[Dict[str, Any]]:
+    filter = with_adaptive_sampling(filter)
     if cache_type == CacheType.FUNNEL:
         return _calculate_funnel(filter, team)
     else:
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from time import perf_counter
 from typing import Any, Optional, Union
 
 from django.utils.timezone import now
@@ -74,7 +75,9 @@ def fetch_cached_insight_result(target: Union[Insight, DashboardTile], refresh_f
 def synchronously_update_cache(
     insight: Insight, dashboard: Optional[Dashboard], refresh_frequency: Optional[timedelta] = None
 ) -> InsightResult:
+    start_time = perf_counter()
     cache_key, cache_type, result = calculate_result_by_insight(team=insight.team, insight=insight, dashboard=dashboard)
+    duration = perf_counter() - start_time
     timestamp = now()
 
     next_allowed_client_refresh = timestamp + refresh_frequency if refresh_frequency else None
@@ -88,6 +91,7 @@ def synchronously_update_cache(
             "last_refresh": timestamp,
             "next_allowed_client_refresh": next_allowed_client_refresh,
         },
+        duration=duration,
     )
 
     return InsightResult(
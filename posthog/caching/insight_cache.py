@@ -1,6 +1,7 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from time import perf_counter
-from typing import Any, List, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Set, Tuple, cast
 from uuid import UUID
 
 import structlog
@@ -8,7 +9,7 @@ from django.conf import settings
 from django.core.cache import cache
 from django.db import connection
 from django.utils.timezone import now
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge
 from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 
@@ -21,7 +22,31 @@ logger = structlog.get_logger(__name__)
 REQUEUE_DELAY = timedelta(hours=2)
 MAX_ATTEMPTS = 3
 
+# How many more candidates than needed to consider, so that teams at their concurrency limit can be skipped
+CANDIDATE_POOL_MULTIPLIER = 10
+# Relative weights of insights that were never refreshed or never viewed, see `_fetch_candidates`
+NEVER_REFRESHED_STALENESS = 10.0
+NEVER_VIEWED_RECENCY = 0.01
+
 insight_cache_write_counter = Counter("posthog_cloud_insight_cache_write", "A write to the redis insight cache")
+INSIGHT_CACHE_QUEUE_DEPTH_GAUGE = Gauge(
+    "posthog_insight_cache_refresh_queue_depth", "Insight caches due for a refresh that have not been queued yet"
+)
+INSIGHT_CACHE_QUEUE_LAG_GAUGE = Gauge(
+    "posthog_insight_cache_refresh_lag_seconds", "How long the most overdue insight cache has been due for a refresh"
+)
+
+
+@dataclass(frozen=True)
+class CacheUpdateCandidate:
+    team_id: int
+    cache_key: str
+    caching_state_id: UUID
+    last_refresh: Optional[datetime]
+    target_cache_age_seconds: int
+    last_refresh_duration_seconds: Optional[float]
+    # Last time the insight or the dashboard holding the tile was looked at
+    last_viewed_at: Optional[datetime]
 
 
 def schedule_cache_updates():
@@ -33,12 +58,14 @@ def schedule_cache_updates():
     to_update = fetch_states_in_need_of_updating(limit=PARALLEL_INSIGHT_CACHE)
     # :TRICKY: Schedule tasks and deduplicate by ID to avoid clashes
     representative_by_cache_key = set()
-    for team_id, cache_key, caching_state_id in to_update:
-        if (team_id, cache_key) not in representative_by_cache_key:
-            representative_by_cache_key.add((team_id, cache_key))
-            update_cache_task.delay(caching_state_id)
+    for candidate in to_update:
+        if (candidate.team_id, candidate.cache_key) not in representative_by_cache_key:
+            representative_by_cache_key.add((candidate.team_id, candidate.cache_key))
+            update_cache_task.delay(candidate.caching_state_id)
 
-    InsightCachingState.objects.filter(pk__in=(id for _, _, id in to_update)).update(last_refresh_queued_at=now())
+    InsightCachingState.objects.filter(pk__in=(candidate.caching_state_id for candidate in to_update)).update(
+        last_refresh_queued_at=now()
+    )
 
     if len(representative_by_cache_key) > 0:
         logger.warn(
@@ -47,13 +74,132 @@ def schedule_cache_updates():
     else:
         logger.warn("No caches were found to be updated")
 
+    report_queue_metrics()
+
 
-def fetch_states_in_need_of_updating(limit: int) -> List[Tuple[int, str, UUID]]:
+def fetch_states_in_need_of_updating(limit: int) -> List[CacheUpdateCandidate]:
+    """
+    Returns up to `limit` caching states to refresh, most urgent first. Teams which already have
+    `INSIGHT_CACHE_REFRESH_TEAM_CONCURRENCY` refreshes in flight don't get any more.
+    """
     current_time = now()
+    candidates = _fetch_candidates(current_time, limit * CANDIDATE_POOL_MULTIPLIER)
+    in_flight_by_team = _count_in_flight_by_team(current_time, {candidate.team_id for candidate in candidates})
+
+    to_update: List[CacheUpdateCandidate] = []
+    for candidate in candidates:
+        if len(to_update) >= limit:
+            break
+        if in_flight_by_team.get(candidate.team_id, 0) >= settings.INSIGHT_CACHE_REFRESH_TEAM_CONCURRENCY:
+            continue
+
+        in_flight_by_team[candidate.team_id] = in_flight_by_team.get(candidate.team_id, 0) + 1
+        to_update.append(candidate)
+
+    return to_update
+
+
+def _fetch_candidates(current_time: datetime, limit: int) -> List[CacheUpdateCandidate]:
+    """
+    Returns the caching states due for a refresh, most urgent first. Stale results of recently viewed, cheap insights
+    come first, while expensive insights nobody looks at get refreshed when there's nothing better to do:
+
+        priority = staleness * view recency / cost
+
+    where staleness is the time since the last refresh relative to the target cache age, view recency decays with the
+    days since the insight (or the dashboard holding the tile) was last viewed, and cost grows with the logarithm of
+    how long the last refresh took.
+    """
     with connection.cursor() as cursor:
         cursor.execute(
             """
-            SELECT team_id, cache_key, id
+            WITH due AS (
+                SELECT
+                    state.team_id,
+                    state.cache_key,
+                    state.id,
+                    state.last_refresh,
+                    state.target_cache_age_seconds,
+                    state.last_refresh_duration_seconds,
+                    COALESCE(dashboard.last_accessed_at, insight_views.last_viewed_at) AS last_viewed_at
+                FROM posthog_insightcachingstate AS state
+                LEFT JOIN posthog_dashboardtile AS tile ON tile.id = state.dashboard_tile_id
+                LEFT JOIN posthog_dashboard AS dashboard ON dashboard.id = tile.dashboard_id
+                -- Only the views of the due insights are looked at, through the index on insight_id
+                LEFT JOIN LATERAL (
+                    SELECT max(viewed.last_viewed_at) AS last_viewed_at
+                    FROM posthog_insightviewed AS viewed
+                    WHERE viewed.insight_id = state.insight_id
+                ) AS insight_views ON true
+                WHERE state.target_cache_age_seconds IS NOT NULL
+                AND state.refresh_attempt < %(max_attempts)s
+                AND (
+                    state.last_refresh IS NULL OR
+                    state.last_refresh < %(current_time)s - state.target_cache_age_seconds * interval '1' second
+                )
+                AND (
+                    state.last_refresh_queued_at IS NULL OR
+                    state.last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
+                )
+            )
+            SELECT *
+            FROM due
+            ORDER BY (
+                CASE
+                    WHEN last_refresh IS NULL THEN %(never_refreshed_staleness)s
+                    ELSE EXTRACT(EPOCH FROM %(current_time)s - last_refresh) / GREATEST(target_cache_age_seconds, 1)
+                END
+                * CASE
+                    WHEN last_viewed_at IS NULL THEN %(never_viewed_recency)s
+                    ELSE 1 / (1 + GREATEST(EXTRACT(EPOCH FROM %(current_time)s - last_viewed_at), 0) / 86400)
+                END
+                / (1 + ln(1 + COALESCE(last_refresh_duration_seconds, 0)))
+            ) DESC, last_refresh ASC NULLS FIRST
+            LIMIT %(limit)s
+            """,
+            {
+                "max_attempts": MAX_ATTEMPTS,
+                "current_time": current_time,
+                "last_refresh_queued_at_threshold": current_time - REQUEUE_DELAY,
+                "never_refreshed_staleness": NEVER_REFRESHED_STALENESS,
+                "never_viewed_recency": NEVER_VIEWED_RECENCY,
+                "limit": limit,
+            },
+        )
+        return [CacheUpdateCandidate(*row) for row in cursor.fetchall()]
+
+
+def _count_in_flight_by_team(current_time: datetime, team_ids: Set[int]) -> Dict[int, int]:
+    if not team_ids:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT team_id, count(*)
+            FROM posthog_insightcachingstate
+            WHERE team_id = ANY(%(team_ids)s)
+            AND last_refresh_queued_at >= %(last_refresh_queued_at_threshold)s
+            AND (last_refresh IS NULL OR last_refresh < last_refresh_queued_at)
+            GROUP BY team_id
+            """,
+            {"team_ids": list(team_ids), "last_refresh_queued_at_threshold": current_time - REQUEUE_DELAY},
+        )
+        return dict(cursor.fetchall())
+
+
+def report_queue_metrics() -> None:
+    current_time = now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                count(*) FILTER (
+                    WHERE last_refresh_queued_at IS NULL OR last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
+                ),
+                max(EXTRACT(EPOCH FROM %(current_time)s - COALESCE(
+                    last_refresh + target_cache_age_seconds * interval '1' second, created_at
+                )))
             FROM posthog_insightcachingstate
             WHERE target_cache_age_seconds IS NOT NULL
             AND refresh_attempt < %(max_attempts)s
@@ -61,21 +207,17 @@ def fetch_states_in_need_of_updating(limit: int) -> List[Tuple[int, str, UUID]]:
                 last_refresh IS NULL OR
                 last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
             )
-            AND (
-                last_refresh_queued_at IS NULL OR
-                last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
-            )
-            ORDER BY last_refresh ASC NULLS FIRST
-            LIMIT %(limit)s
             """,
             {
                 "max_attempts": MAX_ATTEMPTS,
                 "current_time": current_time,
                 "last_refresh_queued_at_threshold": current_time - REQUEUE_DELAY,
-                "limit": limit,
             },
         )
-        return cursor.fetchall()
+        queue_depth, lag_seconds = cursor.fetchone()
+
+    INSIGHT_CACHE_QUEUE_DEPTH_GAUGE.set(queue_depth or 0)
+    INSIGHT_CACHE_QUEUE_LAG_GAUGE.set(max(float(lag_seconds or 0), 0))
 
 
 def update_cache(caching_state_id: UUID):
@@ -116,6 +258,7 @@ def update_cache(caching_state_id: UUID):
             cast(str, cache_key),
             timestamp,
             {"result": result, "type": cache_type, "last_refresh": timestamp},
+            duration=duration,
         )
         statsd.incr("caching_state_update_success")
         statsd.incr("caching_state_update_rows_updated", rows_updated)
@@ -141,15 +284,24 @@ def update_cache(caching_state_id: UUID):
         )
 
 
-def update_cached_state(team_id: int, cache_key: str, timestamp: datetime, result: Any, ttl: Optional[int] = None):
+def update_cached_state(
+    team_id: int,
+    cache_key: str,
+    timestamp: datetime,
+    result: Any,
+    ttl: Optional[int] = None,
+    duration: Optional[float] = None,
+):
     cache.set(cache_key, result, ttl if ttl is not None else settings.CACHED_RESULTS_TTL)
     insight_cache_write_counter.inc()
 
+    updates: Dict[str, Any] = {"last_refresh": timestamp, "refresh_attempt": 0}
+    if duration is not None:
+        updates["last_refresh_duration_seconds"] = duration
+
     # :TRICKY: We update _all_ states with same cache_key to avoid needless re-calculations and
     #   handle race conditions around cache_key changing.
-    return InsightCachingState.objects.filter(team_id=team_id, cache_key=cache_key).update(
-        last_refresh=timestamp, refresh_attempt=0
-    )
+    return InsightCachingState.objects.filter(team_id=team_id, cache_key=cache_key).update(**updates)
 
 
 def _extract_insight_dashboard(caching_state: InsightCachingState) -> Tuple[Insight, Optional[Dashboard]]:
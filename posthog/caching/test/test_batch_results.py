@@ -0,0 +1,105 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.utils.timezone import now
+from freezegun import freeze_time
+
+from posthog.caching.batch_results import batch_update_cache
+from posthog.caching.calculate_results import calculate_result_by_insight
+from posthog.clickhouse.client.execute import SharedQueryResults, share_query_results, sync_execute
+from posthog.decorators import CacheType
+from posthog.models import Dashboard, DashboardTile, Insight
+from posthog.test.base import BaseTest, ClickhouseTestMixin, _create_event, flush_persons_and_events
+from posthog.utils import get_safe_cache
+
+
+@freeze_time("2012-01-14T03:21:34.000Z")
+class TestBatchUpdateCache(ClickhouseTestMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+
+        _create_event(team=self.team, event="$pageview", distinct_id="1", properties={"prop": "val"})
+        _create_event(team=self.team, event="$pageview", distinct_id="2", properties={"prop": "another_val"})
+        flush_persons_and_events()
+
+        self.dashboard = Dashboard.objects.create(team=self.team, name="dashboard")
+
+    def _create_tile(self, filters) -> Insight:
+        insight = Insight.objects.create(team=self.team, filters=filters)
+        DashboardTile.objects.create(dashboard=self.dashboard, insight=insight)
+        return insight
+
+    def test_batch_update_cache_deduplicates_insights_with_the_same_cache_key(self):
+        pageviews = self._create_tile({"events": [{"id": "$pageview"}], "display": "ActionsLineGraph"})
+        pageviews_again = self._create_tile({"events": [{"id": "$pageview"}], "display": "ActionsLineGraph"})
+        breakdown = self._create_tile({"events": [{"id": "$pageview"}], "breakdown": "prop"})
+
+        with patch(
+            "posthog.caching.batch_results.calculate_result_by_insight", wraps=calculate_result_by_insight
+        ) as calculate:
+            batch = batch_update_cache(
+                [(pageviews, timedelta(minutes=15)), (pageviews_again, timedelta(minutes=3)), (breakdown, None)],
+                self.dashboard,
+            )
+
+        assert calculate.call_count == 2
+        assert set(batch.results.keys()) == {pageviews.pk, pageviews_again.pk, breakdown.pk}
+        assert batch.results[pageviews.pk] == batch.results[pageviews_again.pk]
+        assert batch.results[pageviews.pk].next_allowed_client_refresh == now() + timedelta(minutes=3)
+        assert batch.results[breakdown.pk].result != batch.results[pageviews.pk].result
+
+        for insight in (pageviews, breakdown):
+            result = batch.results[insight.pk]
+            assert not result.is_cached
+            assert get_safe_cache(result.cache_key) == {
+                "result": result.result,
+                "type": CacheType.TRENDS,
+                "last_refresh": now(),
+                "next_allowed_client_refresh": result.next_allowed_client_refresh,
+            }
+
+        timing_keys = [timing.k for timing in batch.timings]
+        assert "./calculate" in timing_keys
+        assert f"./calculate/insight_{pageviews.pk}" in timing_keys
+
+    def test_batch_update_cache_without_insights(self):
+        batch = batch_update_cache([], self.dashboard)
+
+        assert batch.results == {}
+
+
+class TestSharedQueryResults(ClickhouseTestMixin, BaseTest):
+    def test_identical_queries_are_executed_once(self):
+        shared_results = SharedQueryResults()
+
+        with share_query_results(shared_results):
+            first = sync_execute("SELECT %(value)s", {"value": 1})
+            second = sync_execute("SELECT %(value)s", {"value": 1})
+            other = sync_execute("SELECT %(value)s", {"value": 2})
+
+        assert first == second == [(1,)]
+        assert other == [(2,)]
+        assert first is not second
+        assert shared_results.executed_count == 2
+        assert shared_results.shared_count == 1
+
+    def test_errors_are_shared(self):
+        shared_results = SharedQueryResults()
+
+        with share_query_results(shared_results):
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    sync_execute("SELECT * FROM table_that_does_not_exist")
+
+        assert shared_results.executed_count == 1
+        assert shared_results.shared_count == 1
+
+    def test_queries_outside_scope_are_not_shared(self):
+        shared_results = SharedQueryResults()
+
+        with share_query_results(shared_results):
+            sync_execute("SELECT 1")
+        sync_execute("SELECT 1")
+
+        assert shared_results.executed_count == 1
+        assert shared_results.shared_count == 0
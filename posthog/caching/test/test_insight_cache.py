@@ -7,12 +7,19 @@ from django.utils.timezone import now
 from freezegun import freeze_time
 
 from posthog.caching.calculate_results import get_cache_type
-from posthog.caching.insight_cache import fetch_states_in_need_of_updating, schedule_cache_updates, update_cache
+from posthog.caching.insight_cache import (
+    INSIGHT_CACHE_QUEUE_DEPTH_GAUGE,
+    INSIGHT_CACHE_QUEUE_LAG_GAUGE,
+    fetch_states_in_need_of_updating,
+    report_queue_metrics,
+    schedule_cache_updates,
+    update_cache,
+)
 from posthog.caching.insight_caching_state import upsert
 from posthog.caching.test.test_insight_caching_state import create_insight, filter_dict
 from posthog.constants import INSIGHT_PATHS, INSIGHT_RETENTION, INSIGHT_STICKINESS, INSIGHT_TRENDS
 from posthog.decorators import CacheType
-from posthog.models import Filter, InsightCachingState, RetentionFilter, Team, User
+from posthog.models import Filter, InsightCachingState, InsightViewed, RetentionFilter, Team, User
 from posthog.models.filters import PathFilter
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.signals import mute_selected_signals
@@ -96,6 +103,74 @@ def test_fetch_states_in_need_of_updating(team: Team, user: User, params, expect
     assert len(results) == expected_matches
 
 
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+def test_fetch_states_in_need_of_updating_prioritizes_viewed_and_cheap_insights(team: Team, user: User):
+    unviewed = create_insight_caching_state(team, user, last_refresh=timedelta(days=2))
+    viewed_expensive = create_insight_caching_state(team, user, last_refresh=timedelta(days=2))
+    viewed_cheap = create_insight_caching_state(team, user, last_refresh=timedelta(days=2))
+    stale_viewed_cheap = create_insight_caching_state(team, user, last_refresh=timedelta(days=4))
+
+    for state, duration in [(viewed_expensive, 90), (viewed_cheap, 0.2), (stale_viewed_cheap, 0.2)]:
+        InsightViewed.objects.create(team=team, user=user, insight=state.insight, last_viewed_at=now())
+        InsightCachingState.objects.filter(pk=state.pk).update(last_refresh_duration_seconds=duration)
+
+    results = fetch_states_in_need_of_updating(10)
+
+    assert [result.caching_state_id for result in results] == [
+        stale_viewed_cheap.pk,
+        viewed_cheap.pk,
+        viewed_expensive.pk,
+        unviewed.pk,
+    ]
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+def test_fetch_states_in_need_of_updating_does_not_starve_viewed_insights(team: Team, user: User):
+    for _ in range(15):
+        create_insight_caching_state(team, user, last_refresh=timedelta(days=14))
+    viewed = create_insight_caching_state(team, user, last_refresh=timedelta(days=2))
+    InsightViewed.objects.create(team=team, user=user, insight=viewed.insight, last_viewed_at=now())
+
+    # More stale unviewed insights than candidates considered
+    assert [result.caching_state_id for result in fetch_states_in_need_of_updating(1)] == [viewed.pk]
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+def test_fetch_states_in_need_of_updating_respects_team_concurrency(team: Team, user: User, settings):
+    settings.INSIGHT_CACHE_REFRESH_TEAM_CONCURRENCY = 2
+    other_team = Team.objects.create(organization=team.organization)
+
+    create_insight_caching_state(team, user)
+    create_insight_caching_state(team, user)
+    create_insight_caching_state(team, user)
+    create_insight_caching_state(other_team, user)
+
+    assert len(fetch_states_in_need_of_updating(10)) == 3
+
+    # Queued but not refreshed yet
+    create_insight_caching_state(team, user, last_refresh_queued_at=timedelta(minutes=5))
+
+    results = fetch_states_in_need_of_updating(10)
+    assert [result.team_id for result in results].count(team.pk) == 1
+    assert [result.team_id for result in results].count(other_team.pk) == 1
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+def test_report_queue_metrics(team: Team, user: User):
+    create_insight_caching_state(team, user, last_refresh=timedelta(days=3), target_cache_age=timedelta(days=1))
+    create_insight_caching_state(team, user, last_refresh=timedelta(days=2), last_refresh_queued_at=timedelta(hours=1))
+    create_insight_caching_state(team, user, last_refresh=timedelta(hours=1))
+
+    report_queue_metrics()
+
+    assert INSIGHT_CACHE_QUEUE_DEPTH_GAUGE._value.get() == 1
+    assert INSIGHT_CACHE_QUEUE_LAG_GAUGE._value.get() == timedelta(days=2).total_seconds()
+
+
 @pytest.mark.django_db
 @freeze_time("2020-01-04T13:01:01Z")
 def test_update_cache(team: Team, user: User, cache):
@@ -112,6 +187,7 @@ def test_update_cache(team: Team, user: User, cache):
     updated_caching_state = InsightCachingState.objects.get(team=team)
     assert updated_caching_state.last_refresh == now()
     assert updated_caching_state.refresh_attempt == 0
+    assert updated_caching_state.last_refresh_duration_seconds is not None
 
 
 @pytest.mark.django_db
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import zlib
+
+import fakeredis
+import zstandard
+from django.test import TestCase
+from django_redis.cache import RedisCache
+from parameterized import parameterized
+
+from posthog.caching.tolerant_zstd_compressor import FORMAT_MARKER, CouldNotDecompressValue, TolerantZstdCompressor
+
+
+def _insight_result(index: int) -> bytes:
+    return json.dumps(
+        {
+            "result": [
+                {
+                    "label": f"$pageview - variant {index}",
+                    "days": [f"2023-01-{day:02d}" for day in range(1, 29)],
+                    "labels": [f"{day}-Jan-2023" for day in range(1, 29)],
+                    "data": [float((index * day) % 17) for day in range(1, 29)],
+                }
+            ]
+        }
+    ).encode("utf-8")
+
+
+class TestTolerantZstdCompressor(TestCase):
+    short_uncompressed_bytes = b"hello world"
+    # needs to be long enough to trigger compression
+    uncompressed_bytes = ("hello world hello world hello world hello world hello world" * 100).encode("utf-8")
+
+    def _train_dictionary(self) -> str:
+        dictionary = zstandard.train_dictionary(4096, [_insight_result(index) for index in range(200)])
+        f = tempfile.NamedTemporaryFile(suffix=".zstd_dict", delete=False)
+        f.write(dictionary.as_bytes())
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    @parameterized.expand(
+        [
+            ("test_when_disabled_compress_is_the_identity", False, "zstd", uncompressed_bytes, False),
+            ("test_when_enabled_compresses_with_zstd", True, "zstd", uncompressed_bytes, True),
+            ("test_when_enabled_does_not_compress_small_values", True, "zstd", short_uncompressed_bytes, False),
+            ("test_when_zlib_is_selected_compresses_with_zlib", True, "zlib", uncompressed_bytes, False),
+        ]
+    )
+    def test_compression(self, _, enabled: bool, algorithm: str, input: bytes, is_zstd: bool) -> None:
+        with self.settings(USE_REDIS_COMPRESSION=enabled, REDIS_COMPRESSION_ALGORITHM=algorithm):
+            compressed = TolerantZstdCompressor({}).compress(input)
+
+        assert compressed.startswith(FORMAT_MARKER) == is_zstd
+        assert TolerantZstdCompressor({}).decompress(compressed) == input
+
+    def test_zstd_values_of_insight_results_are_smaller_than_zlib_values(self) -> None:
+        value = b"".join(_insight_result(index) for index in range(50))
+        with self.settings(USE_REDIS_COMPRESSION=True, REDIS_COMPRESSION_ALGORITHM="zstd"):
+            compressed = TolerantZstdCompressor({}).compress(value)
+
+        assert len(compressed) < len(zlib.compress(value, 6))
+
+    @parameterized.expand([("enabled", True), ("disabled", False)])
+    def test_can_read_zlib_and_uncompressed_values(self, _, enabled: bool) -> None:
+        with self.settings(USE_REDIS_COMPRESSION=enabled, REDIS_COMPRESSION_ALGORITHM="zstd"):
+            compressor = TolerantZstdCompressor({})
+
+            assert compressor.decompress(zlib.compress(self.uncompressed_bytes, 6)) == self.uncompressed_bytes
+            assert compressor.decompress(self.uncompressed_bytes) == self.uncompressed_bytes
+            assert compressor.decompress(self.short_uncompressed_bytes) == self.short_uncompressed_bytes
+
+    def test_compresses_with_trained_dictionary(self) -> None:
+        value = _insight_result(1000)
+        with self.settings(USE_REDIS_COMPRESSION=True, REDIS_COMPRESSION_ALGORITHM="zstd"):
+            without_dictionary = TolerantZstdCompressor({}).compress(value)
+            with self.settings(REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS=[self._train_dictionary()]):
+                compressor = TolerantZstdCompressor({})
+                with_dictionary = compressor.compress(value)
+
+                assert len(with_dictionary) < len(without_dictionary)
+                assert compressor.decompress(with_dictionary) == value
+                # values compressed without a dictionary can still be read
+                assert compressor.decompress(without_dictionary) == value
+
+    def test_can_read_values_compressed_with_a_previous_dictionary(self) -> None:
+        value = _insight_result(1000)
+        old_dictionary = self._train_dictionary()
+        with self.settings(USE_REDIS_COMPRESSION=True, REDIS_COMPRESSION_ALGORITHM="zstd"):
+            with self.settings(REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS=[old_dictionary]):
+                compressed = TolerantZstdCompressor({}).compress(value)
+
+            new_dictionary_bytes = zstandard.train_dictionary(
+                8192, [_insight_result(index) for index in range(300, 600)]
+            ).as_bytes()
+            with tempfile.NamedTemporaryFile(suffix=".zstd_dict") as new_dictionary:
+                new_dictionary.write(new_dictionary_bytes)
+                new_dictionary.flush()
+
+                with self.settings(REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS=[new_dictionary.name, old_dictionary]):
+                    assert TolerantZstdCompressor({}).decompress(compressed) == value
+
+                with self.settings(REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS=[new_dictionary.name]):
+                    with self.assertRaises(CouldNotDecompressValue):
+                        TolerantZstdCompressor({}).decompress(compressed)
+
+    def test_unknown_format_version_raises(self) -> None:
+        with self.assertRaises(CouldNotDecompressValue):
+            TolerantZstdCompressor({}).decompress(FORMAT_MARKER + bytes([99]) + b"whatever")
+
+
+class TestTolerantRedisClient(TestCase):
+    def _cache(self) -> RedisCache:
+        cache = RedisCache(
+            "redis://localhost:6379",
+            {
+                "OPTIONS": {
+                    "CLIENT_CLASS": "posthog.caching.tolerant_redis_client.TolerantRedisClient",
+                    "COMPRESSOR": "posthog.caching.tolerant_zstd_compressor.TolerantZstdCompressor",
+                }
+            },
+        )
+        cache.client._clients = [fakeredis.FakeRedis()]
+        return cache
+
+    def test_values_that_can_not_be_decompressed_are_cache_misses(self) -> None:
+        cache = self._cache()
+        with self.settings(USE_REDIS_COMPRESSION=True, REDIS_COMPRESSION_ALGORITHM="zstd"):
+            cache.set("readable", _insight_result(1))
+            cache.set("unreadable", _insight_result(2))
+            # As if it was compressed with a dictionary that was rotated out
+            cache.client.get_client().set(cache.make_key("unreadable"), FORMAT_MARKER + bytes([99]) + b"whatever")
+
+            assert cache.get("readable") == _insight_result(1)
+            assert cache.get("unreadable") is None
+            assert cache.get("unreadable", "default") == "default"
+            assert cache.get_many(["readable", "unreadable", "missing"]) == {"readable": _insight_result(1)}
@@ -0,0 +1,34 @@
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django_redis.client import DefaultClient
+from redis import Redis
+
+from posthog.caching.tolerant_zstd_compressor import CouldNotDecompressValue
+
+_MISSING = object()
+
+
+class TolerantRedisClient(DefaultClient):
+    """
+    Treats cached values that can't be decompressed anymore (see `CouldNotDecompressValue`) as cache misses, instead
+    of failing every read of their keys until they expire.
+    """
+
+    def get(self, key: Any, default=None, version: Optional[int] = None, client: Optional[Redis] = None) -> Any:
+        try:
+            return super().get(key, default=default, version=version, client=client)
+        except CouldNotDecompressValue:
+            return default
+
+    def get_many(self, keys, version: Optional[int] = None, client: Optional[Redis] = None) -> OrderedDict:
+        try:
+            return super().get_many(keys, version=version, client=client)
+        except CouldNotDecompressValue:
+            # Read the keys one by one to only leave out the ones that can't be decompressed
+            recovered_data = OrderedDict()
+            for key in keys:
+                value = self.get(key, default=_MISSING, version=version, client=client)
+                if value is not _MISSING:
+                    recovered_data[key] = value
+            return recovered_data
@@ -0,0 +1,134 @@
+import threading
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import structlog
+import zstandard
+from django.conf import settings
+from prometheus_client import Counter, Histogram
+
+from posthog.caching.tolerant_zlib_compressor import TolerantZlibCompressor
+
+logger = structlog.get_logger(__name__)
+
+# Values written by this compressor are prefixed with a marker and a format version, so that the format can change
+# without losing the ability to read existing values. Neither pickled values (b"\x80") nor zlib streams (b"x")
+# can start with a null byte.
+FORMAT_MARKER = b"\x00ph"
+FORMAT_ZSTD = 1
+
+COMPRESSION_RATIO_HISTOGRAM = Histogram(
+    "posthog_redis_compression_ratio",
+    "Ratio of uncompressed to compressed size of values written to redis",
+    labelnames=["algorithm"],
+    buckets=(1, 1.5, 2, 3, 5, 10, 20, 50, 100),
+)
+COMPRESSION_TIME_HISTOGRAM = Histogram(
+    "posthog_redis_compression_seconds",
+    "Time spent compressing or decompressing values written to or read from redis",
+    labelnames=["algorithm", "operation"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+COULD_NOT_DECOMPRESS_ZSTD_VALUE_COUNTER = Counter(
+    "posthog_redis_could_not_decompress_zstd_value_counter",
+    "Number of times a zstd value read from redis could not be decompressed, e.g. because its dictionary is gone",
+)
+
+
+class CouldNotDecompressValue(ValueError):
+    """
+    Raised for values that were written by this compressor but can't be read anymore, e.g. because the dictionary
+    they were compressed with was rotated out. `TolerantRedisClient` treats them as cache misses.
+    """
+
+
+def load_dictionaries(paths: List[str]) -> List[zstandard.ZstdCompressionDict]:
+    dictionaries = []
+    for path in paths:
+        with open(path, "rb") as f:
+            dictionaries.append(zstandard.ZstdCompressionDict(f.read()))
+    return dictionaries
+
+
+class TolerantZstdCompressor(TolerantZlibCompressor):
+    """
+    Compresses values written to the cache with zstd when `REDIS_COMPRESSION_ALGORITHM` is "zstd", otherwise behaves
+    like the `TolerantZlibCompressor`. Values compressed with zlib, and uncompressed values, can always be read.
+
+    Insight results are repetitive JSON, so zstd can optionally use a dictionary trained on cached insight results
+    (see the `train_cache_compression_dictionary` management command). The first of
+    `REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS` is used for writing, all of them for reading, so that values
+    written with a previous dictionary can be read while a new one is rolled out.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self._local = threading.local()
+        self._dictionaries_by_id: Optional[Dict[int, zstandard.ZstdCompressionDict]] = None
+        self._write_dictionary: Optional[zstandard.ZstdCompressionDict] = None
+        self._dictionaries_lock = threading.Lock()
+
+    def compress(self, value: bytes) -> bytes:
+        if settings.REDIS_COMPRESSION_ALGORITHM != "zstd":
+            return super().compress(value)
+        if not settings.USE_REDIS_COMPRESSION or len(value) <= self.min_length:
+            return value
+
+        start_time = perf_counter()
+        compressed = FORMAT_MARKER + bytes([FORMAT_ZSTD]) + self._compressor().compress(value)
+        COMPRESSION_TIME_HISTOGRAM.labels(algorithm="zstd", operation="compress").observe(perf_counter() - start_time)
+        COMPRESSION_RATIO_HISTOGRAM.labels(algorithm="zstd").observe(len(value) / len(compressed))
+        return compressed
+
+    def decompress(self, value: bytes) -> bytes:
+        if not value.startswith(FORMAT_MARKER):
+            start_time = perf_counter()
+            decompressed = super().decompress(value)
+            if decompressed is not value:
+                COMPRESSION_TIME_HISTOGRAM.labels(algorithm="zlib", operation="decompress").observe(
+                    perf_counter() - start_time
+                )
+            return decompressed
+
+        format_version = value[len(FORMAT_MARKER)]
+        payload = value[len(FORMAT_MARKER) + 1 :]
+        if format_version != FORMAT_ZSTD:
+            raise CouldNotDecompressValue(f"Unknown cache compression format version {format_version}")
+
+        start_time = perf_counter()
+        try:
+            decompressed = self._decompressor(zstandard.get_frame_parameters(payload).dict_id).decompress(payload)
+        except (zstandard.ZstdError, KeyError) as err:
+            COULD_NOT_DECOMPRESS_ZSTD_VALUE_COUNTER.inc()
+            logger.warning("could_not_decompress_zstd_value", error=repr(err))
+            raise CouldNotDecompressValue("Could not decompress zstd value") from err
+        COMPRESSION_TIME_HISTOGRAM.labels(algorithm="zstd", operation="decompress").observe(perf_counter() - start_time)
+        return decompressed
+
+    def _load_dictionaries(self) -> Dict[int, zstandard.ZstdCompressionDict]:
+        if self._dictionaries_by_id is None:
+            with self._dictionaries_lock:
+                if self._dictionaries_by_id is None:
+                    dictionaries = load_dictionaries(settings.REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS)
+                    self._write_dictionary = dictionaries[0] if dictionaries else None
+                    self._dictionaries_by_id = {dictionary.dict_id(): dictionary for dictionary in dictionaries}
+        return self._dictionaries_by_id
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        # zstd (de)compressors can't be shared between threads
+        if getattr(self._local, "compressor", None) is None:
+            self._load_dictionaries()
+            self._local.compressor = zstandard.ZstdCompressor(
+                level=settings.REDIS_COMPRESSION_ZSTD_LEVEL, dict_data=self._write_dictionary
+            )
+        return self._local.compressor
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dict_id not in decompressors:
+            # A dict_id of 0 means the value was compressed without a dictionary
+            dictionary = self._load_dictionaries()[dict_id] if dict_id else None
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressors[dict_id]
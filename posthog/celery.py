@@ -62,9 +62,12 @@ def receiver_bind_extra_request_metadata(sender, signal, task=None, logger=None)
 
 @worker_process_init.connect
 def on_worker_start(**kwargs) -> None:
+    from posthog.clickhouse.client.connection import warm_up_pools
     from posthog.settings import sentry_init
 
     sentry_init()
+    # Opens connections in the background, so it doesn't delay the worker being reported as started
+    warm_up_pools()
 
 
 @app.on_after_configure.connect
@@ -91,6 +94,15 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
     # NOTE: We can't use is_cloud here as some Django elements aren't loaded yet. We check in the task execution instead
     # Verify that persons data is in sync every day at 4 AM UTC
     sender.add_periodic_task(crontab(hour=4, minute=0), verify_persons_data_in_sync.s())
+    # Verify all persons are in sync every Sunday at 5 AM UTC
+    sender.add_periodic_task(
+        crontab(day_of_week="sun", hour=5, minute=0), verify_all_persons_data_in_sync.s(), name="verify all persons"
+    )
+
+    # Compact settled session replays into per-session summaries every hour
+    sender.add_periodic_task(
+        crontab(hour="*", minute=20), compact_session_replay_summaries.s(), name="compact session replay summaries"
+    )
 
     # Every 30 minutes, send decide request counts to the main posthog instance
     sender.add_periodic_task(crontab(minute="*/30"), calculate_decide_usage.s(), name="calculate decide usage")
@@ -118,6 +130,11 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
 
     sender.add_periodic_task(crontab(minute="*/15"), check_async_migration_health.s())
 
+    if settings.QUERY_COST_ROUTING_ENABLED:
+        sender.add_periodic_task(
+            crontab(minute=0, hour="*"), update_query_cost_rates.s(), name="update query cost rates"
+        )
+
     if settings.INGESTION_LAG_METRIC_TEAM_IDS:
         sender.add_periodic_task(60, ingestion_lag.s(), name="ingestion lag")
     sender.add_periodic_task(120, clickhouse_lag.s(), name="clickhouse table lag")
@@ -253,6 +270,23 @@ def enqueue_clickhouse_execute_with_progress(
     execute_with_progress(team_id, query_id, query, args, settings, with_column_types, task_id=self.request.id)
 
 
+@app.task(ignore_result=True)
+def delete_clickhouse_query_results(results_prefix: str):
+    """
+    Delete the results of a query run that were spooled to object storage, once they can't be read anymore
+    """
+    from posthog.storage import object_storage
+
+    object_storage.delete_objects(results_prefix)
+
+
+@app.task(ignore_result=True)
+def update_query_cost_rates():
+    from posthog.clickhouse.client.query_cost import update_query_rates
+
+    update_query_rates()
+
+
 @app.task(ignore_result=True)
 def pg_table_cache_hit_rate():
     from statshog.defaults.django import statsd
@@ -616,6 +650,16 @@ def clickhouse_clear_removed_data():
     cohort_runner.run()
 
 
+@app.task(ignore_result=True)
+def compact_session_replay_summaries():
+    from posthog.models.session_replay_event.summaries import compact_session_replay_summaries as compact
+
+    if not settings.SESSION_REPLAY_SUMMARIES_ENABLED:
+        return
+
+    compact()
+
+
 @app.task(ignore_result=True)
 def clear_clickhouse_deleted_person():
     from posthog.models.async_deletion.delete_person import remove_deleted_person_data
@@ -783,6 +827,16 @@ def verify_persons_data_in_sync():
     verify()
 
 
+@app.task(ignore_result=True)
+def verify_all_persons_data_in_sync():
+    from posthog.tasks.verify_persons_data_in_sync import verify_persons_data_in_sync_by_ranges
+
+    if not is_cloud():
+        return
+
+    verify_persons_data_in_sync_by_ranges()
+
+
 def recompute_materialized_columns_enabled() -> bool:
     from posthog.models.instance_setting import get_instance_setting
 
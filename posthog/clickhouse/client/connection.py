@@ -1,11 +1,16 @@
+import re
+import threading
 from contextlib import contextmanager
 from enum import Enum
 from functools import lru_cache
+from time import perf_counter
+from typing import Any, Dict, Optional
 
 from clickhouse_driver import Client as SyncClient
-from clickhouse_pool import ChPool
 from django.conf import settings
 
+from posthog.clickhouse.client.pool import InstrumentedChPool
+
 
 class Workload(Enum):
     # Default workload
@@ -26,18 +31,88 @@ def get_pool(workload: Workload, team_id=None, readonly=False):
     Note that the same pool should be returned every call.
     """
     if team_id is not None and str(team_id) in settings.CLICKHOUSE_PER_TEAM_SETTINGS:
-        return make_ch_pool(**settings.CLICKHOUSE_PER_TEAM_SETTINGS[str(team_id)])
-
-    # Note that `readonly` does nothing if the relevant vars are not set!
-    if readonly and settings.READONLY_CLICKHOUSE_USER is not None and settings.READONLY_CLICKHOUSE_PASSWORD:
-        return make_ch_pool(user=settings.READONLY_CLICKHOUSE_USER, password=settings.READONLY_CLICKHOUSE_PASSWORD)
+        return make_ch_pool(name=f"team_{team_id}", **settings.CLICKHOUSE_PER_TEAM_SETTINGS[str(team_id)])
 
+    name = "online"
+    overrides: Dict[str, str] = {}
     if (
         workload == Workload.OFFLINE or workload == Workload.DEFAULT and _default_workload == Workload.OFFLINE
     ) and settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST is not None:
-        return make_ch_pool(host=settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST)
+        name = "offline"
+        overrides["host"] = settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST
+
+    # Note that `readonly` does nothing if the relevant vars are not set!
+    if readonly and settings.READONLY_CLICKHOUSE_USER is not None and settings.READONLY_CLICKHOUSE_PASSWORD:
+        name = f"{name}_readonly"
+        overrides["user"] = settings.READONLY_CLICKHOUSE_USER
+        overrides["password"] = settings.READONLY_CLICKHOUSE_PASSWORD
+
+    return make_ch_pool(name=name, **overrides)
+
+
+def warm_up_pools():
+    """
+    Opens a few idle connections of the pools most queries run on in the background, when a worker starts. Otherwise,
+    the first queries of the worker wait for their connection to be opened.
+
+    This returns straight away, so that workers aren't killed for taking too long to boot when ClickHouse is slow or
+    unreachable.
+    """
+    if not settings.CLICKHOUSE_CONN_POOL_WARM_UP:
+        return
+    threading.Thread(target=_warm_up_pools, name="clickhouse-pool-warm-up", daemon=True).start()
+
 
-    return make_ch_pool()
+def _warm_up_pools():
+    deadline = perf_counter() + settings.CLICKHOUSE_CONN_POOL_WARM_UP_TIMEOUT_SECONDS
+    pools = {get_pool(Workload.ONLINE), get_pool(Workload.ONLINE, readonly=True), get_pool(Workload.OFFLINE)}
+    for pool in pools:
+        pool.warm_up(settings.CLICKHOUSE_CONN_POOL_WARM_UP_CONNECTIONS, deadline)
+
+
+OPTIMIZE_QUERY_REGEX = re.compile(r"^\s*(/\*.*?\*/\s*)*OPTIMIZE\b", re.IGNORECASE | re.DOTALL)
+
+
+def get_send_receive_timeout(query: str, query_settings: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    How long to wait for ClickHouse to send data while running the query. Queries allowed to run for longer than the
+    default, and ones that wait for merges or mutations to finish, wait for as long as they need. None waits forever.
+    """
+    query_settings = query_settings or {}
+    if int(query_settings.get("mutations_sync") or 0) or OPTIMIZE_QUERY_REGEX.match(query):
+        return None
+
+    max_execution_time = query_settings.get("max_execution_time")
+    if max_execution_time is None:
+        return settings.CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS
+    if int(max_execution_time) == 0:
+        return None
+    # Leaves time for ClickHouse to report that the query timed out
+    return max(settings.CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS, int(max_execution_time) + 60)
+
+
+@contextmanager
+def send_receive_timeout(client: SyncClient, query: str, query_settings: Optional[Dict[str, Any]]):
+    "Runs queries of the client with the send and receive timeout for the query, see `get_send_receive_timeout`."
+    connection = client.connection
+    default_timeout = connection.send_receive_timeout
+    timeout = get_send_receive_timeout(query, query_settings)
+    if timeout == default_timeout:
+        yield
+        return
+
+    # Applies to the open socket as well as to the one opened if the connection has to be reopened
+    _set_send_receive_timeout(connection, timeout)
+    try:
+        yield
+    finally:
+        _set_send_receive_timeout(connection, default_timeout)
+
+
+def _set_send_receive_timeout(connection, timeout: Optional[float]) -> None:
+    connection.send_receive_timeout = timeout
+    if connection.connected:
+        connection.socket.settimeout(timeout)
 
 
 def default_client():
@@ -63,7 +138,8 @@ def default_client():
 
 
 @lru_cache(maxsize=None)
-def make_ch_pool(**overrides) -> ChPool:
+def make_ch_pool(name: Optional[str] = None, **overrides) -> InstrumentedChPool:
+    """Creates a pool, named in its metrics after the workload or team it's for, or else after its host."""
     kwargs = {
         "host": settings.CLICKHOUSE_HOST,
         "database": settings.CLICKHOUSE_DATABASE,
@@ -75,12 +151,17 @@ def make_ch_pool(**overrides) -> ChPool:
         "connections_min": settings.CLICKHOUSE_CONN_POOL_MIN,
         "connections_max": settings.CLICKHOUSE_CONN_POOL_MAX,
         "settings": {"mutations_sync": "1"} if settings.TEST else {},
-        # Without this, OPTIMIZE table and other queries will regularly run into timeouts
-        "send_receive_timeout": 30 if settings.TEST else 999_999_999,
+        # Queries that are allowed to run for longer extend this, see `send_receive_timeout`
+        "send_receive_timeout": settings.CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS,
         **overrides,
     }
 
-    return ChPool(**kwargs)
+    return InstrumentedChPool(
+        name=name or kwargs["host"],
+        acquire_timeout=settings.CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        ping_interval=settings.CLICKHOUSE_CONN_POOL_PING_INTERVAL_SECONDS,
+        **kwargs,
+    )
 
 
 @contextmanager
@@ -1,18 +1,22 @@
+import hashlib
 import json
 import threading
 import types
+from concurrent.futures import Future
 from contextlib import contextmanager
-from functools import lru_cache
+from functools import lru_cache, partial
 from time import perf_counter
-from typing import Any, Dict, List, Optional, Sequence, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
 import sqlparse
 from clickhouse_driver import Client as SyncClient
 from django.conf import settings as app_settings
 from statshog.defaults.django import statsd
 
-from posthog.clickhouse.client.connection import Workload, get_pool
+from posthog.clickhouse.client.connection import Workload, get_pool, send_receive_timeout
 from posthog.clickhouse.client.escape import substitute_params
+from posthog.clickhouse.client.query_cost import get_predicted_query_cost
+from posthog.clickhouse.client.single_flight import single_flight_execute
 from posthog.clickhouse.query_tagging import get_query_tag_value, get_query_tags
 from posthog.errors import wrap_query_error
 from posthog.settings import TEST
@@ -90,22 +94,60 @@ def sync_execute(
         except ModuleNotFoundError:  # when we run plugin server tests it tries to run above, ignore
             pass
 
+    execute: Callable[[], Any] = lambda: _execute(
+        query, args, settings, with_column_types, workload=workload, team_id=team_id, readonly=readonly
+    )
+    shared_results: Optional[SharedQueryResults] = getattr(thread_local_storage, "shared_query_results", None)
+    single_flight = app_settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED
+    # Keying queries isn't free, so it's only done when their results can be shared
+    if not (single_flight or shared_results is not None) or not is_read_query(query, args):
+        return execute()
+
+    key = query_key(query, args, settings, with_column_types, workload, team_id)
+    if single_flight:
+        execute = partial(single_flight_execute, key, execute)
+
+    if shared_results is not None:
+        return shared_results.get_or_execute(key, execute)
+
+    return execute()
+
+
+def _execute(
+    query,
+    args=None,
+    settings=None,
+    with_column_types=False,
+    *,
+    workload: Workload = Workload.DEFAULT,
+    team_id: Optional[int] = None,
+    readonly=False,
+):
+    query_cost = get_predicted_query_cost()
+    if query_cost is not None and query_cost.is_expensive:
+        workload = Workload.OFFLINE
+
     with get_pool(workload, team_id, readonly).get_client() as client:
         start_time = perf_counter()
 
         prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args, workload=workload)
         query_id = validated_client_query_id()
-        core_settings = {**default_settings(), **(settings or {})}
+        core_settings = {
+            **default_settings(),
+            **(query_cost.limits() if query_cost is not None else {}),
+            **(settings or {}),
+        }
         tags["query_settings"] = core_settings
         settings = {**core_settings, "log_comment": json.dumps(tags, separators=(",", ":"))}
         try:
-            result = client.execute(
-                prepared_sql,
-                params=prepared_args,
-                settings=settings,
-                with_column_types=with_column_types,
-                query_id=query_id,
-            )
+            with send_receive_timeout(client, prepared_sql, settings):
+                result = client.execute(
+                    prepared_sql,
+                    params=prepared_args,
+                    settings=settings,
+                    with_column_types=with_column_types,
+                    query_id=query_id,
+                )
         except Exception as err:
             err = wrap_query_error(err)
             statsd.incr("clickhouse_sync_execution_failure", tags={"failed": True, "reason": type(err).__name__})
@@ -238,3 +280,65 @@ def clickhouse_query_counter(query_counter):
     thread_local_storage.query_counter = query_counter
     yield
     thread_local_storage.query_counter = None
+
+
+def is_read_query(query: str, args: QueryArgs) -> bool:
+    # Only reads can be shared, inserts and mutations always run
+    return not isinstance(args, (list, tuple, types.GeneratorType)) and query.lstrip().upper().startswith(
+        ("SELECT", "WITH")
+    )
+
+
+def query_key(query: str, args: Optional[NonInsertParams], settings, with_column_types, workload, team_id) -> str:
+    rendered_sql = substitute_params(query, args) if args else query
+    payload = json.dumps(
+        [rendered_sql, settings, with_column_types, str(workload), team_id], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SharedQueryResults:
+    """
+    Shares the results of identical read queries between the callers within a scope, e.g. the tiles of a dashboard
+    being refreshed together. The first caller executes the query, concurrent callers wait for its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Future] = {}
+        self.executed_count = 0
+        self.shared_count = 0
+
+    def get_or_execute(self, key: str, execute: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._results.get(key)
+            is_owner = future is None
+            if future is None:
+                future = self._results[key] = Future()
+                self.executed_count += 1
+            else:
+                self.shared_count += 1
+
+        if is_owner:
+            try:
+                future.set_result(execute())
+            except Exception as err:
+                future.set_exception(err)
+
+        result = future.result()
+        # Callers are free to modify the rows list they get back, so each of them gets their own
+        if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], list):
+            return list(result[0]), result[1]
+        if isinstance(result, list):
+            return list(result)
+        return result
+
+
+@contextmanager
+def share_query_results(shared_results: SharedQueryResults):
+    previous = getattr(thread_local_storage, "shared_query_results", None)
+    thread_local_storage.shared_query_results = shared_results
+    try:
+        yield shared_results
+    finally:
+        thread_local_storage.shared_query_results = previous
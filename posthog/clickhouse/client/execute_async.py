@@ -1,31 +1,30 @@
+import gzip
 import hashlib
 import json
 import time
 from dataclasses import asdict as dataclass_asdict
 from dataclasses import dataclass
 from time import perf_counter
-from typing import Any, Optional
+from typing import Any, Iterator, List, Optional
 
-from posthog import celery
-from clickhouse_driver import Client as SyncClient
 from django.conf import settings as app_settings
+from django.core.serializers.json import DjangoJSONEncoder
 from statshog.defaults.django import statsd
 
-from posthog import redis
-from posthog.celery import enqueue_clickhouse_execute_with_progress
+from posthog import celery, redis
+from posthog.celery import delete_clickhouse_query_results, enqueue_clickhouse_execute_with_progress
+from posthog.clickhouse.client.connection import Workload, get_pool, send_receive_timeout
 from posthog.clickhouse.client.execute import _prepare_query
 from posthog.errors import wrap_query_error
-from posthog.settings import (
-    CLICKHOUSE_CA,
-    CLICKHOUSE_DATABASE,
-    CLICKHOUSE_HOST,
-    CLICKHOUSE_PASSWORD,
-    CLICKHOUSE_SECURE,
-    CLICKHOUSE_USER,
-    CLICKHOUSE_VERIFY,
-)
+from posthog.storage import object_storage
 
 REDIS_STATUS_TTL = 600  # 10 minutes
+# Spooled results are deleted a while after they're written, once the status of their query has expired for sure
+RESULTS_CHUNKS_TTL = REDIS_STATUS_TTL + 60
+
+
+class QueryResultsExpired(Exception):
+    pass
 
 
 @dataclass
@@ -37,105 +36,90 @@ class QueryStatus:
     complete: bool = False
     error_message: str = ""
     results: Any = None
+    # Column names and types of the results, if requested
+    types: Optional[List] = None
+    # Number of chunks the results were spooled to object storage in, if there were too many to keep in redis
+    results_chunks: int = 0
     start_time: Optional[float] = None
     end_time: Optional[float] = None
     task_id: Optional[str] = None
 
 
-def generate_redis_results_key(query_id):
+def generate_redis_results_key(team_id: int, query_id: str) -> str:
+    # Query ids can be provided by clients, so they're only unique within a team
     REDIS_KEY_PREFIX_ASYNC_RESULTS = "query_with_progress"
-    key = f"{REDIS_KEY_PREFIX_ASYNC_RESULTS}:{query_id}"
+    key = f"{REDIS_KEY_PREFIX_ASYNC_RESULTS}:{team_id}:{query_id}"
     return key
 
 
+def generate_results_prefix(team_id: int, query_id: str, start_time: float) -> str:
+    # Results are kept apart for every run of the query, so that deleting those of a run never touches a rerun's
+    run = int(start_time * 1_000_000)
+    return f"{app_settings.OBJECT_STORAGE_QUERY_RESULTS_FOLDER}/team_id/{team_id}/query_id/{query_id}/run/{run}/"
+
+
+def generate_results_chunk_key(team_id: int, query_id: str, start_time: float, chunk: int) -> str:
+    return f"{generate_results_prefix(team_id, query_id, start_time)}chunk/{chunk}"
+
+
 def execute_with_progress(
     team_id, query_id, query, args=None, settings=None, with_column_types=False, update_freq=0.2, task_id=None
 ):
     """
-    Kick off query with progress reporting
-    Iterate over the progress status
-    Save status to redis
-    Once complete save results to redis
+    Kick off query with progress reporting, on a connection from the team's pool
+    Save status to redis and publish it on the query's channel, at most every `update_freq` seconds
+    Once complete save results to redis, or spool them to object storage in compressed chunks if there are many
     """
 
-    key = generate_redis_results_key(query_id)
-    ch_client = SyncClient(
-        host=CLICKHOUSE_HOST,
-        database=CLICKHOUSE_DATABASE,
-        secure=CLICKHOUSE_SECURE,
-        user=CLICKHOUSE_USER,
-        password=CLICKHOUSE_PASSWORD,
-        ca_certs=CLICKHOUSE_CA,
-        verify=CLICKHOUSE_VERIFY,
-        settings={"max_result_rows": "10000"},
-    )
+    key = generate_redis_results_key(team_id, query_id)
     redis_client = redis.get_client()
 
     start_time = perf_counter()
 
-    prepared_sql, prepared_args, tags = _prepare_query(client=ch_client, query=query, args=args)
-
-    query_status = QueryStatus(team_id, task_id=task_id)
-
-    start_time = time.time()
+    query_status = QueryStatus(team_id, start_time=time.time(), task_id=task_id)
+    tags = {}
 
     try:
-        progress = ch_client.execute_with_progress(
-            prepared_sql, params=prepared_args, settings=settings, with_column_types=with_column_types
-        )
-        for num_rows, total_rows in progress:
-            query_status = QueryStatus(
-                team_id=team_id,
-                num_rows=num_rows,
-                total_rows=total_rows,
-                complete=False,
-                error=False,
-                error_message="",
-                results=None,
-                start_time=start_time,
-                task_id=task_id,
-            )
-            redis_client.set(key, json.dumps(dataclass_asdict(query_status)), ex=REDIS_STATUS_TTL)
-            time.sleep(update_freq)
+        with get_pool(Workload.ONLINE, team_id=team_id, readonly=True).get_client() as ch_client:
+            prepared_sql, prepared_args, tags = _prepare_query(client=ch_client, query=query, args=args)
+            query_settings = {"max_result_rows": str(app_settings.ASYNC_QUERY_MAX_RESULT_ROWS), **(settings or {})}
+            with send_receive_timeout(ch_client, prepared_sql, query_settings):
+                progress = ch_client.execute_with_progress(
+                    prepared_sql,
+                    params=prepared_args,
+                    settings=query_settings,
+                    with_column_types=with_column_types,
+                )
+                published_at = 0.0
+                for num_rows, total_rows in progress:
+                    query_status.num_rows = num_rows
+                    query_status.total_rows = total_rows
+                    if time.time() - published_at >= update_freq:
+                        _save_status(redis_client, key, query_status)
+                        published_at = time.time()
+                rv = progress.get_result()
+
+        results, query_status.types = rv if with_column_types else (rv, None)
+        if app_settings.OBJECT_STORAGE_ENABLED and len(results) > app_settings.ASYNC_QUERY_RESULTS_CHUNK_ROWS:
+            query_status.results_chunks = _spool_results(team_id, query_id, query_status.start_time, results)
         else:
-            rv = progress.get_result()
-            query_status = QueryStatus(
-                team_id=team_id,
-                num_rows=query_status.num_rows,
-                total_rows=query_status.total_rows,
-                complete=True,
-                error=False,
-                start_time=query_status.start_time,
-                end_time=time.time(),
-                error_message="",
-                results=rv,
-                task_id=task_id,
-            )
-            redis_client.set(key, json.dumps(dataclass_asdict(query_status)), ex=REDIS_STATUS_TTL)
+            query_status.results = results
+        query_status.complete = True
+        query_status.end_time = time.time()
+        _save_status(redis_client, key, query_status)
 
     except Exception as err:
         err = wrap_query_error(err)
         tags["failed"] = True
         tags["reason"] = type(err).__name__
         statsd.incr("clickhouse_sync_execution_failure")
-        query_status = QueryStatus(
-            team_id=team_id,
-            num_rows=query_status.num_rows,
-            total_rows=query_status.total_rows,
-            complete=False,
-            error=True,
-            start_time=query_status.start_time,
-            end_time=time.time(),
-            error_message=str(err),
-            results=None,
-            task_id=task_id,
-        )
-        redis_client.set(key, json.dumps(dataclass_asdict(query_status)), ex=REDIS_STATUS_TTL)
+        query_status.error = True
+        query_status.end_time = time.time()
+        query_status.error_message = str(err)
+        _save_status(redis_client, key, query_status)
 
         raise err
     finally:
-        ch_client.disconnect()
-
         execution_time = perf_counter() - start_time
 
         statsd.timing("clickhouse_sync_execution_time", execution_time * 1000.0)
@@ -144,12 +128,34 @@ def execute_with_progress(
             print("Execution time: %.6fs" % (execution_time,))  # noqa T201
 
 
+def _save_status(redis_client, key: str, query_status: QueryStatus) -> None:
+    redis_client.set(key, json.dumps(dataclass_asdict(query_status), cls=DjangoJSONEncoder), ex=REDIS_STATUS_TTL)
+    # Subscribers only get told how far along the query is, results are fetched from the status
+    update = dataclass_asdict(query_status)
+    update["results"] = None
+    redis_client.publish(key, json.dumps(update, cls=DjangoJSONEncoder))
+
+
+def _spool_results(team_id: int, query_id: str, start_time: float, results: List) -> int:
+    # Scheduled before writing any chunk, so that none are left behind if writing the others fails
+    delete_clickhouse_query_results.apply_async(
+        (generate_results_prefix(team_id, query_id, start_time),), countdown=RESULTS_CHUNKS_TTL
+    )
+    chunk_rows = app_settings.ASYNC_QUERY_RESULTS_CHUNK_ROWS
+    chunks = 0
+    for offset in range(0, len(results), chunk_rows):
+        content = json.dumps(results[offset : offset + chunk_rows], cls=DjangoJSONEncoder).encode("utf-8")
+        object_storage.write(generate_results_chunk_key(team_id, query_id, start_time, chunks), gzip.compress(content))
+        chunks += 1
+    return chunks
+
+
 def enqueue_execute_with_progress(
     team_id, query, args=None, settings=None, with_column_types=False, bypass_celery=False, query_id=None, force=False
 ):
     if not query_id:
         query_id = _query_hash(query, team_id, args)
-    key = generate_redis_results_key(query_id)
+    key = generate_redis_results_key(team_id, query_id)
     redis_client = redis.get_client()
 
     if force:
@@ -178,21 +184,37 @@ def enqueue_execute_with_progress(
         # Call directly ( for testing )
         enqueue_clickhouse_execute_with_progress(team_id, query_id, query, args, settings, with_column_types)
     else:
-        enqueue_clickhouse_execute_with_progress.delay(team_id, query_id, query, args, settings, with_column_types)
+        # Queries run on workers of their own, so that long ones don't hold up other tasks
+        enqueue_clickhouse_execute_with_progress.apply_async(
+            (team_id, query_id, query, args, settings, with_column_types), queue=app_settings.ASYNC_QUERY_CELERY_QUEUE
+        )
 
     return query_id
 
 
-def get_status_or_results(team_id, query_id):
+def get_status_or_results(team_id, query_id, chunk=0):
     """
     Returns QueryStatus data class
     QueryStatus data class contains either:
     Current status of running query
-    Results of completed query
+    Results of completed query, or the given chunk of them if they were spooled to object storage
     Error payload of failed query
+    Raises QueryResultsExpired if the results were spooled to object storage and aren't there anymore
     """
+    query_status = _get_status(team_id, query_id)
+    if query_status.results_chunks:
+        try:
+            query_status.results = _read_results_chunk(query_status, query_id, chunk)
+        except QueryResultsExpired:
+            raise
+        except Exception as e:
+            query_status = QueryStatus(team_id, error=True, error_message=str(e))
+    return query_status
+
+
+def _get_status(team_id, query_id) -> QueryStatus:
     redis_client = redis.get_client()
-    key = generate_redis_results_key(query_id)
+    key = generate_redis_results_key(team_id, query_id)
     try:
         byte_results = redis_client.get(key)
         if byte_results:
@@ -207,6 +229,47 @@ def get_status_or_results(team_id, query_id):
     return query_status
 
 
+def get_status_updates(team_id, query_id, timeout: float) -> Iterator[QueryStatus]:
+    """
+    Yields the status of the query, and then every update published for it until it completes, fails or `timeout`
+    seconds have passed. Updates don't include results.
+    """
+    pubsub = redis.get_client().pubsub(ignore_subscribe_messages=True)
+    # Subscribe before reading the status, so that no update is missed in between
+    pubsub.subscribe(generate_redis_results_key(team_id, query_id))
+    try:
+        query_status = _get_status(team_id, query_id)
+        query_status.results = None
+        yield query_status
+
+        deadline = time.monotonic() + timeout
+        while not query_status.complete and not query_status.error and time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=deadline - time.monotonic())
+            if message is None:
+                continue
+            query_status = QueryStatus(**json.loads(message["data"]))
+            if query_status.team_id != team_id:
+                return
+            yield query_status
+    finally:
+        pubsub.close()
+
+
+def _read_results_chunk(query_status: QueryStatus, query_id: str, chunk: int) -> List:
+    if not 0 <= chunk < query_status.results_chunks:
+        raise Exception(f"Results chunk {chunk} does not exist, there are {query_status.results_chunks}")
+    assert query_status.start_time is not None
+    key = generate_results_chunk_key(query_status.team_id, query_id, query_status.start_time, chunk)
+    try:
+        content = object_storage.read_bytes(key)
+    except object_storage.ObjectStorageError as e:
+        raise QueryResultsExpired(f"Results chunk {chunk} has expired, run the query again to get it") from e
+    if content is None:
+        # Object storage was disabled since the results were spooled to it
+        raise QueryResultsExpired(f"Results chunk {chunk} has expired, run the query again to get it")
+    return json.loads(gzip.decompress(content))
+
+
 def _query_hash(query: str, team_id: int, args: Any) -> str:
     """
     Takes a query and returns a hex encoded hash of the query and args
@@ -0,0 +1,191 @@
+"""
+A ClickHouse connection pool that reports how it's used to Prometheus, labelled by the name of the pool.
+
+When all connections are in use, callers wait for one to be returned for a bounded time instead of failing straight
+away. Idle connections can be opened ahead of the first queries, and pinged in the background so that broken ones are
+reopened before they're handed out. They're checked one at a time, counting as in use meanwhile, so that the rest of
+the pool stays available to queries.
+"""
+import math
+import threading
+import weakref
+from time import perf_counter, sleep
+from typing import Callable, Optional
+
+import structlog
+from clickhouse_driver import Client
+from clickhouse_pool import ChPool
+from clickhouse_pool.pool import TooManyConnections
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = structlog.get_logger(__name__)
+
+CONNECTIONS_IN_USE_GAUGE = Gauge(
+    "posthog_clickhouse_pool_connections_in_use",
+    "ClickHouse connections of the pool handed out to run queries",
+    labelnames=["pool"],
+    multiprocess_mode="livesum",
+)
+CONNECTIONS_IDLE_GAUGE = Gauge(
+    "posthog_clickhouse_pool_connections_idle",
+    "ClickHouse connections kept in the pool to be reused",
+    labelnames=["pool"],
+    multiprocess_mode="livesum",
+)
+ACQUIRE_WAIT_HISTOGRAM = Histogram(
+    "posthog_clickhouse_pool_acquire_wait_seconds",
+    "Time taken to get a connection from the pool, including waiting for one to be returned",
+    labelnames=["pool"],
+)
+ACQUIRE_TIMEOUTS_COUNTER = Counter(
+    "posthog_clickhouse_pool_acquire_timeouts_total",
+    "Queries that failed because no connection of the pool was returned in time",
+    labelnames=["pool"],
+)
+CONNECTION_AGE_HISTOGRAM = Histogram(
+    "posthog_clickhouse_pool_connection_age_seconds",
+    "Time since the connections handed out by the pool were created",
+    labelnames=["pool"],
+    buckets=(1, 10, 60, 5 * 60, 15 * 60, 60 * 60, 4 * 60 * 60, 24 * 60 * 60, math.inf),
+)
+BROKEN_CONNECTIONS_COUNTER = Counter(
+    "posthog_clickhouse_pool_broken_connections_total",
+    "Idle connections of the pool that didn't answer a ping",
+    labelnames=["pool"],
+)
+
+
+class PoolAcquireTimeout(TooManyConnections):
+    """Raised when all connections of a pool stay in use for longer than its acquire timeout."""
+
+
+class InstrumentedChPool(ChPool):
+    def __init__(self, name: str, acquire_timeout: float, ping_interval: float, **kwargs):
+        self.name = name
+        self.acquire_timeout = acquire_timeout
+        self._created_at: weakref.WeakKeyDictionary[Client, float] = weakref.WeakKeyDictionary()
+        super().__init__(**kwargs)
+        # Lets callers wait for connections to be returned
+        self._lock = threading.Condition(self._lock)
+        self._report_usage()
+
+        if ping_interval > 0:
+            threading.Thread(
+                target=self._ping_idle_clients_periodically,
+                args=(ping_interval,),
+                name=f"clickhouse-pool-{name}-ping",
+                daemon=True,
+            ).start()
+
+    def _connect(self, key=None) -> Client:
+        client = super()._connect(key)
+        self._created_at[client] = perf_counter()
+        return client
+
+    def pull(self, key=None) -> Client:
+        start_time = perf_counter()
+        while True:
+            try:
+                client = super().pull(key)
+                break
+            except TooManyConnections:
+                with self._lock:
+                    # A connection may have been returned since
+                    if self._pool or len(self._used) < self.connections_max:
+                        continue
+                    remaining = start_time + self.acquire_timeout - perf_counter()
+                    if remaining <= 0:
+                        ACQUIRE_TIMEOUTS_COUNTER.labels(pool=self.name).inc()
+                        raise PoolAcquireTimeout(
+                            f"All {self.connections_max} connections of the {self.name} ClickHouse pool stayed in use "
+                            f"for {self.acquire_timeout}s"
+                        )
+                    self._lock.wait(remaining)
+
+        ACQUIRE_WAIT_HISTOGRAM.labels(pool=self.name).observe(perf_counter() - start_time)
+        created_at = self._created_at.get(client)
+        if created_at is not None:
+            CONNECTION_AGE_HISTOGRAM.labels(pool=self.name).observe(perf_counter() - created_at)
+        self._report_usage()
+        return client
+
+    def push(self, client=None, key=None, close=False):
+        try:
+            super().push(client=client, key=key, close=close)
+        finally:
+            with self._lock:
+                self._lock.notify()
+            self._report_usage()
+
+    def warm_up(self, connections: Optional[int] = None, deadline: Optional[float] = None) -> None:
+        """
+        Opens up to `connections` idle connections of the pool, or all of them, so that the first queries don't wait
+        for them to be opened. No more are opened after `deadline`, a `perf_counter` time.
+        """
+        self._check_idle_clients(lambda client: client.connection.force_connect(), connections, deadline)
+
+    def ping_idle_clients(self) -> None:
+        """Pings the open idle connections of the pool, and reopens the ones that don't answer."""
+
+        def ping(client: Client):
+            if client.connection.connected and not client.connection.ping():
+                BROKEN_CONNECTIONS_COUNTER.labels(pool=self.name).inc()
+                client.connection.connect()
+
+        self._check_idle_clients(ping)
+
+    def _check_idle_clients(
+        self, check: Callable[[Client], None], limit: Optional[int] = None, deadline: Optional[float] = None
+    ) -> None:
+        """
+        Checks the idle connections one at a time, oldest first, dropping the ones the check fails for. The connection
+        being checked is taken out of the pool and counts as in use, so that it isn't handed out meanwhile.
+        """
+        with self._lock:
+            count = len(self._pool)
+        if limit is not None:
+            count = min(count, limit)
+
+        for _ in range(count):
+            if deadline is not None and perf_counter() >= deadline:
+                break
+            with self._lock:
+                if self.closed or not self._pool:
+                    return
+                client = self._pool.pop(0)
+                key = self._get_key()
+                self._used[key] = client
+                self._rused[id(client)] = key
+            self._report_usage()
+
+            try:
+                check(client)
+                failed = False
+            except Exception as err:
+                logger.warning("clickhouse_pool_connection_failed", pool=self.name, error=str(err))
+                failed = True
+            self._return_checked_client(client, failed)
+
+    def _return_checked_client(self, client: Client, close: bool) -> None:
+        # Unlike `push`, keeps connections that the check left unopened
+        with self._lock:
+            key = self._rused.pop(id(client), None)
+            self._used.pop(key, None)
+            if close or self.closed:
+                client.disconnect()
+            else:
+                self._pool.append(client)
+            self._lock.notify()
+        self._report_usage()
+
+    def _ping_idle_clients_periodically(self, interval: float) -> None:
+        while not self.closed:
+            sleep(interval)
+            try:
+                self.ping_idle_clients()
+            except Exception as err:
+                logger.exception("clickhouse_pool_ping_failed", pool=self.name, error=str(err))
+
+    def _report_usage(self) -> None:
+        CONNECTIONS_IN_USE_GAUGE.labels(pool=self.name).set(len(self._used))
+        CONNECTIONS_IDLE_GAUGE.labels(pool=self.name).set(len(self._pool))
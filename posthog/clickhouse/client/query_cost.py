@@ -0,0 +1,163 @@
+"""
+Predicts how costly insight queries are before running them, so that expensive ones can be sent to the offline cluster
+and every query gets limits fitting its size.
+
+Queries are assumed to read the events of their team and date range, as estimated for adaptive sampling. How long
+they take and how much memory they need per row read is learnt from `system.query_log`, for each type of query and,
+if it ran often enough recently, for each team.
+
+`system.query_log` only holds the queries of the node it's read from, so the rates are learnt from the queries that
+node coordinated. Learning them scans the log, so it's done by a periodic task, see `update_query_rates`. Until it
+first ran no costs are predicted, and queries run as if routing by cost was off.
+"""
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from posthog.clickhouse.query_tagging import get_query_tag_value, tags_context
+
+if TYPE_CHECKING:
+    from posthog.models.team import Team
+
+# Teams need this many queries of a type for their own rates to be used instead of the rates of all teams
+MIN_TEAM_QUERIES = 10
+# Rows a query is expected to need a thread of its own for
+ROWS_PER_THREAD = 10_000_000
+# Queries can run this many times longer, or use this many times more memory, than predicted before they're stopped
+LIMIT_HEADROOM = 10
+MIN_MAX_EXECUTION_TIME_SECONDS = 60
+MIN_MAX_MEMORY_USAGE = 1_000_000_000
+# Rates are learnt hourly, and forgotten if that stops for a while
+QUERY_RATES_CACHE_KEY = "query_cost_rates"
+QUERY_RATES_CACHE_TIMEOUT_SECONDS = 3 * 60 * 60
+
+QUERY_RATES_SQL = """
+SELECT
+    JSONExtractInt(log_comment, 'team_id') AS team_id,
+    if(JSONExtractString(log_comment, 'query_type') != '',
+       JSONExtractString(log_comment, 'query_type'),
+       JSONExtractString(log_comment, 'cache_type')) AS query_type,
+    sum(query_duration_ms),
+    sum(memory_usage),
+    sum(read_rows),
+    count()
+FROM system.query_log
+WHERE
+    type = 'QueryFinish'
+    AND is_initial_query
+    AND event_time > now() - toIntervalHour(%(hours)s)
+    AND read_rows > 0
+    AND query_type != ''
+GROUP BY team_id, query_type
+"""
+
+# Milliseconds and bytes a query of a type needs per row it reads, and how many queries that was learnt from
+QueryRates = Dict[str, Tuple[float, float, int]]
+
+
+@dataclass(frozen=True)
+class QueryCost:
+    rows: int
+    duration_ms: float
+    memory_bytes: float
+
+    @property
+    def is_expensive(self) -> bool:
+        return self.duration_ms >= settings.QUERY_COST_OFFLINE_THRESHOLD_MS
+
+    def limits(self) -> Dict[str, int]:
+        "ClickHouse settings limiting the resources of the query, with room for the prediction to be off"
+        return {
+            "max_execution_time": min(
+                settings.QUERY_COST_MAX_EXECUTION_TIME_SECONDS,
+                max(MIN_MAX_EXECUTION_TIME_SECONDS, math.ceil(self.duration_ms * LIMIT_HEADROOM / 1000)),
+            ),
+            "max_threads": min(settings.QUERY_COST_MAX_THREADS, max(1, math.ceil(self.rows / ROWS_PER_THREAD))),
+            "max_memory_usage": min(
+                settings.QUERY_COST_MAX_MEMORY_USAGE,
+                max(MIN_MAX_MEMORY_USAGE, math.ceil(self.memory_bytes * LIMIT_HEADROOM)),
+            ),
+        }
+
+
+def predict_query_cost(
+    team: "Team", query_type: str, date_from: Optional[datetime], date_to: Optional[datetime]
+) -> Optional[QueryCost]:
+    "Predicts the cost of a query of the type over the date range, if queries of the type ran recently"
+    from posthog.queries.adaptive_sampling import estimate_event_count
+
+    rates = get_team_query_rates(team.pk).get(query_type)
+    if rates is None or rates[2] < MIN_TEAM_QUERIES:
+        rates = get_query_rates().get(query_type)
+    if rates is None:
+        return None
+
+    duration_ms_per_row, memory_bytes_per_row, _ = rates
+    rows = round(estimate_event_count(team, date_from, date_to))
+    return QueryCost(rows=rows, duration_ms=rows * duration_ms_per_row, memory_bytes=rows * memory_bytes_per_row)
+
+
+@contextmanager
+def tag_predicted_query_cost(team: "Team", query_type: str, date_from: Optional[datetime], date_to: Optional[datetime]):
+    """
+    Predicts the cost of the queries run within the context and tags them with it, so that they are routed and limited
+    accordingly, see `_execute`. The prediction is logged with the queries, to compare it with their actual cost.
+    """
+    if not settings.QUERY_COST_ROUTING_ENABLED:
+        yield
+        return
+    query_cost = predict_query_cost(team, query_type, date_from, date_to)
+    # A prediction made around the context doesn't apply to the queries within it, even if there's none for them
+    with tags_context(predicted_query_cost=asdict(query_cost) if query_cost is not None else {}):
+        yield
+
+
+def get_predicted_query_cost() -> Optional[QueryCost]:
+    "The predicted cost of the queries being run, if they were tagged with one"
+    query_cost = get_query_tag_value("predicted_query_cost")
+    return QueryCost(**query_cost) if query_cost else None
+
+
+def get_query_rates() -> QueryRates:
+    return cache.get(QUERY_RATES_CACHE_KEY) or {}
+
+
+def get_team_query_rates(team_id: int) -> QueryRates:
+    return cache.get(_team_query_rates_cache_key(team_id)) or {}
+
+
+def update_query_rates() -> None:
+    "Learns the rates of all teams and of each team from system.query_log, for costs to be predicted with"
+    from posthog.client import sync_execute
+
+    rows = sync_execute(QUERY_RATES_SQL, {"hours": settings.QUERY_COST_LOOKBACK_HOURS})
+
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0, 0, 0])
+    team_rates: Dict[int, QueryRates] = defaultdict(dict)
+    for team_id, query_type, duration_ms, memory_bytes, read_rows, queries in rows:
+        team_rates[team_id][query_type] = (duration_ms / read_rows, memory_bytes / read_rows, queries)
+        for index, value in enumerate((duration_ms, memory_bytes, read_rows, queries)):
+            totals[query_type][index] += value
+
+    cache.set(
+        QUERY_RATES_CACHE_KEY,
+        {
+            query_type: (duration_ms / read_rows, memory_bytes / read_rows, int(queries))
+            for query_type, (duration_ms, memory_bytes, read_rows, queries) in totals.items()
+        },
+        QUERY_RATES_CACHE_TIMEOUT_SECONDS,
+    )
+    cache.set_many(
+        {_team_query_rates_cache_key(team_id): rates for team_id, rates in team_rates.items() if team_id},
+        QUERY_RATES_CACHE_TIMEOUT_SECONDS,
+    )
+
+
+def _team_query_rates_cache_key(team_id: int) -> str:
+    return f"{QUERY_RATES_CACHE_KEY}:{team_id}"
@@ -0,0 +1,124 @@
+import pickle
+import time
+import uuid
+from time import perf_counter
+from typing import Any, Callable, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from prometheus_client import Counter
+
+from posthog import redis
+
+logger = structlog.get_logger(__name__)
+
+SINGLE_FLIGHT_EXECUTED_COUNTER = Counter(
+    "posthog_clickhouse_single_flight_executed",
+    "Read queries executed in ClickHouse by the single-flight layer, as the first caller for their key",
+)
+SINGLE_FLIGHT_COALESCED_COUNTER = Counter(
+    "posthog_clickhouse_single_flight_coalesced",
+    "Read queries answered without executing them, from a concurrent caller's result or the short-lived result cache",
+    labelnames=["source"],
+)
+SINGLE_FLIGHT_TIME_SAVED_COUNTER = Counter(
+    "posthog_clickhouse_single_flight_time_saved_seconds",
+    "ClickHouse execution time saved by coalesced read queries",
+)
+
+RESULT_KEY_PREFIX = "ch_single_flight_result:"
+LOCK_KEY_PREFIX = "ch_single_flight_lock:"
+
+# Release the lock only if it's still held by this caller, it may have expired and been taken over
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def single_flight_execute(key: str, execute: Callable[[], Any]) -> Any:
+    """
+    Coalesces identical read queries across processes through redis.
+
+    The first caller for `key` executes the query and stores its result for `CLICKHOUSE_SINGLE_FLIGHT_RESULT_TTL_SECONDS`.
+    Concurrent callers wait for that result instead of executing the same query, as do callers within the TTL.
+    If anything goes wrong with coordinating through redis, the query is just executed.
+    """
+    try:
+        client = redis.get_client()
+        cached = _get_result(client, key)
+        if cached is not None:
+            return _coalesced(cached, "cache")
+
+        token = uuid.uuid4().hex
+        lock_timeout = settings.CLICKHOUSE_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS
+        is_owner = client.set(LOCK_KEY_PREFIX + key, token, nx=True, ex=lock_timeout)
+    except Exception as err:
+        logger.warn("clickhouse_single_flight_unavailable", error=err)
+        return execute()
+
+    if is_owner:
+        return _execute_as_owner(client, key, token, execute)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.CLICKHOUSE_SINGLE_FLIGHT_POLL_INTERVAL_SECONDS)
+        try:
+            cached = _get_result(client, key)
+            if cached is not None:
+                return _coalesced(cached, "wait")
+            if not client.exists(LOCK_KEY_PREFIX + key):
+                # The owner failed, or its result was too large to share
+                break
+        except Exception as err:
+            logger.warn("clickhouse_single_flight_unavailable", error=err)
+            break
+
+    return execute()
+
+
+def _execute_as_owner(client, key: str, token: str, execute: Callable[[], Any]) -> Any:
+    try:
+        # The previous owner may have stored its result and released the lock just before it was acquired
+        try:
+            cached = _get_result(client, key)
+        except Exception as err:
+            logger.warn("clickhouse_single_flight_unavailable", error=err)
+            cached = None
+        if cached is not None:
+            return _coalesced(cached, "cache")
+
+        SINGLE_FLIGHT_EXECUTED_COUNTER.inc()
+        start_time = perf_counter()
+        result = execute()
+        duration = perf_counter() - start_time
+
+        try:
+            payload = pickle.dumps((result, duration))
+            if len(payload) <= settings.CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES:
+                # Waiting callers need the result for at least one poll, even if caching is turned off
+                ttl = max(settings.CLICKHOUSE_SINGLE_FLIGHT_RESULT_TTL_SECONDS, 1)
+                client.set(RESULT_KEY_PREFIX + key, payload, ex=ttl)
+        except Exception as err:
+            logger.warn("clickhouse_single_flight_store_failed", error=err)
+
+        return result
+    finally:
+        try:
+            client.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY_PREFIX + key, token)
+        except Exception as err:
+            logger.warn("clickhouse_single_flight_release_failed", error=err)
+
+
+def _get_result(client, key: str) -> Optional[Tuple[Any, float]]:
+    payload = client.get(RESULT_KEY_PREFIX + key)
+    return pickle.loads(payload) if payload is not None else None
+
+
+def _coalesced(cached: Tuple[Any, float], source: str) -> Any:
+    result, duration = cached
+    SINGLE_FLIGHT_COALESCED_COUNTER.labels(source=source).inc()
+    SINGLE_FLIGHT_TIME_SAVED_COUNTER.inc(duration)
+    return result
@@ -1,6 +1,17 @@
+import threading
+from unittest.mock import MagicMock, patch
+
 import pytest
 
-from posthog.clickhouse.client.connection import Workload, get_pool, make_ch_pool, set_default_clickhouse_workload_type
+from posthog.clickhouse.client.connection import (
+    Workload,
+    get_pool,
+    get_send_receive_timeout,
+    make_ch_pool,
+    send_receive_timeout,
+    set_default_clickhouse_workload_type,
+    warm_up_pools,
+)
 
 
 def test_connection_pool_creation_without_offline_cluster(settings):
@@ -22,6 +33,8 @@ def test_connection_pool_creation_with_offline_cluster(settings):
 
     assert get_pool(Workload.OFFLINE) is offline_pool
     assert offline_pool is not online_pool
+    assert online_pool.name == "online"
+    assert offline_pool.name == "offline"
 
     set_default_clickhouse_workload_type(Workload.OFFLINE)
     assert get_pool(Workload.DEFAULT) is offline_pool
@@ -44,6 +57,68 @@ def test_connection_pool_creation_with_team_id(settings):
 
     assert online_pool.connection_args["host"] == "localhost"
     assert team_pool.connection_args["host"] == "clicky"
+    assert team_pool.name == "team_2"
+
+
+def test_connection_pool_creation_readonly_with_offline_cluster(settings):
+    settings.CLICKHOUSE_OFFLINE_CLUSTER_HOST = "ch-offline.example.com"
+    settings.READONLY_CLICKHOUSE_USER = "readonly"
+    settings.READONLY_CLICKHOUSE_PASSWORD = "password"
+
+    online_pool = get_pool(Workload.ONLINE, readonly=True)
+    offline_pool = get_pool(Workload.OFFLINE, readonly=True)
+
+    assert online_pool.connection_args["host"] == "localhost"
+    assert online_pool.connection_args["user"] == "readonly"
+    assert offline_pool.connection_args["host"] == "ch-offline.example.com"
+    assert offline_pool.connection_args["user"] == "readonly"
+    assert offline_pool.name == "offline_readonly"
+
+
+def test_warm_up_pools_does_not_block(settings):
+    settings.CLICKHOUSE_CONN_POOL_WARM_UP = True
+    warming_up = threading.Event()
+    release = threading.Event()
+
+    def warm_up(connections, deadline):
+        warming_up.set()
+        release.wait(5)
+
+    with patch("posthog.clickhouse.client.pool.InstrumentedChPool.warm_up", side_effect=warm_up):
+        warm_up_pools()
+        assert warming_up.wait(5)
+        release.set()
+
+
+@pytest.mark.parametrize(
+    "query,query_settings,expected",
+    [
+        ("SELECT 1", None, 120),
+        ("SELECT 1", {"max_execution_time": 30}, 120),
+        ("SELECT 1", {"max_execution_time": 600}, 660),
+        ("SELECT 1", {"max_execution_time": 0}, None),
+        ("ALTER TABLE events DELETE WHERE 1", {"mutations_sync": 2}, None),
+        ("/* async_migration:0001 */ optimize TABLE events FINAL", None, None),
+    ],
+)
+def test_get_send_receive_timeout(settings, query, query_settings, expected):
+    settings.CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS = 120
+
+    assert get_send_receive_timeout(query, query_settings) == expected
+
+
+def test_send_receive_timeout_is_restored(settings):
+    settings.CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS = 30
+    client = MagicMock()
+    client.connection.send_receive_timeout = 30
+    client.connection.connected = True
+
+    with send_receive_timeout(client, "SELECT 1", {"max_execution_time": 0}):
+        assert client.connection.send_receive_timeout is None
+        client.connection.socket.settimeout.assert_called_with(None)
+
+    assert client.connection.send_receive_timeout == 30
+    client.connection.socket.settimeout.assert_called_with(30)
 
 
 @pytest.fixture(autouse=True)
@@ -0,0 +1,139 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from prometheus_client import REGISTRY
+
+from posthog.clickhouse.client.pool import InstrumentedChPool, PoolAcquireTimeout
+
+
+def make_pool(name: str, connections_min=0, connections_max=1, acquire_timeout=0.05) -> InstrumentedChPool:
+    # Clients only connect when they're first used
+    return InstrumentedChPool(
+        name=name,
+        acquire_timeout=acquire_timeout,
+        ping_interval=0,
+        connections_min=connections_min,
+        connections_max=connections_max,
+        host="localhost",
+    )
+
+
+def sample(metric: str, pool: str) -> float:
+    return REGISTRY.get_sample_value(metric, {"pool": pool}) or 0
+
+
+def test_acquire_times_out_when_all_connections_stay_in_use():
+    pool = make_pool("test_acquire_timeout")
+    pool.pull()
+
+    start_time = time.perf_counter()
+    with pytest.raises(PoolAcquireTimeout):
+        pool.pull()
+
+    assert 0.05 <= time.perf_counter() - start_time < 1
+    assert sample("posthog_clickhouse_pool_acquire_timeouts_total", "test_acquire_timeout") == 1
+
+
+def test_acquire_waits_for_connection_to_be_returned():
+    pool = make_pool("test_acquire_wait", acquire_timeout=5)
+    client = pool.pull()
+
+    threading.Timer(0.05, lambda: pool.push(client)).start()
+    assert pool.pull() is not None
+
+    assert sample("posthog_clickhouse_pool_acquire_wait_seconds_count", "test_acquire_wait") == 2
+    assert sample("posthog_clickhouse_pool_acquire_wait_seconds_sum", "test_acquire_wait") >= 0.05
+    assert sample("posthog_clickhouse_pool_acquire_timeouts_total", "test_acquire_wait") == 0
+
+
+def test_reports_connections_in_use():
+    pool = make_pool("test_usage", connections_min=2, connections_max=3)
+    assert sample("posthog_clickhouse_pool_connections_idle", "test_usage") == 2
+    assert sample("posthog_clickhouse_pool_connections_in_use", "test_usage") == 0
+
+    clients = [pool.pull() for _ in range(3)]
+    assert sample("posthog_clickhouse_pool_connections_idle", "test_usage") == 0
+    assert sample("posthog_clickhouse_pool_connections_in_use", "test_usage") == 3
+    assert sample("posthog_clickhouse_pool_connection_age_seconds_count", "test_usage") == 3
+
+    pool.push(clients[0])
+    assert sample("posthog_clickhouse_pool_connections_in_use", "test_usage") == 2
+
+
+def test_ping_reopens_broken_connections():
+    pool = make_pool("test_ping", connections_min=2, connections_max=2)
+    broken, healthy = pool._pool
+    broken.connection = MagicMock(connected=True, ping=MagicMock(return_value=False))
+    healthy.connection = MagicMock(connected=True, ping=MagicMock(return_value=True))
+
+    pool.ping_idle_clients()
+
+    assert broken.connection.connect.call_count == 1
+    assert healthy.connection.connect.call_count == 0
+    assert pool._pool == [broken, healthy]
+    assert sample("posthog_clickhouse_pool_broken_connections_total", "test_ping") == 1
+
+
+def test_warm_up_opens_idle_connections():
+    pool = make_pool("test_warm_up", connections_min=2, connections_max=2)
+    working, failing = pool._pool
+    working.connection = MagicMock()
+    failing.connection = MagicMock(force_connect=MagicMock(side_effect=ConnectionError("unreachable")))
+
+    pool.warm_up()
+
+    assert working.connection.force_connect.call_count == 1
+    # Connections that can't be opened are dropped, and replaced when needed
+    assert pool._pool == [working]
+    assert pool.pull() is working
+    assert pool.pull() is not failing
+
+
+def test_checked_connection_counts_as_in_use():
+    pool = make_pool("test_check_in_use", connections_min=2, connections_max=2)
+    first, second = pool._pool
+    checking = threading.Event()
+    release = threading.Event()
+
+    def force_connect():
+        checking.set()
+        release.wait(5)
+
+    first.connection = MagicMock(force_connect=MagicMock(side_effect=force_connect))
+    second.connection = MagicMock()
+    warm_up = threading.Thread(target=pool.warm_up)
+    warm_up.start()
+    assert checking.wait(5)
+
+    # Only the connection being checked is out of the pool
+    assert pool._pool == [second]
+    assert list(pool._used.values()) == [first]
+    assert sample("posthog_clickhouse_pool_connections_in_use", "test_check_in_use") == 1
+    assert pool.pull() is second
+
+    release.set()
+    warm_up.join(5)
+    assert pool._pool == [first]
+
+
+def test_warm_up_opens_limited_connections():
+    pool = make_pool("test_warm_up_limited", connections_min=3, connections_max=3)
+    for client in pool._pool:
+        client.connection = MagicMock()
+
+    pool.warm_up(connections=2)
+
+    assert [client.connection.force_connect.call_count for client in pool._pool] == [0, 1, 1]
+    assert len(pool._used) == 0
+
+
+def test_warm_up_stops_at_deadline():
+    pool = make_pool("test_warm_up_deadline", connections_min=2, connections_max=2)
+    for client in pool._pool:
+        client.connection = MagicMock()
+
+    pool.warm_up(deadline=time.perf_counter())
+
+    assert [client.connection.force_connect.call_count for client in pool._pool] == [0, 0]
@@ -0,0 +1,132 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from posthog.clickhouse.client.connection import Workload
+from posthog.clickhouse.client.execute import sync_execute
+from posthog.clickhouse.client.query_cost import (
+    QUERY_RATES_CACHE_KEY,
+    QueryCost,
+    get_predicted_query_cost,
+    get_query_rates,
+    get_team_query_rates,
+    predict_query_cost,
+    tag_predicted_query_cost,
+    update_query_rates,
+)
+from posthog.clickhouse.query_tagging import get_query_tag_value, reset_query_tags
+from posthog.test.base import BaseTest
+
+DATE_FROM = datetime(2023, 5, 1, tzinfo=ZoneInfo("UTC"))
+DATE_TO = datetime(2023, 5, 11, tzinfo=ZoneInfo("UTC"))
+
+
+@override_settings(
+    QUERY_COST_ROUTING_ENABLED=True,
+    QUERY_COST_OFFLINE_THRESHOLD_MS=10_000,
+    QUERY_COST_MAX_EXECUTION_TIME_SECONDS=600,
+    QUERY_COST_MAX_THREADS=16,
+    QUERY_COST_MAX_MEMORY_USAGE=50_000_000_000,
+)
+@patch("posthog.queries.adaptive_sampling.get_team_daily_event_count", return_value=1_000_000)
+@patch("posthog.clickhouse.client.query_cost.get_team_query_rates", return_value={})
+@patch("posthog.clickhouse.client.query_cost.get_query_rates", return_value={"Trends": (0.002, 10.0, 1000)})
+class TestQueryCost(BaseTest):
+    def tearDown(self):
+        reset_query_tags()
+        super().tearDown()
+
+    def test_predicts_from_rates_of_all_teams(self, *args):
+        self.assertEqual(
+            predict_query_cost(self.team, "Trends", DATE_FROM, DATE_TO),
+            QueryCost(rows=10_000_000, duration_ms=20_000, memory_bytes=100_000_000),
+        )
+        self.assertIsNone(predict_query_cost(self.team, "Funnel", DATE_FROM, DATE_TO))
+
+    def test_predicts_from_rates_of_the_team_if_it_ran_enough_queries(self, _query_rates, team_query_rates, *args):
+        team_query_rates.return_value = {"Trends": (0.0001, 10.0, 5)}
+        self.assertEqual(predict_query_cost(self.team, "Trends", DATE_FROM, DATE_TO).duration_ms, 20_000)
+
+        team_query_rates.return_value = {"Trends": (0.0001, 10.0, 50)}
+        self.assertEqual(predict_query_cost(self.team, "Trends", DATE_FROM, DATE_TO).duration_ms, 1_000)
+
+    def test_limits(self, *args):
+        self.assertFalse(QueryCost(rows=1_000, duration_ms=10, memory_bytes=1_000).is_expensive)
+        self.assertEqual(
+            QueryCost(rows=1_000, duration_ms=10, memory_bytes=1_000).limits(),
+            {"max_execution_time": 60, "max_threads": 1, "max_memory_usage": 1_000_000_000},
+        )
+
+        self.assertTrue(QueryCost(rows=55_000_000, duration_ms=20_000, memory_bytes=2_000_000_000).is_expensive)
+        self.assertEqual(
+            QueryCost(rows=55_000_000, duration_ms=20_000, memory_bytes=2_000_000_000).limits(),
+            {"max_execution_time": 200, "max_threads": 6, "max_memory_usage": 20_000_000_000},
+        )
+
+        self.assertEqual(
+            QueryCost(rows=10_000_000_000, duration_ms=3_600_000, memory_bytes=100_000_000_000).limits(),
+            {"max_execution_time": 600, "max_threads": 16, "max_memory_usage": 50_000_000_000},
+        )
+
+    def test_tags_queries_with_prediction(self, *args):
+        with tag_predicted_query_cost(self.team, "Trends", DATE_FROM, DATE_TO):
+            self.assertEqual(
+                get_predicted_query_cost(), QueryCost(rows=10_000_000, duration_ms=20_000, memory_bytes=100_000_000)
+            )
+
+            # Queries without a prediction of their own aren't routed like the ones around them
+            with tag_predicted_query_cost(self.team, "Funnel", DATE_FROM, DATE_TO):
+                self.assertIsNone(get_predicted_query_cost())
+
+            self.assertIsNotNone(get_predicted_query_cost())
+
+        # Later queries aren't routed like the ones of the prediction
+        self.assertIsNone(get_query_tag_value("predicted_query_cost"))
+
+        with self.settings(QUERY_COST_ROUTING_ENABLED=False):
+            with tag_predicted_query_cost(self.team, "Trends", DATE_FROM, DATE_TO):
+                self.assertIsNone(get_query_tag_value("predicted_query_cost"))
+
+    def test_expensive_queries_run_offline_with_limits(self, *args):
+        with tag_predicted_query_cost(self.team, "Trends", DATE_FROM, DATE_TO), patch(
+            "posthog.clickhouse.client.execute.get_pool"
+        ) as get_pool:
+            client = MagicMock()
+            client.execute.return_value = [(1,)]
+            get_pool.return_value.get_client.return_value.__enter__.return_value = client
+            sync_execute("SELECT 1", workload=Workload.ONLINE, settings={"max_threads": 2})
+
+        self.assertEqual(get_pool.call_args.args[0], Workload.OFFLINE)
+        settings = client.execute.call_args.kwargs["settings"]
+        self.assertEqual(settings["max_execution_time"], 200)
+        # Settings of the query itself take precedence
+        self.assertEqual(settings["max_threads"], 2)
+        self.assertEqual(settings["max_memory_usage"], 1_000_000_000)
+
+
+@override_settings(QUERY_COST_LOOKBACK_HOURS=24)
+class TestQueryRates(BaseTest):
+    def tearDown(self):
+        cache.delete_many([QUERY_RATES_CACHE_KEY, f"{QUERY_RATES_CACHE_KEY}:1", f"{QUERY_RATES_CACHE_KEY}:2"])
+        super().tearDown()
+
+    def test_rates_are_only_learnt_in_the_background(self):
+        with patch("posthog.client.sync_execute") as sync_execute:
+            self.assertEqual(get_query_rates(), {})
+            self.assertEqual(get_team_query_rates(1), {})
+            sync_execute.assert_not_called()
+
+            sync_execute.return_value = [
+                (1, "Trends", 1_000, 10_000, 1_000, 4),
+                (2, "Trends", 3_000, 10_000, 1_000, 6),
+                (2, "Funnel", 500, 2_000, 100, 1),
+            ]
+            update_query_rates()
+
+        self.assertEqual(get_query_rates(), {"Trends": (2.0, 10.0, 10), "Funnel": (5.0, 20.0, 1)})
+        self.assertEqual(get_team_query_rates(1), {"Trends": (1.0, 10.0, 4)})
+        self.assertEqual(get_team_query_rates(2), {"Trends": (3.0, 10.0, 6), "Funnel": (5.0, 20.0, 1)})
+        self.assertEqual(get_team_query_rates(3), {})
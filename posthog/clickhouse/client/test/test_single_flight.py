@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from posthog import redis
+from posthog.clickhouse.client.execute import sync_execute
+from posthog.clickhouse.client.single_flight import LOCK_KEY_PREFIX, single_flight_execute
+
+
+@pytest.fixture(autouse=True)
+def single_flight_settings(settings):
+    settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED = True
+    settings.CLICKHOUSE_SINGLE_FLIGHT_RESULT_TTL_SECONDS = 5
+    settings.CLICKHOUSE_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS = 5
+    settings.CLICKHOUSE_SINGLE_FLIGHT_POLL_INTERVAL_SECONDS = 0.01
+    settings.CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES = 1024
+    redis.get_client().flushdb()
+    yield
+    redis.get_client().flushdb()
+
+
+def test_result_is_reused_within_ttl():
+    execute = MagicMock(return_value=[(1, "a")])
+
+    assert single_flight_execute("key", execute) == [(1, "a")]
+    assert single_flight_execute("key", execute) == [(1, "a")]
+    assert single_flight_execute("other_key", execute) == [(1, "a")]
+
+    assert execute.call_count == 2
+
+
+def test_concurrent_callers_wait_for_the_first_caller():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_execute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return [(42,)]
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(single_flight_execute("key", slow_execute)))
+    owner.start()
+    started.wait(5)
+
+    waiters = [
+        threading.Thread(target=lambda: results.append(single_flight_execute("key", slow_execute))) for _ in range(3)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    release.set()
+    for thread in [owner, *waiters]:
+        thread.join(5)
+
+    assert results == [[(42,)]] * 4
+    assert len(calls) == 1
+
+
+def test_failed_execution_releases_the_lock():
+    with pytest.raises(ValueError):
+        single_flight_execute("key", MagicMock(side_effect=ValueError("query failed")))
+
+    assert not redis.get_client().exists(LOCK_KEY_PREFIX + "key")
+    assert single_flight_execute("key", MagicMock(return_value=[(1,)])) == [(1,)]
+
+
+def test_large_results_are_not_shared():
+    execute = MagicMock(return_value=[("x" * 2048,)])
+
+    single_flight_execute("key", execute)
+    single_flight_execute("key", execute)
+
+    assert execute.call_count == 2
+
+
+def test_executes_when_redis_is_unavailable():
+    execute = MagicMock(return_value=[(1,)])
+
+    with patch("posthog.clickhouse.client.single_flight.redis.get_client", side_effect=ConnectionError):
+        assert single_flight_execute("key", execute) == [(1,)]
+        assert single_flight_execute("key", execute) == [(1,)]
+
+    assert execute.call_count == 2
+
+
+@patch("posthog.clickhouse.client.execute._execute", return_value=[(1,)])
+def test_sync_execute_coalesces_identical_reads(patched_execute, settings):
+    sync_execute("SELECT %(value)s", {"value": 1}, flush=False, team_id=1)
+    sync_execute("SELECT %(value)s", {"value": 1}, flush=False, team_id=1)
+    assert patched_execute.call_count == 1
+
+    sync_execute("SELECT %(value)s", {"value": 1}, flush=False, team_id=2)
+    assert patched_execute.call_count == 2
+
+    sync_execute("INSERT INTO events VALUES", [(1,)], flush=False)
+    sync_execute("INSERT INTO events VALUES", [(1,)], flush=False)
+    assert patched_execute.call_count == 4
+
+    settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED = False
+    sync_execute("SELECT %(value)s", {"value": 1}, flush=False, team_id=1)
+    assert patched_execute.call_count == 5
+
+
+@patch("posthog.clickhouse.client.execute.query_key")
+@patch("posthog.clickhouse.client.execute._execute", return_value=[(1,)])
+def test_sync_execute_does_not_key_queries_when_results_are_not_shared(patched_execute, query_key, settings):
+    settings.CLICKHOUSE_SINGLE_FLIGHT_ENABLED = False
+    sync_execute("SELECT %(value)s", {"value": 1}, flush=False, team_id=1)
+
+    assert patched_execute.call_count == 1
+    assert query_key.call_count == 0
@@ -0,0 +1,6 @@
+from posthog.clickhouse.client.migration_tools import run_sql_with_exceptions
+from posthog.clickhouse.usage_report_daily_counters import USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL
+
+operations = [
+    run_sql_with_exceptions(USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL()),
+]
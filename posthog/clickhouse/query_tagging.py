@@ -1,6 +1,7 @@
 # This module is responsible for adding tags/metadata to outgoing clickhouse queries in a thread-safe manner
 
 import threading
+from contextlib import contextmanager
 from typing import Any, Optional
 
 thread_local_storage = threading.local()
@@ -32,6 +33,24 @@ def reset_query_tags():
     thread_local_storage.query_tags = {}
 
 
+@contextmanager
+def tags_context(**kwargs):
+    """
+    Tags the queries run within the context only. Tags with the same keys from before the context are restored after
+    it, other tags set within it are kept.
+    """
+    previous_tags = get_query_tags()
+    previous = {key: previous_tags[key] for key in kwargs if key in previous_tags}
+    tag_queries(**kwargs)
+    try:
+        yield
+    finally:
+        tags = get_query_tags()
+        for key in kwargs:
+            tags.pop(key, None)
+        tags.update(previous)
+
+
 class QueryCounter:
     def __init__(self):
         self.total_query_time = 0.0
@@ -3,6 +3,7 @@ import re
 
 from posthog.clickhouse.dead_letter_queue import *
 from posthog.clickhouse.plugin_log_entries import *
+from posthog.clickhouse.usage_report_daily_counters import USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL
 from posthog.models.app_metrics.sql import *
 from posthog.models.cohort.sql import *
 from posthog.models.event.sql import *
@@ -33,6 +34,9 @@ from posthog.models.session_replay_event.sql import (
     DISTRIBUTED_SESSION_REPLAY_EVENTS_TABLE_SQL,
     SESSION_REPLAY_EVENTS_TABLE_SQL,
     SESSION_REPLAY_EVENTS_TABLE_MV_SQL,
+    SESSION_REPLAY_SUMMARIES_TABLE_SQL,
+    WRITABLE_SESSION_REPLAY_SUMMARIES_TABLE_SQL,
+    DISTRIBUTED_SESSION_REPLAY_SUMMARIES_TABLE_SQL,
 )
 
 CREATE_MERGETREE_TABLE_QUERIES = (
@@ -51,6 +55,8 @@ CREATE_MERGETREE_TABLE_QUERIES = (
     APP_METRICS_DATA_TABLE_SQL,
     PERFORMANCE_EVENTS_TABLE_SQL,
     SESSION_REPLAY_EVENTS_TABLE_SQL,
+    SESSION_REPLAY_SUMMARIES_TABLE_SQL,
+    USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL,
 )
 CREATE_DISTRIBUTED_TABLE_QUERIES = (
     WRITABLE_EVENTS_TABLE_SQL,
@@ -62,6 +68,8 @@ CREATE_DISTRIBUTED_TABLE_QUERIES = (
     WRITABLE_PERFORMANCE_EVENTS_TABLE_SQL,
     DISTRIBUTED_PERFORMANCE_EVENTS_TABLE_SQL,
     DISTRIBUTED_SESSION_REPLAY_EVENTS_TABLE_SQL,
+    WRITABLE_SESSION_REPLAY_SUMMARIES_TABLE_SQL,
+    DISTRIBUTED_SESSION_REPLAY_SUMMARIES_TABLE_SQL,
 )
 CREATE_KAFKA_TABLE_QUERIES = (
     KAFKA_DEAD_LETTER_QUEUE_TABLE_SQL,
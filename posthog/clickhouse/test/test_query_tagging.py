@@ -0,0 +1,31 @@
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries, tags_context
+from posthog.test.base import BaseTest
+
+
+class TestQueryTagging(BaseTest):
+    def setUp(self):
+        super().setUp()
+        reset_query_tags()
+
+    def tearDown(self):
+        reset_query_tags()
+        super().tearDown()
+
+    def test_tags_context_only_tags_queries_within_it(self):
+        tag_queries(kind="request", id="1")
+
+        with tags_context(id="2", property_accesses=[]):
+            self.assertEqual(get_query_tags(), {"kind": "request", "id": "2", "property_accesses": []})
+            tag_queries(query_type="hogql_query")
+
+        # Tags set within the context aren't undone
+        self.assertEqual(get_query_tags(), {"kind": "request", "id": "1", "query_type": "hogql_query"})
+
+    def test_tags_context_restores_tags_on_error(self):
+        try:
+            with tags_context(property_accesses=[]):
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(get_query_tags(), {})
@@ -0,0 +1,94 @@
+from posthog.clickhouse.table_engines import ReplacingMergeTree
+from posthog.settings import CLICKHOUSE_CLUSTER
+
+USAGE_REPORT_DAILY_COUNTERS_TABLE = "usage_report_daily_counters"
+
+# Per-team usage counters by day, see posthog/tasks/usage_report_daily_counters.py
+USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL = lambda: """
+CREATE TABLE IF NOT EXISTS {table_name} ON CLUSTER '{cluster}'
+(
+    date Date,
+    metric LowCardinality(String),
+    team_id Int64,
+    value Int64,
+    -- days are recomputed to pick up late events, the latest computation wins
+    computed_at DateTime64(6, 'UTC')
+) ENGINE = {engine}
+PARTITION BY toYYYYMM(date)
+ORDER BY (metric, date, team_id)
+""".format(
+    table_name=USAGE_REPORT_DAILY_COUNTERS_TABLE,
+    cluster=CLICKHOUSE_CLUSTER,
+    engine=ReplacingMergeTree(USAGE_REPORT_DAILY_COUNTERS_TABLE, ver="computed_at"),
+)
+
+TRUNCATE_USAGE_REPORT_DAILY_COUNTERS_TABLE_SQL = (
+    f"TRUNCATE TABLE IF EXISTS {USAGE_REPORT_DAILY_COUNTERS_TABLE} ON CLUSTER '{CLICKHOUSE_CLUSTER}'"
+)
+
+INSERT_DAILY_EVENT_COUNT_SQL = """
+INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at)
+SELECT toDate(timestamp) as date, %(metric)s, team_id, count(1), now64(6, 'UTC')
+FROM events
+WHERE timestamp >= %(begin)s AND timestamp < %(end)s {event_filter}
+GROUP BY date, team_id
+"""
+
+# Events are sampled by distinct id, so the error of sampled counts depends on how many distinct ids events are spread
+# across. Distinct ids with uneven numbers of events count as fewer equally active ones: (sum of events) ^ 2 / sum of
+# events ^ 2 of each distinct id, see posthog/queries/adaptive_sampling.py
+INSERT_DAILY_EFFECTIVE_DISTINCT_ID_COUNT_SQL = """
+INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at)
+SELECT date, %(metric)s, team_id, toInt64(round(pow(sum(events), 2) / sum(events * events))), now64(6, 'UTC')
+FROM (
+    SELECT toDate(timestamp) as date, team_id, distinct_id, count(1) as events
+    FROM events
+    WHERE timestamp >= %(begin)s AND timestamp < %(end)s
+    GROUP BY date, team_id, distinct_id
+)
+GROUP BY date, team_id
+"""
+
+# Recordings are counted on the day they started, rows of a session can start up to a day before it
+INSERT_DAILY_RECORDING_COUNT_SQL = """
+INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at)
+SELECT toDate(start_time) as date, %(metric)s, team_id, count(1), now64(6, 'UTC')
+FROM (
+    SELECT team_id, session_id, min(min_first_timestamp) as start_time
+    FROM session_replay_events
+    WHERE min_first_timestamp >= %(rows_from)s AND min_first_timestamp < %(end)s
+    GROUP BY team_id, session_id
+    HAVING start_time >= %(begin)s
+)
+GROUP BY date, team_id
+"""
+
+INSERT_DAILY_FEATURE_FLAG_REQUESTS_COUNT_SQL = """
+INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at)
+SELECT toDate(timestamp) as date, %(metric)s, toInt64OrZero(distinct_id) as team, sum(JSONExtractInt(properties, 'count')), now64(6, 'UTC')
+FROM events
+WHERE team_id = %(team_to_query)s AND event=%(target_event)s AND timestamp >= %(begin)s AND timestamp < %(end)s
+AND has([%(validity_token)s], replaceRegexpAll(JSONExtractRaw(properties, 'token'), '^"|"$', ''))
+GROUP BY date, team
+"""
+
+# Days are marked as computed with a row for team 0, since days without usage have no rows
+SELECT_DAILY_COUNTERS_COMPUTED_THROUGH_SQL = """
+SELECT metric, max(date)
+FROM usage_report_daily_counters
+WHERE team_id = 0
+GROUP BY metric
+"""
+
+SELECT_DAILY_COUNTERS_SUM_SQL = """
+SELECT team_id, sum(value) as count
+FROM usage_report_daily_counters FINAL
+WHERE metric = %(metric)s AND team_id != 0 AND date >= %(begin)s AND date <= %(end)s
+GROUP BY team_id
+"""
+
+SELECT_TEAM_DAILY_COUNTER_AVERAGE_SQL = """
+SELECT sum(value) / %(days)s
+FROM usage_report_daily_counters FINAL
+WHERE metric = %(metric)s AND team_id = %(team_id)s AND date >= today() - %(days)s AND date < today()
+"""
@@ -196,6 +196,10 @@ AGGREGATION_GROUP_TYPE_INDEX = "aggregation_group_type_index"
 BREAKDOWN_HISTOGRAM_BIN_COUNT = "breakdown_histogram_bin_count"
 BREAKDOWN_NORMALIZE_URL = "breakdown_normalize_url"
 SAMPLING_FACTOR = "sampling_factor"
+# Sampling factor asking for the factor to be chosen from the number of events the query reads
+ADAPTIVE_SAMPLING = "auto"
+# The sampling factor chosen for a filter with adaptive sampling, when its insight is calculated
+ADAPTIVE_SAMPLING_FACTOR = "adaptive_sampling_factor"
 
 
 BREAKDOWN_TYPES = Literal["event", "person", "cohort", "group", "session", "hogql"]
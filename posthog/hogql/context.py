@@ -17,6 +17,14 @@ class HogQLFieldAccess:
     sql: str
 
 
+@dataclass
+class HogQLPropertyAccess:
+    table: str
+    field: str
+    property: str
+    materialized_column: Optional[str]
+
+
 @dataclass
 class HogQLContext:
     """Context given to a HogQL expression printer"""
@@ -44,6 +52,8 @@ class HogQLContext:
     notices: List["HogQLNotice"] = field(default_factory=list)
     # Timings in seconds for different parts of the HogQL query
     timings: HogQLTimings = field(default_factory=HogQLTimings)
+    # Properties read by the printed query, and the materialized columns they were read from
+    property_accesses: List[HogQLPropertyAccess] = field(default_factory=list)
 
     def add_value(self, value: Any) -> str:
         key = f"hogql_val_{len(self.values)}"
@@ -0,0 +1,67 @@
+from typing import Dict, List, Tuple, cast
+
+from posthog.client import sync_execute
+from posthog.clickhouse.client.connection import Workload
+from posthog.hogql.query import prepare_hogql_query
+from posthog.hogql.timings import HogQLTimings
+from posthog.models.team import Team
+from posthog.schema import HogQLExplain, HogQLExplainProperty, HogQLExplainResponse, HogQLExplainTable
+
+
+def explain_hogql_query(query: HogQLExplain, team: Team) -> HogQLExplainResponse:
+    """
+    Prints a HogQL query and asks ClickHouse how it would run it, without running it.
+
+    Only estimates of what the query reads are reported for its tables, as those are limited to the team's data by
+    the query's filters. Sizes of whole tables would describe the data of other teams too.
+    """
+    timings = HogQLTimings()
+    hogql_response, clickhouse_context = prepare_hogql_query(
+        query=query.query, team=team, filters=query.filters, timings=timings
+    )
+    clickhouse_sql = cast(str, hogql_response.clickhouse)
+
+    def explain(explain_sql: str) -> List[tuple]:
+        return sync_execute(
+            f"{explain_sql} {clickhouse_sql}",
+            clickhouse_context.values,
+            workload=Workload.ONLINE,
+            team_id=team.pk,
+            readonly=True,
+        )
+
+    with timings.measure("explain_indexes"):
+        indexes = [row[0] for row in explain("EXPLAIN indexes = 1")]
+    with timings.measure("explain_pipeline"):
+        pipeline = [row[0] for row in explain("EXPLAIN PIPELINE")]
+    with timings.measure("explain_estimate"):
+        estimates = explain("EXPLAIN ESTIMATE")
+
+    # (parts, rows, marks) ClickHouse expects to read from each table
+    estimated_reads: Dict[str, Tuple[int, int, int]] = {}
+    for _database, table, parts, rows, marks in estimates:
+        estimated_parts, estimated_rows, estimated_marks = estimated_reads.get(table, (0, 0, 0))
+        estimated_reads[table] = (estimated_parts + parts, estimated_rows + rows, estimated_marks + marks)
+    tables = [
+        HogQLExplainTable(table=table, estimatedParts=parts, estimatedRows=rows, estimatedMarks=marks)
+        for table, (parts, rows, marks) in sorted(estimated_reads.items())
+    ]
+
+    return HogQLExplainResponse(
+        query=query.query,
+        hogql=hogql_response.hogql,
+        clickhouse=clickhouse_sql,
+        indexes=indexes,
+        pipeline=pipeline,
+        properties=[
+            HogQLExplainProperty(
+                table=access.table,
+                field=access.field,
+                property=access.property,
+                materializedColumn=access.materialized_column,
+            )
+            for access in clickhouse_context.property_accesses
+        ],
+        tables=tables,
+        timings=timings.to_list(),
+    )
@@ -2,6 +2,7 @@ from typing import Dict, List, Literal, Optional, cast
 
 from antlr4 import CommonTokenStream, InputStream, ParseTreeVisitor, ParserRuleContext
 from antlr4.error.ErrorListener import ErrorListener
+from django.conf import settings
 
 from posthog.hogql import ast
 from posthog.hogql.base import AST
@@ -11,6 +12,7 @@ from posthog.hogql.grammar.HogQLLexer import HogQLLexer
 from posthog.hogql.grammar.HogQLParser import HogQLParser
 from posthog.hogql.parse_string import parse_string, parse_string_literal
 from posthog.hogql.placeholders import replace_placeholders
+from posthog.hogql.pratt_parser import HogQLPrattParser
 from posthog.hogql.timings import HogQLTimings
 
 
@@ -23,8 +25,11 @@ def parse_expr(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure("parse_expr"):
-        parse_tree = get_parser(expr).expr()
-        node = HogQLParseTreeConverter(start=start).visit(parse_tree)
+        if settings.HOGQL_PRATT_PARSER_ENABLED:
+            node = HogQLPrattParser(expr, locations=start is not None).expr()
+        else:
+            parse_tree = get_parser(expr).expr()
+            node = HogQLParseTreeConverter(start=start).visit(parse_tree)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 return replace_placeholders(node, placeholders)
@@ -37,8 +42,11 @@ def parse_order_expr(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure("parse_order_expr"):
-        parse_tree = get_parser(order_expr).orderExpr()
-        node = HogQLParseTreeConverter().visit(parse_tree)
+        if settings.HOGQL_PRATT_PARSER_ENABLED:
+            node = HogQLPrattParser(order_expr).order_expr()
+        else:
+            parse_tree = get_parser(order_expr).orderExpr()
+            node = HogQLParseTreeConverter().visit(parse_tree)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 return replace_placeholders(node, placeholders)
@@ -51,8 +59,11 @@ def parse_select(
     if timings is None:
         timings = HogQLTimings()
     with timings.measure("parse_select"):
-        parse_tree = get_parser(statement).select()
-        node = HogQLParseTreeConverter().visit(parse_tree)
+        if settings.HOGQL_PRATT_PARSER_ENABLED:
+            node = HogQLPrattParser(statement).select()
+        else:
+            parse_tree = get_parser(statement).select()
+            node = HogQLParseTreeConverter().visit(parse_tree)
         if placeholders:
             with timings.measure("replace_placeholders"):
                 node = replace_placeholders(node, placeholders)
@@ -0,0 +1,1281 @@
+"""
+A hand-written HogQL parser, producing the same AST as the ANTLR parser and HogQLParseTreeConverter in parser.py,
+without building a parse tree first. Used instead of it when HOGQL_PRATT_PARSER_ENABLED is set.
+
+Expressions are parsed by precedence climbing (a Pratt parser), everything else by recursive descent, both following
+HogQLParser.g4 rule by rule. Nodes and errors get the same start and end positions as with ANTLR, only the messages
+of syntax errors are worded differently.
+"""
+import re
+from typing import Callable, Dict, List, Literal, NoReturn, Optional, Tuple, cast
+
+from posthog.hogql import ast
+from posthog.hogql.constants import RESERVED_KEYWORDS
+from posthog.hogql.errors import HogQLException, NotImplementedException, SyntaxException
+from posthog.hogql.parse_string import parse_string
+
+# Keywords of HogQLLexer.g4, case insensitive, mapped to the token they are lexed as
+KEYWORDS: Dict[str, str] = {
+    **{
+        keyword: keyword
+        for keyword in (
+            "ADD",
+            "AFTER",
+            "ALIAS",
+            "ALL",
+            "ALTER",
+            "AND",
+            "ANTI",
+            "ANY",
+            "ARRAY",
+            "AS",
+            "ASCENDING",
+            "ASOF",
+            "AST",
+            "ASYNC",
+            "ATTACH",
+            "BETWEEN",
+            "BOTH",
+            "BY",
+            "CASE",
+            "CAST",
+            "CHECK",
+            "CLEAR",
+            "CLUSTER",
+            "CODEC",
+            "COHORT",
+            "COLLATE",
+            "COLUMN",
+            "COMMENT",
+            "CONSTRAINT",
+            "CREATE",
+            "CROSS",
+            "CUBE",
+            "CURRENT",
+            "DATABASE",
+            "DATABASES",
+            "DATE",
+            "DAY",
+            "DEDUPLICATE",
+            "DEFAULT",
+            "DELAY",
+            "DELETE",
+            "DESC",
+            "DESCENDING",
+            "DESCRIBE",
+            "DETACH",
+            "DICTIONARIES",
+            "DICTIONARY",
+            "DISK",
+            "DISTINCT",
+            "DISTRIBUTED",
+            "DROP",
+            "ELSE",
+            "END",
+            "ENGINE",
+            "EVENTS",
+            "EXISTS",
+            "EXPLAIN",
+            "EXPRESSION",
+            "EXTRACT",
+            "FETCHES",
+            "FINAL",
+            "FIRST",
+            "FLUSH",
+            "FOLLOWING",
+            "FOR",
+            "FORMAT",
+            "FREEZE",
+            "FROM",
+            "FULL",
+            "FUNCTION",
+            "GLOBAL",
+            "GRANULARITY",
+            "GROUP",
+            "HAVING",
+            "HIERARCHICAL",
+            "HOUR",
+            "ID",
+            "IF",
+            "ILIKE",
+            "IN",
+            "INDEX",
+            "INF",
+            "INJECTIVE",
+            "INNER",
+            "INSERT",
+            "INTERVAL",
+            "INTO",
+            "IS",
+            "IS_OBJECT_ID",
+            "JOIN",
+            "KEY",
+            "KILL",
+            "LAST",
+            "LAYOUT",
+            "LEADING",
+            "LEFT",
+            "LIFETIME",
+            "LIKE",
+            "LIMIT",
+            "LIVE",
+            "LOCAL",
+            "LOGS",
+            "MATERIALIZE",
+            "MATERIALIZED",
+            "MAX",
+            "MERGES",
+            "MIN",
+            "MINUTE",
+            "MODIFY",
+            "MONTH",
+            "MOVE",
+            "MUTATION",
+            "NAN",
+            "NO",
+            "NOT",
+            "NULL",
+            "NULLS",
+            "OFFSET",
+            "ON",
+            "OPTIMIZE",
+            "OR",
+            "ORDER",
+            "OUTER",
+            "OUTFILE",
+            "OVER",
+            "PARTITION",
+            "POPULATE",
+            "PRECEDING",
+            "PREWHERE",
+            "PRIMARY",
+            "PROJECTION",
+            "QUARTER",
+            "RANGE",
+            "RELOAD",
+            "REMOVE",
+            "RENAME",
+            "REPLACE",
+            "REPLICA",
+            "REPLICATED",
+            "RIGHT",
+            "ROLLUP",
+            "ROW",
+            "ROWS",
+            "SAMPLE",
+            "SECOND",
+            "SELECT",
+            "SEMI",
+            "SENDS",
+            "SET",
+            "SETTINGS",
+            "SHOW",
+            "SOURCE",
+            "START",
+            "STOP",
+            "SUBSTRING",
+            "SYNC",
+            "SYNTAX",
+            "SYSTEM",
+            "TABLE",
+            "TABLES",
+            "TEMPORARY",
+            "TEST",
+            "THEN",
+            "TIES",
+            "TIMEOUT",
+            "TIMESTAMP",
+            "TO",
+            "TOP",
+            "TOTALS",
+            "TRAILING",
+            "TRIM",
+            "TRUNCATE",
+            "TTL",
+            "TYPE",
+            "UNBOUNDED",
+            "UNION",
+            "UPDATE",
+            "USE",
+            "USING",
+            "UUID",
+            "VALUES",
+            "VIEW",
+            "VOLUME",
+            "WATCH",
+            "WEEK",
+            "WHEN",
+            "WHERE",
+            "WINDOW",
+            "WITH",
+            "YEAR",
+        )
+    },
+    "ASC": "ASCENDING",
+    "INFINITY": "INF",
+    "YYYY": "YEAR",
+}
+
+# Tokens the "identifier" rule accepts, i.e. all keywords except these
+IDENTIFIER_TOKENS = frozenset(
+    ["IDENTIFIER", "JSON_TRUE", "JSON_FALSE"]
+    + [keyword for keyword in KEYWORDS.values() if keyword not in ("ADD", "COHORT", "PROJECTION", "INF", "NAN", "NULL")]
+)
+# Tokens the "alias" rule accepts, for aliases without AS
+ALIAS_TOKENS = frozenset(["IDENTIFIER", "DATE", "FIRST", "ID", "KEY"])
+NUMBER_TOKENS = frozenset(["DECIMAL", "FLOATING", "HEXADECIMAL", "INF", "NAN"])
+
+INTERVAL_FUNCTIONS = {
+    "SECOND": "toIntervalSecond",
+    "MINUTE": "toIntervalMinute",
+    "HOUR": "toIntervalHour",
+    "DAY": "toIntervalDay",
+    "WEEK": "toIntervalWeek",
+    "MONTH": "toIntervalMonth",
+    "QUARTER": "toIntervalQuarter",
+    "YEAR": "toIntervalYear",
+}
+JOIN_OP_TOKENS = frozenset(["ALL", "ANY", "ASOF", "INNER", "LEFT", "RIGHT", "OUTER", "SEMI", "ANTI", "FULL"])
+
+# Binding power of the columnExpr operators, from the loosest to the tightest, in the order of HogQLParser.g4
+ALIAS = 1
+TERNARY = 2
+BETWEEN = 3
+OR = 4
+AND = 5
+NOT = 6
+NULLISH = 7
+IS_NULL = 8
+COMPARISON = 9
+ADDITIVE = 10
+MULTIPLICATIVE = 11
+ACCESS = 12
+
+ARITHMETIC_OPERATORS: Dict[str, Tuple[int, ast.ArithmeticOperationOp]] = {
+    "*": (MULTIPLICATIVE, ast.ArithmeticOperationOp.Mult),
+    "/": (MULTIPLICATIVE, ast.ArithmeticOperationOp.Div),
+    "%": (MULTIPLICATIVE, ast.ArithmeticOperationOp.Mod),
+    "+": (ADDITIVE, ast.ArithmeticOperationOp.Add),
+    "-": (ADDITIVE, ast.ArithmeticOperationOp.Sub),
+}
+COMPARISON_OPERATORS: Dict[str, ast.CompareOperationOp] = {
+    "=": ast.CompareOperationOp.Eq,
+    "==": ast.CompareOperationOp.Eq,
+    "!=": ast.CompareOperationOp.NotEq,
+    "<>": ast.CompareOperationOp.NotEq,
+    "<": ast.CompareOperationOp.Lt,
+    "<=": ast.CompareOperationOp.LtEq,
+    ">": ast.CompareOperationOp.Gt,
+    ">=": ast.CompareOperationOp.GtEq,
+    "~": ast.CompareOperationOp.Regex,
+    "=~": ast.CompareOperationOp.Regex,
+    "!~": ast.CompareOperationOp.NotRegex,
+    "~*": ast.CompareOperationOp.IRegex,
+    "=~*": ast.CompareOperationOp.IRegex,
+    "!~*": ast.CompareOperationOp.NotIRegex,
+    "LIKE": ast.CompareOperationOp.Like,
+    "ILIKE": ast.CompareOperationOp.ILike,
+}
+NEGATED_COMPARISON_OPERATORS: Dict[str, ast.CompareOperationOp] = {
+    "IN": ast.CompareOperationOp.NotIn,
+    "LIKE": ast.CompareOperationOp.NotLike,
+    "ILIKE": ast.CompareOperationOp.NotILike,
+}
+
+# Escapes allowed in quoted strings and identifiers, see ESCAPE_CHAR in HogQLLexer.g4
+_ESCAPE = r"\\[bBfFrRnNtT0aAvV\\']"
+# One alternative per token, tried in order. Operators are matched longest first, like ANTLR does.
+TOKEN_REGEX = re.compile(
+    "|".join(
+        [
+            r"(?P<WHITESPACE>[ \t\r\n\x0b\x0c]+|/\*.*?\*/|--[^\n\r]*)",
+            r"(?P<FLOATING>0[xX][0-9a-fA-F]+\.[0-9a-fA-F]*[pPeE][+-]?[0-9]+|0[xX][0-9a-fA-F]+[pPeE][+-]?[0-9]+"
+            r"|[0-9]+\.[0-9]*[eE][+-]?[0-9]+|\.[0-9]+[eE][+-]?[0-9]+|[0-9]+[eE][+-]?[0-9]+)",
+            r"(?P<HEXADECIMAL>0[xX][0-9a-fA-F]+)",
+            r"(?P<DECIMAL>[0-9]+)",
+            r"(?P<WORD>[a-zA-Z_$][a-zA-Z_0-9$]*)",
+            rf"(?P<IDENTIFIER>`(?:[^\\`]|{_ESCAPE}|``)*`|\"(?:[^\\\"]|{_ESCAPE}|\"\")*\")",
+            rf"(?P<STRING>'(?:[^\\']|{_ESCAPE}|'')*')",
+            rf"(?P<PLACEHOLDER>\{{(?:[^\\}}]|{_ESCAPE})*\}})",
+            r"(?P<OPERATOR>=~\*|!~\*|->|\|\||==|=~|>=|<=|<>|!=|~\*|!~|\?\?|[-*:,.=>#\[(<%+?~\]);/])",
+        ]
+    ),
+    re.DOTALL,
+)
+
+
+class Token:
+    __slots__ = ("type", "text", "start", "end")
+
+    def __init__(self, type: str, text: str, start: int, end: int):
+        self.type = type
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.text!r}, {self.start}, {self.end})"
+
+
+def tokenize(query: str) -> List[Token]:
+    """Splits a query into tokens like HogQLLexer does, ending with an EOF token."""
+    tokens: List[Token] = []
+    position = 0
+    length = len(query)
+    match = TOKEN_REGEX.match
+    while position < length:
+        token_match = match(query, position)
+        if token_match is None:
+            raise SyntaxException(f"token recognition error at: '{query[position]}'", start=position, end=length)
+        end = token_match.end()
+        kind = cast(str, token_match.lastgroup)
+        if kind != "WHITESPACE":
+            text = token_match.group()
+            if kind == "WORD":
+                kind = KEYWORDS.get(text.upper()) or (
+                    "JSON_TRUE" if text == "true" else "JSON_FALSE" if text == "false" else "IDENTIFIER"
+                )
+            elif kind == "OPERATOR":
+                kind = text
+            tokens.append(Token(kind, text, position, end))
+        position = end
+    tokens.append(Token("EOF", "<EOF>", length, length))
+    return tokens
+
+
+class HogQLPrattParser:
+    """
+    Parses one query. The public methods are named after the HogQLParser.g4 rules they parse, and like ANTLR's
+    `select` and `expr`, but unlike `orderExpr`, they fail if anything follows what they parse.
+    """
+
+    def __init__(self, query: str, locations: bool = True):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.index = 0
+        # Whether nodes get their start and end positions, errors always do
+        self.locations = locations
+        # ANTLR only converts queries without syntax errors, so other errors are raised once the query is parsed
+        self.error: Optional[HogQLException] = None
+
+    def select(self) -> ast.SelectQuery | ast.SelectUnionQuery:
+        start = self.tokens[0].start
+        node = self._select_union_stmt()
+        self._expect("EOF")
+        return self._parsed(self._located(node, start))
+
+    def expr(self) -> ast.Expr:
+        start = self.tokens[0].start
+        node = self._column_expr()
+        self._expect("EOF")
+        return self._parsed(self._located(node, start))
+
+    def order_expr(self) -> ast.OrderExpr:
+        return self._parsed(self._order_expr())
+
+    def _parsed(self, node):
+        if self.error is not None:
+            raise self.error
+        return node
+
+    def _defer(self, error: HogQLException):
+        if self.error is None:
+            self.error = error
+
+    # Tokens
+
+    def _peek(self, offset: int = 0) -> Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def _next(self) -> Token:
+        token = self.tokens[self.index]
+        if token.type != "EOF":
+            self.index += 1
+        return token
+
+    def _accept(self, type: str) -> bool:
+        if self.tokens[self.index].type == type:
+            self.index += 1
+            return True
+        return False
+
+    def _expect(self, type: str) -> Token:
+        token = self.tokens[self.index]
+        if token.type != type:
+            self._error(f"'{type}'" if type != "EOF" else "<EOF>")
+        return self._next()
+
+    def _error(self, expecting: Optional[str] = None) -> NoReturn:
+        token = self.tokens[self.index]
+        if expecting is None:
+            message = f"no viable alternative at input '{token.text}'"
+        else:
+            message = f"mismatched input '{token.text}' expecting {expecting}"
+        raise SyntaxException(message, start=token.start, end=len(self.query))
+
+    def _end(self) -> int:
+        """End of the last consumed token, which is where the rule being parsed ends."""
+        return self.tokens[self.index - 1].end if self.index > 0 else 0
+
+    def _located(self, node, start: int):
+        """Sets the position of a node that starts at `start` and ends with the last consumed token."""
+        if self.locations:
+            node.start = start
+            node.end = self._end()
+        return node
+
+    def _is_select_ahead(self) -> bool:
+        index = self.index
+        while self.tokens[index].type == "(":
+            index += 1
+        return self.tokens[index].type in ("SELECT", "WITH")
+
+    def _try(self, parse: Callable[[], Optional[ast.Expr]]) -> Optional[ast.Expr]:
+        """Parses one of several alternatives, going back to where it started if the alternative doesn't match."""
+        index, error = self.index, self.error
+        try:
+            node = parse()
+        except SyntaxException:
+            node = None
+        if node is None:
+            self.index, self.error = index, error
+        return node
+
+    # Selects
+
+    def _select_union_stmt(self) -> ast.SelectQuery | ast.SelectUnionQuery:
+        start = self._peek().start
+        select_queries = [self._select_stmt_with_parens()]
+        while self._accept("UNION"):
+            self._expect("ALL")
+            select_queries.append(self._select_stmt_with_parens())
+
+        flattened_queries: List[ast.SelectQuery] = []
+        for query in select_queries:
+            if isinstance(query, ast.SelectQuery):
+                flattened_queries.append(query)
+            else:
+                flattened_queries.extend(query.select_queries)
+        if len(flattened_queries) == 1:
+            return self._located(flattened_queries[0], start)
+        return self._located(ast.SelectUnionQuery(select_queries=flattened_queries), start)
+
+    def _select_stmt_with_parens(self) -> ast.SelectQuery | ast.SelectUnionQuery:
+        if self._peek().type != "(":
+            return self._select_stmt()
+        start = self._next().start
+        node = self._select_union_stmt()
+        self._expect(")")
+        return self._located(node, start)
+
+    def _select_stmt(self) -> ast.SelectQuery:
+        start = self._peek().start
+        ctes = self._with_clause() if self._peek().type == "WITH" else None
+        self._expect("SELECT")
+        distinct = True if self._accept("DISTINCT") else None
+        has_top = False
+        if self._accept("TOP"):
+            self._expect("DECIMAL")
+            if self._peek().type == "WITH" and self._peek(1).type == "TIES":
+                self.index += 2
+            has_top = True
+
+        select_query = ast.SelectQuery(ctes=ctes, select=self._column_expr_list(), distinct=distinct)
+
+        if self._peek().type == "FROM":
+            from_start = self._next().start
+            select_query.select_from = self._located(self._join_expr(), from_start)
+
+        array_join_op = None
+        if self._peek().type == "ARRAY" and self._peek(1).type == "JOIN":
+            array_join_op = "ARRAY JOIN"
+        elif self._peek().type in ("LEFT", "INNER") and self._peek(1).type == "ARRAY" and self._peek(2).type == "JOIN":
+            array_join_op = f"{self._next().type} ARRAY JOIN"
+        array_join_error = None
+        if array_join_op is not None:
+            self.index += 2
+            select_query.array_join_op = array_join_op
+            # Errors in the arrays come after the errors of the other clauses
+            error, self.error = self.error, None
+            select_query.array_join_list = self._column_expr_list()
+            array_join_error, self.error = self.error, error
+
+        if self._peek().type == "PREWHERE":
+            clause_start = self._next().start
+            select_query.prewhere = self._located(self._column_expr(), clause_start)
+        if self._peek().type == "WHERE":
+            clause_start = self._next().start
+            select_query.where = self._located(self._column_expr(), clause_start)
+        if self._accept("GROUP"):
+            self._expect("BY")
+            select_query.group_by = self._group_by_list()
+        if self._peek().type == "WITH" and self._peek(1).type in ("CUBE", "ROLLUP"):
+            self.index += 2
+        if self._peek().type == "WITH" and self._peek(1).type == "TOTALS":
+            self.index += 2
+        if self._peek().type == "HAVING":
+            clause_start = self._next().start
+            select_query.having = self._located(self._column_expr(), clause_start)
+        if self._accept("WINDOW"):
+            select_query.window_exprs = {}
+            while True:
+                name = self._identifier()
+                self._expect("AS")
+                self._expect("(")
+                select_query.window_exprs[name] = self._window_expr()
+                self._expect(")")
+                if not self._accept(","):
+                    break
+        if self._accept("ORDER"):
+            self._expect("BY")
+            select_query.order_by = self._order_expr_list()
+        if self._accept("LIMIT"):
+            self._limit_and_offset_clause(select_query)
+        elif self._accept("OFFSET"):
+            select_query.offset = self._column_expr()
+        has_settings = self._settings_clause()
+
+        if select_query.array_join_list is not None:
+            if select_query.select_from is None:
+                self._defer(
+                    HogQLException(
+                        "Using ARRAY JOIN without a FROM clause is not permitted", start=start, end=self._end()
+                    )
+                )
+            if array_join_error is not None:
+                self._defer(array_join_error)
+            for expr in select_query.array_join_list:
+                if not isinstance(expr, ast.Alias):
+                    if expr.start is not None and expr.end is not None:
+                        self._defer(HogQLException("ARRAY JOIN arrays must have an alias", node=expr))
+                    else:
+                        self._defer(
+                            HogQLException("ARRAY JOIN arrays must have an alias", start=start, end=self._end())
+                        )
+
+        if has_top:
+            self._defer(NotImplementedException(f"Unsupported: SelectStmt.topClause()", start=start, end=self._end()))
+        if has_settings:
+            self._defer(
+                NotImplementedException(f"Unsupported: SelectStmt.settingsClause()", start=start, end=self._end())
+            )
+
+        return self._located(select_query, start)
+
+    def _with_clause(self) -> Dict[str, ast.CTE]:
+        self._expect("WITH")
+        ctes: Dict[str, ast.CTE] = {}
+        while True:
+            cte = self._try(self._with_expr_subquery) or self._with_expr_column()
+            ctes[cte.name] = cte
+            if not self._accept(","):
+                return ctes
+
+    def _with_expr_subquery(self) -> Optional[ast.CTE]:
+        token = self._peek()
+        if token.type not in IDENTIFIER_TOKENS or self._peek(1).type != "AS" or self._peek(2).type != "(":
+            return None
+        name = self._identifier()
+        self.index += 2
+        if not self._is_select_ahead():
+            return None
+        expr = self._select_union_stmt()
+        self._expect(")")
+        return self._located(ast.CTE(name=name, expr=expr, cte_type="subquery"), token.start)
+
+    def _with_expr_column(self) -> ast.CTE:
+        start = self._peek().start
+        expr = self._column_expr(ALIAS + 1)
+        # The expression can have aliases of its own, the last "AS name" before the next CTE or SELECT names the CTE
+        while self._operator_level() == ALIAS and not (
+            self._peek().type == "AS"
+            and self._peek(1).type in IDENTIFIER_TOKENS
+            and self._peek(2).type in (",", "SELECT")
+        ):
+            expr = self._column_expr_operator(expr, ALIAS, start)
+        self._expect("AS")
+        name = self._identifier()
+        return self._located(ast.CTE(name=name, expr=expr, cte_type="column"), start)
+
+    def _group_by_list(self) -> List[ast.Expr]:
+        if self._peek().type in ("CUBE", "ROLLUP") and self._peek(1).type == "(":
+            index = self.index
+            self.index += 2
+            exprs = self._column_expr_list()
+            self._expect(")")
+            if self._peek().type != ",":
+                return exprs
+            # cube(...) was a function call in the list
+            self.index = index
+        return self._column_expr_list()
+
+    def _limit_and_offset_clause(self, select_query: ast.SelectQuery):
+        select_query.limit = self._column_expr()
+        if self._accept(","):
+            select_query.offset = self._column_expr()
+        elif self._accept("OFFSET"):
+            select_query.offset = self._column_expr()
+            if self._accept("BY"):
+                select_query.limit_by = self._column_expr_list()
+            return
+        if self._peek().type == "WITH" and self._peek(1).type == "TIES":
+            self.index += 2
+            select_query.limit_with_ties = True
+            if select_query.offset is None and self._accept("OFFSET"):
+                select_query.offset = self._column_expr()
+        elif self._accept("BY"):
+            select_query.limit_by = self._column_expr_list()
+
+    def _settings_clause(self) -> bool:
+        if not self._accept("SETTINGS"):
+            return False
+        while True:
+            self._identifier()
+            self._expect("=")
+            if not self._accept("STRING") and not self._accept("NULL"):
+                self._number_literal()
+            if not self._accept(","):
+                return True
+
+    # Joins
+
+    def _join_expr(self, allow_cross_join: bool = True) -> ast.JoinExpr:
+        start = self._peek().start
+        join_expr = self._join_expr_primary()
+        while True:
+            token = self._peek()
+            if token.type == "JOIN" or (token.type in JOIN_OP_TOKENS and self._is_join_op_ahead()):
+                join_type = self._join_op()
+                next_join = self._join_expr()
+                next_join.join_type = join_type
+                next_join.constraint = self._join_constraint_clause()
+            elif allow_cross_join and (token.type == "," or (token.type == "CROSS" and self._peek(1).type == "JOIN")):
+                self.index += 1 if token.type == "," else 2
+                next_join = self._join_expr(allow_cross_join=False)
+                next_join.join_type = "CROSS JOIN"
+            else:
+                return join_expr
+
+            last_join = join_expr
+            while last_join.next_join is not None:
+                last_join = last_join.next_join
+            last_join.next_join = next_join
+            self._located(join_expr, start)
+
+    def _join_expr_primary(self) -> ast.JoinExpr:
+        if self._peek().type == "(":
+            # A subquery, unless it's a join in parentheses
+            join_expr = self._try(self._join_expr_table) if self._is_select_ahead() else None
+            if join_expr is not None:
+                return join_expr
+            start = self._next().start
+            join_expr = self._join_expr()
+            self._expect(")")
+            return self._located(join_expr, start)
+        return self._join_expr_table()
+
+    def _join_expr_table(self) -> ast.JoinExpr:
+        start = self._peek().start
+        table = self._table_expr()
+        table_final = True if self._accept("FINAL") else None
+        sample = self._sample_clause() if self._peek().type == "SAMPLE" else None
+        if isinstance(table, ast.JoinExpr):
+            table.table_final = table_final
+            table.sample = sample
+            return self._located(table, start)
+        return self._located(ast.JoinExpr(table=table, table_final=table_final, sample=sample), start)
+
+    def _is_join_op_ahead(self) -> bool:
+        index = self.index
+        while self.tokens[index].type in JOIN_OP_TOKENS:
+            index += 1
+        return self.tokens[index].type == "JOIN"
+
+    def _join_op(self) -> str:
+        token = self._peek()
+        tokens = set()
+        while self._peek().type in JOIN_OP_TOKENS:
+            tokens.add(self._next().type)
+        self._expect("JOIN")
+
+        strictness = tokens & {"SEMI", "ALL", "ANTI", "ANY", "ASOF"}
+        if "FULL" in tokens:
+            order, allowed_strictness = ["FULL", "OUTER", "ALL", "ANY"], {"ALL", "ANY"}
+        elif "LEFT" in tokens or "RIGHT" in tokens:
+            order, allowed_strictness = ["LEFT", "RIGHT", "OUTER", "SEMI", "ALL", "ANTI", "ANY", "ASOF"], strictness
+        elif tokens:
+            order, allowed_strictness = ["ALL", "ANY", "ASOF", "INNER"], {"ALL", "ANY", "ASOF"}
+            tokens.add("INNER")
+        else:
+            return "JOIN"
+        if (
+            len(strictness) > 1
+            or not strictness <= allowed_strictness
+            or not tokens <= set(order)
+            or {"LEFT", "RIGHT"} <= tokens
+        ):
+            raise SyntaxException(
+                f"no viable alternative at input '{token.text}'", start=token.start, end=len(self.query)
+            )
+        return " ".join([keyword for keyword in order if keyword in tokens] + ["JOIN"])
+
+    def _join_constraint_clause(self) -> ast.JoinConstraint:
+        start = self._peek().start
+        if self._accept("USING"):
+            if self._accept("("):
+                column_expr_list = self._column_expr_list()
+                self._expect(")")
+            else:
+                column_expr_list = self._column_expr_list()
+            self._defer(NotImplementedException(f"Unsupported: JOIN ... USING", start=start, end=self._end()))
+        else:
+            self._expect("ON")
+            column_expr_list = self._column_expr_list()
+            if len(column_expr_list) != 1:
+                self._defer(
+                    NotImplementedException(
+                        f"Unsupported: JOIN ... ON with multiple expressions", start=start, end=self._end()
+                    )
+                )
+        return self._located(ast.JoinConstraint(expr=column_expr_list[0]), start)
+
+    def _sample_clause(self) -> ast.SampleExpr:
+        start = self._expect("SAMPLE").start
+        sample_value = self._ratio_expr()
+        offset_value = self._ratio_expr() if self._accept("OFFSET") else None
+        return self._located(ast.SampleExpr(sample_value=sample_value, offset_value=offset_value), start)
+
+    def _ratio_expr(self) -> ast.RatioExpr:
+        start = self._peek().start
+        left = self._number_literal(located=False)
+        right = self._number_literal(located=False) if self._accept("/") else None
+        return self._located(ast.RatioExpr(left=left, right=right), start)
+
+    def _table_expr(self) -> ast.Expr:
+        token = self._peek()
+        start = token.start
+        table: ast.Expr
+        if token.type == "(":
+            self._next()
+            table = self._select_union_stmt()
+            self._expect(")")
+        elif token.type == "PLACEHOLDER":
+            self._next()
+            table = ast.Placeholder(field=parse_string(token.text))
+        elif token.type in IDENTIFIER_TOKENS and self._peek(1).type == "(":
+            name = self._identifier()
+            self._next()
+            table_args = self._column_expr_list() if self._peek().type != ")" else []
+            self._expect(")")
+            table = ast.JoinExpr(table=ast.Field(chain=[name]), table_args=table_args)
+        else:
+            chain = [self._identifier()]
+            if self._peek().type == "." and self._peek(1).type in IDENTIFIER_TOKENS:
+                self._next()
+                chain.append(self._identifier())
+            table = ast.Field(chain=chain)
+        self._located(table, start)
+
+        while self._peek().type in ALIAS_TOKENS or self._peek().type == "AS":
+            alias = self._identifier() if self._accept("AS") else self._alias()
+            if alias in RESERVED_KEYWORDS:
+                self._defer(HogQLException(f"Alias '{alias}' is a reserved keyword", start=start, end=self._end()))
+            if isinstance(table, ast.JoinExpr):
+                table.alias = alias
+            else:
+                table = ast.JoinExpr(table=table, alias=alias)
+            self._located(table, start)
+        return table
+
+    # Windows and ordering
+
+    def _window_expr(self) -> ast.WindowExpr:
+        # Starts at the next token even if empty, just like ANTLR
+        start = self._peek().start
+        window_expr = ast.WindowExpr()
+        if self._accept("PARTITION"):
+            self._expect("BY")
+            window_expr.partition_by = self._column_expr_list()
+        if self._accept("ORDER"):
+            self._expect("BY")
+            window_expr.order_by = self._order_expr_list()
+        if self._peek().type in ("ROWS", "RANGE"):
+            frame_start = self._peek().start
+            window_expr.frame_method = cast(Literal["ROWS", "RANGE"], self._next().type)
+            if self._accept("BETWEEN"):
+                window_expr.frame_start = self._win_frame_bound()
+                self._expect("AND")
+                window_expr.frame_end = self._win_frame_bound()
+            else:
+                window_expr.frame_start = self._located(self._win_frame_bound(), frame_start)
+        return self._located(window_expr, start)
+
+    def _win_frame_bound(self) -> ast.WindowFrameExpr:
+        start = self._peek().start
+        if self._accept("CURRENT"):
+            self._expect("ROW")
+            return self._located(ast.WindowFrameExpr(frame_type="CURRENT ROW"), start)
+        frame_value = None if self._accept("UNBOUNDED") else self._number_literal(located=False).value
+        if self._accept("PRECEDING"):
+            return self._located(ast.WindowFrameExpr(frame_type="PRECEDING", frame_value=frame_value), start)
+        self._expect("FOLLOWING")
+        return self._located(ast.WindowFrameExpr(frame_type="FOLLOWING", frame_value=frame_value), start)
+
+    def _order_expr_list(self) -> List[ast.OrderExpr]:
+        order_exprs = [self._order_expr()]
+        while self._accept(","):
+            order_exprs.append(self._order_expr())
+        return order_exprs
+
+    def _order_expr(self) -> ast.OrderExpr:
+        start = self._peek().start
+        expr = self._column_expr()
+        order: Literal["ASC", "DESC"] = "ASC"
+        if self._peek().type in ("DESC", "DESCENDING"):
+            self._next()
+            order = "DESC"
+        else:
+            self._accept("ASCENDING")
+        if self._accept("NULLS"):
+            if not self._accept("FIRST"):
+                self._expect("LAST")
+        if self._accept("COLLATE"):
+            self._expect("STRING")
+        return self._located(ast.OrderExpr(expr=expr, order=order), start)
+
+    # Expressions
+
+    def _column_expr_list(self) -> List[ast.Expr]:
+        exprs = [self._column_expr()]
+        while self._accept(","):
+            exprs.append(self._column_expr())
+        return exprs
+
+    def _column_expr(self, min_level: int = 0) -> ast.Expr:
+        """Parses an expression, as long as its operators bind at least as tightly as `min_level`."""
+        start = self._peek().start
+        node = self._column_expr_primary()
+        while True:
+            level = self._operator_level()
+            if level is None or level < min_level:
+                return node
+            node = self._column_expr_operator(node, level, start)
+
+    def _operator_level(self) -> Optional[int]:
+        """The binding power of the operator following an expression, if it's followed by one."""
+        type = self._peek().type
+        if type == "[":
+            return ACCESS
+        if type == ".":
+            next_type = self._peek(1).type
+            return ACCESS if next_type == "DECIMAL" or next_type in IDENTIFIER_TOKENS else None
+        if type in ARITHMETIC_OPERATORS:
+            return ARITHMETIC_OPERATORS[type][0]
+        if type == "||":
+            return ADDITIVE
+        if type in COMPARISON_OPERATORS or type == "IN":
+            return COMPARISON
+        if type == "NOT":
+            next_type = self._peek(1).type
+            if next_type in NEGATED_COMPARISON_OPERATORS:
+                return COMPARISON
+            return BETWEEN if next_type == "BETWEEN" else None
+        if type == "IS":
+            return IS_NULL
+        if type == "??":
+            return NULLISH
+        if type == "AND":
+            return AND
+        if type == "OR":
+            return OR
+        if type == "BETWEEN":
+            return BETWEEN
+        if type == "?":
+            return TERNARY
+        if type == "AS" or type in ALIAS_TOKENS:
+            return ALIAS
+        return None
+
+    def _column_expr_operator(self, left: ast.Expr, level: int, start: int) -> ast.Expr:
+        token = self._next()
+        type = token.type
+        node: ast.Expr
+
+        if type == "[":
+            property = self._column_expr()
+            self._expect("]")
+            if isinstance(property, ast.Constant) and property.value == 0:
+                self._defer(
+                    SyntaxException(
+                        "SQL indexes start from one, not from zero. E.g: array[1]", start=start, end=self._end()
+                    )
+                )
+            node = ast.ArrayAccess(array=left, property=property)
+        elif type == ".":
+            if self._peek().type == "DECIMAL":
+                index = int(self._next().text)
+                if index == 0:
+                    self._defer(
+                        SyntaxException(
+                            "SQL indexes start from one, not from zero. E.g: array[1]", start=start, end=self._end()
+                        )
+                    )
+                node = ast.TupleAccess(tuple=left, index=index)
+            else:
+                node = ast.ArrayAccess(array=left, property=ast.Constant(value=self._identifier()))
+        elif type in ARITHMETIC_OPERATORS:
+            right = self._column_expr(level + 1)
+            node = ast.ArithmeticOperation(left=left, right=right, op=ARITHMETIC_OPERATORS[type][1])
+        elif type == "||":
+            right = self._column_expr(level + 1)
+            args = []
+            for expr in (left, right):
+                if isinstance(expr, ast.Call) and expr.name == "concat":
+                    args.extend(expr.args)
+                else:
+                    args.append(expr)
+            node = ast.Call(name="concat", args=args)
+        elif type in COMPARISON_OPERATORS:
+            right = self._column_expr(level + 1)
+            node = ast.CompareOperation(left=left, right=right, op=COMPARISON_OPERATORS[type])
+        elif type == "IN":
+            op = ast.CompareOperationOp.InCohort if self._accept("COHORT") else ast.CompareOperationOp.In
+            right = self._column_expr(level + 1)
+            node = ast.CompareOperation(left=left, right=right, op=op)
+        elif type == "NOT" and self._peek().type in NEGATED_COMPARISON_OPERATORS:
+            op = NEGATED_COMPARISON_OPERATORS[self._next().type]
+            if op == ast.CompareOperationOp.NotIn and self._accept("COHORT"):
+                op = ast.CompareOperationOp.NotInCohort
+            right = self._column_expr(level + 1)
+            node = ast.CompareOperation(left=left, right=right, op=op)
+        elif type == "NOT" or type == "BETWEEN":
+            if type == "NOT":
+                self._expect("BETWEEN")
+            # The lower bound can't contain AND, the upper one can't contain another BETWEEN
+            self._column_expr(NOT)
+            self._expect("AND")
+            self._column_expr(level + 1)
+            self._defer(NotImplementedException(f"Unsupported node: ColumnExprBetween", start=start, end=self._end()))
+            node = left
+        elif type == "IS":
+            op = ast.CompareOperationOp.NotEq if self._accept("NOT") else ast.CompareOperationOp.Eq
+            self._expect("NULL")
+            node = ast.CompareOperation(left=left, right=ast.Constant(value=None), op=op)
+        elif type == "??":
+            right = self._column_expr(level + 1)
+            node = ast.Call(name="ifNull", args=[left, right])
+        elif type == "AND" or type == "OR":
+            junction = ast.And if type == "AND" else ast.Or
+            right = self._column_expr(level + 1)
+            left_exprs = left.exprs if isinstance(left, junction) else [left]
+            right_exprs = right.exprs if isinstance(right, junction) else [right]
+            node = junction(exprs=left_exprs + right_exprs)
+        elif type == "?":
+            then_expr = self._column_expr()
+            self._expect(":")
+            # Right associative
+            else_expr = self._column_expr(level)
+            node = ast.Call(name="if", args=[left, then_expr, else_expr])
+        else:
+            if type == "AS":
+                alias = parse_string(self._next().text) if self._peek().type == "STRING" else self._identifier()
+            else:
+                self.index -= 1
+                alias = self._alias()
+            if alias in RESERVED_KEYWORDS:
+                self._defer(HogQLException(f"Alias '{alias}' is a reserved keyword", start=start, end=self._end()))
+            node = ast.Alias(expr=left, alias=alias)
+
+        return self._located(node, start)
+
+    def _column_expr_primary(self) -> ast.Expr:
+        token = self._peek()
+        type = token.type
+        start = token.start
+
+        special_form = self._special_forms.get(type)
+        if special_form is not None:
+            node = self._try(lambda: special_form(self))
+            if node is not None:
+                return node
+
+        if type == "NOT":
+            # A function, a negation, or else just an identifier
+            node = (self._try(self._function_call) if self._peek(1).type == "(" else None) or self._try(self._not)
+            return node or self._column_identifier()
+        if type in IDENTIFIER_TOKENS:
+            if self._peek(1).type == "(":
+                return self._function_call()
+            return self._column_identifier()
+        if type == "-" and not self._is_number_ahead(1):
+            self._next()
+            right = self._column_expr(ACCESS)
+            node = ast.ArithmeticOperation(op=ast.ArithmeticOperationOp.Sub, left=ast.Constant(value=0), right=right)
+            return self._located(node, start)
+        if type in NUMBER_TOKENS or type in ("-", "+") or (type == "." and self._peek(1).type == "DECIMAL"):
+            return self._number_literal()
+        if type == "STRING":
+            self._next()
+            return self._located(ast.Constant(value=parse_string(token.text)), start)
+        if type == "NULL":
+            self._next()
+            return self._located(ast.Constant(value=None), start)
+        if type == "PLACEHOLDER":
+            self._next()
+            return self._located(ast.Placeholder(field=parse_string(token.text)), start)
+        if type == "*":
+            self._next()
+            return self._located(ast.Field(chain=["*"]), start)
+        if type == "(":
+            subquery = self._try(self._column_expr_subquery) if self._is_select_ahead() else None
+            if subquery is not None:
+                return subquery
+            self._next()
+            exprs = self._column_expr_list()
+            self._expect(")")
+            if len(exprs) == 1:
+                return self._located(exprs[0], start)
+            return self._located(ast.Tuple(exprs=exprs), start)
+        if type == "[":
+            self._next()
+            exprs = self._column_expr_list() if self._peek().type != "]" else []
+            self._expect("]")
+            return self._located(ast.Array(exprs=exprs), start)
+        self._error()
+
+    def _not(self) -> ast.Expr:
+        start = self._expect("NOT").start
+        return self._located(ast.Not(expr=self._column_expr(NOT)), start)
+
+    def _column_expr_subquery(self) -> ast.Expr:
+        start = self._expect("(").start
+        node = self._select_union_stmt()
+        self._expect(")")
+        return self._located(node, start)
+
+    def _column_identifier(self) -> ast.Expr:
+        token = self._peek()
+        chain: List[str | int] = [self._identifier()]
+        while self._peek().type == "." and self._peek(1).type in IDENTIFIER_TOKENS:
+            self._next()
+            chain.append(self._identifier())
+        if self._peek().type == "." and self._peek(1).type == "*":
+            if len(chain) > 2:
+                self._error()
+            self.index += 2
+            return self._located(ast.Field(chain=chain + ["*"]), token.start)
+        if len(chain) == 1:
+            text = token.text.lower()
+            if text == "true":
+                return self._located(ast.Constant(value=True), token.start)
+            if text == "false":
+                return self._located(ast.Constant(value=False), token.start)
+        return self._located(ast.Field(chain=chain), token.start)
+
+    def _function_call(self) -> ast.Expr:
+        start = self._peek().start
+        name = self._identifier()
+        self._expect("(")
+        distinct, args, is_expr_list = self._column_arg_list()
+        if is_expr_list and self._peek().type == "(":
+            # The first list was the parameters
+            params = args if args else None
+            self._next()
+            distinct, args, _ = self._column_arg_list()
+            return self._located(ast.Call(name=name, params=params, args=args, distinct=distinct), start)
+        if is_expr_list and self._accept("OVER"):
+            if self._accept("("):
+                over_expr = self._window_expr()
+                self._expect(")")
+                return self._located(ast.WindowFunction(name=name, args=args, over_expr=over_expr), start)
+            over_identifier = self._identifier()
+            return self._located(ast.WindowFunction(name=name, args=args, over_identifier=over_identifier), start)
+        return self._located(ast.Call(name=name, params=None, args=args, distinct=distinct), start)
+
+    def _column_arg_list(self) -> Tuple[bool, List[ast.Expr], bool]:
+        """Parses arguments up to the closing parenthesis. Also says if they could be parameters, i.e. are plain
+        expressions."""
+        distinct = self._accept("DISTINCT")
+        is_expr_list = not distinct
+        args: List[ast.Expr] = []
+        if self._peek().type != ")":
+            while True:
+                if self._is_lambda_ahead():
+                    args.append(self._column_lambda_expr())
+                    is_expr_list = False
+                else:
+                    args.append(self._column_expr())
+                if not self._accept(","):
+                    break
+        self._expect(")")
+        return distinct, args, is_expr_list
+
+    def _is_lambda_ahead(self) -> bool:
+        tokens = self.tokens
+        index = self.index
+        parens = tokens[index].type == "("
+        if parens:
+            index += 1
+        if tokens[index].type not in IDENTIFIER_TOKENS:
+            return False
+        index += 1
+        while tokens[index].type == "," and tokens[index + 1].type in IDENTIFIER_TOKENS:
+            index += 2
+        if parens:
+            if tokens[index].type != ")":
+                return False
+            index += 1
+        return tokens[index].type == "->"
+
+    def _column_lambda_expr(self) -> ast.Lambda:
+        start = self._peek().start
+        parens = self._accept("(")
+        args = [self._identifier()]
+        while self._accept(","):
+            args.append(self._identifier())
+        if parens:
+            self._expect(")")
+        self._expect("->")
+        return self._located(ast.Lambda(args=args, expr=self._column_expr()), start)
+
+    def _number_literal(self, located: bool = True) -> ast.Constant:
+        start = self._peek().start
+        text = ""
+        if self._peek().type in ("-", "+"):
+            text = self._next().text
+        token = self._next()
+        if token.type == "DECIMAL":
+            text += token.text
+            # Unless it's followed by a property that can't be an alias, like in `1.case`
+            next_type = self._peek(1).type
+            if self._peek().type == "." and (next_type not in IDENTIFIER_TOKENS or next_type in ALIAS_TOKENS):
+                text += self._next().text
+                if self._peek().type == "DECIMAL":
+                    text += self._next().text
+        elif token.type == ".":
+            text += token.text + self._expect("DECIMAL").text
+        elif token.type in NUMBER_TOKENS:
+            text += token.text
+        else:
+            self.index -= 1
+            self._error()
+
+        text = text.lower()
+        if "." in text or "e" in text or text == "-inf" or text == "inf" or text == "nan":
+            node = ast.Constant(value=float(text))
+        else:
+            node = ast.Constant(value=int(text))
+        return self._located(node, start) if located else node
+
+    def _is_number_ahead(self, offset: int) -> bool:
+        type = self._peek(offset).type
+        return type in NUMBER_TOKENS or (type == "." and self._peek(offset + 1).type == "DECIMAL")
+
+    # Special forms, parsed if their keywords are followed by what they expect, else the keyword is an identifier
+
+    def _case(self) -> Optional[ast.Expr]:
+        start = self._expect("CASE").start
+        case_expr = self._column_expr() if self._peek().type != "WHEN" else None
+        columns = [case_expr] if case_expr is not None else []
+        self._expect("WHEN")
+        while True:
+            columns.append(self._column_expr())
+            self._expect("THEN")
+            columns.append(self._column_expr())
+            if not self._accept("WHEN"):
+                break
+        if self._accept("ELSE"):
+            columns.append(self._column_expr())
+        self._expect("END")
+
+        if case_expr is not None:
+            args: List[ast.Expr] = [columns[0], ast.Array(exprs=[]), ast.Array(exprs=[]), columns[-1]]
+            for index, column in enumerate(columns):
+                if 0 < index < len(columns) - 1:
+                    cast(ast.Array, args[((index - 1) % 2) + 1]).exprs.append(column)
+            return self._located(ast.Call(name="transform", args=args), start)
+        elif len(columns) == 3:
+            return self._located(ast.Call(name="if", args=columns), start)
+        return self._located(ast.Call(name="multiIf", args=columns), start)
+
+    def _interval(self) -> Optional[ast.Expr]:
+        start = self._expect("INTERVAL").start
+        expr = self._column_expr()
+        name = INTERVAL_FUNCTIONS.get(self._peek().type)
+        if name is None:
+            return None
+        self._next()
+        return self._located(ast.Call(name=name, args=[expr]), start)
+
+    def _cast(self) -> Optional[ast.Expr]:
+        return self._unsupported_call("ColumnExprCast", lambda: self._column_expr(ALIAS + 1) and self._expect("AS"))
+
+    def _extract(self) -> Optional[ast.Expr]:
+        return self._unsupported_call(
+            "ColumnExprExtract", lambda: self._next().type in INTERVAL_FUNCTIONS and self._expect("FROM")
+        )
+
+    def _substring(self) -> Optional[ast.Expr]:
+        return self._unsupported_call("ColumnExprSubstring", lambda: self._column_expr() and self._expect("FROM"))
+
+    def _trim(self) -> Optional[ast.Expr]:
+        return self._unsupported_call(
+            "ColumnExprTrim", lambda: self._next().type in ("BOTH", "LEADING", "TRAILING") and self._expect("STRING")
+        )
+
+    def _date(self) -> Optional[ast.Expr]:
+        return self._unsupported_literal("ColumnExprDate")
+
+    def _timestamp(self) -> Optional[ast.Expr]:
+        return self._unsupported_literal("ColumnExprTimestamp")
+
+    def _unsupported_call(self, rule: str, matches_start: Callable[[], object]) -> Optional[ast.Expr]:
+        start = self._next().start
+        self._expect("(")
+        if not matches_start():
+            return None
+        depth = 1
+        while depth > 0:
+            token = self._next()
+            if token.type == "EOF":
+                self._error("')'")
+            depth += 1 if token.type == "(" else -1 if token.type == ")" else 0
+        self._defer(NotImplementedException(f"Unsupported node: {rule}", start=start, end=self._end()))
+        return ast.Constant(value=None)
+
+    def _unsupported_literal(self, rule: str) -> Optional[ast.Expr]:
+        start = self._next().start
+        if self._peek().type != "STRING":
+            return None
+        self._next()
+        self._defer(NotImplementedException(f"Unsupported node: {rule}", start=start, end=self._end()))
+        return ast.Constant(value=None)
+
+    _special_forms: Dict[str, Callable[["HogQLPrattParser"], Optional[ast.Expr]]] = {
+        "CASE": _case,
+        "CAST": _cast,
+        "DATE": _date,
+        "EXTRACT": _extract,
+        "INTERVAL": _interval,
+        "SUBSTRING": _substring,
+        "TIMESTAMP": _timestamp,
+        "TRIM": _trim,
+    }
+
+    # Identifiers
+
+    def _identifier(self) -> str:
+        if self._peek().type not in IDENTIFIER_TOKENS:
+            self._error("identifier")
+        return _unquote_identifier(self._next().text)
+
+    def _alias(self) -> str:
+        if self._peek().type not in ALIAS_TOKENS:
+            self._error("alias")
+        return _unquote_identifier(self._next().text)
+
+
+def _unquote_identifier(text: str) -> str:
+    if len(text) >= 2 and ((text[0] == "`" and text[-1] == "`") or (text[0] == '"' and text[-1] == '"')):
+        return parse_string(text)
+    return text
@@ -5,6 +5,8 @@ from difflib import get_close_matches
 from typing import List, Literal, Optional, Union, cast
 from uuid import UUID
 
+from django.conf import settings as app_settings
+
 from posthog.hogql import ast
 from posthog.hogql.base import AST
 from posthog.hogql.constants import (
@@ -18,7 +20,7 @@ from posthog.hogql.functions import (
     HOGQL_AGGREGATIONS,
     HOGQL_POSTHOG_FUNCTIONS,
 )
-from posthog.hogql.context import HogQLContext
+from posthog.hogql.context import HogQLContext, HogQLPropertyAccess
 from posthog.hogql.database.models import Table, FunctionCallTable, SavedQuery
 from posthog.hogql.database.database import create_hogql_database
 from posthog.hogql.database.s3_table import S3Table
@@ -32,6 +34,7 @@ from posthog.hogql.escape_sql import (
 from posthog.hogql.functions.mapping import validate_function_args
 from posthog.hogql.resolver import ResolverException, lookup_field_by_name, resolve_types
 from posthog.hogql.transforms.lazy_tables import resolve_lazy_tables
+from posthog.hogql.transforms.optimizer import optimize, reuse_aliased_properties
 from posthog.hogql.transforms.property_types import resolve_property_types
 from posthog.hogql.visitor import Visitor
 from posthog.models.property import PropertyName, TableColumn
@@ -78,8 +81,14 @@ def prepare_ast_for_printing(
     if dialect == "clickhouse":
         with context.timings.measure("resolve_property_types"):
             node = resolve_property_types(node, context)
+        if app_settings.HOGQL_OPTIMIZER_ENABLED:
+            with context.timings.measure("optimize"):
+                node = optimize(node)
         with context.timings.measure("resolve_lazy_tables"):
             resolve_lazy_tables(node, stack, context)
+        if app_settings.HOGQL_OPTIMIZER_ENABLED:
+            with context.timings.measure("reuse_aliased_properties"):
+                reuse_aliased_properties(node)
     # We add a team_id guard right before printing. It's not a separate step here.
     return node
 
@@ -968,9 +977,16 @@ class _Printer(Visitor):
             )
 
             materialized_columns = get_materialized_columns(cast(TablesWithMaterializedColumns, table_name))
-            return materialized_columns.get((property_name, field_name), None)
+            materialized_column = materialized_columns.get((property_name, field_name), None)
         except ModuleNotFoundError:
-            return None
+            materialized_column = None
+
+        property_access = HogQLPropertyAccess(
+            table=table_name, field=field_name, property=property_name, materialized_column=materialized_column
+        )
+        if property_access not in self.context.property_accesses:
+            self.context.property_accesses.append(property_access)
+        return materialized_column
 
     def _get_timezone(self) -> str:
         return self.context.database.get_timezone() if self.context.database else "UTC"
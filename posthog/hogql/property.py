@@ -9,6 +9,7 @@ from posthog.hogql.base import AST
 from posthog.hogql.functions import HOGQL_AGGREGATIONS
 from posthog.hogql.errors import NotImplementedException
 from posthog.hogql.parser import parse_expr
+from posthog.hogql.templates import HogQLTemplate
 from posthog.hogql.visitor import TraversingVisitor
 from posthog.models import Action, ActionStep, Cohort, Property, Team, PropertyDefinition
 from posthog.models.event import Selector
@@ -17,6 +18,13 @@ from posthog.models.property.util import build_selector_regex
 from posthog.models.property_definition import PropertyType
 from posthog.schema import PropertyOperator, PropertyGroupFilter, PropertyGroupFilterValue, FilterLogicalOperator
 
+EVENT_EQUALS = HogQLTemplate("event = {event}")
+CURRENT_URL_EQUALS = HogQLTemplate("properties.$current_url = {url}")
+CURRENT_URL_MATCHES = HogQLTemplate("properties.$current_url =~ {regex}")
+CURRENT_URL_LIKE = HogQLTemplate("properties.$current_url like {url}")
+ELEMENTS_CHAIN_MATCHES = HogQLTemplate("elements_chain =~ {regex}")
+ELEMENTS_CHAIN_MATCHES_CASE_INSENSITIVE = HogQLTemplate("elements_chain =~* {regex}")
+
 
 def has_aggregation(expr: AST) -> bool:
     finder = AggregationFinder()
@@ -242,7 +250,7 @@ def action_to_expr(action: Action) -> ast.Expr:
     for step in steps:
         exprs: List[ast.Expr] = []
         if step.event:
-            exprs.append(parse_expr("event = {event}", {"event": ast.Constant(value=step.event)}))
+            exprs.append(EVENT_EQUALS.fill({"event": ast.Constant(value=step.event)}))
 
         if step.event == AUTOCAPTURE_EVENT:
             if step.selector:
@@ -268,11 +276,11 @@ def action_to_expr(action: Action) -> ast.Expr:
 
         if step.url:
             if step.url_matching == ActionStep.EXACT:
-                expr = parse_expr("properties.$current_url = {url}", {"url": ast.Constant(value=step.url)})
+                expr = CURRENT_URL_EQUALS.fill({"url": ast.Constant(value=step.url)})
             elif step.url_matching == ActionStep.REGEX:
-                expr = parse_expr("properties.$current_url =~ {regex}", {"regex": ast.Constant(value=step.url)})
+                expr = CURRENT_URL_MATCHES.fill({"regex": ast.Constant(value=step.url)})
             else:
-                expr = parse_expr("properties.$current_url like {url}", {"url": ast.Constant(value=f"%{step.url}%")})
+                expr = CURRENT_URL_LIKE.fill({"url": ast.Constant(value=f"%{step.url}%")})
             exprs.append(expr)
 
         if step.properties:
@@ -306,9 +314,9 @@ def element_chain_key_filter(key: str, text: str, operator: PropertyOperator):
 
     regex = f'({key}="{value}")'
     if operator == PropertyOperator.icontains or operator == PropertyOperator.not_icontains:
-        expr = parse_expr("elements_chain =~* {regex}", {"regex": ast.Constant(value=str(regex))})
+        expr = ELEMENTS_CHAIN_MATCHES_CASE_INSENSITIVE.fill({"regex": ast.Constant(value=str(regex))})
     else:
-        expr = parse_expr("elements_chain =~ {regex}", {"regex": ast.Constant(value=str(regex))})
+        expr = ELEMENTS_CHAIN_MATCHES.fill({"regex": ast.Constant(value=str(regex))})
 
     if (
         operator == PropertyOperator.is_not_set
@@ -322,11 +330,11 @@ def element_chain_key_filter(key: str, text: str, operator: PropertyOperator):
 
 def tag_name_to_expr(tag_name: str):
     regex = rf"(^|;){tag_name}(\.|$|;|:)"
-    expr = parse_expr("elements_chain =~ {regex}", {"regex": ast.Constant(value=str(regex))})
+    expr = ELEMENTS_CHAIN_MATCHES.fill({"regex": ast.Constant(value=str(regex))})
     return expr
 
 
 def selector_to_expr(selector: str):
     regex = build_selector_regex(Selector(selector, escape_slashes=False))
-    expr = parse_expr("elements_chain =~ {regex}", {"regex": ast.Constant(value=regex)})
+    expr = ELEMENTS_CHAIN_MATCHES.fill({"regex": ast.Constant(value=regex)})
     return expr
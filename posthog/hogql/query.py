@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Union, cast
+from typing import Dict, Optional, Tuple, Union, cast
 
 from posthog.clickhouse.client.connection import Workload
 from posthog.hogql import ast
@@ -12,7 +12,7 @@ from posthog.hogql.filters import replace_filters
 from posthog.hogql.timings import HogQLTimings
 from posthog.hogql.visitor import clone_expr
 from posthog.models.team import Team
-from posthog.clickhouse.query_tagging import tag_queries
+from posthog.clickhouse.query_tagging import tag_queries, tags_context
 from posthog.client import sync_execute
 from posthog.schema import HogQLQueryResponse, HogQLFilters
 
@@ -31,6 +31,67 @@ def execute_hogql_query(
     if timings is None:
         timings = HogQLTimings()
 
+    response, clickhouse_context = prepare_hogql_query(
+        query=query,
+        team=team,
+        filters=filters,
+        placeholders=placeholders,
+        settings=settings,
+        default_limit=default_limit,
+        timings=timings,
+    )
+    clickhouse_sql = cast(str, response.clickhouse)
+
+    timings_dict = timings.to_dict()
+    with timings.measure("clickhouse_execute"):
+        tag_queries(
+            team_id=team.pk,
+            query_type=query_type,
+            has_joins="JOIN" in clickhouse_sql,
+            has_json_operations="JSONExtract" in clickhouse_sql or "JSONHas" in clickhouse_sql,
+            timings=timings_dict,
+        )
+
+        # Properties extracted from JSON, as candidates for materialization, see ee/clickhouse/materialized_columns.
+        # Only this query reads them, so they mustn't be attributed to later queries of the request
+        with tags_context(
+            property_accesses=[
+                [access.table, access.field, access.property]
+                for access in clickhouse_context.property_accesses
+                if access.materialized_column is None
+            ]
+        ):
+            results, types = sync_execute(
+                clickhouse_sql,
+                clickhouse_context.values,
+                with_column_types=True,
+                workload=workload,
+                team_id=team.pk,
+                readonly=True,
+            )
+
+    response.results = results
+    response.types = types
+    response.timings = timings.to_list()
+    return response
+
+
+def prepare_hogql_query(
+    query: Union[str, ast.SelectQuery],
+    team: Team,
+    filters: Optional[HogQLFilters] = None,
+    placeholders: Optional[Dict[str, ast.Expr]] = None,
+    settings: Optional[HogQLSettings] = None,
+    default_limit: Optional[int] = None,
+    timings: Optional[HogQLTimings] = None,
+) -> Tuple[HogQLQueryResponse, HogQLContext]:
+    """
+    Prints the ClickHouse SQL of a HogQL query without running it. Returns the response without results, and the
+    context the SQL was printed with, holding the values to run it with.
+    """
+    if timings is None:
+        timings = HogQLTimings()
+
     with timings.measure("query"):
         if isinstance(query, ast.SelectQuery):
             select_query = query
@@ -105,31 +166,13 @@ def execute_hogql_query(
             select_query, context=clickhouse_context, dialect="clickhouse", settings=settings or HogQLSettings()
         )
 
-    timings_dict = timings.to_dict()
-    with timings.measure("clickhouse_execute"):
-        tag_queries(
-            team_id=team.pk,
-            query_type=query_type,
-            has_joins="JOIN" in clickhouse_sql,
-            has_json_operations="JSONExtract" in clickhouse_sql or "JSONHas" in clickhouse_sql,
-            timings=timings_dict,
-        )
-
-        results, types = sync_execute(
-            clickhouse_sql,
-            clickhouse_context.values,
-            with_column_types=True,
-            workload=workload,
-            team_id=team.pk,
-            readonly=True,
-        )
-
-    return HogQLQueryResponse(
-        query=query,
-        hogql=hogql,
-        clickhouse=clickhouse_sql,
-        timings=timings.to_list(),
-        results=results,
-        columns=print_columns,
-        types=types,
+    return (
+        HogQLQueryResponse(
+            query=query,
+            hogql=hogql,
+            clickhouse=clickhouse_sql,
+            timings=timings.to_list(),
+            columns=print_columns,
+        ),
+        clickhouse_context,
     )
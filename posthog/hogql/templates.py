@@ -0,0 +1,106 @@
+import dataclasses
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+from posthog.hogql import ast
+from posthog.hogql.base import AST
+from posthog.hogql.errors import HogQLException
+from posthog.hogql.parser import parse_expr, parse_select
+from posthog.hogql.timings import HogQLTimings
+from posthog.hogql.visitor import clone_expr
+
+# Steps from a node to one of its children: the name of the field, and the index or key within it for lists and dicts
+PlaceholderPath = List[Tuple[str, Optional[Union[int, str]]]]
+
+# Fields of AST nodes that never contain placeholders
+SKIPPED_FIELDS = {"start", "end", "type"}
+
+
+class HogQLTemplate:
+    """
+    A HogQL expression or select query with placeholders, which is parsed the first time it's filled in. Each time
+    after that it's cloned, and the placeholders are replaced at the paths found when it was parsed.
+
+    Create templates from constant strings once, e.g. at the top of a module, and fill them in for every query.
+    """
+
+    def __init__(self, template: str, kind: Literal["expr", "select"] = "expr"):
+        self.template = template
+        self.kind = kind
+        self._node: Optional[ast.Expr] = None
+        self._paths: List[Tuple[str, PlaceholderPath]] = []
+
+    def fill(self, placeholders: Dict[str, ast.Expr], timings: Optional[HogQLTimings] = None) -> ast.Expr:
+        if timings is None:
+            timings = HogQLTimings()
+        with timings.measure("fill_template"):
+            node = clone_expr(self.node)
+            for field, path in self._paths:
+                placeholder = _get_at_path(node, path)
+                if placeholders.get(field) is None:
+                    raise HogQLException(
+                        f"Placeholder {{{field}}} is not available in this context. You can use the following: "
+                        + ", ".join((f"{placeholder}" for placeholder in placeholders)),
+                        start=placeholder.start,
+                        end=placeholder.end,
+                    )
+                new_node = placeholders[field]
+                new_node.start = placeholder.start
+                new_node.end = placeholder.end
+                if len(path) == 0:
+                    node = new_node
+                else:
+                    _set_at_path(node, path, new_node)
+            return node
+
+    @property
+    def node(self) -> ast.Expr:
+        """The parsed template, with its placeholders in place."""
+        if self._node is None:
+            node = parse_select(self.template) if self.kind == "select" else parse_expr(self.template)
+            self._paths = _find_placeholder_paths(node)
+            self._node = node
+        return self._node
+
+
+def _find_placeholder_paths(node: AST, path: Optional[PlaceholderPath] = None) -> List[Tuple[str, PlaceholderPath]]:
+    path = path or []
+    if isinstance(node, ast.Placeholder):
+        return [(node.field, path)]
+    found: List[Tuple[str, PlaceholderPath]] = []
+    for field in dataclasses.fields(node):
+        if field.name in SKIPPED_FIELDS:
+            continue
+        value = getattr(node, field.name)
+        if isinstance(value, AST):
+            found.extend(_find_placeholder_paths(value, [*path, (field.name, None)]))
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                if isinstance(item, AST):
+                    found.extend(_find_placeholder_paths(item, [*path, (field.name, index)]))
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, AST):
+                    found.extend(_find_placeholder_paths(item, [*path, (field.name, key)]))
+    return found
+
+
+def _get_child(node, step: Tuple[str, Optional[Union[int, str]]]):
+    name, key = step
+    value = getattr(node, name)
+    return value if key is None else value[key]
+
+
+def _get_at_path(node: AST, path: PlaceholderPath) -> ast.Placeholder:
+    for step in path:
+        node = _get_child(node, step)
+    return node
+
+
+def _set_at_path(node: AST, path: PlaceholderPath, new_node: ast.Expr) -> None:
+    for step in path[:-1]:
+        node = _get_child(node, step)
+    name, key = path[-1]
+    if key is None:
+        setattr(node, name, new_node)
+    else:
+        getattr(node, name)[key] = new_node
@@ -0,0 +1,61 @@
+from posthog.api.query import process_query
+from posthog.hogql.explain import explain_hogql_query
+from posthog.schema import HogQLExplain, HogQLExplainProperty
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin, _create_event, flush_persons_and_events
+
+
+class TestExplain(ClickhouseTestMixin, APIBaseTest):
+    maxDiff = None
+
+    def _explain(self, query: str):
+        return explain_hogql_query(query=HogQLExplain(query=query), team=self.team)
+
+    def test_explain(self):
+        for _ in range(3):
+            _create_event(team=self.team, event="$pageview", distinct_id="user", properties={"$browser": "Chrome"})
+        flush_persons_and_events()
+
+        response = self._explain(
+            "select event, count() from events where properties.$browser = 'Chrome' group by event"
+        )
+
+        self.assertIn("equals(events.team_id", response.clickhouse)
+        self.assertTrue(any("ReadFromMergeTree" in line for line in response.indexes))
+        self.assertTrue(any("PrimaryKey" in line for line in response.indexes))
+        self.assertTrue(len(response.pipeline) > 0)
+        self.assertIn("explain_indexes", [timing.k for timing in response.timings])
+
+        self.assertEqual(len(response.tables), 1)
+        table = response.tables[0]
+        self.assertEqual(table.table, "sharded_events")
+        self.assertGreaterEqual(table.estimatedParts, 1)
+        self.assertGreaterEqual(table.estimatedRows, 3)
+        self.assertGreaterEqual(table.estimatedMarks, 1)
+
+    def test_explain_materialized_columns(self):
+        try:
+            from ee.clickhouse.materialized_columns.analyze import materialize
+        except ModuleNotFoundError:
+            # EE not available? Assume we're good
+            self.assertEqual(1 + 2, 3)
+            return
+        materialize("events", "withmat")
+
+        response = self._explain("select properties.withmat, properties.nomat, properties.withmat.nested from events")
+
+        self.assertEqual(
+            response.properties,
+            [
+                HogQLExplainProperty(
+                    table="events", field="properties", property="withmat", materializedColumn="mat_withmat"
+                ),
+                HogQLExplainProperty(table="events", field="properties", property="nomat", materializedColumn=None),
+            ],
+        )
+
+    def test_process_query(self):
+        response = process_query(self.team, {"kind": "HogQLExplain", "query": "select count() from events"})
+
+        self.assertIn("SELECT count() FROM events", response["clickhouse"])
+        self.assertIsInstance(response["indexes"], list)
+        self.assertIsInstance(response["pipeline"], list)
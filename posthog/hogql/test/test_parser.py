@@ -2,6 +2,8 @@ from typing import cast, Optional, Dict
 
 import math
 
+from django.test import override_settings
+
 from posthog.hogql import ast
 from posthog.hogql.errors import HogQLException
 from posthog.hogql.parser import parse_expr, parse_order_expr, parse_select
@@ -1233,3 +1235,8 @@ class TestParser(BaseTest):
             self._select(query)
         self.assertEqual(e.exception.start, 7)
         self.assertEqual(e.exception.end, 24)
+
+
+@override_settings(HOGQL_PRATT_PARSER_ENABLED=True)
+class TestPrattParser(TestParser):
+    pass
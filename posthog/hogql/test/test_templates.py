@@ -0,0 +1,66 @@
+from posthog.hogql import ast
+from posthog.hogql.errors import HogQLException
+from posthog.hogql.parser import parse_expr, parse_select
+from posthog.hogql.templates import HogQLTemplate
+from posthog.test.base import BaseTest
+
+
+class TestTemplates(BaseTest):
+    def test_fill_expr(self):
+        template = HogQLTemplate("event = {event} and timestamp > {timestamp}")
+        placeholders = {"event": ast.Constant(value="$pageview"), "timestamp": ast.Constant(value="2023-01-01")}
+        self.assertEqual(
+            template.fill(placeholders),
+            parse_expr("event = {event} and timestamp > {timestamp}", placeholders),
+        )
+
+    def test_fill_select(self):
+        template = HogQLTemplate(
+            "with {cte} as c select {column} from {table} as t where {filter} window w as (order by {order})",
+            kind="select",
+        )
+        placeholders = {
+            "cte": ast.Constant(value=1),
+            "column": ast.Field(chain=["event"]),
+            "table": ast.Field(chain=["events"]),
+            "filter": ast.Constant(value=True),
+            "order": ast.Field(chain=["timestamp"]),
+        }
+        self.assertEqual(
+            template.fill(placeholders),
+            parse_select(
+                "with {cte} as c select {column} from {table} as t where {filter} window w as (order by {order})",
+                placeholders,
+            ),
+        )
+
+    def test_fill_root_placeholder(self):
+        template = HogQLTemplate("{filter}")
+        self.assertEqual(
+            template.fill({"filter": ast.Constant(value=True)}),
+            ast.Constant(value=True, start=0, end=8),
+        )
+
+    def test_fill_does_not_change_template(self):
+        template = HogQLTemplate("event = {event}")
+        first = template.fill({"event": ast.Constant(value="a")})
+        second = template.fill({"event": ast.Constant(value="b")})
+        self.assertEqual(first, parse_expr("event = {event}", {"event": ast.Constant(value="a")}))
+        self.assertEqual(second, parse_expr("event = {event}", {"event": ast.Constant(value="b")}))
+        self.assertEqual(template.node, parse_expr("event = {event}"))
+
+    def test_parses_once(self):
+        template = HogQLTemplate("event = {event}")
+        node = template.node
+        template.fill({"event": ast.Constant(value="a")})
+        self.assertIs(template.node, node)
+
+    def test_fill_missing_placeholder(self):
+        template = HogQLTemplate("event = {event}")
+        with self.assertRaises(HogQLException) as context:
+            template.fill({"bar": ast.Constant(value=123)})
+        self.assertEqual(
+            "Placeholder {event} is not available in this context. You can use the following: bar",
+            str(context.exception),
+        )
+        self.assertEqual((context.exception.start, context.exception.end), (8, 15))
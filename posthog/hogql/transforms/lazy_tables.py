@@ -1,12 +1,20 @@
 import dataclasses
-from typing import Dict, List, Optional, cast
+from typing import Dict, List, Literal, Optional, Set, cast
+
+from django.conf import settings
 
 from posthog.hogql import ast
 from posthog.hogql.context import HogQLContext
 from posthog.hogql.database.models import LazyJoin, LazyTable
+from posthog.hogql.database.schema.events import EventsTable
+from posthog.hogql.database.schema.person_distinct_ids import PersonDistinctIdsTable
+from posthog.hogql.database.schema.persons import PersonsTable
 from posthog.hogql.errors import HogQLException
 from posthog.hogql.resolver import resolve_types
-from posthog.hogql.visitor import TraversingVisitor
+from posthog.hogql.visitor import CloningVisitor, TraversingVisitor, clone_expr
+
+# Joins after which conditions in WHERE still only keep rows of the tables before them that would be kept anyway
+PUSHDOWN_SAFE_JOIN_TYPES = {None, "JOIN", "INNER JOIN", "LEFT JOIN", "LEFT OUTER JOIN", "CROSS JOIN"}
 
 
 def resolve_lazy_tables(node: ast.Expr, stack: Optional[List[ast.SelectQuery]] = None, context: HogQLContext = None):
@@ -176,6 +184,12 @@ class LazyTableResolver(TraversingVisitor):
                         else:
                             new_table.fields_accessed[field.name] = chain
 
+        # Conditions in WHERE that only read one table, by table name. They're also applied inside the subqueries.
+        pushed_down_conditions = (
+            self._get_pushed_down_conditions(node, select_type) if settings.HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED else {}
+        )
+        events_table_name = self._get_events_table_name(node, select_type, pushed_down_conditions)
+
         # Make sure we also add fields we will use for the join's "ON" condition into the list of fields accessed.
         # Without this "pdi.person.id" won't work if you did not ALSO select "pdi.person_id" explicitly for the join.
         for new_join in joins_to_add.values():
@@ -187,6 +201,9 @@ class LazyTableResolver(TraversingVisitor):
         # For all the collected tables, create the subqueries, and add them to the table.
         for table_name, table_to_add in tables_to_add.items():
             subquery = table_to_add.lazy_table.lazy_select(table_to_add.fields_accessed)
+            if self._is_inner_table(node, select_type, table_name):
+                for condition in pushed_down_conditions.get(table_name, []):
+                    add_subquery_condition(subquery, SubqueryFieldsCloner().visit(condition))
             subquery = cast(ast.SelectQuery, resolve_types(subquery, self.context, [node.type]))
             old_table_type = select_type.tables[table_name]
             select_type.tables[table_name] = ast.SelectQueryAliasType(alias=table_name, select_query_type=subquery.type)
@@ -205,6 +222,10 @@ class LazyTableResolver(TraversingVisitor):
             join_to_add: ast.JoinExpr = join_scope.lazy_join.join_function(
                 join_scope.from_table, join_scope.to_table, join_scope.fields_accessed
             )
+            if join_to_add.join_type == "INNER JOIN":
+                self._push_down_conditions(
+                    join_scope, join_to_add, joins_to_add, pushed_down_conditions, events_table_name
+                )
             join_to_add = cast(ast.JoinExpr, resolve_types(join_to_add, self.context, [node.type]))
             select_type.tables[to_table] = join_to_add.type
 
@@ -249,3 +270,248 @@ class LazyTableResolver(TraversingVisitor):
                 field_or_property.joined_subquery = table_type
 
         self.stack_of_fields.pop()
+
+    def _get_pushed_down_conditions(
+        self, node: ast.SelectQuery, select_type: ast.SelectQueryType
+    ) -> Dict[str, List[ast.Expr]]:
+        """
+        Splits WHERE and PREWHERE into the conditions that are ANDed together, and returns those that only read fields
+        of one table. A row the outer query returns has passed all of them, so the rows of that table that don't pass
+        one can be skipped wherever that table is read from. That stops being true with joins that keep or match rows
+        of the other side based on what's on this side, so nothing is pushed down past those.
+        """
+        join = node.select_from
+        while join:
+            if join.join_type not in PUSHDOWN_SAFE_JOIN_TYPES:
+                return {}
+            join = join.next_join
+
+        conditions: List[ast.Expr] = []
+        for expr in (node.where, node.prewhere):
+            if isinstance(expr, ast.And):
+                conditions.extend(expr.exprs)
+            elif expr is not None:
+                conditions.append(expr)
+
+        pushed_down_conditions: Dict[str, List[ast.Expr]] = {}
+        for condition in conditions:
+            collector = ConditionFieldsCollector()
+            collector.visit(condition)
+            if not collector.movable or len(collector.fields) == 0:
+                continue
+
+            table_names: Set[Optional[str]] = set()
+            for field_or_property in collector.fields:
+                field = (
+                    field_or_property.field_type
+                    if isinstance(field_or_property, ast.PropertyType)
+                    else field_or_property
+                )
+                table_names.add(self._get_condition_table_name(select_type, field.table_type))
+            if len(table_names) == 1 and None not in table_names:
+                pushed_down_conditions.setdefault(cast(str, table_names.pop()), []).append(condition)
+
+        return pushed_down_conditions
+
+    def _get_condition_table_name(self, select: ast.SelectQueryType, type: ast.Type) -> Optional[str]:
+        # Fields of the tables of this select query, including its lazy joins and tables
+        if isinstance(type, ast.TableType) or isinstance(type, ast.TableAliasType):
+            return select.get_alias_for_table_type(type)
+        elif isinstance(type, ast.LazyJoinType) or isinstance(type, ast.LazyTableType):
+            return self._get_long_table_name(select, type)
+        return None
+
+    def _get_events_table_name(
+        self,
+        node: ast.SelectQuery,
+        select_type: ast.SelectQueryType,
+        pushed_down_conditions: Dict[str, List[ast.Expr]],
+    ) -> Optional[str]:
+        """Returns the name of the events table if the query selects from it, and there are conditions on it."""
+        if node.select_from is None or not isinstance(node.select_from.type, (ast.TableType, ast.TableAliasType)):
+            return None
+        table_type = node.select_from.type
+        if isinstance(table_type, ast.TableAliasType):
+            table_type = table_type.table_type
+        if not isinstance(table_type, ast.TableType) or not isinstance(table_type.table, EventsTable):
+            return None
+        table_name = select_type.get_alias_for_table_type(node.select_from.type)
+        return table_name if table_name in pushed_down_conditions else None
+
+    def _is_inner_table(self, node: ast.SelectQuery, select_type: ast.SelectQueryType, table_name: str) -> bool:
+        join = node.select_from
+        while join:
+            if join.type == select_type.tables.get(table_name):
+                return join is node.select_from or join.join_type in ("JOIN", "INNER JOIN")
+            join = join.next_join
+        return False
+
+    def _push_down_conditions(
+        self,
+        join_scope: JoinToAdd,
+        join_to_add: ast.JoinExpr,
+        joins_to_add: Dict[str, JoinToAdd],
+        pushed_down_conditions: Dict[str, List[ast.Expr]],
+        events_table_name: Optional[str],
+    ):
+        subquery = join_to_add.table
+        if not isinstance(subquery, ast.SelectQuery):
+            return
+
+        for condition in pushed_down_conditions.get(join_scope.to_table, []):
+            add_subquery_condition(subquery, SubqueryFieldsCloner().visit(condition))
+
+        # Instead of the latest version of everyone, only look at the people behind the events the query reads
+        if events_table_name is None:
+            return
+        join_table = join_scope.lazy_join.join_table
+        if isinstance(join_table, PersonDistinctIdsTable) and join_scope.from_table == events_table_name:
+            add_subquery_condition(
+                subquery,
+                ast.CompareOperation(
+                    op=ast.CompareOperationOp.In,
+                    left=ast.Field(chain=["distinct_id"]),
+                    right=self._select_event_distinct_ids(events_table_name, pushed_down_conditions),
+                ),
+            )
+        elif (
+            isinstance(join_table, PersonsTable)
+            and join_scope.from_table in joins_to_add
+            and isinstance(joins_to_add[join_scope.from_table].lazy_join.join_table, PersonDistinctIdsTable)
+            and joins_to_add[join_scope.from_table].from_table == events_table_name
+        ):
+            # Persons are looked up through all versions of the distinct ids, which at worst finds a few too many.
+            # The person_id column on events can't be used, as it's not updated when persons are merged.
+            add_subquery_condition(
+                subquery,
+                ast.CompareOperation(
+                    op=ast.CompareOperationOp.In,
+                    left=ast.Field(chain=["id"]),
+                    right=ast.SelectQuery(
+                        select=[ast.Field(chain=["person_id"])],
+                        select_from=ast.JoinExpr(table=ast.Field(chain=["raw_person_distinct_ids"])),
+                        where=ast.CompareOperation(
+                            op=ast.CompareOperationOp.In,
+                            left=ast.Field(chain=["distinct_id"]),
+                            right=self._select_event_distinct_ids(events_table_name, pushed_down_conditions),
+                        ),
+                    ),
+                ),
+            )
+
+    def _select_event_distinct_ids(
+        self, events_table_name: str, pushed_down_conditions: Dict[str, List[ast.Expr]]
+    ) -> ast.SelectQuery:
+        conditions = [
+            clone_expr(condition, clear_types=True) for condition in pushed_down_conditions[events_table_name]
+        ]
+        return ast.SelectQuery(
+            select=[ast.Field(chain=["distinct_id"])],
+            select_from=ast.JoinExpr(
+                table=ast.Field(chain=["events"]),
+                alias=events_table_name if events_table_name != "events" else None,
+            ),
+            where=conditions[0] if len(conditions) == 1 else ast.And(exprs=conditions),
+        )
+
+
+class ConditionFieldsCollector(TraversingVisitor):
+    """
+    Collects the fields a condition reads, and whether it's safe to evaluate it somewhere else than where it's written.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fields: List[ast.FieldType | ast.PropertyType] = []
+        self.movable = True
+
+    def visit_field(self, node: ast.Field):
+        if isinstance(node.type, ast.FieldType) or isinstance(node.type, ast.PropertyType):
+            self.fields.append(node.type)
+        else:
+            # Aliases, lambda arguments and the like
+            self.movable = False
+
+    def visit_placeholder(self, node: ast.Placeholder):
+        self.movable = False
+
+    def visit_select_query(self, node: ast.SelectQuery):
+        self.movable = False
+
+    def visit_select_union_query(self, node: ast.SelectUnionQuery):
+        self.movable = False
+
+    def visit_window_function(self, node: ast.WindowFunction):
+        self.movable = False
+
+
+class SubqueryFieldsCloner(CloningVisitor):
+    """Clones a condition on the fields of a lazy table, to read them from the lazy table's subquery instead."""
+
+    def visit_field(self, node: ast.Field):
+        if isinstance(node.type, ast.PropertyType):
+            return ast.Field(chain=[cast(str, node.type.joined_subquery_field_name)])
+        elif isinstance(node.type, ast.FieldType):
+            return ast.Field(chain=[node.type.name])
+        raise HogQLException("Can only clone conditions on fields of lazy tables")
+
+
+class SubqueryColumnsCollector(TraversingVisitor):
+    """Collects the names of the columns of a subquery a condition on them reads."""
+
+    def __init__(self):
+        super().__init__()
+        self.names: Set[str] = set()
+
+    def visit_field(self, node: ast.Field):
+        self.names.add(node.chain[0])
+
+    def visit_select_query(self, node: ast.SelectQuery):
+        # Fields of nested queries are their own
+        pass
+
+
+class GroupedColumnsCloner(CloningVisitor):
+    """Clones a condition on the columns a subquery groups by, to read the fields they're grouped by instead."""
+
+    def __init__(self, grouped_by: Dict[str, ast.Expr]):
+        super().__init__()
+        self.grouped_by = grouped_by
+
+    def visit_field(self, node: ast.Field):
+        return clone_expr(self.grouped_by[node.chain[0]])
+
+    def visit_select_query(self, node: ast.SelectQuery):
+        return clone_expr(node)
+
+
+def add_subquery_condition(subquery: ast.SelectQuery, condition: ast.Expr):
+    """
+    Adds a condition on the columns of a lazy table's subquery. Conditions on the columns it groups by filter rows
+    before they're aggregated, others filter the aggregated rows.
+    """
+    if not subquery.group_by:
+        _add_condition(subquery, "where", condition)
+        return
+
+    collector = SubqueryColumnsCollector()
+    collector.visit(condition)
+    grouped_by = {
+        select.alias: select.expr
+        for select in subquery.select
+        if isinstance(select, ast.Alias) and select.expr in subquery.group_by
+    }
+    if all(name in grouped_by for name in collector.names):
+        _add_condition(subquery, "where", GroupedColumnsCloner(grouped_by).visit(condition))
+    else:
+        _add_condition(subquery, "having", condition)
+
+
+def _add_condition(select: ast.SelectQuery, clause: Literal["where", "having"], condition: ast.Expr):
+    existing = getattr(select, clause)
+    if existing is None:
+        setattr(select, clause, condition)
+    elif isinstance(existing, ast.And):
+        existing.exprs.append(condition)
+    else:
+        setattr(select, clause, ast.And(exprs=[existing, condition]))
@@ -0,0 +1,233 @@
+from typing import Callable, Dict, List, Optional
+
+from posthog.hogql import ast
+from posthog.hogql.visitor import CloningVisitor, TraversingVisitor, clone_expr
+
+# Comparisons of constants that evaluate the same in Python as in ClickHouse. Others aren't folded: comparisons with
+# NULL are NULL in ClickHouse, and it converts values of different types before comparing them
+CONSTANT_COMPARISONS: Dict[ast.CompareOperationOp, Callable[[object, object], bool]] = {
+    ast.CompareOperationOp.Eq: lambda left, right: left == right,
+    ast.CompareOperationOp.NotEq: lambda left, right: left != right,
+    ast.CompareOperationOp.Gt: lambda left, right: left > right,  # type: ignore
+    ast.CompareOperationOp.GtEq: lambda left, right: left >= right,  # type: ignore
+    ast.CompareOperationOp.Lt: lambda left, right: left < right,  # type: ignore
+    ast.CompareOperationOp.LtEq: lambda left, right: left <= right,  # type: ignore
+}
+
+# Wrappers resolve_property_types puts around properties of a known type
+PROPERTY_TYPE_CONVERSIONS = {"toFloat", "toDateTime"}
+
+
+def optimize(node: ast.Expr) -> ast.Expr:
+    """
+    Simplifies the boolean logic of a resolved query without changing what it evaluates to. Comparisons of constants
+    are folded, nested `and` and `or` are flattened, and conditions that are repeated or can't change the result are
+    dropped.
+
+    Fields only read by conditions that were dropped aren't in the query anymore when lazy tables are resolved, so
+    the joins they'd need aren't added either.
+    """
+    return BooleanSimplifier().visit(node)
+
+
+def reuse_aliased_properties(node: ast.Expr) -> None:
+    """
+    Replaces properties of a query that it also selects under an alias with the alias, so that ClickHouse extracts
+    them from the JSON once. Runs after lazy tables are resolved, as conditions reading an alias can't be pushed
+    down into their subqueries.
+    """
+    AliasedPropertiesReuser().visit(node)
+
+
+class BooleanSimplifier(CloningVisitor):
+    def __init__(self):
+        super().__init__(clear_types=False)
+
+    def visit_and(self, node: ast.And):
+        return _simplify_junction(super().visit_and(node), absorbing_value=False)
+
+    def visit_or(self, node: ast.Or):
+        return _simplify_junction(super().visit_or(node), absorbing_value=True)
+
+    def visit_not(self, node: ast.Not):
+        node = super().visit_not(node)
+        value = _get_constant_truth(node.expr)
+        if value is not None:
+            return ast.Constant(value=not value, type=ast.BooleanType())
+        if isinstance(node.expr, ast.Not) and _is_boolean(node.expr.expr):
+            return node.expr.expr
+        return node
+
+    def visit_call(self, node: ast.Call):
+        # `and(a, b)` is the same as `a and b`
+        if node.name in ("and", "or") and len(node.args) >= 2 and node.params is None:
+            junction = ast.And if node.name == "and" else ast.Or
+            return self.visit(junction(exprs=node.args, type=ast.BooleanType(), start=node.start, end=node.end))
+        if node.name == "not" and len(node.args) == 1 and node.params is None:
+            return self.visit(ast.Not(expr=node.args[0], type=ast.BooleanType(), start=node.start, end=node.end))
+        return super().visit_call(node)
+
+    def visit_select_query(self, node: ast.SelectQuery):
+        node = super().visit_select_query(node)
+        # Conditions that are always true filter nothing
+        if node.where is not None and _get_constant_truth(node.where) is True:
+            node.where = None
+        if node.prewhere is not None and _get_constant_truth(node.prewhere) is True:
+            node.prewhere = None
+        if node.having is not None and _get_constant_truth(node.having) is True:
+            node.having = None
+        return node
+
+
+def _simplify_junction(node: ast.And | ast.Or, absorbing_value: bool) -> ast.Expr:
+    """Simplifies an `and` (absorbed by false) or an `or` (absorbed by true), whose operands are simplified already."""
+    exprs: List[ast.Expr] = []
+    for expr in node.exprs:
+        # Operands of the same kind were simplified already, so they have no further nesting
+        exprs.extend(expr.exprs if isinstance(expr, type(node)) else [expr])
+
+    # Aliases defined within the operands may be used elsewhere in the query
+    if any(_has_alias(expr) for expr in exprs):
+        node.exprs = exprs
+        return node
+
+    kept_exprs: List[ast.Expr] = []
+    seen_keys = set()
+    for expr in exprs:
+        value = _get_constant_truth(expr)
+        if value == absorbing_value:
+            return ast.Constant(value=absorbing_value, type=ast.BooleanType())
+        elif value is not None:
+            continue
+        key = _get_expr_key(expr)
+        if key not in seen_keys:
+            seen_keys.add(key)
+            kept_exprs.append(expr)
+
+    if len(kept_exprs) == 0:
+        return ast.Constant(value=not absorbing_value, type=ast.BooleanType())
+    if len(kept_exprs) == 1:
+        if _is_boolean(kept_exprs[0]):
+            return kept_exprs[0]
+        # Keep converting the value to a boolean
+        kept_exprs.append(ast.Constant(value=not absorbing_value, type=ast.BooleanType()))
+    node.exprs = kept_exprs
+    return node
+
+
+def _get_constant_truth(expr: ast.Expr) -> Optional[bool]:
+    if isinstance(expr, ast.Constant):
+        if isinstance(expr.value, bool):
+            return expr.value
+        if isinstance(expr.value, int) or isinstance(expr.value, float):
+            return expr.value != 0
+    elif isinstance(expr, ast.CompareOperation) and expr.op in CONSTANT_COMPARISONS:
+        if (
+            isinstance(expr.left, ast.Constant)
+            and isinstance(expr.right, ast.Constant)
+            and _is_comparable_constant(expr.left.value, expr.right.value)
+        ):
+            return CONSTANT_COMPARISONS[expr.op](expr.left.value, expr.right.value)
+    return None
+
+
+def _is_comparable_constant(left: object, right: object) -> bool:
+    if left is None or right is None:
+        return False
+    # Integers and floats are both numbers to ClickHouse, unlike booleans
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+        return isinstance(left, bool) == isinstance(right, bool)
+    return type(left) is type(right)
+
+
+def _is_boolean(expr: ast.Expr) -> bool:
+    return isinstance(expr, (ast.And, ast.Or, ast.Not, ast.CompareOperation)) or isinstance(expr.type, ast.BooleanType)
+
+
+def _has_alias(expr: ast.Expr) -> bool:
+    finder = AliasFinder()
+    finder.visit(expr)
+    return finder.found_alias
+
+
+def _get_expr_key(expr: ast.Expr) -> str:
+    """A key that's the same for expressions that are written the same, wherever they are in the query."""
+    return repr(clone_expr(expr, clear_types=True, clear_locations=True))
+
+
+class AliasFinder(TraversingVisitor):
+    def __init__(self):
+        super().__init__()
+        self.found_alias = False
+
+    def visit_alias(self, node: ast.Alias):
+        self.found_alias = True
+
+
+class AliasedPropertiesReuser(TraversingVisitor):
+    def visit_select_query(self, node: ast.SelectQuery):
+        super().visit_select_query(node)
+        # Aliases are only visible after the array is joined
+        if node.array_join_op is not None or not node.select:
+            return
+
+        aliases: Dict[str, ast.Alias] = {}
+        for expr in node.select:
+            if isinstance(expr, ast.Alias) and isinstance(expr.type, ast.FieldAliasType) and _is_property(expr.expr):
+                aliases.setdefault(_get_expr_key(expr.expr), expr)
+        if len(aliases) == 0:
+            return
+
+        replacer = AliasedPropertiesReplacer(aliases)
+        node.select = [
+            expr
+            if isinstance(expr, ast.Alias) and _is_property(expr.expr) and _get_expr_key(expr.expr) in aliases
+            else replacer.visit(expr)
+            for expr in node.select
+        ]
+        node.where = replacer.visit(node.where)
+        node.prewhere = replacer.visit(node.prewhere)
+        node.having = replacer.visit(node.having)
+        node.group_by = [replacer.visit(expr) for expr in node.group_by] if node.group_by else node.group_by
+        node.order_by = [replacer.visit(expr) for expr in node.order_by] if node.order_by else node.order_by
+
+
+def _is_property(expr: ast.Expr) -> bool:
+    """Whether the expression extracts a property from a table that's read directly, possibly converting its type."""
+    if isinstance(expr, ast.Call) and expr.name in PROPERTY_TYPE_CONVERSIONS and len(expr.args) == 1:
+        expr = expr.args[0]
+    return (
+        isinstance(expr, ast.Field)
+        and isinstance(expr.type, ast.PropertyType)
+        and isinstance(expr.type.field_type.table_type, (ast.TableType, ast.TableAliasType))
+    )
+
+
+class AliasedPropertiesReplacer(CloningVisitor):
+    def __init__(self, aliases: Dict[str, ast.Alias]):
+        super().__init__(clear_types=False)
+        self.aliases = aliases
+
+    def visit_field(self, node: ast.Field):
+        return self._replace(node) or super().visit_field(node)
+
+    def visit_call(self, node: ast.Call):
+        return self._replace(node) or super().visit_call(node)
+
+    def _replace(self, node: ast.Expr) -> Optional[ast.Field]:
+        if not _is_property(node):
+            return None
+        alias = self.aliases.get(_get_expr_key(node))
+        if alias is None:
+            return None
+        return ast.Field(chain=[alias.alias], type=alias.type, start=node.start, end=node.end)
+
+    # Aliases of this query aren't in scope of subqueries and lambdas
+    def visit_select_query(self, node: ast.SelectQuery):
+        return node
+
+    def visit_select_union_query(self, node: ast.SelectUnionQuery):
+        return node
+
+    def visit_lambda(self, node: ast.Lambda):
+        return node
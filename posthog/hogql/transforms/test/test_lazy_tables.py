@@ -164,6 +164,78 @@ class TestLazyJoins(BaseTest):
         )
         self.assertEqual(printed, expected)
 
+    @override_settings(
+        HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED=True, PERSON_ON_EVENTS_OVERRIDE=False, PERSON_ON_EVENTS_V2_OVERRIDE=False
+    )
+    def test_pushdown_filters_into_person_joins(self):
+        printed = self._print_select(
+            "select event, person.properties.email from events where event = 'a' and person.properties.email = 'x'"
+        )
+        expected = (
+            f"SELECT events.event, events__pdi__person.properties___email FROM events INNER JOIN (SELECT "
+            f"argMax(person_distinct_id2.person_id, person_distinct_id2.version) AS person_id, "
+            f"person_distinct_id2.distinct_id AS distinct_id FROM person_distinct_id2 WHERE "
+            f"and(equals(person_distinct_id2.team_id, {self.team.pk}), in(person_distinct_id2.distinct_id, (SELECT "
+            f"events.distinct_id FROM events WHERE and(equals(events.team_id, {self.team.pk}), "
+            f"equals(events.event, %(hogql_val_0)s))))) GROUP BY person_distinct_id2.distinct_id HAVING "
+            f"ifNull(equals(argMax(person_distinct_id2.is_deleted, person_distinct_id2.version), 0), 0)) AS "
+            f"events__pdi ON equals(events.distinct_id, events__pdi.distinct_id) INNER JOIN (SELECT "
+            f"argMax(replaceRegexpAll(nullIf(nullIf(JSONExtractRaw(person.properties, %(hogql_val_1)s), ''), "
+            f"'null'), '^\"|\"$', ''), person.version) AS properties___email, person.id AS id FROM person WHERE "
+            f"and(equals(person.team_id, {self.team.pk}), in(person.id, (SELECT person_distinct_id2.person_id FROM "
+            f"person_distinct_id2 WHERE and(equals(person_distinct_id2.team_id, {self.team.pk}), "
+            f"in(person_distinct_id2.distinct_id, (SELECT events.distinct_id FROM events WHERE "
+            f"and(equals(events.team_id, {self.team.pk}), equals(events.event, %(hogql_val_2)s)))))))) GROUP BY "
+            f"person.id HAVING and(ifNull(equals(argMax(person.is_deleted, person.version), 0), 0), "
+            f"ifNull(equals(properties___email, %(hogql_val_3)s), 0))) AS events__pdi__person ON "
+            f"equals(events__pdi.person_id, events__pdi__person.id) WHERE and(equals(events.team_id, "
+            f"{self.team.pk}), equals(events.event, %(hogql_val_4)s), "
+            f"ifNull(equals(events__pdi__person.properties___email, %(hogql_val_5)s), 0)) LIMIT 10000"
+        )
+        self.assertEqual(printed, expected)
+
+    @override_settings(HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED=True)
+    def test_pushdown_filters_into_lazy_table(self):
+        printed = self._print_select("select key from groups where index = 1 and properties.name = 'x'")
+        expected = (
+            f"SELECT groups.key FROM (SELECT "
+            f"argMax(replaceRegexpAll(nullIf(nullIf(JSONExtractRaw(groups.group_properties, %(hogql_val_0)s), ''), "
+            f"'null'), '^\"|\"$', ''), groups._timestamp) AS properties___name, groups.group_type_index AS index, "
+            f"groups.group_key AS key FROM groups WHERE and(equals(groups.team_id, {self.team.pk}), "
+            f"equals(groups.group_type_index, 1)) GROUP BY groups.group_type_index, groups.group_key HAVING "
+            f"ifNull(equals(properties___name, %(hogql_val_1)s), 0)) AS groups WHERE "
+            f"and(ifNull(equals(groups.index, 1), 0), ifNull(equals(groups.properties___name, %(hogql_val_2)s), "
+            f"0)) LIMIT 10000"
+        )
+        self.assertEqual(printed, expected)
+
+    @override_settings(
+        HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED=True, PERSON_ON_EVENTS_OVERRIDE=False, PERSON_ON_EVENTS_V2_OVERRIDE=False
+    )
+    def test_no_pushdown_past_right_joins(self):
+        printed = self._print_select(
+            "select event from events right join persons on persons.id = events.person_id "
+            "where event = 'a' and person.properties.x = 1"
+        )
+        expected = (
+            f"SELECT events.event FROM events INNER JOIN (SELECT argMax(person_distinct_id2.person_id, "
+            f"person_distinct_id2.version) AS person_id, person_distinct_id2.distinct_id AS distinct_id FROM "
+            f"person_distinct_id2 WHERE equals(person_distinct_id2.team_id, {self.team.pk}) GROUP BY "
+            f"person_distinct_id2.distinct_id HAVING ifNull(equals(argMax(person_distinct_id2.is_deleted, "
+            f"person_distinct_id2.version), 0), 0)) AS events__pdi ON equals(events.distinct_id, "
+            f"events__pdi.distinct_id) INNER JOIN (SELECT "
+            f"argMax(replaceRegexpAll(nullIf(nullIf(JSONExtractRaw(person.properties, %(hogql_val_0)s), ''), "
+            f"'null'), '^\"|\"$', ''), person.version) AS properties___x, person.id AS id FROM person WHERE "
+            f"equals(person.team_id, {self.team.pk}) GROUP BY person.id HAVING "
+            f"ifNull(equals(argMax(person.is_deleted, person.version), 0), 0)) AS events__pdi__person ON "
+            f"equals(events__pdi.person_id, events__pdi__person.id) RIGHT JOIN (SELECT person.id AS id FROM person "
+            f"WHERE equals(person.team_id, {self.team.pk}) GROUP BY person.id HAVING "
+            f"ifNull(equals(argMax(person.is_deleted, person.version), 0), 0)) AS persons ON equals(persons.id, "
+            f"events__pdi.person_id) WHERE and(equals(events.team_id, {self.team.pk}), equals(events.event, "
+            f"%(hogql_val_1)s), ifNull(equals(events__pdi__person.properties___x, 1), 0)) LIMIT 10000"
+        )
+        self.assertEqual(printed, expected)
+
     def _print_select(self, select: str):
         expr = parse_select(select)
         return print_ast(expr, HogQLContext(team_id=self.team.pk, enable_select_queries=True), "clickhouse")
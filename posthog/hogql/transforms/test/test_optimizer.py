@@ -0,0 +1,140 @@
+from django.test import override_settings
+
+from posthog.hogql.context import HogQLContext
+from posthog.hogql.parser import parse_select
+from posthog.hogql.printer import print_ast
+from posthog.hogql.query import execute_hogql_query
+from posthog.test.base import (
+    APIBaseTest,
+    BaseTest,
+    ClickhouseTestMixin,
+    _create_event,
+    _create_person,
+    flush_persons_and_events,
+)
+
+
+@override_settings(HOGQL_OPTIMIZER_ENABLED=True, PERSON_ON_EVENTS_OVERRIDE=False, PERSON_ON_EVENTS_V2_OVERRIDE=False)
+class TestOptimizer(BaseTest):
+    maxDiff = None
+
+    def test_flattens_and_folds_conditions(self):
+        printed = self._print_select(
+            "select event from events where (true and (event = 'a' and 1 = 1)) and (event = 'a' or 1 > 2)"
+        )
+        self.assertEqual(
+            printed,
+            f"SELECT events.event FROM events WHERE and(equals(events.team_id, {self.team.pk}), "
+            f"equals(events.event, %(hogql_val_0)s)) LIMIT 10000",
+        )
+
+    def test_folds_function_call_conditions(self):
+        printed = self._print_select("select event from events where and(event = 'a', or(1 = 1, event = 'b'))")
+        self.assertEqual(
+            printed,
+            f"SELECT events.event FROM events WHERE and(equals(events.team_id, {self.team.pk}), "
+            f"equals(events.event, %(hogql_val_0)s)) LIMIT 10000",
+        )
+
+    def test_does_not_fold_comparisons_with_null_or_of_different_types(self):
+        printed = self._print_select("select event from events where not(null > 1) and '1' = 1 and 1 = 1.0")
+        # Left for the printer to print as it always has
+        self.assertEqual(
+            printed,
+            f"SELECT events.event FROM events WHERE and(equals(events.team_id, {self.team.pk}), not(0), 0) LIMIT 10000",
+        )
+
+    def test_keeps_values_that_are_not_booleans(self):
+        printed = self._print_select("select event and true, not(not(event)), not(not(event = 'a')) from events")
+        self.assertEqual(
+            printed,
+            f"SELECT and(events.event, true), not(not(events.event)), equals(events.event, %(hogql_val_0)s) "
+            f"FROM events WHERE equals(events.team_id, {self.team.pk}) LIMIT 10000",
+        )
+
+    def test_drops_joins_only_needed_by_folded_conditions(self):
+        printed = self._print_select("select event from events where 1 = 1 or person.properties.email = 'x'")
+        self.assertEqual(
+            printed, f"SELECT events.event FROM events WHERE equals(events.team_id, {self.team.pk}) LIMIT 10000"
+        )
+
+    def test_keeps_conditions_defining_aliases(self):
+        printed = self._print_select("select event from events where (1 = 1 or (event as e) = 'x') and e = 'y'")
+        self.assertEqual(
+            printed,
+            f"SELECT events.event FROM events WHERE and(equals(events.team_id, {self.team.pk}), "
+            f"or(1, ifNull(equals(events.event AS e, %(hogql_val_0)s), 0)), ifNull(equals(e, %(hogql_val_1)s), 0)) "
+            f"LIMIT 10000",
+        )
+
+    def test_reuses_aliased_properties(self):
+        printed = self._print_select(
+            "select properties.$browser as browser, count() from events where properties.$browser = 'Chrome' "
+            "group by properties.$browser order by properties.$browser"
+        )
+        self.assertEqual(
+            printed,
+            f"SELECT replaceRegexpAll(nullIf(nullIf(JSONExtractRaw(events.properties, %(hogql_val_0)s), ''), 'null'), "
+            f"'^\"|\"$', '') AS browser, count() FROM events WHERE and(equals(events.team_id, {self.team.pk}), "
+            f"ifNull(equals(browser, %(hogql_val_1)s), 0)) GROUP BY browser ORDER BY browser ASC LIMIT 10000",
+        )
+
+    def test_does_not_reuse_aliases_in_subqueries(self):
+        printed = self._print_select(
+            "select properties.$browser as browser from events "
+            "where event in (select event from events where properties.$browser = 'Chrome')"
+        )
+        self.assertIn("WHERE and(equals(events.team_id, ", printed)
+        self.assertNotIn("equals(browser", printed)
+
+    def _print_select(self, select: str):
+        expr = parse_select(select)
+        return print_ast(expr, HogQLContext(team_id=self.team.pk, enable_select_queries=True), "clickhouse")
+
+
+@override_settings(PERSON_ON_EVENTS_OVERRIDE=False, PERSON_ON_EVENTS_V2_OVERRIDE=False)
+class TestOptimizerPreservesResults(ClickhouseTestMixin, APIBaseTest):
+    maxDiff = None
+
+    def test_optimized_queries_return_the_same_results(self):
+        _create_person(team=self.team, distinct_ids=["a"], properties={"email": "a@example.com"})
+        _create_person(team=self.team, distinct_ids=["b"], properties={"email": "b@example.com"})
+        for distinct_id, event, browser in [
+            ("a", "$pageview", "Chrome"),
+            ("a", "$pageview", "Firefox"),
+            ("a", "$autocapture", None),
+            ("b", "$pageview", "Chrome"),
+            ("b", "$pageleave", "Safari"),
+        ]:
+            _create_event(
+                team=self.team,
+                event=event,
+                distinct_id=distinct_id,
+                properties={"$browser": browser} if browser else {},
+            )
+        flush_persons_and_events()
+
+        queries = [
+            "select event, count() from events where (true and event = '$pageview') or (1 = 2 and event = 'x') "
+            "group by event order by event",
+            "select properties.$browser as browser, count() from events "
+            "where properties.$browser = 'Chrome' or properties.$browser is null "
+            "group by properties.$browser order by properties.$browser",
+            "select distinct_id from events where 1 = 1 or person.properties.email = 'x' order by distinct_id",
+            "select distinct_id, count() from events "
+            "where person.properties.email = 'a@example.com' and (1 = 1 or person.properties.email = 'x') "
+            "group by distinct_id",
+            "select event, not(not(event = '$pageview')), (event = '$pageview') and true, 2 and true from events "
+            "order by event",
+            "select event from events where properties.missing = 'x' or (properties.missing is null and 1 = 1) "
+            "order by event",
+            "select event from events where and(event = '$pageview', or(false, properties.$browser != 'Chrome')) "
+            "order by event",
+            "select count() from events where 1 > 2 and person.properties.email = 'a@example.com'",
+        ]
+        for query in queries:
+            with self.settings(HOGQL_OPTIMIZER_ENABLED=False):
+                expected = execute_hogql_query(query, team=self.team).results
+            with self.settings(HOGQL_OPTIMIZER_ENABLED=True):
+                optimized = execute_hogql_query(query, team=self.team).results
+            self.assertEqual(optimized, expected, query)
@@ -1,16 +1,100 @@
 from typing import Optional
 
+from django.conf import settings
 from django.utils.timezone import datetime
 
+from posthog.clickhouse.client.query_cost import tag_predicted_query_cost
 from posthog.hogql import ast
-from posthog.hogql.parser import parse_expr, parse_select
 from posthog.hogql.property import property_to_expr, action_to_expr
 from posthog.hogql.query import execute_hogql_query
+from posthog.hogql.templates import HogQLTemplate
 from posthog.hogql.timings import HogQLTimings
 from posthog.models import Team, Action
 from posthog.hogql_queries.query_date_range import QueryDateRange
+from posthog.queries.adaptive_sampling import get_adaptive_sampling_factor
+from posthog.queries.util import correct_result_for_sampling
 from posthog.schema import LifecycleQuery, ActionsNode, EventsNode, LifecycleQueryResponse
 
+DATE_FROM_FILTER = HogQLTemplate("timestamp >= dateTrunc({interval}, {date_from}) - {one_interval}")
+DATE_TO_FILTER = HogQLTemplate("timestamp < dateTrunc({interval}, {date_to}) + {one_interval}")
+
+EVENTS_QUERY = HogQLTemplate(
+    """
+    SELECT
+        events.person.id as person_id,
+        min(events.person.created_at) AS created_at,
+        arraySort(groupUniqArray(dateTrunc({interval}, events.timestamp))) AS all_activity,
+        arrayPopBack(arrayPushFront(all_activity, dateTrunc({interval}, created_at))) as previous_activity,
+        arrayPopFront(arrayPushBack(all_activity, dateTrunc({interval}, toDateTime('1970-01-01 00:00:00')))) as following_activity,
+        arrayMap((previous, current, index) -> (previous = current ? 'new' : ((current - {one_interval_period}) = previous AND index != 1) ? 'returning' : 'resurrecting'), previous_activity, all_activity, arrayEnumerate(all_activity)) as initial_status,
+        arrayMap((current, next) -> (current + {one_interval_period} = next ? '' : 'dormant'), all_activity, following_activity) as dormant_status,
+        arrayMap(x -> x + {one_interval_period}, arrayFilter((current, is_dormant) -> is_dormant = 'dormant', all_activity, dormant_status)) as dormant_periods,
+        arrayMap(x -> 'dormant', dormant_periods) as dormant_label,
+        arrayConcat(arrayZip(all_activity, initial_status), arrayZip(dormant_periods, dormant_label)) as temp_concat,
+        arrayJoin(temp_concat) as period_status_pairs,
+        period_status_pairs.1 as start_of_period,
+        period_status_pairs.2 as status
+    FROM events
+    WHERE {event_filter}
+    GROUP BY person_id
+""",
+    kind="select",
+)
+
+PERIODS_QUERY = HogQLTemplate(
+    """
+    SELECT (
+        dateTrunc({interval}, {date_to}) - {number_interval_period}
+    ) AS start_of_period
+    FROM numbers(
+        dateDiff(
+            {interval},
+            dateTrunc({interval}, {date_from}),
+            dateTrunc({interval}, {date_to} + {one_interval_period})
+        )
+    )
+""",
+    kind="select",
+)
+
+LIFECYCLE_QUERY = HogQLTemplate(
+    """
+    SELECT groupArray(start_of_period) AS date,
+           groupArray(counts) AS total,
+           status
+    FROM (
+        SELECT
+            status = 'dormant' ? negate(sum(counts)) : negate(negate(sum(counts))) as counts,
+            start_of_period,
+            status
+        FROM (
+            SELECT
+                periods.start_of_period as start_of_period,
+                0 AS counts,
+                status
+            FROM {periods} as periods
+            CROSS JOIN (
+                SELECT status
+                FROM (SELECT 1)
+                ARRAY JOIN ['new', 'returning', 'resurrecting', 'dormant'] as status
+            ) as sec
+            ORDER BY status, start_of_period
+            UNION ALL
+            SELECT
+                start_of_period, count(DISTINCT person_id) AS counts, status
+            FROM {events_query}
+            GROUP BY start_of_period, status
+        )
+        WHERE start_of_period <= dateTrunc({interval}, {date_to})
+            AND start_of_period >= dateTrunc({interval}, {date_from})
+        GROUP BY start_of_period, status
+        ORDER BY start_of_period ASC
+    )
+    GROUP BY status
+""",
+    kind="select",
+)
+
 
 def create_events_query(
     query_date_range: QueryDateRange,
@@ -24,29 +108,7 @@ def create_events_query(
         "one_interval_period": query_date_range.one_interval_period(),
     }
 
-    events_query = parse_select(
-        """
-            SELECT
-                events.person.id as person_id,
-                min(events.person.created_at) AS created_at,
-                arraySort(groupUniqArray(dateTrunc({interval}, events.timestamp))) AS all_activity,
-                arrayPopBack(arrayPushFront(all_activity, dateTrunc({interval}, created_at))) as previous_activity,
-                arrayPopFront(arrayPushBack(all_activity, dateTrunc({interval}, toDateTime('1970-01-01 00:00:00')))) as following_activity,
-                arrayMap((previous, current, index) -> (previous = current ? 'new' : ((current - {one_interval_period}) = previous AND index != 1) ? 'returning' : 'resurrecting'), previous_activity, all_activity, arrayEnumerate(all_activity)) as initial_status,
-                arrayMap((current, next) -> (current + {one_interval_period} = next ? '' : 'dormant'), all_activity, following_activity) as dormant_status,
-                arrayMap(x -> x + {one_interval_period}, arrayFilter((current, is_dormant) -> is_dormant = 'dormant', all_activity, dormant_status)) as dormant_periods,
-                arrayMap(x -> 'dormant', dormant_periods) as dormant_label,
-                arrayConcat(arrayZip(all_activity, initial_status), arrayZip(dormant_periods, dormant_label)) as temp_concat,
-                arrayJoin(temp_concat) as period_status_pairs,
-                period_status_pairs.1 as start_of_period,
-                period_status_pairs.2 as status
-            FROM events
-            WHERE {event_filter}
-            GROUP BY person_id
-        """,
-        placeholders=placeholders,
-        timings=timings,
-    )
+    events_query = EVENTS_QUERY.fill(placeholders, timings=timings)
 
     if sampling_factor is not None and isinstance(sampling_factor, float):
         sample_expr = ast.SampleExpr(sample_value=ast.RatioExpr(left=ast.Constant(value=sampling_factor)))
@@ -63,8 +125,7 @@ def run_lifecycle_query(team: Team, query: LifecycleQuery) -> LifecycleQueryResp
     with timings.measure("date_range"):
         query_date_range = QueryDateRange(date_range=query.dateRange, team=team, interval=query.interval, now=now_dt)
         event_filter.append(
-            parse_expr(
-                "timestamp >= dateTrunc({interval}, {date_from}) - {one_interval}",
+            DATE_FROM_FILTER.fill(
                 {
                     "interval": query_date_range.interval_period_string_as_hogql_constant(),
                     "one_interval": query_date_range.one_interval_period(),
@@ -74,8 +135,7 @@ def run_lifecycle_query(team: Team, query: LifecycleQuery) -> LifecycleQueryResp
             )
         )
         event_filter.append(
-            parse_expr(
-                "timestamp < dateTrunc({interval}, {date_to}) + {one_interval}",
+            DATE_TO_FILTER.fill(
                 {
                     "interval": query_date_range.interval_period_string_as_hogql_constant(),
                     "one_interval": query_date_range.one_interval_period(),
@@ -133,78 +193,34 @@ def run_lifecycle_query(team: Team, query: LifecycleQuery) -> LifecycleQueryResp
         "date_to": query_date_range.date_to_as_hogql(),
     }
 
+    sampling_factor = query.samplingFactor
+    if sampling_factor is None and settings.ADAPTIVE_SAMPLING_BY_DEFAULT:
+        with timings.measure("adaptive_sampling"):
+            sampling_factor = get_adaptive_sampling_factor(team)
+
     with timings.measure("events_query"):
         events_query = create_events_query(
             query_date_range=query_date_range,
             event_filter=event_filter,
-            sampling_factor=query.samplingFactor,
+            sampling_factor=sampling_factor,
             timings=timings,
         )
 
     with timings.measure("periods_query"):
-        periods = parse_select(
-            """
-                SELECT (
-                    dateTrunc({interval}, {date_to}) - {number_interval_period}
-                ) AS start_of_period
-                FROM numbers(
-                    dateDiff(
-                        {interval},
-                        dateTrunc({interval}, {date_from}),
-                        dateTrunc({interval}, {date_to} + {one_interval_period})
-                    )
-                )
-            """,
-            placeholders=placeholders,
-            timings=timings,
-        )
+        periods = PERIODS_QUERY.fill(placeholders, timings=timings)
 
     with timings.measure("lifecycle_query"):
-        lifecycle_sql = parse_select(
-            """
-                SELECT groupArray(start_of_period) AS date,
-                       groupArray(counts) AS total,
-                       status
-                FROM (
-                    SELECT
-                        status = 'dormant' ? negate(sum(counts)) : negate(negate(sum(counts))) as counts,
-                        start_of_period,
-                        status
-                    FROM (
-                        SELECT
-                            periods.start_of_period as start_of_period,
-                            0 AS counts,
-                            status
-                        FROM {periods} as periods
-                        CROSS JOIN (
-                            SELECT status
-                            FROM (SELECT 1)
-                            ARRAY JOIN ['new', 'returning', 'resurrecting', 'dormant'] as status
-                        ) as sec
-                        ORDER BY status, start_of_period
-                        UNION ALL
-                        SELECT
-                            start_of_period, count(DISTINCT person_id) AS counts, status
-                        FROM {events_query}
-                        GROUP BY start_of_period, status
-                    )
-                    WHERE start_of_period <= dateTrunc({interval}, {date_to})
-                        AND start_of_period >= dateTrunc({interval}, {date_from})
-                    GROUP BY start_of_period, status
-                    ORDER BY start_of_period ASC
-                )
-                GROUP BY status
-            """,
-            {**placeholders, "periods": periods, "events_query": events_query},
-            timings=timings,
+        lifecycle_sql = LIFECYCLE_QUERY.fill(
+            {**placeholders, "periods": periods, "events_query": events_query}, timings=timings
         )
 
-    response = execute_hogql_query(
-        team=team,
-        query=lifecycle_sql,
-        query_type="LifecycleQuery",
-        timings=timings,
-    )
+    with tag_predicted_query_cost(team, "LifecycleQuery", query_date_range.date_from(), query_date_range.date_to()):
+        response = execute_hogql_query(
+            team=team,
+            query=lifecycle_sql,
+            query_type="LifecycleQuery",
+            timings=timings,
+        )
 
     # ensure that the items are in a deterministic order
     order = {"new": 1, "returning": 2, "resurrecting": 3, "dormant": 4}
@@ -212,7 +228,7 @@ def run_lifecycle_query(team: Team, query: LifecycleQuery) -> LifecycleQueryResp
 
     res = []
     for val in results:
-        counts = val[1]
+        counts = [correct_result_for_sampling(count, sampling_factor) for count in val[1]]
         labels = [
             item.strftime("%-d-%b-%Y{}".format(" %H:%M" if query_date_range.interval_name == "hour" else ""))
             for item in val[0]
@@ -234,4 +250,4 @@ def run_lifecycle_query(team: Team, query: LifecycleQuery) -> LifecycleQueryResp
             }
         )
 
-    return LifecycleQueryResponse(result=res, timings=response.timings)
+    return LifecycleQueryResponse(result=res, samplingFactor=sampling_factor, timings=response.timings)
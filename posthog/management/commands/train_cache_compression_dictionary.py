@@ -0,0 +1,52 @@
+import zlib
+
+import zstandard
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from posthog.caching.tolerant_zstd_compressor import TolerantZstdCompressor
+from posthog.models.insight_caching_state import InsightCachingState
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a zstd dictionary on recently cached insight results, for use in REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, required=True, help="Path to write the trained dictionary to")
+        parser.add_argument("--samples", type=int, default=2000, help="Number of cached insight results to train on")
+        parser.add_argument("--dict-size", type=int, default=112640, help="Maximum size of the dictionary in bytes")
+        parser.add_argument("--level", type=int, default=3, help="zstd compression level to report ratios for")
+
+    def handle(self, *args, **options):
+        cache_keys = list(
+            InsightCachingState.objects.filter(last_refresh__isnull=False)
+            .order_by("-last_refresh")
+            .values_list("cache_key", flat=True)
+            .distinct()[: options["samples"]]
+        )
+        raw_values = get_redis_connection("default").mget([cache.make_key(key) for key in cache_keys])
+
+        compressor = TolerantZstdCompressor({})
+        samples = [compressor.decompress(value) for value in raw_values if value is not None]
+        if len(samples) < 10:
+            self.stdout.write(self.style.ERROR(f"Only found {len(samples)} cached insight results, not training"))
+            return
+
+        dictionary = zstandard.train_dictionary(options["dict_size"], samples, level=options["level"])
+        with open(options["output"], "wb") as f:
+            f.write(dictionary.as_bytes())
+
+        uncompressed_size = sum(len(sample) for sample in samples)
+        zlib_size = sum(len(zlib.compress(sample, TolerantZstdCompressor.preset)) for sample in samples)
+        zstd = zstandard.ZstdCompressor(level=options["level"])
+        zstd_size = sum(len(zstd.compress(sample)) for sample in samples)
+        zstd_with_dictionary = zstandard.ZstdCompressor(level=options["level"], dict_data=dictionary)
+        zstd_with_dictionary_size = sum(len(zstd_with_dictionary.compress(sample)) for sample in samples)
+
+        self.stdout.write(f"Trained dictionary {dictionary.dict_id()} on {len(samples)} samples: {options['output']}")
+        self.stdout.write(f"zlib ratio: {uncompressed_size / zlib_size:.2f}")
+        self.stdout.write(f"zstd ratio: {uncompressed_size / zstd_size:.2f}")
+        self.stdout.write(f"zstd with dictionary ratio: {uncompressed_size / zstd_with_dictionary_size:.2f}")
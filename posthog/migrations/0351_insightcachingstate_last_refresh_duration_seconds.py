@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2023-09-14 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0350_add_notebook_text_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insightcachingstate",
+            name="last_refresh_duration_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,33 @@
+import re
+import time
+from collections import defaultdict
 from typing import Any, Dict, List, Set, Tuple
 
+from django.conf import settings
+from prometheus_client import Counter
+
 from posthog.client import sync_execute
 from posthog.models.async_deletion import AsyncDeletion, DeletionType
 from posthog.models.async_deletion.delete import AsyncDeletionProcess, logger
 from posthog.settings.data_stores import CLICKHOUSE_CLUSTER
 
+ASYNC_DELETION_MUTATIONS_COUNTER = Counter(
+    "posthog_async_deletion_mutations",
+    "Partition-scoped mutations issued to delete events",
+)
+ASYNC_DELETION_ROWS_COUNTER = Counter(
+    "posthog_async_deletion_rows",
+    "Rows of events matched by issued partition-scoped deletion mutations",
+)
+ASYNC_DELETION_THROTTLED_COUNTER = Counter(
+    "posthog_async_deletion_throttled",
+    "Times deleting events left partitions to the next run, as the ClickHouse mutations backlog was full",
+)
+
+# Partition ID of an events row, matching the `PARTITION BY` of sharded_events
+EVENTS_PARTITION_ID_EXPR = "toString(toYYYYMM(timestamp))"
+PARTITION_ID_IN_MUTATION_REGEX = re.compile(r"IN PARTITION ID '(\w+)'")
+
 # Note: Session recording, dead letter queue, logs deletion will be handled by TTL
 TABLES_TO_DELETE_TEAM_DATA_FROM = [
     "person",
@@ -30,15 +53,18 @@ class AsyncEventDeletion(AsyncDeletionProcess):
             {"count": len(deletions), "team_ids": list(set(row.team_id for row in deletions))},
         )
 
-        conditions, args = self._conditions(deletions)
-        sync_execute(
-            f"""
-            DELETE FROM sharded_events
-            ON CLUSTER '{CLICKHOUSE_CLUSTER}'
-            WHERE {" OR ".join(conditions)}
-            """,
-            args,
-        )
+        if settings.ASYNC_DELETION_BY_PARTITION:
+            self._delete_events_by_partition(deletions)
+        else:
+            conditions, args = self._conditions(deletions)
+            sync_execute(
+                f"""
+                DELETE FROM sharded_events
+                ON CLUSTER '{CLICKHOUSE_CLUSTER}'
+                WHERE {" OR ".join(conditions)}
+                """,
+                args,
+            )
 
         # Team data needs to be deleted from other models as well, groups/persons handles deletions on a schema level
         team_deletions = [row for row in deletions if row.deletion_type == DeletionType.Team]
@@ -61,6 +87,113 @@ class AsyncEventDeletion(AsyncDeletionProcess):
                 args,
             )
 
+    def _delete_events_by_partition(self, deletions: List[AsyncDeletion]):
+        """
+        Deletes events with one mutation per affected partition, instead of a mutation over every partition.
+
+        Partitions that still have deletion mutations running are skipped, as their events would be deleted again.
+        They're deleted on the next run. Mutations are only issued while the mutations backlog is below
+        ASYNC_DELETION_MAX_PENDING_MUTATIONS, once it's full the remaining partitions are left to the next run as well,
+        rather than holding up the worker until the backlog shrinks.
+        """
+        start_time = time.monotonic()
+        plan = self._plan_by_partition(deletions)
+        pending_partitions = self._pending_mutation_partitions()
+
+        mutations, rows = 0, 0
+        for index, (partition_id, (partition_deletions, partition_rows)) in enumerate(sorted(plan.items())):
+            if partition_id in pending_partitions:
+                logger.info("Skipping partition with deletions still running", {"partition_id": partition_id})
+                continue
+            if self._mutations_backlog_is_full():
+                ASYNC_DELETION_THROTTLED_COUNTER.inc()
+                logger.warn(
+                    "Stopped deleting events, the mutations backlog is full",
+                    {"remaining_partitions": len(plan) - index},
+                )
+                break
+
+            conditions, args = self._conditions(sorted(partition_deletions, key=lambda row: row.team_id))
+            sync_execute(
+                f"""
+                ALTER TABLE sharded_events
+                ON CLUSTER '{CLICKHOUSE_CLUSTER}'
+                DELETE IN PARTITION ID %(partition_id)s
+                WHERE {" OR ".join(conditions)}
+                """,
+                {**args, "partition_id": partition_id},
+            )
+            mutations += 1
+            rows += partition_rows
+            ASYNC_DELETION_MUTATIONS_COUNTER.inc()
+            ASYNC_DELETION_ROWS_COUNTER.inc(partition_rows)
+            logger.info(
+                "Issued partition deletion",
+                {
+                    "partition_id": partition_id,
+                    "deletions": len(partition_deletions),
+                    "rows": partition_rows,
+                    "progress": f"{index + 1}/{len(plan)}",
+                },
+            )
+
+        duration = time.monotonic() - start_time
+        logger.info(
+            "Finished issuing partition deletions",
+            {
+                "partitions": len(plan),
+                "mutations": mutations,
+                "skipped_partitions": len(pending_partitions & plan.keys()),
+                "rows": rows,
+                "duration_seconds": round(duration, 2),
+                "rows_per_second": round(rows / duration) if duration > 0 else None,
+            },
+        )
+
+    def _plan_by_partition(self, deletions: List[AsyncDeletion]) -> Dict[str, Tuple[List[AsyncDeletion], int]]:
+        conditions, args = self._conditions(deletions)
+        deletion_index = ", ".join(f"{condition}, {index}" for index, condition in enumerate(conditions))
+        rows = sync_execute(
+            f"""
+            SELECT {EVENTS_PARTITION_ID_EXPR} AS partition_id, multiIf({deletion_index}, -1) AS deletion_index, count()
+            FROM events
+            WHERE {" OR ".join(conditions)}
+            GROUP BY partition_id, deletion_index
+            """,
+            args,
+        )
+
+        partition_deletions: Dict[str, List[AsyncDeletion]] = defaultdict(list)
+        partition_rows: Dict[str, int] = defaultdict(int)
+        for partition_id, index, count in rows:
+            partition_deletions[partition_id].append(deletions[index])
+            partition_rows[partition_id] += count
+        return {
+            partition_id: (partition_deletions[partition_id], partition_rows[partition_id])
+            for partition_id in partition_deletions
+        }
+
+    def _pending_mutation_partitions(self) -> Set[str]:
+        partitions = set()
+        for (command,) in self._pending_mutations():
+            match = PARTITION_ID_IN_MUTATION_REGEX.search(command)
+            if match is not None:
+                partitions.add(match.group(1))
+        return partitions
+
+    def _pending_mutations(self) -> List[Tuple[str]]:
+        return sync_execute(
+            """
+            SELECT command
+            FROM clusterAllReplicas(%(cluster)s, system, 'mutations')
+            WHERE NOT is_done AND table = 'sharded_events' AND database = currentDatabase()
+            """,
+            {"cluster": CLICKHOUSE_CLUSTER},
+        )
+
+    def _mutations_backlog_is_full(self) -> bool:
+        return len(self._pending_mutations()) >= settings.ASYNC_DELETION_MAX_PENDING_MUTATIONS
+
     def _verify_by_group(self, deletion_type: int, async_deletions: List[AsyncDeletion]) -> List[AsyncDeletion]:
         if deletion_type == DeletionType.Team:
             team_ids_with_data = self._verify_by_column("team_id", async_deletions)
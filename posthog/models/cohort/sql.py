@@ -88,3 +88,64 @@ STALE_COHORTPEOPLE = f"""
 SELECT count() FROM cohortpeople
 WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s AND version < %(version)s
 """
+
+# Incremental recalculation of "performed event X in the last N days" cohorts. Rather than rescanning the whole
+# window, only events newer than the previous watermark (additions) and events that fell out of the window since then
+# (removal candidates) are read. The surviving members of the current version are carried over into the new version.
+INCREMENTAL_COHORT_ADDITIONS_SQL = """
+SELECT DISTINCT pdi.person_id AS id
+FROM events e
+INNER JOIN ({GET_TEAM_PERSON_DISTINCT_IDS}) AS pdi ON e.distinct_id = pdi.distinct_id
+WHERE team_id = %(team_id)s
+AND timestamp > toDateTime(%(additions_from)s, 'UTC') AND timestamp < toDateTime(%(watermark)s, 'UTC')
+AND ({additions_condition})
+"""
+
+INCREMENTAL_COHORT_REMOVAL_CANDIDATES_SQL = """
+SELECT distinct_id, person_id
+FROM ({GET_TEAM_PERSON_DISTINCT_IDS})
+WHERE person_id IN (
+    SELECT pdi.person_id
+    FROM events e
+    INNER JOIN ({GET_TEAM_PERSON_DISTINCT_IDS}) AS pdi ON e.distinct_id = pdi.distinct_id
+    WHERE team_id = %(team_id)s
+    AND timestamp > toDateTime(%(aging_from)s, 'UTC') AND timestamp <= toDateTime(%(aging_to)s, 'UTC')
+    AND ({aging_condition})
+)
+"""
+
+# Only the events of the persons with events aging out of the window are read from the rest of the window, so that
+# removals don't read the whole window
+INCREMENTAL_COHORT_REMOVALS_SQL = """
+SELECT DISTINCT person_id AS id
+FROM ({candidates_query}) AS candidates
+WHERE person_id NOT IN (
+    SELECT pdi.person_id
+    FROM events e
+    INNER JOIN ({candidates_query}) AS pdi ON e.distinct_id = pdi.distinct_id
+    WHERE team_id = %(team_id)s
+    AND timestamp > toDateTime(%(window_from)s, 'UTC') AND timestamp < toDateTime(%(watermark)s, 'UTC')
+    AND e.distinct_id IN (SELECT distinct_id FROM ({candidates_query}))
+    AND ({window_condition})
+)
+"""
+
+INCREMENTAL_RECALCULATE_COHORT_BY_ID = """
+INSERT INTO cohortpeople
+SELECT id, %(cohort_id)s as cohort_id, %(team_id)s as team_id, 1 AS sign, %(new_version)s AS version
+FROM (
+    SELECT DISTINCT id FROM (
+        SELECT person_id AS id
+        FROM cohortpeople
+        WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s AND version = %(current_version)s
+        GROUP BY person_id
+        HAVING sum(sign) > 0 AND person_id NOT IN ({removals_query})
+        UNION ALL
+        {additions_query}
+    )
+) as person
+UNION ALL
+SELECT person_id, cohort_id, team_id, -1, version
+FROM cohortpeople
+WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s AND version < %(new_version)s AND sign = 1
+"""
@@ -1,6 +1,20 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from posthog.client import sync_execute
 from posthog.models.cohort import Cohort
-from posthog.models.cohort.util import get_dependent_cohorts, simplified_cohort_filter_properties
-from posthog.test.base import BaseTest, _create_person, flush_persons_and_events
+from posthog.models.cohort.sql import GET_COHORTPEOPLE_BY_COHORT_ID
+from posthog.models.cohort.util import (
+    IncrementalCohortState,
+    get_cohort_definition_hash,
+    get_dependent_cohorts,
+    get_incremental_cohort_properties,
+    get_incremental_cohort_state,
+    set_incremental_cohort_state,
+    simplified_cohort_filter_properties,
+)
+from posthog.test.base import BaseTest, _create_event, _create_person, flush_persons_and_events
 
 
 def _create_cohort(**kwargs):
@@ -358,3 +372,119 @@ class TestDependentCohorts(BaseTest):
         self.assertEqual(get_dependent_cohorts(cohort3), [cohort2, cohort1])
         self.assertEqual(get_dependent_cohorts(cohort4), [cohort1])
         self.assertEqual(get_dependent_cohorts(cohort5), [cohort4, cohort1, cohort2])
+
+
+def _performed_event_filter(event: str = "$pageview", **kwargs):
+    return {
+        "key": event,
+        "event_type": "events",
+        "time_value": 1,
+        "time_interval": "day",
+        "value": "performed_event",
+        "type": "behavioral",
+        **kwargs,
+    }
+
+
+class TestIncrementalCohortCalculation(BaseTest):
+    CLASS_DATA_LEVEL_SETUP = False
+
+    def _create_behavioral_cohort(self, *groups):
+        return Cohort.objects.create(
+            team=self.team,
+            name="behavioral",
+            filters={"properties": {"type": "OR", "values": [{"type": "AND", "values": values} for values in groups]}},
+        )
+
+    def _cohort_members(self, cohort: Cohort):
+        return sorted(
+            str(row[0])
+            for row in sync_execute(
+                GET_COHORTPEOPLE_BY_COHORT_ID,
+                {"cohort_id": cohort.pk, "team_id": self.team.pk, "version": cohort.version},
+            )
+        )
+
+    def test_incremental_properties_for_performed_event_union(self):
+        cohort = self._create_behavioral_cohort(
+            [_performed_event_filter("$pageview")], [_performed_event_filter("$autocapture", time_interval="week")]
+        )
+
+        properties = get_incremental_cohort_properties(cohort)
+
+        assert properties is not None
+        self.assertEqual([prop.key for prop in properties], ["$pageview", "$autocapture"])
+
+    def test_incremental_properties_not_supported(self):
+        cohorts = [
+            self._create_behavioral_cohort([_performed_event_filter(), _performed_event_filter("$autocapture")]),
+            self._create_behavioral_cohort([_performed_event_filter(negation=True)]),
+            self._create_behavioral_cohort([_performed_event_filter(time_interval="month")]),
+            self._create_behavioral_cohort([_performed_event_filter(event_type="actions")]),
+            self._create_behavioral_cohort([_performed_event_filter(value="performed_event_multiple")]),
+            self._create_behavioral_cohort([{"key": "email", "value": "a@b.com", "type": "person"}]),
+            Cohort.objects.create(team=self.team, groups=[], is_static=True),
+        ]
+
+        for cohort in cohorts:
+            self.assertIsNone(get_incremental_cohort_properties(cohort))
+
+    def test_incremental_state_invalidated_by_definition_change(self):
+        cohort = self._create_behavioral_cohort([_performed_event_filter()])
+        cohort.version = 1
+        now = timezone.now()
+        properties = get_incremental_cohort_properties(cohort)
+        assert properties is not None
+
+        set_incremental_cohort_state(
+            cohort,
+            IncrementalCohortState(
+                version=1, watermark=now, full_calculation_at=now, definition_hash=get_cohort_definition_hash(cohort)
+            ),
+        )
+        self.assertIsNotNone(get_incremental_cohort_state(cohort, properties, now + timedelta(minutes=15)))
+        # Watermark older than the window
+        self.assertIsNone(get_incremental_cohort_state(cohort, properties, now + timedelta(days=1)))
+
+        cohort.filters = {"properties": {"type": "OR", "values": [_performed_event_filter("$autocapture")]}}
+        self.assertIsNone(get_incremental_cohort_state(cohort, properties, now + timedelta(minutes=15)))
+
+    def test_incremental_recalculation_matches_full_recalculation(self):
+        now = timezone.now()
+        p1 = _create_person(team_id=self.team.pk, distinct_ids=["p1"])
+        p2 = _create_person(team_id=self.team.pk, distinct_ids=["p2"])
+        p3 = _create_person(team_id=self.team.pk, distinct_ids=["p3"])
+        p4 = _create_person(team_id=self.team.pk, distinct_ids=["p4", "p4_other"])
+        _create_event(team=self.team, event="$pageview", distinct_id="p1", timestamp=now - timedelta(hours=2))
+        _create_event(team=self.team, event="$pageview", distinct_id="p4", timestamp=now - timedelta(hours=3))
+        _create_event(team=self.team, event="$pageview", distinct_id="p4_other", timestamp=now - timedelta(hours=25))
+        flush_persons_and_events()
+
+        cohort = self._create_behavioral_cohort([_performed_event_filter()])
+        with self.settings(COHORT_INCREMENTAL_CALCULATION=True):
+            cohort.calculate_people_ch(pending_version=1)
+        self.assertEqual(self._cohort_members(cohort), sorted([str(p1.uuid), str(p4.uuid)]))
+
+        # p3 was a member when the watermark was set two hours ago, but their only event has since aged out
+        _create_event(team=self.team, event="$pageview", distinct_id="p3", timestamp=now - timedelta(hours=25))
+        _create_event(team=self.team, event="$pageview", distinct_id="p2", timestamp=now - timedelta(minutes=1))
+        flush_persons_and_events()
+        sync_execute(
+            "INSERT INTO cohortpeople (person_id, cohort_id, team_id, sign, version) VALUES",
+            [(p3.uuid, cohort.pk, self.team.pk, 1, 1)],
+        )
+        set_incremental_cohort_state(
+            cohort,
+            IncrementalCohortState(
+                version=1,
+                watermark=now - timedelta(hours=2),
+                full_calculation_at=now - timedelta(hours=2),
+                definition_hash=get_cohort_definition_hash(cohort),
+            ),
+        )
+
+        with self.settings(COHORT_INCREMENTAL_CALCULATION=True):
+            cohort.calculate_people_ch(pending_version=2)
+
+        self.assertEqual(cohort.version, 2)
+        self.assertEqual(self._cohort_members(cohort), sorted([str(p1.uuid), str(p2.uuid), str(p4.uuid)]))
@@ -1,4 +1,7 @@
+import hashlib
+import json
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -10,6 +13,7 @@ from rest_framework.exceptions import ValidationError
 
 from posthog.client import sync_execute
 from posthog.constants import PropertyOperatorType
+from posthog.redis import get_client
 from posthog.hogql.hogql import HogQLContext
 from posthog.models import Action, Filter, Team
 from posthog.models.action.util import format_action_filter
@@ -22,6 +26,10 @@ from posthog.models.cohort.sql import (
     GET_PERSON_ID_BY_PRECALCULATED_COHORT_ID,
     GET_STATIC_COHORT_SIZE_SQL,
     GET_STATIC_COHORTPEOPLE_BY_PERSON_UUID,
+    INCREMENTAL_COHORT_ADDITIONS_SQL,
+    INCREMENTAL_COHORT_REMOVAL_CANDIDATES_SQL,
+    INCREMENTAL_COHORT_REMOVALS_SQL,
+    INCREMENTAL_RECALCULATE_COHORT_BY_ID,
     RECALCULATE_COHORT_BY_ID,
     STALE_COHORTPEOPLE,
 )
@@ -31,13 +39,18 @@ from posthog.models.person.sql import (
     INSERT_PERSON_STATIC_COHORT,
     PERSON_STATIC_COHORT_TABLE,
 )
-from posthog.models.property import Property, PropertyGroup
+from posthog.models.property import BehavioralPropertyType, Property, PropertyGroup
 from posthog.queries.insight import insight_sync_execute
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 
 # temporary marker to denote when cohortpeople table started being populated
 TEMP_PRECALCULATED_MARKER = parser.parse("2021-06-07T15:00:00+00:00")
 
+INCREMENTAL_COHORT_STATE_KEY = "cohort_incremental_state_{cohort_id}"
+INCREMENTAL_COHORT_STATE_TTL = 7 * 24 * 60 * 60
+# Month and year intervals are calendar based in ClickHouse, so they can't be expressed as a fixed window
+INCREMENTAL_COHORT_INTERVALS = ("minute", "hour", "day", "week")
+
 logger = structlog.get_logger(__name__)
 
 
@@ -248,28 +261,60 @@ def get_static_cohort_size(cohort: Cohort) -> Optional[int]:
 
 def recalculate_cohortpeople(cohort: Cohort, pending_version: int) -> Optional[int]:
     hogql_context = HogQLContext(within_non_hogql_query=True, team_id=cohort.team_id)
-    cohort_query, cohort_params = format_person_query(cohort, 0, hogql_context)
+    calculation_time = timezone.now()
+
+    incremental_properties = (
+        get_incremental_cohort_properties(cohort) if settings.COHORT_INCREMENTAL_CALCULATION else None
+    )
+    incremental_state = (
+        get_incremental_cohort_state(cohort, incremental_properties, calculation_time)
+        if incremental_properties is not None
+        else None
+    )
 
     before_count = get_cohort_size(cohort)
 
     if before_count:
         logger.warn(
-            "Recalculating cohortpeople starting", team_id=cohort.team_id, cohort_id=cohort.pk, size_before=before_count
+            "Recalculating cohortpeople starting",
+            team_id=cohort.team_id,
+            cohort_id=cohort.pk,
+            size_before=before_count,
+            incremental=incremental_state is not None,
         )
 
-    recalcluate_cohortpeople_sql = RECALCULATE_COHORT_BY_ID.format(cohort_filter=cohort_query)
-
-    sync_execute(
-        recalcluate_cohortpeople_sql,
-        {
-            **cohort_params,
-            **hogql_context.values,
-            "cohort_id": cohort.pk,
-            "team_id": cohort.team_id,
-            "new_version": pending_version,
-        },
-        settings={"optimize_on_insert": 0},
-    )
+    if incremental_properties is not None and incremental_state is not None:
+        recalculate_cohortpeople_incrementally(
+            cohort, pending_version, incremental_properties, incremental_state, calculation_time
+        )
+        full_calculation_at = incremental_state.full_calculation_at
+    else:
+        cohort_query, cohort_params = format_person_query(cohort, 0, hogql_context)
+        recalcluate_cohortpeople_sql = RECALCULATE_COHORT_BY_ID.format(cohort_filter=cohort_query)
+
+        sync_execute(
+            recalcluate_cohortpeople_sql,
+            {
+                **cohort_params,
+                **hogql_context.values,
+                "cohort_id": cohort.pk,
+                "team_id": cohort.team_id,
+                "new_version": pending_version,
+            },
+            settings={"optimize_on_insert": 0},
+        )
+        full_calculation_at = calculation_time
+
+    if incremental_properties is not None:
+        set_incremental_cohort_state(
+            cohort,
+            IncrementalCohortState(
+                version=pending_version,
+                watermark=calculation_time,
+                full_calculation_at=full_calculation_at,
+                definition_hash=get_cohort_definition_hash(cohort),
+            ),
+        )
 
     count = get_cohort_size(cohort, override_version=pending_version)
 
@@ -285,6 +330,193 @@ def recalculate_cohortpeople(cohort: Cohort, pending_version: int) -> Optional[i
     return count
 
 
+@dataclass
+class IncrementalCohortState:
+    # Version of cohortpeople the state describes
+    version: int
+    # Events up to this point in time have been taken into account
+    watermark: datetime
+    full_calculation_at: datetime
+    definition_hash: str
+
+
+def get_incremental_cohort_properties(cohort: Cohort) -> Optional[List[Property]]:
+    """
+    Returns the filters of a cohort if its membership can be maintained incrementally, i.e. if the cohort is a
+    union of "performed event X in the last N <interval>" filters. Returns None otherwise.
+    """
+    if cohort.is_static:
+        return None
+
+    def _is_union(group: PropertyGroup) -> bool:
+        if group.type != PropertyOperatorType.OR and len(group.values) > 1:
+            return False
+        return all(_is_union(value) for value in group.values if isinstance(value, PropertyGroup))
+
+    if not _is_union(cohort.properties):
+        return None
+
+    properties = cohort.properties.flat
+    if not properties:
+        return None
+
+    for prop in properties:
+        if (
+            prop.type != "behavioral"
+            or prop.value != BehavioralPropertyType.PERFORMED_EVENT
+            or prop.negation
+            # Actions can be edited without the cohort changing, which would silently invalidate the membership
+            or prop.event_type != "events"
+            or prop.time_interval not in INCREMENTAL_COHORT_INTERVALS
+        ):
+            return None
+        try:
+            if int(prop.time_value) <= 0:  # type: ignore
+                return None
+        except (TypeError, ValueError):
+            return None
+
+    return properties
+
+
+def get_cohort_definition_hash(cohort: Cohort) -> str:
+    return hashlib.sha256(json.dumps(cohort.properties.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+def get_incremental_cohort_state(
+    cohort: Cohort, properties: List[Property], calculation_time: datetime
+) -> Optional[IncrementalCohortState]:
+    """
+    Returns the state of the previous calculation if the next one can be done incrementally on top of it.
+    """
+    raw_state = get_client().get(INCREMENTAL_COHORT_STATE_KEY.format(cohort_id=cohort.pk))
+    if raw_state is None or cohort.version is None:
+        return None
+
+    try:
+        data = json.loads(raw_state)
+        state = IncrementalCohortState(
+            version=int(data["version"]),
+            watermark=parser.isoparse(data["watermark"]),
+            full_calculation_at=parser.isoparse(data["full_calculation_at"]),
+            definition_hash=data["definition_hash"],
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if state.version != cohort.version or state.definition_hash != get_cohort_definition_hash(cohort):
+        return None
+    if calculation_time - state.full_calculation_at > timedelta(
+        hours=settings.COHORT_INCREMENTAL_FULL_RECALCULATION_HOURS
+    ):
+        return None
+    # If more time than the shortest window has passed, every member has to be re-checked anyway
+    if calculation_time - state.watermark >= min(_get_window(prop) for prop in properties):
+        return None
+
+    return state
+
+
+def set_incremental_cohort_state(cohort: Cohort, state: IncrementalCohortState) -> None:
+    get_client().set(
+        INCREMENTAL_COHORT_STATE_KEY.format(cohort_id=cohort.pk),
+        json.dumps(
+            {
+                "version": state.version,
+                "watermark": state.watermark.isoformat(),
+                "full_calculation_at": state.full_calculation_at.isoformat(),
+                "definition_hash": state.definition_hash,
+            }
+        ),
+        ex=INCREMENTAL_COHORT_STATE_TTL,
+    )
+
+
+def recalculate_cohortpeople_incrementally(
+    cohort: Cohort,
+    pending_version: int,
+    properties: List[Property],
+    state: IncrementalCohortState,
+    calculation_time: datetime,
+) -> None:
+    """
+    Writes `pending_version` of the cohort from its current version by adding persons who performed one of the
+    events since the last watermark and removing persons whose last matching event has fallen out of the window.
+    """
+    hogql_context = HogQLContext(within_non_hogql_query=True, team_id=cohort.team_id)
+    lag = timedelta(seconds=settings.COHORT_INCREMENTAL_INGESTION_LAG_SECONDS)
+
+    params: Dict[str, Any] = {}
+    additions_conditions, aging_conditions, window_conditions = [], [], []
+    additions_from, aging_from, aging_to, window_from = [], [], [], []
+
+    for idx, prop in enumerate(properties):
+        entity_query, entity_params = get_entity_query(
+            str(prop.key), None, cohort.team_id, f"incremental_{idx}", hogql_context
+        )
+        params.update(entity_params)
+
+        window = _get_window(prop)
+        prop_additions_from = max(state.watermark - lag, calculation_time - window)
+        prop_aging_from, prop_aging_to = state.watermark - window, calculation_time - window
+
+        params[f"incremental_{idx}_additions_from"] = _format_timestamp(prop_additions_from)
+        params[f"incremental_{idx}_aging_from"] = _format_timestamp(prop_aging_from)
+        params[f"incremental_{idx}_aging_to"] = _format_timestamp(prop_aging_to)
+
+        additions_conditions.append(
+            f"(timestamp > toDateTime(%(incremental_{idx}_additions_from)s, 'UTC') AND {entity_query})"
+        )
+        aging_conditions.append(
+            f"(timestamp > toDateTime(%(incremental_{idx}_aging_from)s, 'UTC') AND timestamp <= toDateTime(%(incremental_{idx}_aging_to)s, 'UTC') AND {entity_query})"
+        )
+        window_conditions.append(f"(timestamp > toDateTime(%(incremental_{idx}_aging_to)s, 'UTC') AND {entity_query})")
+
+        additions_from.append(prop_additions_from)
+        aging_from.append(prop_aging_from)
+        aging_to.append(prop_aging_to)
+        window_from.append(prop_aging_to)
+
+    distinct_ids_query = get_team_distinct_ids_query(cohort.team_id)
+    additions_query = INCREMENTAL_COHORT_ADDITIONS_SQL.format(
+        GET_TEAM_PERSON_DISTINCT_IDS=distinct_ids_query, additions_condition=" OR ".join(additions_conditions)
+    )
+    candidates_query = INCREMENTAL_COHORT_REMOVAL_CANDIDATES_SQL.format(
+        GET_TEAM_PERSON_DISTINCT_IDS=distinct_ids_query, aging_condition=" OR ".join(aging_conditions)
+    )
+    removals_query = INCREMENTAL_COHORT_REMOVALS_SQL.format(
+        candidates_query=candidates_query, window_condition=" OR ".join(window_conditions)
+    )
+
+    sync_execute(
+        INCREMENTAL_RECALCULATE_COHORT_BY_ID.format(additions_query=additions_query, removals_query=removals_query),
+        {
+            **params,
+            **hogql_context.values,
+            "cohort_id": cohort.pk,
+            "team_id": cohort.team_id,
+            "current_version": state.version,
+            "new_version": pending_version,
+            "watermark": _format_timestamp(calculation_time),
+            "additions_from": _format_timestamp(min(additions_from)),
+            "aging_from": _format_timestamp(min(aging_from)),
+            "aging_to": _format_timestamp(max(aging_to)),
+            "window_from": _format_timestamp(min(window_from)),
+        },
+        settings={"optimize_on_insert": 0},
+    )
+
+
+def _get_window(prop: Property) -> timedelta:
+    from posthog.queries.foss_cohort_query import relative_date_to_seconds
+
+    return timedelta(seconds=relative_date_to_seconds((int(prop.time_value), prop.time_interval)))  # type: ignore
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
 def clear_stale_cohortpeople(cohort: Cohort, before_version: int) -> None:
     if cohort.version and cohort.version > 0:
         stale_count_result = sync_execute(
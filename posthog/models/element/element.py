@@ -1,5 +1,6 @@
 import re
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
@@ -29,63 +30,187 @@ split_chain_regex = re.compile(r'(?:[^\s;"]|"(?:\\.|[^"])*")+')
 # Needs a regex because classes can have : too
 split_class_attributes = re.compile(r"(.*?)($|:([a-zA-Z\-\_0-9]*=.*))")
 
+chain_separators_regex = re.compile(r"[\s;]+")
+
+ATTRIBUTE_KEY_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-_0123456789")
+
+# Number of distinct parsed elements chains kept in memory by each process
+ELEMENTS_CHAIN_CACHE_SIZE = 4096
+
 
 def _escape(input: str) -> str:
     return input.replace('"', r"\"")
 
 
 def elements_to_string(elements: List[Element]) -> str:
-    ret = []
-    for element in elements:
-        el_string = ""
-        if element.tag_name:
-            el_string += element.tag_name
-        if element.attr_class:
-            for single_class in sorted(element.attr_class):
-                el_string += ".{}".format(single_class.replace('"', ""))
-        attributes = {
-            **({"text": element.text} if element.text else {}),
-            "nth-child": element.nth_child or 0,
-            "nth-of-type": element.nth_of_type or 0,
-            **({"href": element.href} if element.href else {}),
-            **({"attr_id": element.attr_id} if element.attr_id else {}),
-            **element.attributes,
-        }
-        attributes = {_escape(key): _escape(str(value)) for key, value in sorted(attributes.items())}
-        el_string += ":"
-        el_string += "".join(['{}="{}"'.format(key, value) for key, value in attributes.items()])
-        ret.append(el_string)
-    return ";".join(ret)
+    return ";".join([_element_to_string(element) for element in elements])
+
+
+def _element_to_string(element: Element) -> str:
+    el_string = element.tag_name or ""
+    if element.attr_class:
+        el_string += "".join(["." + single_class.replace('"', "") for single_class in sorted(element.attr_class)])
+    attributes = {"nth-child": element.nth_child or 0, "nth-of-type": element.nth_of_type or 0}
+    if element.text:
+        attributes["text"] = element.text
+    if element.href:
+        attributes["href"] = element.href
+    if element.attr_id:
+        attributes["attr_id"] = element.attr_id
+    attributes.update(element.attributes)
+    escaped_attributes = {_escape(key): _escape(str(value)) for key, value in sorted(attributes.items())}
+    return el_string + ":" + "".join([f'{key}="{value}"' for key, value in escaped_attributes.items()])
 
 
 def chain_to_elements(chain: str) -> List[Element]:
+    return [Element(**element) for element in parse_elements_chain(chain)]
+
+
+def parse_elements_chain(chain: str) -> List[Dict[str, Any]]:
+    """
+    Parses an elements chain into dicts shaped like serialized `Element`s, without going through model instances.
+
+    Chains repeat heavily (e.g. in toolbar heatmaps), so parsed chains are cached. Each call gets its own copies.
+    """
+    return [
+        {
+            **element,
+            "attr_class": list(element["attr_class"]) if element["attr_class"] is not None else None,
+            "attributes": dict(element["attributes"]),
+        }
+        for element in _parse_elements_chain_cached(chain)
+    ]
+
+
+@lru_cache(maxsize=ELEMENTS_CHAIN_CACHE_SIZE)
+def _parse_elements_chain_cached(chain: str) -> Tuple[Dict[str, Any], ...]:
+    el_strings = _split_chain(chain) if "\n" not in chain else None
+    if el_strings is None:
+        # Newlines and unterminated quotes are handled in ways by the regexes that aren't worth replicating
+        return tuple(_parse_elements_chain_with_regexes(chain))
+    return tuple(_parse_element(el_string, idx) for idx, el_string in enumerate(el_strings))
+
+
+def _split_chain(chain: str) -> Optional[List[str]]:
+    """Splits the chain by ; and whitespace, except within quotes, like `split_chain_regex`."""
+    el_strings = []
+    current = ""
+    position = 0
+    while True:
+        quote = chain.find('"', position)
+        parts = chain_separators_regex.split(chain[position:] if quote == -1 else chain[position:quote])
+        current += parts[0]
+        for part in parts[1:]:
+            if current:
+                el_strings.append(current)
+            current = part
+        if quote == -1:
+            break
+        closing = _find_closing_quote(chain, quote + 1)
+        if closing == -1:
+            return None
+        current += chain[quote : closing + 1]
+        position = closing + 1
+    if current:
+        el_strings.append(current)
+    return el_strings
+
+
+def _find_closing_quote(chain: str, start: int) -> int:
+    quote = chain.find('"', start)
+    while quote != -1:
+        # The quote is escaped if it's preceded by an odd number of backslashes
+        backslashes = 0
+        while quote - backslashes - 1 >= start and chain[quote - backslashes - 1] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return quote
+        quote = chain.find('"', quote + 1)
+    return -1
+
+
+def _parse_element(el_string: str, order: int) -> Dict[str, Any]:
+    element: Dict[str, Any] = {
+        "text": None,
+        "tag_name": None,
+        "attr_class": None,
+        "href": None,
+        "attr_id": None,
+        "nth_child": None,
+        "nth_of_type": None,
+        "attributes": {},
+        "order": order,
+    }
+
+    # Tag and classes end at the first : followed by an attribute key and =, classes can contain : too
+    split_at = -1
+    colon = el_string.find(":")
+    while colon != -1:
+        key_end = colon + 1
+        while key_end < len(el_string) and el_string[key_end] in ATTRIBUTE_KEY_CHARACTERS:
+            key_end += 1
+        if key_end < len(el_string) and el_string[key_end] == "=":
+            split_at = colon
+            break
+        colon = el_string.find(":", colon + 1)
+    tag_and_classes = el_string if split_at == -1 else el_string[:split_at]
+    attributes = "" if split_at == -1 else el_string[split_at + 1 :]
+
+    if tag_and_classes:
+        tag_and_class = tag_and_classes.split(".", 1)
+        element["tag_name"] = tag_and_class[0]
+        if len(tag_and_class) > 1:
+            element["attr_class"] = [cl for cl in tag_and_class[1].split(".") if cl != ""]
+
+    # Equivalent to `parse_attributes_regex`: key="value", where the value ends at the first unescaped quote
+    position = 0
+    while True:
+        key_end = attributes.find('="', position)
+        if key_end == -1:
+            break
+        value_end = attributes.find('"', key_end + 3)
+        while value_end != -1 and attributes[value_end - 1] == "\\":
+            value_end = attributes.find('"', value_end + 1)
+        if value_end == -1:
+            break
+        _set_attribute(element, attributes[position:key_end], attributes[key_end + 2 : value_end])
+        position = value_end + 1
+
+    return element
+
+
+def _set_attribute(element: Dict[str, Any], key: str, value: str) -> None:
+    if key == "href":
+        element["href"] = value
+    elif key == "nth-child":
+        element["nth_child"] = int(value)
+    elif key == "nth-of-type":
+        element["nth_of_type"] = int(value)
+    elif key == "text":
+        element["text"] = value
+    elif key == "attr_id":
+        element["attr_id"] = value
+    elif key:
+        element["attributes"][key] = value
+
+
+def _parse_elements_chain_with_regexes(chain: str) -> List[Dict[str, Any]]:
     elements = []
     for idx, el_string in enumerate(re.findall(split_chain_regex, chain)):
         el_string_split = re.findall(split_class_attributes, el_string)[0]
         attributes = re.finditer(parse_attributes_regex, el_string_split[2]) if len(el_string_split) > 2 else []
 
-        element = Element(order=idx)
+        element = _parse_element("", idx)
 
         if el_string_split[0]:
             tag_and_class = el_string_split[0].split(".", 1)
-            element.tag_name = tag_and_class[0]
+            element["tag_name"] = tag_and_class[0]
             if len(tag_and_class) > 1:
-                element.attr_class = [cl for cl in tag_and_class[1].split(".") if cl != ""]
+                element["attr_class"] = [cl for cl in tag_and_class[1].split(".") if cl != ""]
 
         for ii in attributes:
             item = ii.groupdict()
-            if item["key"] == "href":
-                element.href = item["value"]
-            elif item["key"] == "nth-child":
-                element.nth_child = int(item["value"])
-            elif item["key"] == "nth-of-type":
-                element.nth_of_type = int(item["value"])
-            elif item["key"] == "text":
-                element.text = item["value"]
-            elif item["key"] == "attr_id":
-                element.attr_id = item["value"]
-            elif item["key"]:
-                element.attributes[item["key"]] = item["value"]
+            _set_attribute(element, item["key"], item["value"])
 
         elements.append(element)
     return elements
@@ -1,5 +1,9 @@
-from datetime import timedelta
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Union
+from uuid import UUID
 from zoneinfo import ZoneInfo
 
 from dateutil.parser import isoparse
@@ -19,6 +23,44 @@ from posthog.models.property.util import parse_prop_grouped_clauses
 from posthog.queries.insight import insight_query_with_columns
 from posthog.utils import relative_date_parse
 
+# Time windows searched for events, starting from the newest, before falling back to scanning all history
+EVENTS_LIST_WINDOWS = [
+    timedelta(hours=1),
+    timedelta(days=1),
+    timedelta(days=7),
+    timedelta(days=30),
+    timedelta(days=365),
+]
+
+
+@dataclass(frozen=True)
+class EventsCursor:
+    """Position of the last event of a page, encoded as an opaque string for the API."""
+
+    timestamp: datetime
+    uuid: str
+
+    def encode(self) -> str:
+        payload = json.dumps({"t": self.timestamp.astimezone(ZoneInfo("UTC")).isoformat(), "u": self.uuid})
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def decode(cls, value: str) -> "EventsCursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(value.encode("ascii")))
+            timestamp = isoparse(payload["t"])
+            # Cursors come from the client, so they're validated before being used in queries
+            uuid = str(UUID(payload["u"]))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise ValueError("Invalid events cursor")
+        if timestamp.tzinfo is None:
+            raise ValueError("Invalid events cursor")
+        return cls(timestamp=timestamp, uuid=uuid)
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    return timestamp.astimezone(ZoneInfo("UTC")).strftime("%Y-%m-%d %H:%M:%S.%f")
+
 
 def determine_event_conditions(
     conditions: Dict[str, Union[None, str, List[str]]], tzinfo: ZoneInfo
@@ -65,6 +107,9 @@ def query_events_list(
     unbounded_date_from: bool = False,
     limit: int = DEFAULT_RETURNED_ROWS,
     offset: int = 0,
+    cursor: Optional[EventsCursor] = None,
+    window_from: Optional[datetime] = None,
+    window_to: Optional[datetime] = None,
 ) -> List:
     # Note: This code is inefficient and problematic, see https://github.com/PostHog/posthog/issues/13485 for details.
     # To isolate its impact from rest of the queries its queries are run on different nodes as part of "offline" workloads.
@@ -77,15 +122,36 @@ def query_events_list(
         limit_sql += " OFFSET %(offset)s"
 
     workload = Workload.OFFLINE if unbounded_date_from else Workload.ONLINE
+    order = "DESC" if len(order_by) == 1 and order_by[0] == "-timestamp" else "ASC"
+
+    request_conditions = dict(request_get_query_dict)
+    if cursor:
+        # The cursor replaces the timestamp bound the page was requested with
+        request_conditions.pop("before" if order == "DESC" else "after", None)
 
     conditions, condition_params = determine_event_conditions(
         {
-            "after": None if unbounded_date_from else (now() - timedelta(days=1)).isoformat(),
+            "after": None if unbounded_date_from or window_from or cursor else (now() - timedelta(days=1)).isoformat(),
             "before": (now() + timedelta(seconds=5)).isoformat(),
-            **request_get_query_dict,
+            **request_conditions,
         },
         tzinfo=team.timezone_info,
     )
+    if window_from:
+        conditions += "AND timestamp >= %(window_from)s "
+        condition_params["window_from"] = _format_timestamp(window_from)
+    if window_to:
+        conditions += "AND timestamp < %(window_to)s "
+        condition_params["window_to"] = _format_timestamp(window_to)
+    if cursor:
+        operator = "<" if order == "DESC" else ">"
+        # The plain timestamp comparison lets ClickHouse skip granules using the sorting key
+        conditions += f"AND timestamp {operator}= %(cursor_timestamp)s "
+        conditions += (
+            f"AND (timestamp, uuid) {operator} (toDateTime64(%(cursor_timestamp)s, 6, 'UTC'), toUUID(%(cursor_uuid)s)) "
+        )
+        condition_params["cursor_timestamp"] = _format_timestamp(cursor.timestamp)
+        condition_params["cursor_uuid"] = cursor.uuid
     prop_filters, prop_filter_params = parse_prop_grouped_clauses(
         team_id=team.pk, property_group=filter.property_groups, has_person_id_joined=False, hogql_context=hogql_context
     )
@@ -102,7 +168,6 @@ def query_events_list(
         prop_filters += " AND {}".format(action_query)
         prop_filter_params = {**prop_filter_params, **params}
 
-    order = "DESC" if len(order_by) == 1 and order_by[0] == "-timestamp" else "ASC"
     if prop_filters != "":
         return insight_query_with_columns(
             SELECT_EVENT_BY_TEAM_AND_CONDITIONS_FILTERS_SQL.format(
@@ -134,3 +199,83 @@ def query_events_list(
             workload=workload,
             team_id=team.pk,
         )
+
+
+def query_events_list_by_cursor(
+    filter: Filter,
+    team: Team,
+    request_get_query_dict: Dict,
+    order_by: List[str],
+    action_id: Optional[str],
+    limit: int = DEFAULT_RETURNED_ROWS,
+    cursor: Optional[EventsCursor] = None,
+) -> List:
+    """
+    Returns up to `limit + 1` events following `cursor`, the extra event signalling that there is a next page.
+
+    Newest-first pages are searched for in growing time windows (see `EVENTS_LIST_WINDOWS`), stopping as soon as
+    the page is full, so that sparse filters and deep pages only scan as much history as they need to.
+    """
+    if len(order_by) != 1 or order_by[0] != "-timestamp":
+        query_args = dict(
+            filter=filter,
+            team=team,
+            limit=limit,
+            request_get_query_dict=request_get_query_dict,
+            order_by=order_by,
+            action_id=action_id,
+            cursor=cursor,
+        )
+        results = query_events_list(**query_args)
+        # Retry the query without the 1 day optimization
+        if len(results) < limit and not request_get_query_dict.get("after") and not cursor:
+            results = query_events_list(unbounded_date_from=True, **query_args)
+        return results
+
+    if cursor:
+        upper_bound = cursor.timestamp
+    elif request_get_query_dict.get("before"):
+        upper_bound = _parse_timestamp(request_get_query_dict["before"], team)
+    else:
+        upper_bound = now() + timedelta(seconds=5)
+    lower_bound = (
+        _parse_timestamp(request_get_query_dict["after"], team) if request_get_query_dict.get("after") else None
+    )
+
+    results: List = []
+    window_to: Optional[datetime] = None
+    for window in [*EVENTS_LIST_WINDOWS, None]:
+        window_from = upper_bound - window if window else None
+        if lower_bound and (window_from is None or window_from <= lower_bound):
+            # The requested `after` bounds this window
+            window_from = None
+        results.extend(
+            query_events_list(
+                filter=filter,
+                team=team,
+                limit=limit - len(results),
+                request_get_query_dict=request_get_query_dict,
+                order_by=order_by,
+                action_id=action_id,
+                # Only the first window continues from the cursor, later ones are strictly older
+                cursor=cursor if window_to is None else None,
+                unbounded_date_from=window_from is None and lower_bound is None,
+                window_from=window_from,
+                window_to=window_to,
+            )
+        )
+        if len(results) > limit or window_from is None:
+            break
+        window_to = window_from
+
+    return results
+
+
+def _parse_timestamp(value: str, team: Team) -> datetime:
+    try:
+        timestamp = isoparse(value)
+    except ValueError:
+        timestamp = relative_date_parse(value, team.timezone_info)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=ZoneInfo("UTC"))
+    return timestamp
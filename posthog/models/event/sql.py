@@ -286,6 +286,22 @@ WHERE
 LIMIT 10
 """
 
+SELECT_PROP_VALUES_INDEX_SQL = """
+SELECT
+    {property_field} AS value,
+    count() AS count,
+    max(timestamp) AS last_seen
+FROM
+    events
+WHERE
+    team_id = %(team_id)s
+    AND {property_exists_filter}
+    AND timestamp >= %(date_from)s
+GROUP BY value
+ORDER BY count DESC, value
+LIMIT %(limit)s
+"""
+
 SELECT_EVENT_BY_TEAM_AND_CONDITIONS_SQL = """
 SELECT
     uuid,
@@ -300,7 +316,7 @@ FROM
     events
 where team_id = %(team_id)s
 {conditions}
-ORDER BY timestamp {order} {limit}
+ORDER BY timestamp {order}, uuid {order} {limit}
 """
 
 SELECT_EVENT_BY_TEAM_AND_CONDITIONS_FILTERS_SQL = """
@@ -318,7 +334,7 @@ WHERE
 team_id = %(team_id)s
 {conditions}
 {filters}
-ORDER BY timestamp {order} {limit}
+ORDER BY timestamp {order}, uuid {order} {limit}
 """
 
 SELECT_ONE_EVENT_SQL = """
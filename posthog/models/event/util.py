@@ -12,7 +12,7 @@ from posthog.client import sync_execute
 from posthog.kafka_client.client import ClickhouseProducer
 from posthog.kafka_client.topics import KAFKA_EVENTS_JSON
 from posthog.models import Group
-from posthog.models.element.element import Element, chain_to_elements, elements_to_string
+from posthog.models.element.element import Element, elements_to_string, parse_elements_chain
 from posthog.models.event.sql import BULK_INSERT_EVENT_SQL, INSERT_EVENT_SQL
 from posthog.models.person import Person
 from posthog.models.team import Team
@@ -242,25 +242,6 @@ def bulk_create_events(events: List[Dict[str, Any]], person_mapping: Optional[Di
     sync_execute(BULK_INSERT_EVENT_SQL() + ", ".join(inserts), params, flush=False)
 
 
-class ElementSerializer(serializers.ModelSerializer):
-    event = serializers.CharField()
-
-    class Meta:
-        model = Element
-        fields = [
-            "event",
-            "text",
-            "tag_name",
-            "attr_class",
-            "href",
-            "attr_id",
-            "nth_child",
-            "nth_of_type",
-            "attributes",
-            "order",
-        ]
-
-
 def parse_properties(properties: str, allow_list: Set[str] = set()) -> Dict:
     # parse_constants gets called for any NaN, Infinity etc values
     # we just want those to be returned as None
@@ -315,7 +296,7 @@ class ClickhouseEventSerializer(serializers.Serializer):
     def get_elements(self, event):
         if not event["elements_chain"]:
             return []
-        return ElementSerializer(chain_to_elements(event["elements_chain"]), many=True).data
+        return [{"event": None, **element} for element in parse_elements_chain(event["elements_chain"])]
 
     def get_elements_chain(self, event):
         return event["elements_chain"]
@@ -6,11 +6,14 @@ from typing import Any, Dict, List, Literal, Optional, Union, cast
 
 from zoneinfo import ZoneInfo
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from posthog.constants import (
     ACTIONS,
+    ADAPTIVE_SAMPLING,
+    ADAPTIVE_SAMPLING_FACTOR,
     BREAKDOWN,
     BREAKDOWN_ATTRIBUTION_TYPE,
     BREAKDOWN_ATTRIBUTION_VALUE,
@@ -572,11 +575,21 @@ class UpdatedAfterMixin(BaseParamMixin):
 
 class SampleMixin(BaseParamMixin):
     """
-    Sample factor for a query.
+    Sample factor for a query. With "auto" the factor is chosen from how many distinct ids the team's events are spread
+    across, when the query runs, see posthog/queries/adaptive_sampling.py.
     """
 
+    @cached_property
+    def adaptive_sampling(self) -> bool:
+        sampling_factor = self._data.get(SAMPLING_FACTOR, None)
+        return sampling_factor == ADAPTIVE_SAMPLING or (not sampling_factor and settings.ADAPTIVE_SAMPLING_BY_DEFAULT)
+
     @cached_property
     def sampling_factor(self) -> Optional[float]:
+        if self.adaptive_sampling:
+            sampling_factor = self._data.get(ADAPTIVE_SAMPLING_FACTOR, None)
+            return float(sampling_factor) if sampling_factor else None
+
         sampling_factor = self._data.get("sampling_factor", None)
 
         # cover for both None and empty strings - also ok to filter out 0s here
@@ -591,4 +604,9 @@ class SampleMixin(BaseParamMixin):
 
     @include_dict
     def sampling_factor_to_dict(self):
+        if self.adaptive_sampling:
+            # The factor chosen can change as the team grows, so "auto" is kept, along with the factor chosen for the
+            # calculation at hand for the filters derived from this one
+            chosen = {ADAPTIVE_SAMPLING_FACTOR: self.sampling_factor} if ADAPTIVE_SAMPLING_FACTOR in self._data else {}
+            return {SAMPLING_FACTOR: self._data.get(SAMPLING_FACTOR) or "", **chosen}
         return {SAMPLING_FACTOR: self.sampling_factor or ""}
@@ -1,5 +1,12 @@
+import base64
 import json
+from dataclasses import dataclass
+from datetime import datetime
 from typing import List, Optional, Literal
+from zoneinfo import ZoneInfo
+
+from dateutil.parser import isoparse
+from rest_framework.exceptions import ValidationError
 
 from posthog.constants import PERSON_UUID_FILTER, SESSION_RECORDINGS_FILTER_IDS
 from posthog.models.filters.mixins.common import BaseParamMixin
@@ -7,6 +14,26 @@ from posthog.models.filters.mixins.utils import cached_property
 from posthog.models.property import Property
 
 
+@dataclass(frozen=True)
+class SessionRecordingsCursor:
+    """Position of the last recording of a page, encoded as an opaque string for the API."""
+
+    start_time: datetime
+    session_id: str
+
+    def encode(self) -> str:
+        payload = json.dumps({"t": self.start_time.astimezone(ZoneInfo("UTC")).isoformat(), "s": self.session_id})
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def decode(cls, value: str) -> "SessionRecordingsCursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(value.encode("ascii")))
+            return cls(start_time=isoparse(payload["t"]), session_id=str(payload["s"]))
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid session recordings cursor")
+
+
 class PersonUUIDMixin(BaseParamMixin):
     @cached_property
     def person_uuid(self) -> Optional[str]:
@@ -49,3 +76,13 @@ class SessionRecordingsMixin(BaseParamMixin):
             # Sort for stable queries
             return sorted(recordings_ids)
         return None
+
+    @cached_property
+    def recordings_cursor(self) -> Optional[SessionRecordingsCursor]:
+        value = self._data.get("cursor", None)
+        if not value:
+            return None
+        try:
+            return SessionRecordingsCursor.decode(value)
+        except ValueError:
+            raise ValidationError({"cursor": "Invalid cursor."})
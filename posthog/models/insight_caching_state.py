@@ -32,6 +32,8 @@ class InsightCachingState(UUIDModel):
     last_refresh: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     last_refresh_queued_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     refresh_attempt: models.IntegerField = models.IntegerField(null=False, default=0)
+    # How long the last successful calculation took, used to prioritize refreshes
+    last_refresh_duration_seconds: models.FloatField = models.FloatField(null=True, blank=True)
 
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
     updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
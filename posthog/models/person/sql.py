@@ -449,5 +449,29 @@ ORDER BY count(value) DESC
 LIMIT 20
 """
 
+SELECT_PERSON_PROP_VALUES_INDEX_SQL = """
+SELECT
+    value,
+    count(value) AS count,
+    max(_timestamp) AS last_seen
+FROM (
+    SELECT
+        {property_field} as value,
+        _timestamp
+    FROM
+        person
+    WHERE
+        team_id = %(team_id)s AND
+        is_deleted = 0 AND
+        {property_field} IS NOT NULL AND
+        {property_field} != ''
+    ORDER BY id DESC
+    LIMIT %(sample_size)s
+)
+GROUP BY value
+ORDER BY count DESC, value
+LIMIT %(limit)s
+"""
+
 GET_PERSON_COUNT_FOR_TEAM = "SELECT count() AS count FROM person WHERE team_id = %(team_id)s"
 GET_PERSON_DISTINCT_ID2_COUNT_FOR_TEAM = "SELECT count() AS count FROM person_distinct_id2 WHERE team_id = %(team_id)s"
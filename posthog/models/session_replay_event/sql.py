@@ -1,7 +1,7 @@
 from django.conf import settings
 
 from posthog.clickhouse.kafka_engine import kafka_engine
-from posthog.clickhouse.table_engines import Distributed, ReplicationScheme, AggregatingMergeTree
+from posthog.clickhouse.table_engines import Distributed, ReplicationScheme, AggregatingMergeTree, ReplacingMergeTree
 from posthog.kafka_client.topics import KAFKA_CLICKHOUSE_SESSION_REPLAY_EVENTS
 
 SESSION_REPLAY_EVENTS_DATA_TABLE = lambda: "sharded_session_replay_events"
@@ -152,3 +152,100 @@ DROP_SESSION_REPLAY_EVENTS_TABLE_SQL = lambda: (
 TRUNCATE_SESSION_REPLAY_EVENTS_TABLE_SQL = lambda: (
     f"TRUNCATE TABLE IF EXISTS {SESSION_REPLAY_EVENTS_DATA_TABLE()} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}'"
 )
+
+
+SESSION_REPLAY_SUMMARIES_DATA_TABLE = lambda: "sharded_session_replay_summaries"
+
+"""
+One final row per session, compacted from session_replay_events once a session can no longer receive events,
+see posthog/models/session_replay_event/summaries.py. Listing recordings reads these instead of aggregating
+every pre-aggregated row of every session in the time range.
+"""
+SESSION_REPLAY_SUMMARIES_TABLE_BASE_SQL = """
+CREATE TABLE IF NOT EXISTS {table_name} ON CLUSTER '{cluster}'
+(
+    session_id VARCHAR,
+    team_id Int64,
+    distinct_id VARCHAR,
+    start_time DateTime64(6, 'UTC'),
+    end_time DateTime64(6, 'UTC'),
+    first_url Nullable(VARCHAR),
+    click_count Int64,
+    keypress_count Int64,
+    mouse_activity_count Int64,
+    active_milliseconds Int64,
+    console_log_count Int64,
+    console_warn_count Int64,
+    console_error_count Int64,
+    -- sessions are compacted again if events arrive late, the latest compaction wins
+    compacted_at DateTime64(6, 'UTC')
+) ENGINE = {engine}
+"""
+
+SESSION_REPLAY_SUMMARIES_DATA_TABLE_ENGINE = lambda: ReplacingMergeTree(
+    "session_replay_summaries", ver="compacted_at", replication_scheme=ReplicationScheme.SHARDED
+)
+
+SESSION_REPLAY_SUMMARIES_TABLE_SQL = lambda: (
+    SESSION_REPLAY_SUMMARIES_TABLE_BASE_SQL
+    + """
+    PARTITION BY toYYYYMM(start_time)
+    -- matches the order recordings are listed in, so that pages can be read from the primary key
+    ORDER BY (team_id, start_time, session_id)
+SETTINGS index_granularity=512
+"""
+).format(
+    table_name=SESSION_REPLAY_SUMMARIES_DATA_TABLE(),
+    cluster=settings.CLICKHOUSE_CLUSTER,
+    engine=SESSION_REPLAY_SUMMARIES_DATA_TABLE_ENGINE(),
+)
+
+# This table is responsible for writing to sharded_session_replay_summaries based on a sharding key.
+WRITABLE_SESSION_REPLAY_SUMMARIES_TABLE_SQL = lambda: SESSION_REPLAY_SUMMARIES_TABLE_BASE_SQL.format(
+    table_name="writable_session_replay_summaries",
+    cluster=settings.CLICKHOUSE_CLUSTER,
+    engine=Distributed(data_table=SESSION_REPLAY_SUMMARIES_DATA_TABLE(), sharding_key="sipHash64(session_id)"),
+)
+
+# This table is responsible for reading from session_replay_summaries on a cluster setting
+DISTRIBUTED_SESSION_REPLAY_SUMMARIES_TABLE_SQL = lambda: SESSION_REPLAY_SUMMARIES_TABLE_BASE_SQL.format(
+    table_name="session_replay_summaries",
+    cluster=settings.CLICKHOUSE_CLUSTER,
+    engine=Distributed(data_table=SESSION_REPLAY_SUMMARIES_DATA_TABLE(), sharding_key="sipHash64(session_id)"),
+)
+
+# Compacts the sessions that started in [start, end), rows are filtered with a day of margin
+# since sessions can have pre-aggregated rows that started before them
+COMPACT_SESSION_REPLAY_SUMMARIES_SQL = (
+    lambda: """
+INSERT INTO writable_session_replay_summaries
+SELECT
+    session_id,
+    team_id,
+    any(distinct_id) as distinct_id,
+    min(min_first_timestamp) as start_time,
+    max(max_last_timestamp) as end_time,
+    argMinMerge(first_url) as first_url,
+    sum(click_count) as click_count,
+    sum(keypress_count) as keypress_count,
+    sum(mouse_activity_count) as mouse_activity_count,
+    sum(active_milliseconds) as active_milliseconds,
+    sum(console_log_count) as console_log_count,
+    sum(console_warn_count) as console_warn_count,
+    sum(console_error_count) as console_error_count,
+    now64(6, 'UTC') as compacted_at
+FROM session_replay_events
+WHERE min_first_timestamp >= %(start)s - INTERVAL 1 DAY
+    AND min_first_timestamp < %(end)s
+GROUP BY team_id, session_id
+HAVING start_time >= %(start)s AND start_time < %(end)s
+"""
+)
+
+DROP_SESSION_REPLAY_SUMMARIES_TABLE_SQL = lambda: (
+    f"DROP TABLE IF EXISTS {SESSION_REPLAY_SUMMARIES_DATA_TABLE()} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}'"
+)
+
+TRUNCATE_SESSION_REPLAY_SUMMARIES_TABLE_SQL = lambda: (
+    f"TRUNCATE TABLE IF EXISTS {SESSION_REPLAY_SUMMARIES_DATA_TABLE()} ON CLUSTER '{settings.CLICKHOUSE_CLUSTER}'"
+)
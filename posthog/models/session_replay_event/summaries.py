@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from prometheus_client import Counter, Gauge
+
+from posthog.client import sync_execute
+from posthog.models.session_replay_event.sql import COMPACT_SESSION_REPLAY_SUMMARIES_SQL
+
+logger = structlog.get_logger(__name__)
+
+COMPACTED_UNTIL_CACHE_KEY = "session_replay_summaries_compacted_until"
+
+SESSION_REPLAY_SUMMARIES_COMPACTED_COUNTER = Counter(
+    "posthog_session_replay_summaries_compacted_hours",
+    "Hours of sessions compacted into session_replay_summaries",
+)
+SESSION_REPLAY_SUMMARIES_LAG_GAUGE = Gauge(
+    "posthog_session_replay_summaries_lag_seconds",
+    "How far behind now sessions have been compacted into session_replay_summaries",
+)
+
+
+def get_summaries_compacted_until() -> Optional[datetime]:
+    """
+    All sessions that started before the returned time are compacted into session_replay_summaries.
+
+    Returns None when recordings shouldn't be listed from the summaries.
+    """
+    if not settings.SESSION_REPLAY_SUMMARIES_ENABLED:
+        return None
+    return cache.get(COMPACTED_UNTIL_CACHE_KEY)
+
+
+def compact_session_replay_summaries(now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Compacts settled sessions into one row each in session_replay_summaries, a day of sessions per query, and moves
+    the watermark forward after each day so that listing can use them straight away.
+
+    Starts from the oldest retained recordings when there is no watermark yet, continuing over as many runs as needed.
+    """
+    now = now or timezone.now()
+    settled_until = (now - timedelta(seconds=settings.SESSION_REPLAY_SUMMARIES_SETTLED_AFTER_SECONDS)).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+    compacted_until: Optional[datetime] = cache.get(COMPACTED_UNTIL_CACHE_KEY)
+    if compacted_until is None:
+        start = (now - timedelta(days=settings.REPLAY_RETENTION_DAYS_MAX)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+    else:
+        start = compacted_until - timedelta(seconds=settings.SESSION_REPLAY_SUMMARIES_LOOKBACK_SECONDS)
+
+    for _ in range(settings.SESSION_REPLAY_SUMMARIES_MAX_DAYS_PER_RUN):
+        if start >= settled_until:
+            break
+
+        end = min(start + timedelta(days=1), settled_until)
+        sync_execute(
+            COMPACT_SESSION_REPLAY_SUMMARIES_SQL(),
+            {"start": _format_time(start), "end": _format_time(end)},
+            settings={"insert_distributed_sync": 1},
+        )
+        SESSION_REPLAY_SUMMARIES_COMPACTED_COUNTER.inc((end - start).total_seconds() / 3600)
+
+        if compacted_until is None or end > compacted_until:
+            compacted_until = end
+            cache.set(COMPACTED_UNTIL_CACHE_KEY, compacted_until, timeout=None)
+        start = end
+
+    if compacted_until is not None:
+        SESSION_REPLAY_SUMMARIES_LAG_GAUGE.set((now - compacted_until).total_seconds())
+    logger.info("session_replay_summaries_compacted", compacted_until=compacted_until)
+    return compacted_until
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(ZoneInfo("UTC")).strftime("%Y-%m-%d %H:%M:%S")
@@ -1,5 +1,9 @@
+import time
+from unittest.mock import patch
 from uuid import UUID, uuid4
 
+from django.test import override_settings
+
 from posthog.client import sync_execute
 from posthog.models import AsyncDeletion, DeletionType, Team, User
 from posthog.models.async_deletion.delete_cohorts import AsyncCohortDeletion
@@ -304,6 +308,83 @@ class TestAsyncDeletion(ClickhouseTestMixin, ClickhouseDestroyTablesMixin, BaseT
 
         self.assertRowCount(1, "cohortpeople")
 
+    @override_settings(ASYNC_DELETION_BY_PARTITION=True)
+    def test_delete_by_partition(self):
+        for timestamp in ["2022-12-31T12:00:00Z", "2023-01-01T12:00:00Z", "2023-02-01T12:00:00Z"]:
+            _create_event(event_uuid=uuid4(), event="event1", team=self.teams[0], distinct_id="1", timestamp=timestamp)
+        _create_event(
+            event_uuid=uuid4(),
+            event="event1",
+            team=self.teams[1],
+            distinct_id="1",
+            person_id=uuid,
+            timestamp="2023-01-01T12:00:00Z",
+        )
+        _create_event(event_uuid=uuid4(), event="event1", team=self.teams[2], distinct_id="1")
+
+        AsyncDeletion.objects.create(
+            deletion_type=DeletionType.Team, team_id=self.teams[0].pk, key=str(self.teams[0].pk), created_by=self.user
+        )
+        AsyncDeletion.objects.create(
+            deletion_type=DeletionType.Person, team_id=self.teams[1].pk, key=str(uuid), created_by=self.user
+        )
+
+        with patch("posthog.models.async_deletion.delete_events.sync_execute", wraps=sync_execute) as execute:
+            AsyncEventDeletion().run()
+        self._wait_for_mutations()
+
+        mutations = [call.args for call in execute.call_args_list if "ALTER TABLE sharded_events" in call.args[0]]
+        self.assertEqual([args["partition_id"] for _, args in mutations], ["202212", "202301", "202302"])
+        # Only deletions with events in the partition are part of its mutation
+        self.assertEqual(len([key for key in mutations[1][1] if key.startswith("team_id")]), 2)
+        self.assertEqual(len([key for key in mutations[2][1] if key.startswith("team_id")]), 1)
+        self.assertRowCount(1)
+
+    @override_settings(ASYNC_DELETION_BY_PARTITION=True)
+    def test_delete_by_partition_skips_partitions_with_running_deletions(self):
+        for timestamp in ["2023-01-01T12:00:00Z", "2023-02-01T12:00:00Z"]:
+            _create_event(event_uuid=uuid4(), event="event1", team=self.teams[0], distinct_id="1", timestamp=timestamp)
+        AsyncDeletion.objects.create(
+            deletion_type=DeletionType.Team, team_id=self.teams[0].pk, key=str(self.teams[0].pk), created_by=self.user
+        )
+
+        with patch.object(
+            AsyncEventDeletion,
+            "_pending_mutations",
+            return_value=[("DELETE IN PARTITION ID '202301' WHERE team_id = 1",)],
+        ):
+            AsyncEventDeletion().run()
+        self._wait_for_mutations()
+
+        self.assertEqual(sync_execute("SELECT toYYYYMM(timestamp) FROM events"), [(202301,)])
+
+    @override_settings(ASYNC_DELETION_BY_PARTITION=True, ASYNC_DELETION_MAX_PENDING_MUTATIONS=1)
+    def test_delete_by_partition_stops_when_mutations_backlog_is_full(self):
+        _create_event(event_uuid=uuid4(), event="event1", team=self.teams[0], distinct_id="1")
+        AsyncDeletion.objects.create(
+            deletion_type=DeletionType.Team, team_id=self.teams[0].pk, key=str(self.teams[0].pk), created_by=self.user
+        )
+
+        with patch.object(AsyncEventDeletion, "_pending_mutations", return_value=[("DELETE WHERE 1",)]), patch(
+            "posthog.models.async_deletion.delete_events.time.sleep"
+        ) as sleep:
+            AsyncEventDeletion().run()
+
+        # The remaining partitions are left to the next run instead of waiting for the backlog to shrink
+        sleep.assert_not_called()
+        self.assertRowCount(1)
+
+        AsyncEventDeletion().run()
+        self._wait_for_mutations()
+        self.assertRowCount(0)
+
+    def _wait_for_mutations(self):
+        for _ in range(100):
+            if not AsyncEventDeletion()._pending_mutations():
+                return
+            time.sleep(0.1)
+        raise AssertionError("Mutations didn't finish")
+
     def assertRowCount(self, expected, table="events"):
         result = sync_execute(f"SELECT count() FROM {table}")[0][0]
         self.assertEqual(result, expected)
@@ -0,0 +1,116 @@
+"""
+Chooses sampling factors for queries that ask for `sampling_factor: "auto"`, from how many distinct ids the events
+they read are spread across.
+
+Events are sampled by distinct id, so a sample holds all the events of some distinct ids rather than independent
+events. A count estimated from a sample of `factor` of `n` distinct ids, each with as many events, has a relative
+standard error of `sqrt((1 - factor) / (factor * n))`, so the error stays under `target` for any
+`factor >= 1 / (1 + n * target ** 2)`. Distinct ids with uneven numbers of events make the error larger, which is
+accounted for by taking `n` to be the effective number of distinct ids counted daily by the usage report, see
+INSERT_DAILY_EFFECTIVE_DISTINCT_ID_COUNT_SQL. The smallest of the factors users can pick themselves that satisfies
+this is used, so that results of queries sampled automatically stay comparable, and cacheable, with manually sampled
+ones.
+
+The daily number of distinct ids is used whatever the date range of the query. Longer ranges spread their events
+across as many distinct ids or more, so their error is smaller still. The target applies to the count of all the
+events a query reads. Counts of single intervals or breakdown values are estimated from fewer events, with a
+correspondingly larger error.
+
+Choosing a factor queries ClickHouse, so it's done once when an insight is calculated, see `with_adaptive_sampling`.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Optional, TypeVar
+
+from django.conf import settings
+from django.utils import timezone
+
+from posthog.cache_utils import cache_for
+from posthog.client import sync_execute
+from posthog.clickhouse.usage_report_daily_counters import SELECT_TEAM_DAILY_COUNTER_AVERAGE_SQL
+from posthog.constants import ADAPTIVE_SAMPLING_FACTOR
+
+if TYPE_CHECKING:
+    from posthog.models.filters.mixins.common import SampleMixin
+    from posthog.models.team import Team
+
+F = TypeVar("F", bound="SampleMixin")
+
+# The sampling factors offered in the insight editor, see samplingFilterLogic.ts
+SAMPLING_FACTORS = (0.001, 0.01, 0.1, 0.25)
+
+
+def with_adaptive_sampling(filter: F) -> F:
+    """
+    Returns the filter with the sampling factor chosen for it, if it asks for adaptive sampling. Queries of filters
+    that do but weren't passed through here aren't sampled.
+    """
+    team = getattr(filter, "team", None)
+    if not filter.adaptive_sampling or team is None or ADAPTIVE_SAMPLING_FACTOR in filter._data:
+        return filter
+    return filter.shallow_clone({ADAPTIVE_SAMPLING_FACTOR: get_adaptive_sampling_factor(team)})  # type: ignore
+
+
+def get_adaptive_sampling_factor(team: "Team") -> Optional[float]:
+    return choose_sampling_factor(
+        get_team_daily_distinct_id_count(team.pk), settings.ADAPTIVE_SAMPLING_TARGET_RELATIVE_ERROR
+    )
+
+
+def choose_sampling_factor(distinct_id_count: float, target_relative_error: float) -> Optional[float]:
+    if distinct_id_count <= 0:
+        return None
+
+    min_factor = 1 / (1 + distinct_id_count * target_relative_error**2)
+    for factor in SAMPLING_FACTORS:
+        if factor >= min_factor:
+            return factor
+    # Sampling wouldn't make the query much cheaper
+    return None
+
+
+@cache_for(timedelta(hours=1), background_refresh=True)
+def get_team_daily_distinct_id_count(team_id: int) -> float:
+    """
+    The team's average effective distinct ids per day over the last few complete days, from the usage report's daily
+    counters. Teams are assumed to have no events if the counters haven't been computed.
+    """
+    from posthog.tasks.usage_report_daily_counters import EFFECTIVE_DISTINCT_ID_COUNT
+
+    rows = sync_execute(
+        SELECT_TEAM_DAILY_COUNTER_AVERAGE_SQL,
+        {"metric": EFFECTIVE_DISTINCT_ID_COUNT, "team_id": team_id, "days": settings.ADAPTIVE_SAMPLING_LOOKBACK_DAYS},
+    )
+    return rows[0][0] if rows else 0
+
+
+# Used to predict the cost of queries, see posthog/clickhouse/client/query_cost.py
+def estimate_event_count(team: "Team", date_from: Optional[datetime], date_to: Optional[datetime]) -> float:
+    """
+    Estimates the events of the team between the dates from its average events per day. Queries from the beginning
+    of time are assumed to start when the team was created.
+    """
+    date_to = date_to or timezone.now()
+    date_from = date_from or team.created_at
+    days = max(1, math.ceil((date_to - date_from) / timedelta(days=1)))
+    return get_team_daily_event_count(team.pk) * days
+
+
+@cache_for(timedelta(hours=1), background_refresh=True)
+def get_team_daily_event_count(team_id: int) -> float:
+    """
+    The team's average events per day over the last few complete days, from the usage report's daily counters.
+    Teams are assumed to have no events if the counters haven't been computed.
+    """
+    from posthog.tasks.usage_report_daily_counters import EVENT_COUNT
+
+    rows = sync_execute(
+        SELECT_TEAM_DAILY_COUNTER_AVERAGE_SQL,
+        {"metric": EVENT_COUNT, "team_id": team_id, "days": settings.ADAPTIVE_SAMPLING_LOOKBACK_DAYS},
+    )
+    return rows[0][0] if rows else 0
+
+
+def applied_sampling(filter: "SampleMixin") -> Dict[str, Any]:
+    "The sampling factor chosen for a filter with adaptive sampling, to be returned with its results"
+    return {"sampling_factor": filter.sampling_factor} if filter.adaptive_sampling else {}
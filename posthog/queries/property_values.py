@@ -7,12 +7,18 @@ from posthog.models.person.sql import SELECT_PERSON_PROP_VALUES_SQL, SELECT_PERS
 from posthog.models.property.util import get_property_string_expr
 from posthog.models.team import Team
 from posthog.queries.insight import insight_sync_execute
+from posthog.queries.property_values_index import get_indexed_property_values
 from posthog.utils import relative_date_parse
 
 
 def get_property_values_for_key(
     key: str, team: Team, event_names: Optional[List[str]] = None, value: Optional[str] = None
 ):
+    if not event_names:
+        indexed_values = get_indexed_property_values(team.pk, "event", key, value, limit=10)
+        if indexed_values is not None:
+            return [(indexed_value,) for indexed_value, _ in indexed_values]
+
     property_field, mat_column_exists = get_property_string_expr("events", key, "%(key)s", "properties")
     parsed_date_from = "AND timestamp >= '{}'".format(
         relative_date_parse("-7d", team.timezone_info).strftime("%Y-%m-%d 00:00:00")
@@ -58,6 +64,10 @@ def get_property_values_for_key(
 
 
 def get_person_property_values_for_key(key: str, team: Team, value: Optional[str] = None):
+    indexed_values = get_indexed_property_values(team.pk, "person", key, value, limit=20)
+    if indexed_values is not None:
+        return indexed_values
+
     property_field, _ = get_property_string_expr("person", key, "%(key)s", "properties")
 
     if value:
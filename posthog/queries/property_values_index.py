@@ -0,0 +1,199 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from prometheus_client import Counter
+
+from posthog.models.event.sql import SELECT_PROP_VALUES_INDEX_SQL
+from posthog.models.person.sql import SELECT_PERSON_PROP_VALUES_INDEX_SQL
+from posthog.models.property.util import get_property_string_expr
+from posthog.queries.insight import insight_sync_execute
+
+logger = structlog.get_logger(__name__)
+
+PropertyValuesIndexType = Literal["event", "person"]
+
+PROPERTY_VALUES_INDEX_COUNTER = Counter(
+    "posthog_property_values_index",
+    "Property value autocomplete lookups, by whether they were answered from the property values index",
+    labelnames=["property_type", "result"],
+)
+
+# Events are indexed over the same period the live query looks at
+EVENT_PROPERTY_VALUES_DAYS = 7
+# Persons are indexed from a sample of the most recent ones
+PERSON_PROPERTY_VALUES_SAMPLE_SIZE = 100_000
+# Failed builds are retried after this long
+BUILD_LOCK_TIMEOUT_SECONDS = 10 * 60
+
+
+class PropertyValuesIndex:
+    """
+    Top values of a property, by count, with a trigram index for case-insensitive substring search.
+
+    Matches are ordered by whether they start with the search, then by count, mirroring how people type into the
+    property filter.
+    """
+
+    def __init__(self, values: List[Tuple[str, int]]):
+        self.values = values
+        self._lowercase_values = [value.lower() for value, _ in values]
+        self._trigrams: Dict[str, Set[int]] = {}
+        for index, value in enumerate(self._lowercase_values):
+            for trigram in _trigrams(value):
+                self._trigrams.setdefault(trigram, set()).add(index)
+
+    def search(self, search: Optional[str], limit: int) -> List[Tuple[str, int]]:
+        if not search:
+            return self.values[:limit]
+
+        search = search.lower()
+        if len(search) < 3:
+            candidates: List[int] = list(range(len(self.values)))
+        else:
+            postings = sorted((self._trigrams.get(trigram, set()) for trigram in _trigrams(search)), key=len)
+            candidates = sorted(set.intersection(*postings))
+
+        matches = [index for index in candidates if search in self._lowercase_values[index]]
+        prefix_matches = [index for index in matches if self._lowercase_values[index].startswith(search)]
+        other_matches = [index for index in matches if not self._lowercase_values[index].startswith(search)]
+        return [self.values[index] for index in (prefix_matches + other_matches)[:limit]]
+
+
+def _trigrams(value: str) -> Set[str]:
+    return {value[index : index + 3] for index in range(len(value) - 2)}
+
+
+class _LocalIndexes:
+    """Indexes built in this process, keyed by cache key and build time so that rebuilt indexes are picked up."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._indexes: "OrderedDict[Tuple[str, float], PropertyValuesIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: str, entry: Dict) -> PropertyValuesIndex:
+        local_key = (cache_key, entry["built_at"])
+        with self._lock:
+            index = self._indexes.get(local_key)
+            if index is not None:
+                self._indexes.move_to_end(local_key)
+                return index
+
+        index = PropertyValuesIndex([(value, count) for value, count, _ in entry["values"]])
+        with self._lock:
+            self._indexes[local_key] = index
+            while len(self._indexes) > self._max_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+local_indexes = _LocalIndexes(max_size=settings.PROPERTY_VALUES_INDEX_LOCAL_SIZE)
+
+
+def property_values_index_cache_key(team_id: int, property_type: PropertyValuesIndexType, key: str) -> str:
+    key_hash = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return f"property_values_index_{team_id}_{property_type}_{key_hash}"
+
+
+def get_indexed_property_values(
+    team_id: int, property_type: PropertyValuesIndexType, key: str, search: Optional[str], limit: int
+) -> Optional[List[Tuple[str, int]]]:
+    """
+    Returns the top values of the property matching `search` from the property values index, or None if the index
+    can't answer, in which case the live query should be used.
+
+    Missing and stale indexes are (re)built in the background.
+    """
+    if not settings.PROPERTY_VALUES_INDEX_ENABLED:
+        return None
+
+    cache_key = property_values_index_cache_key(team_id, property_type, key)
+    entry = cache.get(cache_key)
+    if entry is None or time.time() - entry["built_at"] > settings.PROPERTY_VALUES_INDEX_REFRESH_SECONDS:
+        _schedule_build(team_id, property_type, key)
+    if entry is None:
+        PROPERTY_VALUES_INDEX_COUNTER.labels(property_type=property_type, result="missing").inc()
+        return None
+
+    matches = local_indexes.get(cache_key, entry).search(search, limit)
+    # Values outside of the top values could match too, unless the index holds all values of the property
+    if len(matches) < limit and not entry["complete"]:
+        PROPERTY_VALUES_INDEX_COUNTER.labels(property_type=property_type, result="incomplete").inc()
+        return None
+
+    PROPERTY_VALUES_INDEX_COUNTER.labels(property_type=property_type, result="hit").inc()
+    return matches
+
+
+def _schedule_build(team_id: int, property_type: PropertyValuesIndexType, key: str) -> None:
+    from posthog.tasks.property_values_index import build_property_values_index_task
+
+    lock_key = property_values_index_cache_key(team_id, property_type, key) + "_building"
+    if cache.add(lock_key, True, timeout=BUILD_LOCK_TIMEOUT_SECONDS):
+        build_property_values_index_task.delay(team_id, property_type, key)
+
+
+def build_property_values_index(team_id: int, property_type: PropertyValuesIndexType, key: str) -> None:
+    size = settings.PROPERTY_VALUES_INDEX_SIZE
+    if property_type == "event":
+        property_field, mat_column_exists = get_property_string_expr("events", key, "%(key)s", "properties")
+        rows = insight_sync_execute(
+            SELECT_PROP_VALUES_INDEX_SQL.format(
+                property_field=property_field,
+                property_exists_filter=f"notEmpty({property_field})"
+                if mat_column_exists
+                else "JSONHas(properties, %(key)s)",
+            ),
+            {
+                "team_id": team_id,
+                "key": key,
+                "date_from": (timezone.now() - timedelta(days=EVENT_PROPERTY_VALUES_DAYS)).strftime(
+                    "%Y-%m-%d 00:00:00"
+                ),
+                "limit": size + 1,
+            },
+            query_type="build_property_values_index",
+            team_id=team_id,
+        )
+        complete = len(rows) <= size
+    else:
+        property_field, _ = get_property_string_expr("person", key, "%(key)s", "properties")
+        rows = insight_sync_execute(
+            SELECT_PERSON_PROP_VALUES_INDEX_SQL.format(property_field=property_field),
+            {"team_id": team_id, "key": key, "limit": size + 1, "sample_size": PERSON_PROPERTY_VALUES_SAMPLE_SIZE},
+            query_type="build_person_property_values_index",
+            team_id=team_id,
+        )
+        # When all values were returned, their counts add up to the persons sampled. A full sample may have left out
+        # persons with other values
+        complete = len(rows) <= size and sum(count for _, count, _ in rows) < PERSON_PROPERTY_VALUES_SAMPLE_SIZE
+
+    entry = {
+        "values": [(value, count, last_seen.isoformat()) for value, count, last_seen in rows[:size]],
+        "complete": complete,
+        "built_at": time.time(),
+    }
+    cache.set(
+        property_values_index_cache_key(team_id, property_type, key),
+        entry,
+        timeout=settings.PROPERTY_VALUES_INDEX_TTL_SECONDS,
+    )
+    logger.debug(
+        "property_values_index_built",
+        team_id=team_id,
+        property_type=property_type,
+        values=len(entry["values"]),
+        complete=entry["complete"],
+    )
@@ -2,6 +2,7 @@ import dataclasses
 import re
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Literal, NamedTuple, Tuple, Union
+from zoneinfo import ZoneInfo
 
 from django.conf import settings
 
@@ -15,6 +16,7 @@ from posthog.models.filters.session_recordings_filter import SessionRecordingsFi
 from posthog.models.instance_setting import get_instance_setting
 from posthog.models.property import PropertyGroup
 from posthog.models.property.util import parse_prop_grouped_clauses
+from posthog.models.session_replay_event.summaries import get_summaries_compacted_until
 from posthog.models.team import PersonOnEventsMode
 from posthog.models.team.team import Team
 from posthog.queries.event_query import EventQuery
@@ -55,6 +57,10 @@ def _get_filter_by_provided_session_ids_clause(
     return f'AND "{column_name}" in %(session_ids)s', {"session_ids": recording_filters.session_ids}
 
 
+def _format_time(value: datetime) -> str:
+    return value.astimezone(ZoneInfo("UTC")).strftime("%Y-%m-%d %H:%M:%S")
+
+
 def ttl_days(team: Team) -> int:
     ttl_days = (get_instance_setting("RECORDINGS_TTL_WEEKS") or 3) * 7
     if is_cloud():
@@ -433,13 +439,47 @@ class SessionRecordingListFromReplaySummary(EventQuery):
         -- and any not-the-highest max value is _less_ lower than the max value
         AND s.min_first_timestamp >= %(start_time)s
         AND s.max_last_timestamp <= %(end_time)s
+        {summaries_where_clause}
         {persons_sub_query}
         {events_sub_query}
     {provided_session_ids_clause}
     GROUP BY session_id
-        HAVING 1=1 {duration_clause} {console_log_clause}
-    ORDER BY start_time DESC
-    LIMIT %(limit)s OFFSET %(offset)s
+        HAVING 1=1 {duration_clause} {console_log_clause} {cursor_clause} {summaries_having_clause}
+    """
+
+    # Sessions compacted into session_replay_summaries, with the same filters as above
+    _session_recordings_from_summaries_query: str = """
+    SELECT
+       s.session_id,
+       s.team_id,
+       s.distinct_id,
+       s.start_time,
+       s.end_time,
+       dateDiff('SECOND', start_time, end_time) as duration,
+       s.first_url,
+       s.click_count,
+       s.keypress_count,
+       s.mouse_activity_count,
+       s.active_milliseconds/1000 as active_seconds,
+       duration-active_seconds as inactive_seconds,
+       s.console_log_count,
+       s.console_warn_count,
+       s.console_error_count
+    FROM session_replay_summaries AS s FINAL
+    WHERE s.team_id = %(team_id)s
+        AND s.start_time < %(summaries_compacted_until)s
+        AND s.start_time >= %(clamped_to_storage_ttl)s
+        AND s.start_time >= %(start_time)s
+        AND s.end_time <= %(end_time)s
+        {persons_sub_query}
+        {events_sub_query}
+        {provided_session_ids_clause}
+        {duration_clause} {console_log_clause} {cursor_clause}
+    """
+
+    _order_and_paginate: str = """
+    ORDER BY start_time DESC, session_id DESC
+    LIMIT %(limit)s {offset_clause}
     """
 
     @staticmethod
@@ -517,21 +557,76 @@ class SessionRecordingListFromReplaySummary(EventQuery):
                 f"AND s.distinct_id in (select distinct_id from ({persons_select}) as session_persons_sub_query)"
             )
 
-        return (
-            self._session_recordings_query.format(
+        cursor_clause, cursor_params = self._get_cursor_clause()
+        # The cursor already skips the recordings of previous pages
+        order_and_paginate = self._order_and_paginate.format(
+            offset_clause="OFFSET %(offset)s" if self._filter.recordings_cursor is None else ""
+        )
+        params = {
+            **base_params,
+            **events_join_params,
+            **recording_start_time_params,
+            **duration_params,
+            **provided_session_ids_params,
+            **persons_select_params,
+            **cursor_params,
+        }
+
+        compacted_until = get_summaries_compacted_until()
+        if compacted_until is None:
+            query = self._session_recordings_query.format(
                 duration_clause=duration_clause,
                 provided_session_ids_clause=provided_session_ids_clause,
                 console_log_clause=console_log_clause,
+                cursor_clause=cursor_clause,
                 persons_sub_query=persons_select,
                 events_sub_query=events_select,
-            ),
+                summaries_where_clause="",
+                summaries_having_clause="",
+            )
+            return query + order_and_paginate, params
+
+        # Sessions that started before the watermark are read from their summaries, only the most recent
+        # sessions are aggregated from session_replay_events. Sessions don't last longer than a day,
+        # so rows of sessions that started after the watermark can't be older than a day before it.
+        recent_sessions_query = self._session_recordings_query.format(
+            duration_clause=duration_clause,
+            provided_session_ids_clause=provided_session_ids_clause,
+            console_log_clause=console_log_clause,
+            cursor_clause=cursor_clause,
+            persons_sub_query=persons_select,
+            events_sub_query=events_select,
+            summaries_where_clause="AND s.min_first_timestamp >= %(summaries_recent_rows_from)s",
+            summaries_having_clause="AND start_time >= %(summaries_compacted_until)s",
+        )
+        compacted_sessions_query = self._session_recordings_from_summaries_query.format(
+            duration_clause=duration_clause,
+            provided_session_ids_clause=provided_session_ids_clause,
+            console_log_clause=console_log_clause,
+            cursor_clause=cursor_clause,
+            persons_sub_query=persons_select,
+            events_sub_query=events_select,
+        )
+        query = (
+            f"SELECT * FROM ({recent_sessions_query} UNION ALL {compacted_sessions_query}) AS session_recordings"
+            + order_and_paginate
+        )
+        return query, {
+            **params,
+            "summaries_compacted_until": _format_time(compacted_until),
+            "summaries_recent_rows_from": _format_time(compacted_until - timedelta(days=1)),
+        }
+
+    def _get_cursor_clause(self) -> Tuple[str, Dict[str, Any]]:
+        cursor = self._filter.recordings_cursor
+        if cursor is None:
+            return "", {}
+        return (
+            """AND (start_time < toDateTime64(%(cursor_start_time)s, 6, 'UTC')
+            OR (start_time = toDateTime64(%(cursor_start_time)s, 6, 'UTC') AND session_id < %(cursor_session_id)s))""",
             {
-                **base_params,
-                **events_join_params,
-                **recording_start_time_params,
-                **duration_params,
-                **provided_session_ids_params,
-                **persons_select_params,
+                "cursor_start_time": cursor.start_time.astimezone(ZoneInfo("UTC")).strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "cursor_session_id": cursor.session_id,
             },
         )
 
@@ -0,0 +1,167 @@
+from datetime import datetime
+from uuid import uuid4
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.test import override_settings
+from freezegun import freeze_time
+from rest_framework.exceptions import ValidationError
+
+from posthog.clickhouse.client import sync_execute
+from posthog.models.filters.mixins.session_recordings import SessionRecordingsCursor
+from posthog.models.filters.session_recordings_filter import SessionRecordingsFilter
+from posthog.models.session_replay_event.sql import TRUNCATE_SESSION_REPLAY_SUMMARIES_TABLE_SQL
+from posthog.models.session_replay_event.summaries import (
+    COMPACTED_UNTIL_CACHE_KEY,
+    compact_session_replay_summaries,
+    get_summaries_compacted_until,
+)
+from posthog.queries.session_recordings.session_recording_list_from_replay_summary import (
+    SessionRecordingListFromReplaySummary,
+)
+from posthog.queries.session_recordings.test.session_replay_sql import produce_replay_summary
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin
+
+UTC = ZoneInfo("UTC")
+
+
+@freeze_time("2023-01-10T12:00:00Z")
+@override_settings(
+    SESSION_REPLAY_SUMMARIES_ENABLED=True, REPLAY_RETENTION_DAYS_MAX=3, SESSION_REPLAY_SUMMARIES_MAX_DAYS_PER_RUN=10
+)
+class TestSessionRecordingListFromReplaySummaries(ClickhouseTestMixin, APIBaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        sync_execute(TRUNCATE_SESSION_REPLAY_SUMMARIES_TABLE_SQL())
+
+        self.session_ids = sorted(f"session-{uuid4()}" for _ in range(3))
+        old_session_one, old_session_two, recent_session = self.session_ids
+        # sessions that have settled, with the first one in two pre-aggregated rows
+        produce_replay_summary(
+            team_id=self.team.pk,
+            session_id=old_session_one,
+            first_timestamp=datetime(2023, 1, 8, 10, 0, tzinfo=UTC),
+            last_timestamp=datetime(2023, 1, 8, 10, 5, tzinfo=UTC),
+            first_url="https://example.io/home",
+            click_count=2,
+            active_milliseconds=60 * 1000,
+        )
+        produce_replay_summary(
+            team_id=self.team.pk,
+            session_id=old_session_one,
+            first_timestamp=datetime(2023, 1, 8, 10, 3, tzinfo=UTC),
+            last_timestamp=datetime(2023, 1, 8, 10, 30, tzinfo=UTC),
+            first_url="https://example.io/other",
+            click_count=3,
+            console_error_count=1,
+        )
+        produce_replay_summary(
+            team_id=self.team.pk,
+            session_id=old_session_two,
+            first_timestamp=datetime(2023, 1, 8, 10, 0, tzinfo=UTC),
+            last_timestamp=datetime(2023, 1, 8, 10, 10, tzinfo=UTC),
+        )
+        # a session that can still receive events
+        produce_replay_summary(
+            team_id=self.team.pk,
+            session_id=recent_session,
+            first_timestamp=datetime(2023, 1, 10, 11, 0, tzinfo=UTC),
+            last_timestamp=datetime(2023, 1, 10, 11, 30, tzinfo=UTC),
+        )
+
+    def _list(self, **data):
+        filter = SessionRecordingsFilter(team=self.team, data={"date_from": "-7d", **data})
+        return SessionRecordingListFromReplaySummary(filter=filter, team=self.team).run()
+
+    def test_compacts_settled_sessions(self):
+        self.assertIsNone(get_summaries_compacted_until())
+
+        compacted_until = compact_session_replay_summaries()
+
+        self.assertEqual(compacted_until, datetime(2023, 1, 9, 11, 0, tzinfo=UTC))
+        self.assertEqual(get_summaries_compacted_until(), compacted_until)
+        rows = sync_execute(
+            """
+            SELECT session_id, start_time, end_time, first_url, click_count, active_milliseconds, console_error_count
+            FROM session_replay_summaries FINAL
+            WHERE team_id = %(team_id)s
+            ORDER BY session_id
+            """,
+            {"team_id": self.team.pk},
+        )
+        self.assertEqual(
+            rows,
+            [
+                (
+                    self.session_ids[0],
+                    datetime(2023, 1, 8, 10, 0, tzinfo=UTC),
+                    datetime(2023, 1, 8, 10, 30, tzinfo=UTC),
+                    "https://example.io/home",
+                    5,
+                    60 * 1000,
+                    1,
+                ),
+                (
+                    self.session_ids[1],
+                    datetime(2023, 1, 8, 10, 0, tzinfo=UTC),
+                    datetime(2023, 1, 8, 10, 10, tzinfo=UTC),
+                    None,
+                    0,
+                    0,
+                    0,
+                ),
+            ],
+        )
+
+    def test_lists_the_same_recordings_from_summaries(self):
+        with override_settings(SESSION_REPLAY_SUMMARIES_ENABLED=False):
+            expected, _ = self._list()
+
+        compact_session_replay_summaries()
+        # compacting sessions again, e.g. for late events, replaces their summaries
+        cache.delete(COMPACTED_UNTIL_CACHE_KEY)
+        compact_session_replay_summaries()
+        results, more_recordings_available = self._list()
+
+        self.assertEqual(results, expected)
+        self.assertEqual(
+            [recording["session_id"] for recording in results],
+            [self.session_ids[2], self.session_ids[1], self.session_ids[0]],
+        )
+        self.assertFalse(more_recordings_available)
+
+        results, _ = self._list(console_logs='["error"]')
+        self.assertEqual([recording["session_id"] for recording in results], [self.session_ids[0]])
+
+    def test_pages_with_cursor(self):
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                if compact:
+                    compact_session_replay_summaries()
+
+                pages = []
+                cursor = None
+                while True:
+                    results, more_recordings_available = self._list(limit=1, **({"cursor": cursor} if cursor else {}))
+                    pages.append([recording["session_id"] for recording in results])
+                    if not more_recordings_available:
+                        break
+                    cursor = SessionRecordingsCursor(
+                        start_time=results[-1]["start_time"], session_id=results[-1]["session_id"]
+                    ).encode()
+
+                # the two sessions that started at the same time are ordered by session id
+                self.assertEqual(pages, [[self.session_ids[2]], [self.session_ids[1]], [self.session_ids[0]]])
+
+                # offsets are ignored when paginating with a cursor
+                first_page, _ = self._list(limit=1)
+                cursor = SessionRecordingsCursor(
+                    start_time=first_page[0]["start_time"], session_id=first_page[0]["session_id"]
+                ).encode()
+                results, _ = self._list(limit=1, offset=1, cursor=cursor)
+                self.assertEqual([recording["session_id"] for recording in results], [self.session_ids[1]])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValidationError):
+            self._list(cursor="not-a-cursor")
@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import override_settings
+from freezegun import freeze_time
+
+from posthog.client import sync_execute
+from posthog.models.filters import Filter
+from posthog.queries.adaptive_sampling import choose_sampling_factor, with_adaptive_sampling
+from posthog.tasks.usage_report_daily_counters import EFFECTIVE_DISTINCT_ID_COUNT
+from posthog.test.base import APIBaseTest, BaseTest, ClickhouseTestMixin, _create_event, flush_persons_and_events
+
+
+class TestChooseSamplingFactor(BaseTest):
+    def test_chooses_smallest_factor_within_target_error(self):
+        self.assertEqual(choose_sampling_factor(0, 0.01), None)
+        self.assertEqual(choose_sampling_factor(10_000, 0.01), None)
+        self.assertEqual(choose_sampling_factor(100_000, 0.01), 0.1)
+        self.assertEqual(choose_sampling_factor(1_000_000, 0.01), 0.01)
+        self.assertEqual(choose_sampling_factor(10_000_000, 0.01), 0.001)
+        self.assertEqual(choose_sampling_factor(10_000_000, 0.001), 0.1)
+
+
+@freeze_time("2023-05-15T12:00:00Z")
+@override_settings(ADAPTIVE_SAMPLING_TARGET_RELATIVE_ERROR=0.01, ADAPTIVE_SAMPLING_LOOKBACK_DAYS=7)
+class TestAdaptiveSampling(ClickhouseTestMixin, APIBaseTest):
+    def _set_daily_distinct_id_count(self, count: int):
+        sync_execute(
+            "INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at) VALUES",
+            [
+                (
+                    date(2023, 5, 15) - timedelta(days=days_ago),
+                    EFFECTIVE_DISTINCT_ID_COUNT,
+                    self.team.pk,
+                    count,
+                    datetime.now(tz=ZoneInfo("UTC")),
+                )
+                for days_ago in range(1, 8)
+            ],
+        )
+
+    def test_auto_sampling_factor_depends_on_distinct_ids(self):
+        self._set_daily_distinct_id_count(1_000_000)
+
+        filter = Filter(data={"sampling_factor": "auto", "date_from": "-1d"}, team=self.team)
+        # The factor is only chosen once the insight is calculated
+        self.assertEqual(filter.sampling_factor, None)
+        filter = with_adaptive_sampling(filter)
+        self.assertEqual(filter.sampling_factor, 0.01)
+        # The factor chosen is kept for the filters derived from this one, but can change as the team grows
+        self.assertEqual(filter.to_dict()["sampling_factor"], "auto")
+        self.assertEqual(Filter(data=filter.to_dict(), team=self.team).sampling_factor, 0.01)
+
+        # However many days the filter covers
+        self.assertEqual(
+            with_adaptive_sampling(
+                Filter(data={"sampling_factor": "auto", "date_from": "-90d"}, team=self.team)
+            ).sampling_factor,
+            0.01,
+        )
+
+    def test_auto_sampling_without_distinct_id_counts_does_not_sample(self):
+        self.assertEqual(
+            with_adaptive_sampling(Filter(data={"sampling_factor": "auto"}, team=self.team)).sampling_factor, None
+        )
+
+    def test_sampling_by_default(self):
+        self._set_daily_distinct_id_count(10_000_000)
+
+        self.assertEqual(
+            with_adaptive_sampling(Filter(data={"date_from": "-7d"}, team=self.team)).sampling_factor, None
+        )
+        with self.settings(ADAPTIVE_SAMPLING_BY_DEFAULT=True):
+            self.assertEqual(
+                with_adaptive_sampling(Filter(data={"date_from": "-7d"}, team=self.team)).sampling_factor, 0.001
+            )
+            # Choosing a factor opts out
+            self.assertEqual(
+                with_adaptive_sampling(
+                    Filter(data={"date_from": "-7d", "sampling_factor": 1}, team=self.team)
+                ).sampling_factor,
+                1,
+            )
+
+    def test_trends_with_auto_sampling_return_the_factor(self):
+        self._set_daily_distinct_id_count(1_000_000)
+        for _ in range(3):
+            _create_event(team=self.team, event="$pageview", distinct_id="user", timestamp="2023-05-15T10:00:00Z")
+        flush_persons_and_events()
+
+        response = self.client.get(
+            f"/api/projects/{self.team.id}/insights/trend/",
+            data={"events": '[{"id": "$pageview"}]', "date_from": "-1d", "sampling_factor": "auto"},
+        ).json()
+
+        self.assertEqual(response["sampling_factor"], 0.01)
+        # Either all or none of a user's events are in the sample
+        self.assertIn(response["result"][0]["count"], [0, 300])
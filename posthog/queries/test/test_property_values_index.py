@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from freezegun import freeze_time
+
+from posthog.queries.insight import insight_sync_execute
+from posthog.queries.property_values import get_person_property_values_for_key, get_property_values_for_key
+from posthog.queries.property_values_index import PropertyValuesIndex
+from posthog.test.base import APIBaseTest, BaseTest, ClickhouseTestMixin, _create_event, _create_person
+
+
+class TestPropertyValuesIndex(BaseTest):
+    def test_search(self):
+        index = PropertyValuesIndex(
+            [("Chrome", 10), ("Firefox", 5), ("Chrome iOS", 3), ("Safari", 2), ("Mobile Chrome", 1)]
+        )
+
+        self.assertEqual(index.search(None, 2), [("Chrome", 10), ("Firefox", 5)])
+        self.assertEqual(index.search("chrome", 10), [("Chrome", 10), ("Chrome iOS", 3), ("Mobile Chrome", 1)])
+        self.assertEqual(index.search("OME", 10), [("Chrome", 10), ("Chrome iOS", 3), ("Mobile Chrome", 1)])
+        self.assertEqual(index.search("sa", 10), [("Safari", 2)])
+        self.assertEqual(index.search("fi", 10), [("Firefox", 5)])
+        self.assertEqual(index.search("opera", 10), [])
+
+
+@override_settings(PROPERTY_VALUES_INDEX_ENABLED=True)
+class TestPropertyValuesFromIndex(ClickhouseTestMixin, APIBaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _get_values(self, *args, **kwargs):
+        with patch("posthog.queries.property_values.insight_sync_execute", wraps=insight_sync_execute) as live_query:
+            result = get_property_values_for_key(*args, **kwargs)
+        return result, live_query.call_count
+
+    @freeze_time("2020-01-20 20:00:00")
+    def test_event_property_values_are_served_from_index(self):
+        for browser, count in [("Chrome", 3), ("Firefox", 2), ("Safari", 1)]:
+            for _ in range(count):
+                _create_event(distinct_id="bla", event="$pageview", team=self.team, properties={"$browser": browser})
+
+        # The first lookup builds the index in the background and is answered by the live query
+        _, live_queries = self._get_values("$browser", self.team)
+        self.assertEqual(live_queries, 1)
+
+        result, live_queries = self._get_values("$browser", self.team)
+        self.assertEqual(result, [("Chrome",), ("Firefox",), ("Safari",)])
+        self.assertEqual(live_queries, 0)
+
+        result, live_queries = self._get_values("$browser", self.team, value="FIRE")
+        self.assertEqual(result, [("Firefox",)])
+        self.assertEqual(live_queries, 0)
+
+        result, live_queries = self._get_values("$browser", self.team, value="opera")
+        self.assertEqual(result, [])
+        self.assertEqual(live_queries, 0)
+
+        # The index doesn't know which events values were seen on
+        result, live_queries = self._get_values("$browser", self.team, event_names=["$pageview"], value="fire")
+        self.assertEqual(result, [("Firefox",)])
+        self.assertEqual(live_queries, 1)
+
+    @freeze_time("2020-01-20 20:00:00")
+    @override_settings(PROPERTY_VALUES_INDEX_SIZE=1)
+    def test_falls_back_to_live_query_when_index_is_incomplete(self):
+        for browser, count in [("Chrome", 3), ("Firefox", 2)]:
+            for _ in range(count):
+                _create_event(distinct_id="bla", event="$pageview", team=self.team, properties={"$browser": browser})
+        self._get_values("$browser", self.team)
+
+        # Values other than the top one could match as well
+        for value, expected in [("chr", [("Chrome",)]), ("fire", [("Firefox",)])]:
+            result, live_queries = self._get_values("$browser", self.team, value=value)
+            self.assertEqual(result, expected)
+            self.assertEqual(live_queries, 1)
+
+    def test_index_is_rebuilt_when_stale(self):
+        _create_event(distinct_id="bla", event="$pageview", team=self.team, properties={"$browser": "Chrome"})
+        self._get_values("$browser", self.team)
+        _create_event(distinct_id="bla", event="$pageview", team=self.team, properties={"$browser": "Firefox"})
+
+        with freeze_time() as frozen_time:
+            frozen_time.tick(2 * 60 * 60)
+            # The stale index is served while it's rebuilt
+            stale_result, _ = self._get_values("$browser", self.team)
+            result, _ = self._get_values("$browser", self.team)
+
+        self.assertEqual(stale_result, [("Chrome",)])
+        self.assertCountEqual(result, [("Chrome",), ("Firefox",)])
+
+    def test_person_property_values_are_served_from_index(self):
+        _create_person(distinct_ids=["1"], team=self.team, properties={"email": "one@posthog.com"})
+        _create_person(distinct_ids=["2"], team=self.team, properties={"email": "two@posthog.com"})
+        _create_person(distinct_ids=["3"], team=self.team, properties={"email": "one@posthog.com"})
+        get_person_property_values_for_key("email", self.team)
+
+        with patch("posthog.queries.property_values.insight_sync_execute") as live_query:
+            self.assertEqual(
+                get_person_property_values_for_key("email", self.team), [("one@posthog.com", 2), ("two@posthog.com", 1)]
+            )
+            self.assertEqual(get_person_property_values_for_key("email", self.team, "TWO"), [("two@posthog.com", 1)])
+        live_query.assert_not_called()
+
+    @patch("posthog.queries.property_values_index.PERSON_PROPERTY_VALUES_SAMPLE_SIZE", 2)
+    def test_person_property_values_fall_back_to_live_query_when_persons_are_sampled(self):
+        _create_person(distinct_ids=["1"], team=self.team, properties={"email": "one@posthog.com"})
+        _create_person(distinct_ids=["2"], team=self.team, properties={"email": "two@posthog.com"})
+        _create_person(distinct_ids=["3"], team=self.team, properties={"email": "three@posthog.com"})
+        get_person_property_values_for_key("email", self.team)
+
+        # The sample may have left out persons with matching values
+        with patch("posthog.queries.property_values.insight_sync_execute", wraps=insight_sync_execute) as live_query:
+            self.assertEqual(get_person_property_values_for_key("email", self.team, "one"), [("one@posthog.com", 1)])
+        self.assertEqual(live_query.call_count, 1)
@@ -0,0 +1,268 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
+
+import structlog
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from prometheus_client import Counter
+
+from posthog.clickhouse.query_tagging import tag_queries
+from posthog.constants import (
+    MONTHLY_ACTIVE,
+    NON_TIME_SERIES_DISPLAY_TYPES,
+    TREND_FILTER_TYPE_ACTIONS,
+    TRENDS_CUMULATIVE,
+    TRENDS_LIFECYCLE,
+    WEEKLY_ACTIVE,
+)
+from posthog.models.entity import Entity
+from posthog.models.filters import Filter
+from posthog.models.team import Team
+from posthog.queries.query_date_range import QueryDateRange
+from posthog.utils import PersonOnEventsMode
+
+logger = structlog.get_logger(__name__)
+
+TRENDS_BUCKET_CACHE_COUNTER = Counter(
+    "posthog_trends_bucket_cache",
+    "Trends interval buckets served from the bucket cache or calculated in ClickHouse",
+    labelnames=["result"],
+)
+
+# Filter keys that only select which buckets are shown or how they're displayed, not the value of a bucket
+IGNORED_FILTER_KEYS = {"date_from", "date_to", "explicit_date", "display", "compare", "events", "actions", "insight"}
+# Entity keys that don't affect the value of a bucket
+IGNORED_ENTITY_KEYS = {"order", "name", "custom_name"}
+# Properties whose matching events can change after the fact, which cached buckets wouldn't reflect
+COHORT_PROPERTY_TYPES = {"cohort", "precalculated-cohort", "static-cohort"}
+# Only mutable if they're read from the persons and groups tables rather than from the events
+PERSON_PROPERTY_TYPES = {"person", "group"}
+
+
+class TrendsBucketCache:
+    """
+    Caches the values of completed interval buckets of a total volume trends series.
+
+    Buckets are cached per team, normalized filter and bucket start - independently of the date range of the
+    query - so that a refresh only has to calculate the buckets that are still open (or weren't cached yet),
+    and a sliding date range like "Last 7 days" reuses the buckets it shares with the previous day's range.
+
+    A bucket is only cached once it is complete: fully inside the queried date range and ended at least
+    `TRENDS_BUCKET_CACHE_INGESTION_LAG_SECONDS` ago, so that late-arriving events have been ingested.
+    """
+
+    def __init__(self, filter: Filter, team: Team, entity: Entity):
+        self._filter = filter
+        self._team = team
+        self._entity = entity
+        self._timezone = ZoneInfo(team.timezone)
+
+    @staticmethod
+    def is_eligible(filter: Filter, team: Team, entity: Entity) -> bool:
+        """Only series where each bucket is calculated independently of all other buckets can be cached."""
+        return (
+            settings.TRENDS_BUCKET_CACHE_ENABLED
+            and not filter.breakdown
+            and not filter.formula
+            and filter.shown_as != TRENDS_LIFECYCLE
+            and filter.display not in NON_TIME_SERIES_DISPLAY_TYPES
+            and filter.display != TRENDS_CUMULATIVE
+            and filter.smoothing_intervals <= 1
+            and not filter.sampling_factor
+            and filter.interval in ("hour", "day", "week", "month")
+            and entity.math not in (WEEKLY_ACTIVE, MONTHLY_ACTIVE)
+            # Sessions can span bucket boundaries
+            and entity.math_property != "$session_duration"
+            # Action definitions can be edited
+            and entity.type != TREND_FILTER_TYPE_ACTIONS
+            and not TrendsBucketCache._filters_on_mutable_properties(filter, team, entity)
+        )
+
+    @staticmethod
+    def _filters_on_mutable_properties(filter: Filter, team: Team, entity: Entity) -> bool:
+        """Whether cohort membership or person properties changing could change the value of completed buckets."""
+        mutable_types = set(COHORT_PROPERTY_TYPES)
+        if team.person_on_events_mode == PersonOnEventsMode.DISABLED:
+            mutable_types |= PERSON_PROPERTY_TYPES
+
+        property_types = {prop.type for prop in filter.property_groups.flat + entity.property_groups.flat}
+        if filter.filter_test_accounts:
+            property_types |= {prop.get("type") for prop in team.test_account_filters or []}
+        return not property_types.isdisjoint(mutable_types)
+
+    def fetch(self, execute: Callable[[Filter], List]) -> List:
+        """
+        Returns the raw result of the series, calculating only the buckets that aren't cached.
+
+        `execute` runs the series query for the given filter and returns its raw rows.
+        """
+        buckets = self._bucket_starts()
+        cacheable = [bucket for bucket in buckets if self._is_cacheable(bucket)]
+        cached = self._get_cached(cacheable)
+
+        # Only a contiguous run of cached buckets at the start of the range can be skipped in the query
+        first_missing = 0
+        while first_missing < len(buckets) and buckets[first_missing] in cached:
+            first_missing += 1
+
+        TRENDS_BUCKET_CACHE_COUNTER.labels(result="hit").inc(first_missing)
+        TRENDS_BUCKET_CACHE_COUNTER.labels(result="miss").inc(len(buckets) - first_missing)
+        tag_queries(trends_bucket_cache_hits=first_missing)
+
+        if first_missing == 0:
+            result = execute(self._filter)
+            self._set_cached(result, cacheable)
+            return result
+
+        cached_points = [cached[bucket][0] for bucket in buckets[:first_missing]]
+        cached_values = [cached[bucket][1] for bucket in buckets[:first_missing]]
+        if first_missing == len(buckets):
+            return [(cached_points, cached_values)]
+
+        bucket_filter = self._filter.shallow_clone({"date_from": buckets[first_missing].replace(tzinfo=self._timezone)})
+        fresh_result = execute(bucket_filter)
+        if (
+            len(fresh_result) != 1
+            or not fresh_result[0][0]
+            or self._bucket_key(fresh_result[0][0][0]) != buckets[first_missing]
+        ):
+            # The bucket boundaries calculated here don't match the ones calculated in ClickHouse,
+            # so don't trust the cache for this series
+            logger.warn(
+                "trends_bucket_cache_mismatch",
+                team_id=self._team.pk,
+                interval=self._filter.interval,
+                expected_bucket=buckets[first_missing].isoformat(),
+            )
+            return execute(self._filter)
+
+        self._set_cached(fresh_result, cacheable)
+        fresh_points, fresh_values = fresh_result[0][0], fresh_result[0][1]
+        return [(cached_points + list(fresh_points), cached_values + list(fresh_values))]
+
+    @cached_property
+    def _date_range(self) -> Tuple[datetime, datetime]:
+        """The queried range as naive datetimes in the team's timezone, as passed to ClickHouse."""
+        date_range = QueryDateRange(self._filter, self._team)
+        date_from = date_range.date_from_param.astimezone(self._timezone).replace(tzinfo=None)
+        if date_range.should_round:
+            date_from = self._truncate(date_from)
+        # `date_to` is passed to ClickHouse with second precision and compared inclusively
+        date_to = date_range.date_to_param.astimezone(self._timezone).replace(tzinfo=None, microsecond=0)
+        return date_from, date_to
+
+    def _bucket_starts(self) -> List[datetime]:
+        """Naive datetimes in the team's timezone, matching the buckets generated in `NULL_SQL`."""
+        date_from, date_to = self._date_range
+        bucket = self._truncate(date_from)
+
+        buckets: List[datetime] = []
+        while bucket <= date_to:
+            buckets.append(bucket)
+            bucket = self._bucket_end(bucket)
+        return buckets
+
+    def _is_cacheable(self, bucket: datetime) -> bool:
+        date_from, date_to = self._date_range
+        bucket_end = self._bucket_end(bucket)
+        completed_before = timezone.now() - timedelta(seconds=settings.TRENDS_BUCKET_CACHE_INGESTION_LAG_SECONDS)
+
+        return (
+            bucket >= date_from
+            and bucket_end <= date_to
+            and bucket_end.replace(tzinfo=self._timezone) <= completed_before
+        )
+
+    def _truncate(self, value: datetime) -> datetime:
+        interval = self._filter.interval
+        if interval == "hour":
+            return value.replace(minute=0, second=0, microsecond=0)
+        value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        if interval == "week":
+            # Python weeks start on Monday (0), `week_start_day` is 0 for Sunday and 1 for Monday
+            first_weekday = 0 if self._team.week_start_day == 1 else 6
+            return value - timedelta(days=(value.weekday() - first_weekday) % 7)
+        if interval == "month":
+            return value.replace(day=1)
+        return value
+
+    def _bucket_end(self, bucket: datetime) -> datetime:
+        interval = self._filter.interval
+        if interval == "hour":
+            return bucket + timedelta(hours=1)
+        if interval == "week":
+            return bucket + timedelta(weeks=1)
+        if interval == "month":
+            return bucket + relativedelta(months=1)
+        return bucket + timedelta(days=1)
+
+    def _bucket_key(self, point: Union[date, datetime]) -> datetime:
+        if not isinstance(point, datetime):
+            return datetime.combine(point, datetime.min.time())
+        if point.tzinfo is not None:
+            return point.astimezone(self._timezone).replace(tzinfo=None)
+        return point
+
+    def _series_key(self) -> str:
+        filter_dict = {key: value for key, value in self._filter.to_dict().items() if key not in IGNORED_FILTER_KEYS}
+        entity_dict = {key: value for key, value in self._entity.to_dict().items() if key not in IGNORED_ENTITY_KEYS}
+        stringified = json.dumps(
+            {
+                "team_id": self._team.pk,
+                "timezone": self._team.timezone,
+                "week_start_day": self._team.week_start_day,
+                "person_on_events_mode": self._team.person_on_events_mode,
+                "filter": filter_dict,
+                "entity": entity_dict,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.md5(stringified.encode("utf-8")).hexdigest()
+
+    def _cache_key(self, series_key: str, bucket: datetime) -> str:
+        return f"trends_bucket_{self._team.pk}_{series_key}_{bucket.isoformat()}"
+
+    def _get_cached(self, buckets: List[datetime]) -> Dict[datetime, Tuple[Union[date, datetime], Any]]:
+        if not buckets:
+            return {}
+        series_key = self._series_key()
+        keys = {self._cache_key(series_key, bucket): bucket for bucket in buckets}
+        try:
+            cached = cache.get_many(list(keys.keys()))
+        except Exception as e:
+            logger.warn("trends_bucket_cache_read_failed", team_id=self._team.pk, error=e)
+            return {}
+        return {keys[key]: value for key, value in cached.items()}
+
+    def _set_cached(self, result: List, cacheable: List[datetime]) -> None:
+        if len(result) != 1 or not cacheable:
+            return
+        cacheable_buckets = set(cacheable)
+        series_key = self._series_key()
+        points, values = result[0][0], result[0][1]
+
+        to_cache: Dict[str, Tuple[Union[date, datetime], Any]] = {}
+        for point, value in zip(points, values):
+            bucket = self._bucket_key(point)
+            if bucket in cacheable_buckets:
+                to_cache[self._cache_key(series_key, bucket)] = (point, value)
+
+        if not to_cache:
+            return
+        try:
+            cache.set_many(to_cache, timeout=settings.TRENDS_BUCKET_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warn("trends_bucket_cache_write_failed", team_id=self._team.pk, error=e)
+
+
+def get_bucket_cache(filter: Filter, team: Team, entity: Entity) -> Optional[TrendsBucketCache]:
+    if not TrendsBucketCache.is_eligible(filter, team, entity):
+        return None
+    return TrendsBucketCache(filter, team, entity)
@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from freezegun.api import freeze_time
+
+from posthog.constants import TRENDS_CUMULATIVE
+from posthog.models.entity import Entity
+from posthog.models.filters.filter import Filter
+from posthog.queries.insight import insight_sync_execute
+from posthog.queries.trends.bucket_cache import TrendsBucketCache
+from posthog.queries.trends.trends import Trends
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin, _create_event, _create_person
+
+
+@override_settings(TRENDS_BUCKET_CACHE_ENABLED=True, TRENDS_BUCKET_CACHE_INGESTION_LAG_SECONDS=3600)
+class TestTrendsBucketCache(ClickhouseTestMixin, APIBaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        _create_person(team_id=self.team.pk, distinct_ids=["person1"])
+        for day, count in [(1, 1), (2, 2), (3, 3), (5, 1), (7, 2)]:
+            for _ in range(count):
+                _create_event(
+                    team=self.team, event="$pageview", distinct_id="person1", timestamp=f"2020-01-0{day}T12:00:00Z"
+                )
+
+    def _run(self, data=None):
+        filter = Filter(
+            data={"date_from": "-7d", "interval": "day", "events": [{"id": "$pageview"}], **(data or {})},
+            team=self.team,
+        )
+        with patch("posthog.queries.trends.trends.insight_sync_execute", wraps=insight_sync_execute) as execute:
+            result = Trends().run(filter, self.team)
+        return result, [call.kwargs["filter"] for call in execute.call_args_list]
+
+    def test_refresh_only_calculates_open_buckets(self):
+        with freeze_time("2020-01-07T15:00:00Z"):
+            with override_settings(TRENDS_BUCKET_CACHE_ENABLED=False):
+                expected, _ = self._run()
+            first_result, first_filters = self._run()
+            second_result, second_filters = self._run()
+
+        self.assertEqual(first_result[0]["data"], [0.0, 1.0, 2.0, 3.0, 0.0, 1.0, 0.0, 2.0])
+        for result in (first_result, second_result):
+            self.assertEqual(result[0]["data"], expected[0]["data"])
+            self.assertEqual(result[0]["days"], expected[0]["days"])
+            self.assertEqual(result[0]["labels"], expected[0]["labels"])
+            self.assertEqual(result[0]["count"], expected[0]["count"])
+            self.assertEqual(len(result[0]["persons_urls"]), len(expected[0]["persons_urls"]))
+
+        self.assertEqual([f.date_from.date().isoformat() for f in first_filters], ["2019-12-31"])
+        # Only today's bucket is still open
+        self.assertEqual([f.date_from.date().isoformat() for f in second_filters], ["2020-01-07"])
+
+    def test_sliding_date_range_reuses_cached_buckets(self):
+        with freeze_time("2020-01-07T15:00:00Z"):
+            self._run()
+
+        _create_event(team=self.team, event="$pageview", distinct_id="person1", timestamp="2020-01-08T12:00:00Z")
+
+        with freeze_time("2020-01-08T15:00:00Z"):
+            result, filters = self._run()
+
+        self.assertEqual(result[0]["days"][0], "2020-01-01")
+        self.assertEqual(result[0]["data"], [1.0, 2.0, 3.0, 0.0, 1.0, 0.0, 2.0, 1.0])
+        # Yesterday's bucket wasn't complete when it was last calculated
+        self.assertEqual([f.date_from.date().isoformat() for f in filters], ["2020-01-07"])
+
+    def test_buckets_within_ingestion_lag_are_not_cached(self):
+        with freeze_time("2020-01-08T00:30:00Z"):
+            self._run()
+            _, filters = self._run()
+
+        self.assertEqual([f.date_from.date().isoformat() for f in filters], ["2020-01-07"])
+
+    def test_hourly_buckets(self):
+        with freeze_time("2020-01-07T15:00:00Z"):
+            with override_settings(TRENDS_BUCKET_CACHE_ENABLED=False):
+                expected, _ = self._run({"date_from": "-24h", "interval": "hour"})
+            self._run({"date_from": "-24h", "interval": "hour"})
+            result, filters = self._run({"date_from": "-24h", "interval": "hour"})
+
+        self.assertEqual(result[0]["data"], expected[0]["data"])
+        self.assertEqual(result[0]["days"], expected[0]["days"])
+        self.assertEqual([f.date_from.isoformat() for f in filters], ["2020-01-07T14:00:00+00:00"])
+
+    def test_different_filters_are_cached_separately(self):
+        with freeze_time("2020-01-07T15:00:00Z"):
+            self._run()
+            result, filters = self._run({"events": [{"id": "$pageview", "math": "dau"}]})
+
+        self.assertEqual(result[0]["data"], [0.0, 1.0, 1.0, 1.0, 0.0, 1.0, 0.0, 1.0])
+        self.assertEqual([f.date_from.date().isoformat() for f in filters], ["2019-12-31"])
+
+    def test_ineligible_filters(self):
+        entity = Entity({"id": "$pageview", "type": "events"})
+        for data in (
+            {"breakdown": "$browser"},
+            {"display": TRENDS_CUMULATIVE},
+            {"smoothing_intervals": 7},
+            {"formula": "A + B"},
+            {"sampling_factor": 0.1},
+        ):
+            filter = Filter(data={"events": [{"id": "$pageview"}], **data}, team=self.team)
+            self.assertFalse(TrendsBucketCache.is_eligible(filter, self.team, entity), data)
+
+        filter = Filter(data={"events": [{"id": "$pageview"}]}, team=self.team)
+        self.assertTrue(TrendsBucketCache.is_eligible(filter, self.team, entity))
+        self.assertFalse(TrendsBucketCache.is_eligible(filter, self.team, Entity({"id": 1, "type": "actions"})))
+        self.assertFalse(
+            TrendsBucketCache.is_eligible(
+                filter, self.team, Entity({"id": "$pageview", "type": "events", "math": "weekly_active"})
+            )
+        )
+
+    def test_filters_on_cohorts_and_person_properties_are_ineligible(self):
+        entity = Entity({"id": "$pageview", "type": "events"})
+        cohort_filter = Filter(
+            data={"events": [{"id": "$pageview"}], "properties": [{"key": "id", "value": 1, "type": "cohort"}]},
+            team=self.team,
+        )
+        person_filter = Filter(
+            data={"events": [{"id": "$pageview"}], "properties": [{"key": "email", "value": "a", "type": "person"}]},
+            team=self.team,
+        )
+        person_entity = Entity(
+            {"id": "$pageview", "type": "events", "properties": [{"key": "email", "value": "a", "type": "person"}]}
+        )
+        plain_filter = Filter(data={"events": [{"id": "$pageview"}]}, team=self.team)
+
+        self.assertFalse(TrendsBucketCache.is_eligible(cohort_filter, self.team, entity))
+        self.assertFalse(TrendsBucketCache.is_eligible(person_filter, self.team, entity))
+        self.assertFalse(TrendsBucketCache.is_eligible(plain_filter, self.team, person_entity))
+
+        self.team.test_account_filters = [
+            {"key": "email", "value": "@posthog.com", "operator": "not_icontains", "type": "person"}
+        ]
+        test_accounts_filter = plain_filter.shallow_clone({"filter_test_accounts": True})
+        self.assertFalse(TrendsBucketCache.is_eligible(test_accounts_filter, self.team, entity))
+
+        # Person properties are frozen on events with persons on events
+        with override_settings(PERSON_ON_EVENTS_OVERRIDE=True):
+            self.assertTrue(TrendsBucketCache.is_eligible(person_filter, self.team, entity))
+            self.assertFalse(TrendsBucketCache.is_eligible(cohort_filter, self.team, entity))
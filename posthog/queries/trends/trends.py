@@ -25,6 +25,7 @@ from posthog.models.team import Team
 from posthog.queries.base import handle_compare
 from posthog.queries.insight import insight_sync_execute
 from posthog.queries.trends.breakdown import TrendsBreakdown
+from posthog.queries.trends.bucket_cache import get_bucket_cache
 from posthog.queries.trends.formula import TrendsFormula
 from posthog.queries.trends.lifecycle import Lifecycle
 from posthog.queries.trends.total_volume import TrendsTotalVolume
@@ -127,14 +128,18 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
             scope.set_tag("team", team)
             query_params = {**params, **adjusted_filter.hogql_context.values}
             scope.set_context("query", {"sql": sql, "params": query_params})
-            result = insight_sync_execute(
-                sql,
-                query_params,
-                settings={"timeout_before_checking_execution_speed": 60},
-                query_type=query_type,
-                filter=adjusted_filter,
-                team_id=team.pk,
-            )
+            bucket_cache = get_bucket_cache(adjusted_filter, team, entity) if not cached_result else None
+            if bucket_cache:
+                result = bucket_cache.fetch(lambda bucket_filter: self._execute_for_entity(bucket_filter, team, entity))
+            else:
+                result = insight_sync_execute(
+                    sql,
+                    query_params,
+                    settings={"timeout_before_checking_execution_speed": 60},
+                    query_type=query_type,
+                    filter=adjusted_filter,
+                    team_id=team.pk,
+                )
             result = parse_function(result)
             serialized_data = self._format_serialized(entity, result)
             merged_results, cached_result = self.merge_results(
@@ -147,13 +152,40 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
 
         return merged_results
 
+    def _execute_for_entity(self, filter: Filter, team: Team, entity: Entity) -> List:
+        query_type, sql, params, _ = self._get_sql_for_entity(filter, team, entity)
+        return insight_sync_execute(
+            sql,
+            {**params, **filter.hogql_context.values},
+            settings={"timeout_before_checking_execution_speed": 60},
+            query_type=query_type,
+            filter=filter,
+            team_id=team.pk,
+        )
+
     def _run_query_for_threading(
-        self, result: List, index: int, query_type, sql, params, query_tags: Dict, filter: Filter, team_id: int
+        self,
+        result: List,
+        index: int,
+        query_type,
+        sql,
+        params,
+        query_tags: Dict,
+        filter: Filter,
+        team: Team,
+        entity: Entity,
+        use_bucket_cache: bool,
     ):
         tag_queries(**query_tags)
         with push_scope() as scope:
             scope.set_context("query", {"sql": sql, "params": params})
-            result[index] = insight_sync_execute(sql, params, query_type=query_type, filter=filter, team_id=team_id)
+            bucket_cache = get_bucket_cache(filter, team, entity) if use_bucket_cache else None
+            if bucket_cache:
+                result[index] = bucket_cache.fetch(
+                    lambda bucket_filter: self._execute_for_entity(bucket_filter, team, entity)
+                )
+            else:
+                result[index] = insight_sync_execute(sql, params, query_type=query_type, filter=filter, team_id=team.pk)
 
     def _run_parallel(self, filter: Filter, team: Team) -> List[Dict[str, Any]]:
         result: List[Optional[List[Dict[str, Any]]]] = [None] * len(filter.entities)
@@ -170,7 +202,18 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
             sql_statements_with_params[entity.index] = (sql, query_params)
             thread = threading.Thread(
                 target=self._run_query_for_threading,
-                args=(result, entity.index, query_type, sql, query_params, get_query_tags(), adjusted_filter, team.pk),
+                args=(
+                    result,
+                    entity.index,
+                    query_type,
+                    sql,
+                    query_params,
+                    get_query_tags(),
+                    adjusted_filter,
+                    team,
+                    entity,
+                    not cached_result,
+                ),
             )
             jobs.append(thread)
 
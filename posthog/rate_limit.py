@@ -1,7 +1,6 @@
 import re
-import time
-from functools import lru_cache
-from typing import List, Optional
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
 
 from prometheus_client import Counter
 from rest_framework.throttling import SimpleRateThrottle, BaseThrottle, UserRateThrottle
@@ -9,10 +8,11 @@ from rest_framework.request import Request
 from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 from posthog.auth import PersonalAPIKeyAuthentication
+from posthog.cache_utils import cache_for
 from posthog.metrics import LABEL_PATH, LABEL_TEAM_ID
 from posthog.models.instance_setting import get_instance_setting
+from posthog.redis_token_bucket import RedisTokenBucketLimiter, delete_shared_buckets
 from posthog.settings.utils import get_list
-from token_bucket import Limiter, MemoryStorage
 
 
 RATE_LIMIT_EXCEEDED_COUNTER = Counter(
@@ -34,20 +34,18 @@ DECIDE_RATE_LIMIT_EXCEEDED_COUNTER = Counter(
 )
 
 
-@lru_cache(maxsize=1)
-def get_team_allow_list(_ttl: int) -> List[str]:
+@cache_for(timedelta(minutes=1))
+def get_team_allow_list() -> List[str]:
     """
     The "allow list" will change way less frequently than it will be called
-    _ttl is passed an infrequently changing value to ensure the cache is invalidated after some delay
     """
     return get_list(get_instance_setting("RATE_LIMITING_ALLOW_LIST_TEAMS"))
 
 
-@lru_cache(maxsize=1)
-def is_rate_limit_enabled(_ttl: int) -> bool:
+@cache_for(timedelta(minutes=1))
+def is_rate_limit_enabled() -> bool:
     """
     The setting will change way less frequently than it will be called
-    _ttl is passed an infrequently changing value to ensure the cache is invalidated after some delay
     """
     return get_instance_setting("RATE_LIMIT_ENABLED")
 
@@ -63,6 +61,26 @@ def is_decide_rate_limit_enabled() -> bool:
     return str_to_bool(settings.DECIDE_RATE_LIMIT_ENABLED)
 
 
+_throttle_limiters: Dict[Tuple[str, int, int], RedisTokenBucketLimiter] = {}
+
+
+def _get_throttle_limiter(scope: str, num_requests: int, duration: int) -> RedisTokenBucketLimiter:
+    # Throttles are instantiated for every request, their buckets live for the whole process
+    key = (scope, num_requests, duration)
+    limiter = _throttle_limiters.get(key)
+    if limiter is None:
+        limiter = _throttle_limiters.setdefault(
+            key, RedisTokenBucketLimiter(f"throttle_{scope}", rate=num_requests / duration, capacity=num_requests)
+        )
+    return limiter
+
+
+def reset_throttles() -> None:
+    """Forgets the requests counted by all throttles, including in redis, e.g. between tests."""
+    _throttle_limiters.clear()
+    delete_shared_buckets("throttle_*")
+
+
 path_by_team_pattern = re.compile(r"/api/projects/(\d+)/")
 path_by_org_pattern = re.compile(r"/api/organizations/(.+)/")
 
@@ -83,7 +101,7 @@ class TeamRateThrottle(SimpleRateThrottle):
 
     def allow_request(self, request, view):
 
-        if not is_rate_limit_enabled(round(time.time() / 60)):
+        if not is_rate_limit_enabled(use_cache=True):
             return True
 
         # Only rate limit authenticated requests made with a personal API key
@@ -93,7 +111,7 @@ class TeamRateThrottle(SimpleRateThrottle):
         # As we're figuring out what our throttle limits should be, we don't actually want to throttle anything.
         # Instead of throttling, this logs that the request would have been throttled.
         try:
-            request_would_be_allowed = super().allow_request(request, view)
+            request_would_be_allowed = self.request_is_within_rate(request, view)
             if not request_would_be_allowed:
                 team_id = self.safely_get_team_id_from_view(view)
                 path = getattr(request, "path", None)
@@ -123,6 +141,24 @@ class TeamRateThrottle(SimpleRateThrottle):
             capture_exception(e)
             return True
 
+    def request_is_within_rate(self, request, view) -> bool:
+        """
+        Takes the place of SimpleRateThrottle.allow_request, counting requests in token buckets shared by all
+        processes, of `num_requests` tokens replenished over `duration`, instead of in a history per key in the cache.
+        """
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        return _get_throttle_limiter(self.scope, self.num_requests, self.duration).consume(key)
+
+    def wait(self):
+        # An empty bucket gets its next token after this long
+        return self.duration / self.num_requests
+
     def get_cache_key(self, request, view):
         """
         Attempts to throttle based on the team_id of the request. If it can't do that, it falls back to the user_id.
@@ -145,27 +181,21 @@ class TeamRateThrottle(SimpleRateThrottle):
         return self.cache_format % {"scope": self.scope, "ident": ident}
 
     def team_is_allowed_to_bypass_throttle(self, team_id: Optional[int]) -> bool:
-        allow_list = get_team_allow_list(round(time.time() / 60))
+        allow_list = get_team_allow_list(use_cache=True)
         return team_id is not None and str(team_id) in allow_list
 
 
 class DecideRateThrottle(BaseThrottle):
     """
     This is a custom throttle that is used to limit the number of requests to the /decide endpoint.
-    It is different from the TeamRateThrottle in that it does not use the Django cache, but instead
-    uses the Limiter from the `token-bucket` library.
-    This uses the token bucket algorithm to limit the number of requests to the endpoint. It's a lot
-    more performant than DRF's SimpleRateThrottle, which inefficiently uses the Django cache.
-
-    However, note that this throttle is per process, and not global.
+    It is different from the TeamRateThrottle in that it is not a DRF throttle, as /decide is served
+    by the ShortCircuitMiddleware.
+    This uses the token bucket algorithm to limit the number of requests to the endpoint, with buckets
+    shared by all processes through redis.
     """
 
     def __init__(self, replenish_rate: float = 5, bucket_capacity=100) -> None:
-        self.limiter = Limiter(
-            rate=replenish_rate,
-            capacity=bucket_capacity,
-            storage=MemoryStorage(),
-        )
+        self.limiter = RedisTokenBucketLimiter("decide", rate=replenish_rate, capacity=bucket_capacity)
 
     @staticmethod
     def safely_get_token_from_request(request: Request) -> Optional[str]:
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import structlog
+from django.conf import settings
+from prometheus_client import Counter
+from redis import Redis
+from redis.commands.core import Script
+
+from posthog import redis
+
+logger = structlog.get_logger(__name__)
+
+TOKEN_BUCKET_FLUSHES_COUNTER = Counter(
+    "posthog_token_bucket_flushes_total",
+    "Flushes of locally counted tokens to the shared buckets in redis, per limiter and outcome",
+    labelnames=["limiter", "outcome"],
+)
+
+KEY_PREFIX = "@posthog/token-bucket/"
+
+# Refills the bucket for the time since it was last updated, takes the tokens consumed since the previous flush, and
+# returns what is left. Tokens consumed beyond what the bucket had leave it negative, so that the processes that
+# consumed too many wait for the debt to be refilled. The bucket expires once it would be full again, as it's then the
+# same as no bucket.
+CONSUME_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local consumed = tonumber(ARGV[4])
+
+local bucket = redis.call("hmget", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+if now > updated_at then
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    updated_at = now
+end
+tokens = tokens - consumed
+
+redis.call("hset", KEYS[1], "tokens", tokens, "updated_at", updated_at)
+redis.call("expire", KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return tostring(tokens)
+"""
+
+_consume_script: Optional[Script] = None
+
+
+def _get_consume_script(client: Redis) -> Script:
+    # Registering only hashes the script, it's loaded into redis by its first call
+    global _consume_script
+    if _consume_script is None or _consume_script.registered_client is not client:
+        _consume_script = client.register_script(CONSUME_SCRIPT)
+    return _consume_script
+
+
+def delete_shared_buckets(name_pattern: str) -> None:
+    """Deletes the buckets in redis of the limiters whose name matches the glob-style pattern, e.g. in tests."""
+    client = redis.get_client()
+    for redis_key in client.scan_iter(match=f"{KEY_PREFIX}{name_pattern}/*"):
+        client.delete(redis_key)
+
+
+class _LocalBucket:
+    __slots__ = ("tokens", "updated_at", "pending", "flushed_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        # Tokens consumed since the last flush to redis
+        self.pending = 0
+        self.flushed_at = now
+
+
+class RedisTokenBucketLimiter:
+    """
+    Token buckets shared by all processes through redis, with the same `consume` as `token_bucket.Limiter`.
+
+    Each process decides from its own copy of a bucket and counts the tokens it consumes, flushing them to redis
+    every `RATE_LIMITER_FLUSH_EVERY_REQUESTS` tokens or `RATE_LIMITER_FLUSH_INTERVAL_SECONDS`, whichever comes first.
+    A flush takes the tokens from the shared bucket in one atomic script, and replaces the local copy with what is
+    left. This costs a redis round-trip per flush rather than per request. Processes can consume up to a flush's worth
+    of tokens more than the shared bucket had, but that leaves the shared bucket in debt, and the local copies set
+    from it only admit requests again once the debt is refilled. All processes together so stay within `rate`.
+
+    If redis is unavailable, the local copies keep limiting each process on its own.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int, max_keys: int = 10_000):
+        self.name = name
+        self._rate = rate
+        self._capacity = capacity
+        # Buckets are kept for the most recently used keys only, counts not flushed yet are lost on eviction
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, _LocalBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, num_tokens: int = 1) -> bool:
+        now = time.time()
+        with self._lock:
+            bucket = self._get_bucket(key, now)
+            bucket.tokens = min(self._capacity, bucket.tokens + (now - bucket.updated_at) * self._rate)
+            bucket.updated_at = max(now, bucket.updated_at)
+            if bucket.tokens < num_tokens:
+                return False
+
+            bucket.tokens -= num_tokens
+            bucket.pending += num_tokens
+            should_flush = (
+                bucket.pending >= settings.RATE_LIMITER_FLUSH_EVERY_REQUESTS
+                or now - bucket.flushed_at >= settings.RATE_LIMITER_FLUSH_INTERVAL_SECONDS
+            )
+            if should_flush:
+                consumed, bucket.pending, bucket.flushed_at = bucket.pending, 0, now
+
+        if should_flush:
+            self._flush(key, bucket, consumed, now)
+        return True
+
+    def reset(self) -> None:
+        """Forgets all tokens consumed so far, by this process and by all others."""
+        with self._lock:
+            self._buckets.clear()
+        delete_shared_buckets(self.name)
+
+    def _get_bucket(self, key: str, now: float) -> _LocalBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # Keys are assumed to have a full bucket until the first flush says otherwise, so that keys seen rarely
+            # never cost a round-trip
+            bucket = self._buckets[key] = _LocalBucket(self._capacity, now)
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _flush(self, key: str, bucket: _LocalBucket, consumed: int, now: float) -> None:
+        remaining = self._take_from_redis(key, consumed, now)
+        with self._lock:
+            if remaining is None:
+                # Counted again with the next flush
+                bucket.pending += consumed
+            else:
+                # Tokens consumed locally during the round-trip aren't in the shared bucket yet
+                bucket.tokens = remaining - bucket.pending
+                bucket.updated_at = now
+
+    def _take_from_redis(self, key: str, consumed: int, now: float) -> Optional[float]:
+        try:
+            script = _get_consume_script(redis.get_client())
+            # Buckets are keyed by their rate and capacity as well, so that changing them starts new buckets
+            redis_key = f"{KEY_PREFIX}{self.name}/{self._rate}/{self._capacity}/{key}"
+            remaining = float(script(keys=[redis_key], args=[self._rate, self._capacity, now, consumed]))
+        except Exception as err:
+            TOKEN_BUCKET_FLUSHES_COUNTER.labels(limiter=self.name, outcome="failed").inc()
+            logger.warn("token_bucket_flush_failed", limiter=self.name, error=err)
+            return None
+
+        TOKEN_BUCKET_FLUSHES_COUNTER.labels(limiter=self.name, outcome="flushed").inc()
+        return remaining
@@ -233,6 +233,32 @@ class FunnelCorrelationPersonConverted(str, Enum):
     false = "false"
 
 
+class HogQLExplainProperty(BaseModel):
+    class Config:
+        extra = Extra.forbid
+
+    field: str
+    materializedColumn: Optional[str] = Field(
+        ..., description="The materialized column the property was read from, or null if it was extracted from JSON"
+    )
+    property: str
+    table: str
+
+
+class HogQLExplainTable(BaseModel):
+    class Config:
+        extra = Extra.forbid
+
+    estimatedMarks: float = Field(
+        ..., description="Granules ClickHouse expects to read after using the table's indexes"
+    )
+    estimatedParts: float = Field(
+        ..., description="Parts ClickHouse expects to read from after using the table's indexes"
+    )
+    estimatedRows: float = Field(..., description="Rows ClickHouse expects to read after using the table's indexes")
+    table: str
+
+
 class HogQLNotice(BaseModel):
     class Config:
         extra = Extra.forbid
@@ -549,6 +575,25 @@ class GroupPropertyFilter(BaseModel):
     value: Optional[Union[str, float, List[Union[str, float]]]] = None
 
 
+class HogQLExplainResponse(BaseModel):
+    class Config:
+        extra = Extra.forbid
+
+    clickhouse: Optional[str] = None
+    hogql: Optional[str] = None
+    indexes: Optional[List[str]] = Field(None, description="Output of EXPLAIN indexes = 1")
+    pipeline: Optional[List[str]] = Field(None, description="Output of EXPLAIN PIPELINE")
+    properties: Optional[List[HogQLExplainProperty]] = Field(
+        None, description="Properties read by the query, and the materialized columns they were read from"
+    )
+    query: Optional[str] = None
+    tables: Optional[List[HogQLExplainTable]] = Field(
+        None,
+        description="How much of the tables read by the query ClickHouse expects to read, for the team's data only",
+    )
+    timings: Optional[List[QueryTiming]] = None
+
+
 class HogQLMetadataResponse(BaseModel):
     class Config:
         extra = Extra.forbid
@@ -599,6 +644,7 @@ class LifecycleQueryResponse(BaseModel):
         extra = Extra.forbid
 
     result: List[Dict[str, Any]]
+    samplingFactor: Optional[float] = Field(None, description="Sampling rate the results were calculated with")
     timings: Optional[List[QueryTiming]] = None
 
 
@@ -773,6 +819,16 @@ class HogQLFilters(BaseModel):
     ] = None
 
 
+class HogQLExplain(BaseModel):
+    class Config:
+        extra = Extra.forbid
+
+    filters: Optional[HogQLFilters] = None
+    kind: str = Field("HogQLExplain", const=True)
+    query: str
+    response: Optional[HogQLExplainResponse] = Field(None, description="Cached query response")
+
+
 class HogQLMetadata(BaseModel):
     class Config:
         extra = Extra.forbid
@@ -1219,7 +1275,16 @@ class Model(BaseModel):
         LifecycleQuery,
         TimeToSeeDataSessionsQuery,
         DatabaseSchemaQuery,
-        Union[EventsNode, EventsQuery, ActionsNode, PersonsNode, HogQLQuery, HogQLMetadata, TimeToSeeDataSessionsQuery],
+        Union[
+            EventsNode,
+            EventsQuery,
+            ActionsNode,
+            PersonsNode,
+            HogQLQuery,
+            HogQLMetadata,
+            HogQLExplain,
+            TimeToSeeDataSessionsQuery,
+        ],
     ]
 
 
@@ -138,6 +138,106 @@ CLICKHOUSE_ENABLE_STORAGE_POLICY = get_from_env("CLICKHOUSE_ENABLE_STORAGE_POLIC
 
 CLICKHOUSE_CONN_POOL_MIN = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
+# How long queries wait for a connection when all connections of a pool are in use, before failing
+CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS = get_from_env(
+    "CLICKHOUSE_CONN_POOL_ACQUIRE_TIMEOUT_SECONDS", 5.0, type_cast=float
+)
+# How often idle connections are pinged, to reopen the broken ones before they're used. 0 disables pinging
+CLICKHOUSE_CONN_POOL_PING_INTERVAL_SECONDS = get_from_env(
+    "CLICKHOUSE_CONN_POOL_PING_INTERVAL_SECONDS", 0 if TEST else 60, type_cast=int
+)
+# Open the idle connections of the main pools when workers start, instead of on their first queries
+CLICKHOUSE_CONN_POOL_WARM_UP = get_from_env("CLICKHOUSE_CONN_POOL_WARM_UP", not TEST, type_cast=str_to_bool)
+# How many idle connections of each pool are opened when workers start, and for how long at most. It's done in the
+# background, so that workers boot in time even when ClickHouse is slow to answer
+CLICKHOUSE_CONN_POOL_WARM_UP_CONNECTIONS = get_from_env("CLICKHOUSE_CONN_POOL_WARM_UP_CONNECTIONS", 2, type_cast=int)
+CLICKHOUSE_CONN_POOL_WARM_UP_TIMEOUT_SECONDS = get_from_env(
+    "CLICKHOUSE_CONN_POOL_WARM_UP_TIMEOUT_SECONDS", 10.0, type_cast=float
+)
+# How long to wait for ClickHouse to send data before giving up on a query. Queries allowed to run for longer, with
+# `max_execution_time`, wait for longer
+CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS = get_from_env(
+    "CLICKHOUSE_SEND_RECEIVE_TIMEOUT_SECONDS", 30 if TEST else 15 * 60, type_cast=int
+)
+
+# Coalesce identical concurrent read queries across processes, see posthog/clickhouse/client/single_flight.py
+CLICKHOUSE_SINGLE_FLIGHT_ENABLED = get_from_env("CLICKHOUSE_SINGLE_FLIGHT_ENABLED", False, type_cast=str_to_bool)
+# How long results of coalesced queries are reused for
+CLICKHOUSE_SINGLE_FLIGHT_RESULT_TTL_SECONDS = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_RESULT_TTL_SECONDS", 5, type_cast=int
+)
+# How long concurrent callers wait for the first caller's result before executing the query themselves
+CLICKHOUSE_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS", 60, type_cast=int
+)
+CLICKHOUSE_SINGLE_FLIGHT_POLL_INTERVAL_SECONDS = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_POLL_INTERVAL_SECONDS", 0.05, type_cast=float
+)
+# Larger results aren't shared through redis, concurrent callers execute the query themselves instead
+CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES = get_from_env(
+    "CLICKHOUSE_SINGLE_FLIGHT_MAX_RESULT_BYTES", 10 * 1024 * 1024, type_cast=int
+)
+
+# Celery queue queries run asynchronously with progress are sent to, so that they can get workers of their own
+ASYNC_QUERY_CELERY_QUEUE = get_from_env("ASYNC_QUERY_CELERY_QUEUE", "celery")
+ASYNC_QUERY_MAX_RESULT_ROWS = get_from_env("ASYNC_QUERY_MAX_RESULT_ROWS", 10_000, type_cast=int)
+# Results of asynchronous queries with more rows are spooled to object storage in chunks of this many rows
+ASYNC_QUERY_RESULTS_CHUNK_ROWS = get_from_env("ASYNC_QUERY_RESULTS_CHUNK_ROWS", 1_000, type_cast=int)
+# How long clients can follow the progress of an asynchronous query for in one request, before they have to reconnect.
+# Has to stay below the gunicorn worker timeout, as the request holds on to a worker all along
+ASYNC_QUERY_PROGRESS_STREAM_TIMEOUT_SECONDS = get_from_env(
+    "ASYNC_QUERY_PROGRESS_STREAM_TIMEOUT_SECONDS", 10, type_cast=int
+)
+
+# Apply the WHERE conditions of HogQL queries inside the subqueries of the persons and groups tables they join,
+# see posthog/hogql/transforms/lazy_tables.py
+HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED = get_from_env("HOGQL_LAZY_JOIN_PUSHDOWN_ENABLED", False, type_cast=str_to_bool)
+# Simplify the boolean logic of HogQL queries and reuse aliased properties before printing them,
+# see posthog/hogql/transforms/optimizer.py
+HOGQL_OPTIMIZER_ENABLED = get_from_env("HOGQL_OPTIMIZER_ENABLED", False, type_cast=str_to_bool)
+# Parse HogQL with the hand-written parser instead of the ANTLR one, see posthog/hogql/pratt_parser.py
+HOGQL_PRATT_PARSER_ENABLED = get_from_env("HOGQL_PRATT_PARSER_ENABLED", False, type_cast=str_to_bool)
+
+# Sampling factors chosen for queries with `sampling_factor: "auto"` keep the estimated relative error of the count
+# of events the query reads under this target, see posthog/queries/adaptive_sampling.py
+ADAPTIVE_SAMPLING_TARGET_RELATIVE_ERROR = get_from_env("ADAPTIVE_SAMPLING_TARGET_RELATIVE_ERROR", 0.01, type_cast=float)
+# Days of per-team counters the distinct ids per day of a team are averaged over
+ADAPTIVE_SAMPLING_LOOKBACK_DAYS = get_from_env("ADAPTIVE_SAMPLING_LOOKBACK_DAYS", 7, type_cast=int)
+# Sample queries that don't set a sampling factor as if they asked for "auto"
+ADAPTIVE_SAMPLING_BY_DEFAULT = get_from_env("ADAPTIVE_SAMPLING_BY_DEFAULT", False, type_cast=str_to_bool)
+
+# Predict the cost of insight queries from system.query_log, run the expensive ones on the offline cluster and limit
+# the resources of each, see posthog/clickhouse/client/query_cost.py
+QUERY_COST_ROUTING_ENABLED = get_from_env("QUERY_COST_ROUTING_ENABLED", False, type_cast=str_to_bool)
+# Queries predicted to take at least this long are expensive
+QUERY_COST_OFFLINE_THRESHOLD_MS = get_from_env("QUERY_COST_OFFLINE_THRESHOLD_MS", 10_000, type_cast=int)
+# Hours of system.query_log the cost per row of each type of query is learnt from
+QUERY_COST_LOOKBACK_HOURS = get_from_env("QUERY_COST_LOOKBACK_HOURS", 24, type_cast=int)
+# Upper bounds of the limits set for each query from its predicted cost
+QUERY_COST_MAX_EXECUTION_TIME_SECONDS = get_from_env("QUERY_COST_MAX_EXECUTION_TIME_SECONDS", 600, type_cast=int)
+QUERY_COST_MAX_THREADS = get_from_env("QUERY_COST_MAX_THREADS", 16, type_cast=int)
+QUERY_COST_MAX_MEMORY_USAGE = get_from_env("QUERY_COST_MAX_MEMORY_USAGE", 50_000_000_000, type_cast=int)
+
+# How many insights of a dashboard being refreshed are calculated concurrently
+DASHBOARD_BATCH_QUERY_CONCURRENCY = get_from_env("DASHBOARD_BATCH_QUERY_CONCURRENCY", 1 if TEST else 4, type_cast=int)
+
+# Cache the values of completed trends interval buckets, so that refreshes only calculate the open buckets
+TRENDS_BUCKET_CACHE_ENABLED = get_from_env("TRENDS_BUCKET_CACHE_ENABLED", False, type_cast=str_to_bool)
+# How long after a bucket has ended its value is considered final, i.e. late events have been ingested
+TRENDS_BUCKET_CACHE_INGESTION_LAG_SECONDS = get_from_env(
+    "TRENDS_BUCKET_CACHE_INGESTION_LAG_SECONDS", 60 * 60, type_cast=int
+)
+TRENDS_BUCKET_CACHE_TTL_SECONDS = get_from_env("TRENDS_BUCKET_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60, type_cast=int)
+
+# Answer property value autocomplete from an index of each property's top values, see
+# posthog/queries/property_values_index.py
+PROPERTY_VALUES_INDEX_ENABLED = get_from_env("PROPERTY_VALUES_INDEX_ENABLED", False, type_cast=str_to_bool)
+# How many of the most common values of a property are indexed
+PROPERTY_VALUES_INDEX_SIZE = get_from_env("PROPERTY_VALUES_INDEX_SIZE", 1000, type_cast=int)
+PROPERTY_VALUES_INDEX_REFRESH_SECONDS = get_from_env("PROPERTY_VALUES_INDEX_REFRESH_SECONDS", 60 * 60, type_cast=int)
+PROPERTY_VALUES_INDEX_TTL_SECONDS = get_from_env("PROPERTY_VALUES_INDEX_TTL_SECONDS", 24 * 60 * 60, type_cast=int)
+# How many indexes each process keeps ready to search
+PROPERTY_VALUES_INDEX_LOCAL_SIZE = get_from_env("PROPERTY_VALUES_INDEX_LOCAL_SIZE", 1000, type_cast=int)
 
 CLICKHOUSE_STABLE_HOST = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 # If enabled, some queries will use system.cluster table to query each shard
@@ -264,10 +364,16 @@ if not REDIS_URL:
         "https://posthog.com/docs/deployment/upgrading-posthog#upgrading-from-before-1011"
     )
 
-# Controls whether the TolerantZlibCompressor is used for Redis compression when writing to Redis.
-# The TolerantZlibCompressor is a drop-in replacement for the standard Django ZlibCompressor that
-# can cope with compressed and uncompressed reading at the same time
+# Controls whether values are compressed when writing to Redis.
+# The TolerantZstdCompressor is a drop-in replacement for the standard Django ZlibCompressor that
+# can cope with compressed (zlib or zstd) and uncompressed reading at the same time
 USE_REDIS_COMPRESSION = get_from_env("USE_REDIS_COMPRESSION", False, type_cast=str_to_bool)
+# Which algorithm compressed values are written with, "zlib" or "zstd". Values written with either can always be read
+REDIS_COMPRESSION_ALGORITHM = get_from_env("REDIS_COMPRESSION_ALGORITHM", "zlib")
+REDIS_COMPRESSION_ZSTD_LEVEL = get_from_env("REDIS_COMPRESSION_ZSTD_LEVEL", 3, type_cast=int)
+# Trained zstd dictionaries, see the `train_cache_compression_dictionary` management command.
+# The first is used to compress new values, all of them can be used to decompress values.
+REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS = get_list(os.getenv("REDIS_COMPRESSION_ZSTD_DICTIONARY_PATHS", ""))
 
 # AWS ElastiCache supports "reader" endpoints.
 # See "Finding a Redis (Cluster Mode Disabled) Cluster's Endpoints (Console)"
@@ -285,8 +391,8 @@ CACHES = {
         # and the rest are replicas
         "LOCATION": REDIS_URL if not REDIS_READER_URL else [REDIS_URL, REDIS_READER_URL],
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
-            "COMPRESSOR": "posthog.caching.tolerant_zlib_compressor.TolerantZlibCompressor",
+            "CLIENT_CLASS": "posthog.caching.tolerant_redis_client.TolerantRedisClient",
+            "COMPRESSOR": "posthog.caching.tolerant_zstd_compressor.TolerantZstdCompressor",
         },
         "KEY_PREFIX": "posthog",
     }
@@ -294,3 +400,10 @@ CACHES = {
 
 if TEST:
     CACHES["default"] = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+# How many of the usage report's per-team aggregations run concurrently
+USAGE_REPORT_QUERY_CONCURRENCY = get_from_env("USAGE_REPORT_QUERY_CONCURRENCY", 1 if TEST else 4, type_cast=int)
+# Daily usage counters are recomputed for this many days before the reported day, to pick up late events
+USAGE_REPORT_DAILY_COUNTERS_RECOMPUTE_DAYS = get_from_env(
+    "USAGE_REPORT_DAILY_COUNTERS_RECOMPUTE_DAYS", 3, type_cast=int
+)
@@ -29,6 +29,8 @@ PARTITION_KEY_BUCKET_CAPACITY = get_from_env("PARTITION_KEY_BUCKET_CAPACITY", ty
 PARTITION_KEY_BUCKET_REPLENTISH_RATE = get_from_env(
     "PARTITION_KEY_BUCKET_REPLENTISH_RATE", type_cast=float, default=1.0
 )
+# Share the partition key buckets between all capture processes through redis, instead of one per process
+PARTITION_KEY_BUCKET_SHARED = get_from_env("PARTITION_KEY_BUCKET_SHARED", type_cast=str_to_bool, default=False)
 
 REPLAY_EVENT_MAX_SIZE = get_from_env("REPLAY_EVENT_MAX_SIZE", type_cast=int, default=1024 * 512)  # 512kb
 REPLAY_EVENTS_NEW_CONSUMER_RATIO = get_from_env("REPLAY_EVENTS_NEW_CONSUMER_RATIO", type_cast=float, default=0.0)
@@ -41,3 +43,17 @@ if REPLAY_EVENTS_NEW_CONSUMER_RATIO > 1 or REPLAY_EVENTS_NEW_CONSUMER_RATIO < 0:
 
 REPLAY_RETENTION_DAYS_MIN = 30
 REPLAY_RETENTION_DAYS_MAX = 90
+
+# List recordings from per-session summaries compacted from session_replay_events,
+# see posthog/models/session_replay_event/summaries.py
+SESSION_REPLAY_SUMMARIES_ENABLED = get_from_env("SESSION_REPLAY_SUMMARIES_ENABLED", False, type_cast=str_to_bool)
+# Sessions are compacted once they can no longer receive events
+SESSION_REPLAY_SUMMARIES_SETTLED_AFTER_SECONDS = get_from_env(
+    "SESSION_REPLAY_SUMMARIES_SETTLED_AFTER_SECONDS", 25 * 60 * 60, type_cast=int
+)
+# Sessions this far behind the compaction watermark are compacted again, to pick up late events
+SESSION_REPLAY_SUMMARIES_LOOKBACK_SECONDS = get_from_env(
+    "SESSION_REPLAY_SUMMARIES_LOOKBACK_SECONDS", 6 * 60 * 60, type_cast=int
+)
+# Bounds how much of a backfill a single compaction run does
+SESSION_REPLAY_SUMMARIES_MAX_DAYS_PER_RUN = get_from_env("SESSION_REPLAY_SUMMARIES_MAX_DAYS_PER_RUN", 7, type_cast=int)
@@ -30,3 +30,5 @@ OBJECT_STORAGE_SESSION_RECORDING_LTS_FOLDER = os.getenv(
 )
 OBJECT_STORAGE_EXPORTS_FOLDER = os.getenv("OBJECT_STORAGE_EXPORTS_FOLDER", "exports")
 OBJECT_STORAGE_MEDIA_UPLOADS_FOLDER = os.getenv("OBJECT_STORAGE_MEDIA_UPLOADS_FOLDER", "media_uploads")
+# Results of asynchronous queries are only read for a few minutes, they're deleted once their status expires
+OBJECT_STORAGE_QUERY_RESULTS_FOLDER = os.getenv("OBJECT_STORAGE_QUERY_RESULTS_FOLDER", "query_results")
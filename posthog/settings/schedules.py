@@ -1,9 +1,19 @@
 from posthog.settings.base_variables import TEST
-from posthog.settings.utils import get_from_env
+from posthog.settings.utils import get_from_env, str_to_bool
 
 USE_PRECALCULATED_CH_COHORT_PEOPLE = not TEST
 CALCULATE_X_COHORTS_PARALLEL = get_from_env("CALCULATE_X_COHORTS_PARALLEL", 5, type_cast=int)
 
+# Maintain "performed event X in the last N days" cohorts from new and expiring events only, instead of recomputing
+# the whole membership on every refresh. Definition changes always trigger a full recalculation.
+COHORT_INCREMENTAL_CALCULATION = get_from_env("COHORT_INCREMENTAL_CALCULATION", False, type_cast=str_to_bool)
+# How far back before the previous watermark to look for late-arriving events
+COHORT_INCREMENTAL_INGESTION_LAG_SECONDS = get_from_env("COHORT_INCREMENTAL_INGESTION_LAG_SECONDS", 600, type_cast=int)
+# Do a full recalculation at least this often to pick up person merges and deletions
+COHORT_INCREMENTAL_FULL_RECALCULATION_HOURS = get_from_env(
+    "COHORT_INCREMENTAL_FULL_RECALCULATION_HOURS", 24, type_cast=int
+)
+
 ACTION_EVENT_MAPPING_INTERVAL_SECONDS = get_from_env("ACTION_EVENT_MAPPING_INTERVAL_SECONDS", 300, type_cast=int)
 
 # Schedule to syncronize insight cache states on. Follows crontab syntax.
@@ -18,6 +28,9 @@ UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS = get_from_env(
     "UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS", 90, type_cast=int
 )
 
+# Maximum number of insight cache refreshes queued for a single team at any time
+INSIGHT_CACHE_REFRESH_TEAM_CONCURRENCY = get_from_env("INSIGHT_CACHE_REFRESH_TEAM_CONCURRENCY", 10, type_cast=int)
+
 COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS = get_from_env(
     "COUNT_TILES_WITH_NO_FILTERS_HASH_INTERVAL_SECONDS", 1800, type_cast=int
 )
@@ -40,3 +53,9 @@ CLEAR_CLICKHOUSE_DELETED_PERSON_SCHEDULE_CRON = get_from_env(
     # Every third month 5AM UTC on 1st of the month
     "0 5 1 */3 *",
 )
+
+# Delete events with one mutation per affected partition, see posthog/models/async_deletion/delete_events.py
+ASYNC_DELETION_BY_PARTITION = get_from_env("ASYNC_DELETION_BY_PARTITION", False, type_cast=str_to_bool)
+# Deletion mutations are only issued while fewer mutations than this are running on the events table, partitions left
+# when there are more are deleted on the next run
+ASYNC_DELETION_MAX_PENDING_MUTATIONS = get_from_env("ASYNC_DELETION_MAX_PENDING_MUTATIONS", 10, type_cast=int)
@@ -26,6 +26,10 @@ DECIDE_RATE_LIMIT_ENABLED = get_from_env("DECIDE_RATE_LIMIT_ENABLED", False, typ
 DECIDE_BUCKET_CAPACITY = get_from_env("DECIDE_BUCKET_CAPACITY", type_cast=int, default=500)
 DECIDE_BUCKET_REPLENISH_RATE = get_from_env("DECIDE_BUCKET_REPLENISH_RATE", type_cast=float, default=10.0)
 
+# Rate limiters shared through redis count tokens locally, and flush them every this many tokens or seconds
+RATE_LIMITER_FLUSH_EVERY_REQUESTS = get_from_env("RATE_LIMITER_FLUSH_EVERY_REQUESTS", 10, type_cast=int)
+RATE_LIMITER_FLUSH_INTERVAL_SECONDS = get_from_env("RATE_LIMITER_FLUSH_INTERVAL_SECONDS", 1.0, type_cast=float)
+
 # Decide billing analytics
 
 DECIDE_BILLING_SAMPLING_RATE = get_from_env("DECIDE_BILLING_SAMPLING_RATE", 0.1, type_cast=float)
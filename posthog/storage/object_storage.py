@@ -48,6 +48,13 @@ class ObjectStorageClient(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def delete_objects(self, bucket: str, prefix: str) -> int | None:
+        """
+        Delete all objects under a prefix. Returns the number of objects deleted.
+        """
+        pass
+
 
 class UnavailableStorage(ObjectStorageClient):
     def head_bucket(self, bucket: str):
@@ -71,6 +78,9 @@ class UnavailableStorage(ObjectStorageClient):
     def copy_objects(self, bucket: str, source_prefix: str, target_prefix: str) -> int | None:
         pass
 
+    def delete_objects(self, bucket: str, prefix: str) -> int | None:
+        pass
+
 
 class ObjectStorage(ObjectStorageClient):
     def __init__(self, aws_client) -> None:
@@ -151,6 +161,20 @@ class ObjectStorage(ObjectStorageClient):
             capture_exception(e)
             return None
 
+    def delete_objects(self, bucket: str, prefix: str) -> int | None:
+        try:
+            object_keys = self.list_objects(bucket, prefix) or []
+            if object_keys:
+                self.aws_client.delete_objects(
+                    Bucket=bucket, Delete={"Objects": [{"Key": object_key} for object_key in object_keys]}
+                )
+
+            return len(object_keys)
+        except Exception as e:
+            logger.error("object_storage.delete_objects_failed", bucket=bucket, prefix=prefix, error=e)
+            capture_exception(e)
+            return None
+
 
 _client: ObjectStorageClient = UnavailableStorage()
 
@@ -200,6 +224,10 @@ def copy_objects(source_prefix: str, target_prefix: str) -> int:
     )
 
 
+def delete_objects(prefix: str) -> int:
+    return object_storage_client().delete_objects(bucket=settings.OBJECT_STORAGE_BUCKET, prefix=prefix) or 0
+
+
 def get_presigned_url(file_key: str, expiration: int = 3600) -> Optional[str]:
     return object_storage_client().get_presigned_url(
         bucket=settings.OBJECT_STORAGE_BUCKET, file_key=file_key, expiration=expiration
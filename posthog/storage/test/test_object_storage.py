@@ -10,7 +10,15 @@ from posthog.settings import (
     OBJECT_STORAGE_ENDPOINT,
     OBJECT_STORAGE_SECRET_ACCESS_KEY,
 )
-from posthog.storage.object_storage import health_check, read, write, get_presigned_url, list_objects, copy_objects
+from posthog.storage.object_storage import (
+    health_check,
+    read,
+    write,
+    get_presigned_url,
+    list_objects,
+    copy_objects,
+    delete_objects,
+)
 from posthog.test.base import APIBaseTest
 
 TEST_BUCKET = "test_storage_bucket"
@@ -148,3 +156,13 @@ class TestStorage(APIBaseTest):
                 "test_storage_bucket/a_shared_prefix/b",
                 "test_storage_bucket/a_shared_prefix/c",
             ]
+
+    def test_can_delete_objects_with_prefix(self) -> None:
+        with self.settings(OBJECT_STORAGE_ENABLED=True):
+            for file_name in ["a_shared_prefix/a", "a_shared_prefix/b", "another_prefix/c"]:
+                write(f"{TEST_BUCKET}/{file_name}", "my content".encode("utf-8"))
+
+            deleted_count = delete_objects(prefix=f"{TEST_BUCKET}/a_shared_prefix")
+            assert deleted_count == 2
+
+            assert list_objects(prefix=f"{TEST_BUCKET}") == ["test_storage_bucket/another_prefix/c"]
@@ -7,6 +7,7 @@ from . import (
     demo_create_data,
     email,
     exporter,
+    property_values_index,
     split_person,
     sync_all_organization_available_features,
     usage_report,
@@ -20,6 +21,7 @@ __all__ = [
     "demo_create_data",
     "email",
     "exporter",
+    "property_values_index",
     "split_person",
     "sync_all_organization_available_features",
     "user_identify",
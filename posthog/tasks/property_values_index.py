@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from posthog.queries.property_values_index import PropertyValuesIndexType, build_property_values_index
+
+
+@shared_task(ignore_result=True, max_retries=1)
+def build_property_values_index_task(team_id: int, property_type: PropertyValuesIndexType, key: str) -> None:
+    build_property_values_index(team_id, property_type, key)
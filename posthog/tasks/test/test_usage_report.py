@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any, Dict, List
 from unittest.mock import ANY, MagicMock, Mock, call, patch
 from uuid import uuid4
@@ -28,6 +28,11 @@ from posthog.models.sharing_configuration import SharingConfiguration
 from posthog.schema import EventsQuery
 from posthog.session_recordings.test.test_factory import create_snapshot
 from posthog.tasks.usage_report import capture_event, send_all_org_usage_reports
+from posthog.tasks.usage_report_daily_counters import (
+    EFFECTIVE_DISTINCT_ID_COUNT,
+    compute_daily_counter,
+    get_teams_with_daily_counter_sum,
+)
 from posthog.test.base import (
     APIBaseTest,
     ClickhouseDestroyTablesMixin,
@@ -613,6 +618,57 @@ class HogQLUsageReport(APIBaseTest, ClickhouseTestMixin, ClickhouseDestroyTables
         assert report["event_explorer_api_rows_read"] == 0
 
 
+class DailyCountersUsageReport(APIBaseTest, ClickhouseTestMixin, ClickhouseDestroyTablesMixin):
+    @patch("posthog.tasks.usage_report.Client")
+    @patch("posthog.tasks.usage_report.send_report_to_billing_service")
+    def test_only_recent_days_are_recomputed(
+        self, billing_task_mock: MagicMock, posthog_capture_mock: MagicMock
+    ) -> None:
+        for timestamp in [
+            "2021-12-20T10:00:00Z",
+            "2022-01-08T10:00:00Z",
+            "2022-01-09T10:00:00Z",
+            "2022-01-10T10:00:00Z",
+        ]:
+            _create_event(event="$pageview", team=self.team, distinct_id=1, timestamp=timestamp)
+        flush_persons_and_events()
+
+        # The first report computes the counters of all history, but those only needed for the last few days
+        with patch("posthog.tasks.usage_report.compute_daily_counter", wraps=compute_daily_counter) as compute:
+            report = send_all_org_usage_reports(dry_run=False, at="2022-01-10T00:01:00Z")[0]
+        self.assertEqual(
+            {compute_call.args[1:3] for compute_call in compute.call_args_list},
+            {(date(1970, 1, 1), date(2022, 1, 9)), (date(2022, 1, 3), date(2022, 1, 9))},
+        )
+        # Events after the reported day are counted towards the lifetime count as well
+        self.assertEqual(report["event_count_lifetime"], 4)
+        self.assertEqual(report["event_count_in_month"], 2)
+
+        with patch("posthog.tasks.usage_report.compute_daily_counter", wraps=compute_daily_counter) as compute:
+            report = send_all_org_usage_reports(dry_run=False, at="2022-01-11T00:01:00Z")[0]
+        self.assertEqual(
+            {compute_call.args[1:3] for compute_call in compute.call_args_list}, {(date(2022, 1, 8), date(2022, 1, 10))}
+        )
+        self.assertEqual(report["event_count_lifetime"], 4)
+        self.assertEqual(report["event_count_in_month"], 3)
+
+    def test_effective_distinct_id_count(self) -> None:
+        for distinct_id, events in [("1", 3), ("2", 1)]:
+            for _ in range(events):
+                _create_event(
+                    event="$pageview", team=self.team, distinct_id=distinct_id, timestamp="2022-01-09T10:00:00Z"
+                )
+        flush_persons_and_events()
+
+        compute_daily_counter(EFFECTIVE_DISTINCT_ID_COUNT, date(2022, 1, 9), date(2022, 1, 9), date(2022, 1, 9))
+
+        # The uneven distinct ids count as (3 + 1) ^ 2 / (3 ^ 2 + 1 ^ 2) = 1.6 equally active ones
+        self.assertEqual(
+            get_teams_with_daily_counter_sum(EFFECTIVE_DISTINCT_ID_COUNT, date(2022, 1, 9), date(2022, 1, 9)),
+            [(self.team.pk, 2)],
+        )
+
+
 @freeze_time("2022-01-10T00:01:00Z")
 class TestFeatureFlagsUsageReport(ClickhouseDestroyTablesMixin, TestCase, ClickhouseTestMixin):
     def setUp(self) -> None:
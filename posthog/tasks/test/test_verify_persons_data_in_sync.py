@@ -0,0 +1,84 @@
+from uuid import UUID
+
+from posthog.models.person import Person
+from posthog.models.person.util import create_person, create_person_distinct_id
+from posthog.models.signals import mute_selected_signals
+from posthog.tasks.verify_persons_data_in_sync import _uuid_range, verify_persons_data_in_sync_by_ranges
+from posthog.test.base import BaseTest, ClickhouseTestMixin
+
+
+class TestVerifyPersonsDataInSyncByRanges(ClickhouseTestMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        # Spread persons over the uuid space, with some sharing long prefixes
+        for uuid in [
+            "0175a2a4-5a25-0000-e15d-a6b2c0e1f6a1",
+            "4e7a96c3-0000-4000-8000-000000000001",
+            "4e7a96c3-0000-4000-8000-000000000002",
+            "9f4c1b22-1d3a-4b8e-9a57-3c2d1e0f9b8a",
+            "ffffffff-ffff-4fff-bfff-ffffffffffff",
+        ]:
+            Person.objects.create(team=self.team, uuid=UUID(uuid), version=1, properties={"uuid": uuid})
+
+    def test_persons_in_sync(self):
+        Person.objects.create(
+            team=self.team,
+            uuid=UUID("4e7a96c3-0000-4000-8000-000000000003"),
+            version=1,
+            properties={
+                "name": 'Zoë "Z"',
+                "count": 1.5,
+                "active": True,
+                "empty": None,
+                "tags": [1, "a b"],
+                "nested": {"k": "v"},
+            },
+        )
+
+        results = verify_persons_data_in_sync_by_ranges(team_ids=[self.team.pk], emit_results=False)
+
+        self.assertEqual(results["ranges_compared"], 4)
+        self.assertEqual(results["ranges_mismatched"], 0)
+        self.assertEqual(results["total"], 0)
+
+    def test_only_mismatching_ranges_are_compared(self):
+        create_person(team_id=self.team.pk, uuid="4e7a96c3-0000-4000-8000-000000000002", version=2, sync=True)
+        create_person(team_id=self.team.pk, uuid="c0ffee00-0000-4000-8000-000000000000", version=0, sync=True)
+        with mute_selected_signals():
+            Person.objects.create(team=self.team, uuid=UUID("3a000000-0000-4000-8000-000000000000"), version=0)
+
+        results = verify_persons_data_in_sync_by_ranges(team_ids=[self.team.pk], emit_results=False)
+
+        self.assertEqual(results["ranges_mismatched"], 3)
+        self.assertEqual(results["total"], 3)
+        self.assertEqual(results["version_mismatch"], 1)
+        self.assertEqual(results["missing_in_clickhouse"], 1)
+        self.assertEqual(results["missing_in_postgres"], 1)
+
+    def test_properties_and_distinct_ids_mismatches_are_found(self):
+        with mute_selected_signals():
+            Person.objects.create(
+                team=self.team, uuid=UUID("b7000000-0000-4000-8000-000000000000"), version=3, properties={"a": 1}
+            )
+        create_person(
+            team_id=self.team.pk, uuid="b7000000-0000-4000-8000-000000000000", version=3, properties={"a": 2}, sync=True
+        )
+        create_person_distinct_id(
+            team_id=self.team.pk, distinct_id="someone", person_id="0175a2a4-5a25-0000-e15d-a6b2c0e1f6a1", sync=True
+        )
+
+        results = verify_persons_data_in_sync_by_ranges(team_ids=[self.team.pk], emit_results=False)
+
+        self.assertEqual(results["ranges_mismatched"], 2)
+        self.assertEqual(results["total"], 2)
+        self.assertEqual(results["version_mismatch"], 0)
+        self.assertEqual(results["properties_mismatch"], 1)
+        self.assertEqual(results["properties_mismatch_same_version"], 1)
+        self.assertEqual(results["distinct_ids_mismatch"], 1)
+
+    def test_uuid_range(self):
+        self.assertEqual(
+            _uuid_range("4e"),
+            (UUID("4e000000-0000-0000-0000-000000000000"), UUID("4f000000-0000-0000-0000-000000000000")),
+        )
+        self.assertEqual(_uuid_range("ff"), (UUID("ff000000-0000-0000-0000-000000000000"), None))
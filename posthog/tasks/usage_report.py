@@ -1,9 +1,12 @@
 import dataclasses
 import os
 from collections import Counter
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
 from typing import (
     Any,
+    Callable,
     Dict,
     List,
     Literal,
@@ -19,7 +22,7 @@ import requests
 import structlog
 from dateutil import parser
 from django.conf import settings
-from django.db import connection
+from django.db import connection, connections
 from django.db.models import Count, Q
 from posthoganalytics.client import Client
 from psycopg2 import sql
@@ -28,6 +31,7 @@ from sentry_sdk import capture_exception
 from posthog import version_requirement
 from posthog.celery import app
 from posthog.client import sync_execute
+from posthog.clickhouse.usage_report_daily_counters import SELECT_DAILY_COUNTERS_SUM_SQL
 from posthog.cloud_utils import get_cached_instance_license, is_cloud
 from posthog.constants import FlagRequestType
 from posthog.logging.timing import timed_log
@@ -39,6 +43,17 @@ from posthog.models.plugin import PluginConfig
 from posthog.models.team.team import Team
 from posthog.models.utils import namedtuplefetchall
 from posthog.settings import CLICKHOUSE_CLUSTER, INSTANCE_TAG
+from posthog.tasks.usage_report_daily_counters import (
+    BILLABLE_EVENT_COUNT,
+    DECIDE_REQUESTS_COUNT,
+    EVENT_COUNT,
+    HISTORY_START,
+    LOCAL_EVALUATION_REQUESTS_COUNT,
+    RECORDING_COUNT,
+    compute_daily_counter,
+    get_daily_counters_to_compute,
+    get_teams_with_daily_counter_sum,
+)
 from posthog.utils import get_helm_info_env, get_instance_realm, get_instance_region, get_machine_id, get_previous_day
 
 logger = structlog.get_logger(__name__)
@@ -314,13 +329,27 @@ def capture_event(
 
 
 @timed_log()
-def get_teams_with_event_count_lifetime() -> List[Tuple[int, int]]:
+def get_teams_with_event_count_lifetime(period_start: datetime) -> List[Tuple[int, int]]:
+    # Days up to the reported day are summed from the daily counters, only events after it are counted here
     result = sync_execute(
-        """
-        SELECT team_id, count(1) as count
-        FROM events
+        f"""
+        SELECT team_id, sum(count) as count
+        FROM (
+            {SELECT_DAILY_COUNTERS_SUM_SQL}
+            UNION ALL
+            SELECT team_id, toInt64(count(1)) as count
+            FROM events
+            WHERE timestamp >= %(since)s
+            GROUP BY team_id
+        )
         GROUP BY team_id
-    """
+    """,
+        {
+            "metric": EVENT_COUNT,
+            "begin": HISTORY_START,
+            "end": period_start.date(),
+            "since": period_start + timedelta(days=1),
+        },
     )
     return result
 
@@ -424,13 +453,34 @@ def get_teams_with_recording_count_in_period(begin: datetime, end: datetime) ->
 
 
 @timed_log()
-def get_teams_with_recording_count_total() -> List[Tuple[int, int]]:
+def get_teams_with_recording_count_total(period_start: datetime) -> List[Tuple[int, int]]:
+    # Recordings that started up to the reported day are summed from the daily counters
     result = sync_execute(
-        """
-        SELECT team_id, count(distinct session_id) as count
-        FROM session_replay_events
+        f"""
+        SELECT team_id, sum(count) as count
+        FROM (
+            {SELECT_DAILY_COUNTERS_SUM_SQL}
+            UNION ALL
+            SELECT team_id, toInt64(count(1)) as count
+            FROM (
+                SELECT team_id, session_id
+                FROM session_replay_events
+                -- rows of a session can start up to a day before it
+                WHERE min_first_timestamp >= %(rows_from)s
+                GROUP BY team_id, session_id
+                HAVING min(min_first_timestamp) >= %(since)s
+            )
+            GROUP BY team_id
+        )
         GROUP BY team_id
-    """
+    """,
+        {
+            "metric": RECORDING_COUNT,
+            "begin": HISTORY_START,
+            "end": period_start.date(),
+            "rows_from": period_start,
+            "since": period_start + timedelta(days=1),
+        },
     )
     return result
 
@@ -511,6 +561,24 @@ def capture_report(
     pha_client.flush()
 
 
+def _run_concurrently(queries: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """Runs independent queries through a bounded pool, returning their results by key."""
+    max_workers = min(settings.USAGE_REPORT_QUERY_CONCURRENCY, len(queries))
+    if max_workers <= 1:
+        return {key: query() for key, query in queries.items()}
+
+    def run_query(query: Callable[[], Any]) -> Any:
+        try:
+            return query()
+        finally:
+            # Each thread gets its own Postgres connection, which would otherwise be left open
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="usage-report") as executor:
+        futures = {key: executor.submit(run_query, query) for key, query in queries.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
 # extend this with future usage based products
 def has_non_zero_usage(report: FullUsageReport) -> bool:
     return (
@@ -552,150 +620,164 @@ def send_all_org_usage_reports(
 
     # Clickhouse is good at counting things so we count across all teams rather than doing it one by one
     try:
-        all_data = dict(
-            teams_with_event_count_lifetime=get_teams_with_event_count_lifetime(),
-            teams_with_event_count_in_period=get_teams_with_billable_event_count_in_period(
-                period_start, period_end, count_distinct=True
-            ),
-            teams_with_event_count_in_month=get_teams_with_billable_event_count_in_period(
-                period_start.replace(day=1), period_end
-            ),
-            teams_with_event_count_with_groups_in_period=get_teams_with_event_count_with_groups_in_period(
-                period_start, period_end
-            ),
-            # teams_with_event_count_by_lib=get_teams_with_event_count_by_lib(period_start, period_end),
-            # teams_with_event_count_by_name=get_teams_with_event_count_by_name(period_start, period_end),
-            teams_with_recording_count_in_period=get_teams_with_recording_count_in_period(period_start, period_end),
-            teams_with_recording_count_total=get_teams_with_recording_count_total(),
-            teams_with_decide_requests_count_in_period=get_teams_with_feature_flag_requests_count_in_period(
-                period_start, period_end, FlagRequestType.DECIDE
-            ),
-            teams_with_decide_requests_count_in_month=get_teams_with_feature_flag_requests_count_in_period(
-                period_start.replace(day=1), period_end, FlagRequestType.DECIDE
-            ),
-            teams_with_local_evaluation_requests_count_in_period=get_teams_with_feature_flag_requests_count_in_period(
-                period_start, period_end, FlagRequestType.LOCAL_EVALUATION
-            ),
-            teams_with_local_evaluation_requests_count_in_month=get_teams_with_feature_flag_requests_count_in_period(
-                period_start.replace(day=1), period_end, FlagRequestType.LOCAL_EVALUATION
-            ),
-            teams_with_group_types_total=list(
-                GroupTypeMapping.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
-            ),
-            teams_with_dashboard_count=list(
-                Dashboard.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
-            ),
-            teams_with_dashboard_template_count=list(
-                Dashboard.objects.filter(creation_mode="template")
-                .values("team_id")
-                .annotate(total=Count("id"))
-                .order_by("team_id")
-            ),
-            teams_with_dashboard_shared_count=list(
-                Dashboard.objects.filter(sharingconfiguration__enabled=True)
-                .values("team_id")
-                .annotate(total=Count("id"))
-                .order_by("team_id")
-            ),
-            teams_with_dashboard_tagged_count=list(
-                Dashboard.objects.filter(tagged_items__isnull=False)
-                .values("team_id")
-                .annotate(total=Count("id"))
-                .order_by("team_id")
-            ),
-            teams_with_ff_count=list(
-                FeatureFlag.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
-            ),
-            teams_with_ff_active_count=list(
-                FeatureFlag.objects.filter(active=True)
-                .values("team_id")
-                .annotate(total=Count("id"))
-                .order_by("team_id")
-            ),
-            teams_with_hogql_app_bytes_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_bytes",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="",
-            ),
-            teams_with_hogql_app_rows_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_rows",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="",
-            ),
-            teams_with_hogql_app_duration_ms=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="query_duration_ms",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="",
-            ),
-            teams_with_hogql_api_bytes_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_bytes",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="personal_api_key",
-            ),
-            teams_with_hogql_api_rows_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_rows",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="personal_api_key",
-            ),
-            teams_with_hogql_api_duration_ms=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="query_duration_ms",
-                query_types=["hogql_query", "HogQLQuery"],
-                access_method="personal_api_key",
-            ),
-            teams_with_event_explorer_app_bytes_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_bytes",
-                query_types=["EventsQuery"],
-                access_method="",
-            ),
-            teams_with_event_explorer_app_rows_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_rows",
-                query_types=["EventsQuery"],
-                access_method="",
-            ),
-            teams_with_event_explorer_app_duration_ms=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="query_duration_ms",
-                query_types=["EventsQuery"],
-                access_method="",
-            ),
-            teams_with_event_explorer_api_bytes_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_bytes",
-                query_types=["EventsQuery"],
-                access_method="personal_api_key",
-            ),
-            teams_with_event_explorer_api_rows_read=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="read_rows",
-                query_types=["EventsQuery"],
-                access_method="personal_api_key",
-            ),
-            teams_with_event_explorer_api_duration_ms=get_teams_with_hogql_metric(
-                period_start,
-                period_end,
-                metric="query_duration_ms",
-                query_types=["EventsQuery"],
-                access_method="personal_api_key",
-            ),
+        # Lifetime and month to date figures are summed from the daily counters, so bring them up to date first
+        period_day = period_start.date()
+        month_start = period_day.replace(day=1)
+        _run_concurrently(
+            {
+                counter: partial(compute_daily_counter, counter, first_day, last_day, computed_through)
+                for counter, first_day, last_day, computed_through in get_daily_counters_to_compute(period_day)
+            }
+        )
+
+        all_data = _run_concurrently(
+            dict(
+                teams_with_event_count_lifetime=lambda: get_teams_with_event_count_lifetime(period_start),
+                teams_with_event_count_in_period=lambda: get_teams_with_billable_event_count_in_period(
+                    period_start, period_end, count_distinct=True
+                ),
+                teams_with_event_count_in_month=lambda: get_teams_with_daily_counter_sum(
+                    BILLABLE_EVENT_COUNT, month_start, period_day
+                ),
+                teams_with_event_count_with_groups_in_period=lambda: get_teams_with_event_count_with_groups_in_period(
+                    period_start, period_end
+                ),
+                # teams_with_event_count_by_lib=get_teams_with_event_count_by_lib(period_start, period_end),
+                # teams_with_event_count_by_name=get_teams_with_event_count_by_name(period_start, period_end),
+                teams_with_recording_count_in_period=lambda: get_teams_with_recording_count_in_period(
+                    period_start, period_end
+                ),
+                teams_with_recording_count_total=lambda: get_teams_with_recording_count_total(period_start),
+                teams_with_decide_requests_count_in_period=lambda: get_teams_with_feature_flag_requests_count_in_period(
+                    period_start, period_end, FlagRequestType.DECIDE
+                ),
+                teams_with_decide_requests_count_in_month=lambda: get_teams_with_daily_counter_sum(
+                    DECIDE_REQUESTS_COUNT, month_start, period_day
+                ),
+                teams_with_local_evaluation_requests_count_in_period=lambda: get_teams_with_feature_flag_requests_count_in_period(
+                    period_start, period_end, FlagRequestType.LOCAL_EVALUATION
+                ),
+                teams_with_local_evaluation_requests_count_in_month=lambda: get_teams_with_daily_counter_sum(
+                    LOCAL_EVALUATION_REQUESTS_COUNT, month_start, period_day
+                ),
+                teams_with_group_types_total=lambda: list(
+                    GroupTypeMapping.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
+                ),
+                teams_with_dashboard_count=lambda: list(
+                    Dashboard.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
+                ),
+                teams_with_dashboard_template_count=lambda: list(
+                    Dashboard.objects.filter(creation_mode="template")
+                    .values("team_id")
+                    .annotate(total=Count("id"))
+                    .order_by("team_id")
+                ),
+                teams_with_dashboard_shared_count=lambda: list(
+                    Dashboard.objects.filter(sharingconfiguration__enabled=True)
+                    .values("team_id")
+                    .annotate(total=Count("id"))
+                    .order_by("team_id")
+                ),
+                teams_with_dashboard_tagged_count=lambda: list(
+                    Dashboard.objects.filter(tagged_items__isnull=False)
+                    .values("team_id")
+                    .annotate(total=Count("id"))
+                    .order_by("team_id")
+                ),
+                teams_with_ff_count=lambda: list(
+                    FeatureFlag.objects.values("team_id").annotate(total=Count("id")).order_by("team_id")
+                ),
+                teams_with_ff_active_count=lambda: list(
+                    FeatureFlag.objects.filter(active=True)
+                    .values("team_id")
+                    .annotate(total=Count("id"))
+                    .order_by("team_id")
+                ),
+                teams_with_hogql_app_bytes_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_bytes",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="",
+                ),
+                teams_with_hogql_app_rows_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_rows",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="",
+                ),
+                teams_with_hogql_app_duration_ms=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="query_duration_ms",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="",
+                ),
+                teams_with_hogql_api_bytes_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_bytes",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="personal_api_key",
+                ),
+                teams_with_hogql_api_rows_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_rows",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="personal_api_key",
+                ),
+                teams_with_hogql_api_duration_ms=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="query_duration_ms",
+                    query_types=["hogql_query", "HogQLQuery"],
+                    access_method="personal_api_key",
+                ),
+                teams_with_event_explorer_app_bytes_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_bytes",
+                    query_types=["EventsQuery"],
+                    access_method="",
+                ),
+                teams_with_event_explorer_app_rows_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_rows",
+                    query_types=["EventsQuery"],
+                    access_method="",
+                ),
+                teams_with_event_explorer_app_duration_ms=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="query_duration_ms",
+                    query_types=["EventsQuery"],
+                    access_method="",
+                ),
+                teams_with_event_explorer_api_bytes_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_bytes",
+                    query_types=["EventsQuery"],
+                    access_method="personal_api_key",
+                ),
+                teams_with_event_explorer_api_rows_read=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="read_rows",
+                    query_types=["EventsQuery"],
+                    access_method="personal_api_key",
+                ),
+                teams_with_event_explorer_api_duration_ms=lambda: get_teams_with_hogql_metric(
+                    period_start,
+                    period_end,
+                    metric="query_duration_ms",
+                    query_types=["EventsQuery"],
+                    access_method="personal_api_key",
+                ),
+            )
         )
 
         # The data is all as raw rows which will dramatically slow down the upcoming loop
@@ -0,0 +1,120 @@
+"""
+Per-team usage counters by day, so that the usage report's lifetime and month-to-date figures are sums over small
+daily rollups instead of scans of all history.
+
+Each run computes the counters of the days since the last run, plus a few days before the reported day to pick up
+late events. The very first run backfills all history.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import structlog
+from django.conf import settings
+
+from posthog.client import sync_execute
+from posthog.clickhouse.usage_report_daily_counters import (
+    INSERT_DAILY_EFFECTIVE_DISTINCT_ID_COUNT_SQL,
+    INSERT_DAILY_EVENT_COUNT_SQL,
+    INSERT_DAILY_FEATURE_FLAG_REQUESTS_COUNT_SQL,
+    INSERT_DAILY_RECORDING_COUNT_SQL,
+    SELECT_DAILY_COUNTERS_COMPUTED_THROUGH_SQL,
+    SELECT_DAILY_COUNTERS_SUM_SQL,
+)
+from posthog.constants import FlagRequestType
+from posthog.logging.timing import timed_log
+from posthog.utils import get_instance_region
+
+logger = structlog.get_logger(__name__)
+
+EVENT_COUNT = "event_count"
+BILLABLE_EVENT_COUNT = "billable_event_count"
+RECORDING_COUNT = "recording_count"
+DECIDE_REQUESTS_COUNT = "decide_requests_count"
+LOCAL_EVALUATION_REQUESTS_COUNT = "local_evaluation_requests_count"
+EFFECTIVE_DISTINCT_ID_COUNT = "effective_distinct_id_count"
+
+DAILY_COUNTERS = [
+    EVENT_COUNT,
+    BILLABLE_EVENT_COUNT,
+    RECORDING_COUNT,
+    DECIDE_REQUESTS_COUNT,
+    LOCAL_EVALUATION_REQUESTS_COUNT,
+    EFFECTIVE_DISTINCT_ID_COUNT,
+]
+
+# Where the backfill of all history starts from, the earliest day events can be counted on
+HISTORY_START = date(1970, 1, 1)
+
+
+def get_daily_counters_to_compute(day: date) -> List[Tuple[str, date, date, date]]:
+    """
+    Returns the (counter, first day, last day, computed through) of the days that need to be computed to report
+    on `day`, computed through being the last day computed once they are.
+    """
+    computed_through: Dict[str, date] = dict(sync_execute(SELECT_DAILY_COUNTERS_COMPUTED_THROUGH_SQL))
+    recompute_from = day - timedelta(days=settings.USAGE_REPORT_DAILY_COUNTERS_RECOMPUTE_DAYS - 1)
+
+    ranges = []
+    for counter in DAILY_COUNTERS:
+        last_computed = computed_through.get(counter)
+        if last_computed is None:
+            # Effective distinct ids are only read for the last few days, to choose sampling factors with
+            if counter == EFFECTIVE_DISTINCT_ID_COUNT:
+                backfill_from = day - timedelta(days=settings.ADAPTIVE_SAMPLING_LOOKBACK_DAYS - 1)
+            else:
+                backfill_from = HISTORY_START
+            ranges.append((counter, backfill_from, day, day))
+        else:
+            # Reports for earlier days recompute those days without moving the marker back
+            first_day = min(last_computed + timedelta(days=1), recompute_from)
+            ranges.append((counter, first_day, day, max(day, last_computed)))
+    return ranges
+
+
+@timed_log()
+def compute_daily_counter(counter: str, first_day: date, last_day: date, computed_through: date) -> None:
+    begin, end = _day_start(first_day), _day_start(last_day + timedelta(days=1))
+    params = {"metric": counter, "begin": _format_time(begin), "end": _format_time(end)}
+
+    if counter in (EVENT_COUNT, BILLABLE_EVENT_COUNT):
+        event_filter = "AND event != '$feature_flag_called'" if counter == BILLABLE_EVENT_COUNT else ""
+        sync_execute(INSERT_DAILY_EVENT_COUNT_SQL.format(event_filter=event_filter), params)
+    elif counter == EFFECTIVE_DISTINCT_ID_COUNT:
+        sync_execute(INSERT_DAILY_EFFECTIVE_DISTINCT_ID_COUNT_SQL, params)
+    elif counter == RECORDING_COUNT:
+        sync_execute(INSERT_DAILY_RECORDING_COUNT_SQL, {**params, "rows_from": _format_time(begin - timedelta(days=1))})
+    else:
+        request_type = FlagRequestType.DECIDE if counter == DECIDE_REQUESTS_COUNT else FlagRequestType.LOCAL_EVALUATION
+        sync_execute(
+            INSERT_DAILY_FEATURE_FLAG_REQUESTS_COUNT_SQL,
+            {
+                **params,
+                # depending on the region, events are stored in different teams
+                "team_to_query": 1 if get_instance_region() == "EU" else 2,
+                "validity_token": settings.DECIDE_BILLING_ANALYTICS_TOKEN,
+                "target_event": "decide usage" if request_type == FlagRequestType.DECIDE else "local evaluation usage",
+            },
+        )
+
+    sync_execute(
+        "INSERT INTO usage_report_daily_counters (date, metric, team_id, value, computed_at) VALUES",
+        [(computed_through, counter, 0, 0, datetime.now(tz=ZoneInfo("UTC")))],
+    )
+    logger.info("usage_report_daily_counter_computed", counter=counter, first_day=first_day, last_day=last_day)
+
+
+@timed_log()
+def get_teams_with_daily_counter_sum(counter: str, first_day: Optional[date], last_day: date) -> List[Tuple[int, int]]:
+    return sync_execute(
+        SELECT_DAILY_COUNTERS_SUM_SQL,
+        {"metric": counter, "begin": first_day or HISTORY_START, "end": last_day},
+    )
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=ZoneInfo("UTC"))
+
+
+def _format_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
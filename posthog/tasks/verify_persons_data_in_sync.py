@@ -1,9 +1,11 @@
 import json
 from collections import Counter, defaultdict
 from datetime import timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
 
 import structlog
+from django.db import connection
 from django.db.models.query import Prefetch
 from django.utils.timezone import now
 
@@ -41,6 +43,111 @@ HAVING argMax(is_deleted, version) = 0 AND person_id IN (%(person_ids)s)
 """
 
 
+# The range verifier compares digests of ranges of the person uuid space, starting from ranges with INITIAL_DEPTH hex
+# digit prefixes. Mismatching ranges are split into 16 ranges with one more digit, until they contain up to LEAF_SIZE
+# persons, which are then compared person by person.
+INITIAL_DEPTH = 2
+MAX_DEPTH = 8
+LEAF_SIZE = BATCH_SIZE
+# Bounds how much work is done when many persons are out of sync, e.g. during an ingestion incident
+MAX_MISMATCHING_RANGES = 1000
+PREFIXES_PER_QUERY = 100
+
+# A range's digest is made of its person count and distinct id count, and of order-independent sums of 64-bit hashes:
+# - of each person's team, uuid and version, plus of each of its top-level properties
+# - of each distinct_id -> person uuid mapping of its persons
+# Postgres' sum is exact, so sums are wrapped to 64 bits in python to match ClickHouse's UInt64 sums.
+#
+# Postgres normalizes jsonb while ClickHouse keeps properties as they were written, so property values are hashed as
+# strings (unescaped) or as their JSON without whitespace. Nested objects whose keys are ordered differently hash
+# differently, which only makes their range get compared person by person.
+GET_PERSON_RANGE_DIGESTS_PG_QUERY = """
+SELECT
+    left(uuid::text, %(depth)s) AS prefix,
+    count(*),
+    sum(
+        ('x' || substr(md5(team_id::text || ':' || uuid::text || ':' || COALESCE(version, 0)::text), 1, 16))::bit(64)::bigint
+        + COALESCE((
+            SELECT sum(('x' || substr(md5(
+                uuid::text || ':' || key || '=' ||
+                CASE jsonb_typeof(value) WHEN 'string' THEN value #>> '{{}}' ELSE replace(value::text, ' ', '') END
+            ), 1, 16))::bit(64)::bigint)
+            FROM jsonb_each(CASE jsonb_typeof(properties) WHEN 'object' THEN properties ELSE '{{}}'::jsonb END)
+        ), 0)
+    )
+FROM posthog_person
+WHERE {range_filter}
+GROUP BY prefix
+"""
+
+GET_PERSON_RANGE_DIGESTS_CH_QUERY = """
+SELECT
+    substring(toString(id), 1, %(depth)s) AS prefix,
+    count(),
+    sum(
+        reinterpretAsUInt64(reverse(substring(MD5(concat(toString(team_id), ':', toString(id), ':', toString(latest_version))), 1, 8)))
+        + arraySum(arrayMap(
+            property -> reinterpretAsUInt64(reverse(substring(MD5(concat(
+                toString(id), ':', property.1, '=',
+                if(JSONType(property.2) = 'String', JSONExtractString(property.2), replaceAll(property.2, ' ', ''))
+            )), 1, 8))),
+            JSONExtractKeysAndValuesRaw(latest_properties)
+        ))
+    )
+FROM (
+    SELECT
+        id,
+        team_id,
+        max(version) as latest_version,
+        argMax(properties, version) as latest_properties,
+        max(is_deleted) as is_deleted
+    FROM person
+    WHERE {team_filter} {range_filter}
+    GROUP BY team_id, id
+    HAVING is_deleted = 0
+)
+GROUP BY prefix
+"""
+
+GET_DISTINCT_ID_RANGE_DIGESTS_PG_QUERY = """
+SELECT
+    left(person.uuid::text, %(depth)s) AS prefix,
+    count(*),
+    sum(('x' || substr(md5(pdi.team_id::text || ':' || pdi.distinct_id || ':' || person.uuid::text), 1, 16))::bit(64)::bigint)
+FROM (SELECT id, uuid FROM posthog_person WHERE {range_filter}) AS person
+JOIN posthog_persondistinctid AS pdi ON pdi.person_id = person.id
+GROUP BY prefix
+"""
+
+# person_distinct_id2 isn't sorted by person, so its mappings are aggregated before being filtered by person uuid
+GET_DISTINCT_ID_RANGE_DIGESTS_CH_QUERY = """
+SELECT
+    substring(toString(person_id), 1, %(depth)s) AS prefix,
+    count(),
+    sum(reinterpretAsUInt64(reverse(substring(MD5(concat(toString(team_id), ':', distinct_id, ':', toString(person_id))), 1, 8))))
+FROM (
+    SELECT team_id, distinct_id, argMax(person_id, version) as person_id
+    FROM person_distinct_id2
+    WHERE {team_filter}
+    GROUP BY team_id, distinct_id
+    HAVING argMax(is_deleted, version) = 0 {range_filter}
+)
+GROUP BY prefix
+"""
+
+GET_PERSON_IDS_IN_RANGES_CH_QUERY = """
+SELECT id
+FROM person
+WHERE {team_filter} {range_filter}
+GROUP BY team_id, id
+HAVING max(is_deleted) = 0
+"""
+
+# Persons, hash of persons, distinct ids and hash of distinct ids in a range
+RangeDigest = Tuple[int, int, int, int]
+EMPTY_RANGE_DIGEST: RangeDigest = (0, 0, 0, 0)
+
+
 @app.task(max_retries=1, ignore_result=True)
 def verify_persons_data_in_sync(
     period_start: timedelta = PERIOD_START,
@@ -146,11 +253,188 @@ def _team_integrity_statistics(person_data: List[Any]) -> Counter:
     return result
 
 
-def _emit_metrics(integrity_results: Counter) -> None:
+@app.task(max_retries=1, ignore_result=True)
+def verify_persons_data_in_sync_by_ranges(team_ids: Optional[List[int]] = None, emit_results: bool = True) -> Counter:
+    """
+    Verifies all persons (of `team_ids`, if given) without loading persons that are in sync.
+
+    Both databases aggregate digests of ranges of the person uuid space, and only ranges whose digests differ are
+    split further and eventually compared person by person, so memory and I/O are bounded by the number of persons
+    out of sync rather than the number of persons.
+    """
+    results = Counter(
+        {
+            "ranges_compared": 0,
+            "ranges_mismatched": 0,
+            "ranges_skipped": 0,
+            "total": 0,
+            "missing_in_clickhouse": 0,
+            "missing_in_postgres": 0,
+            "version_mismatch": 0,
+            "properties_mismatch": 0,
+            "distinct_ids_mismatch": 0,
+            "properties_mismatch_same_version": 0,
+        }
+    )
+
+    parent_prefixes = [""]
+    depth = INITIAL_DEPTH
+    while parent_prefixes:
+        pg_digests = _range_digests(_pg_range_digests, parent_prefixes, depth, team_ids)
+        ch_digests = _range_digests(_ch_range_digests, parent_prefixes, depth, team_ids)
+
+        mismatching = sorted(
+            prefix
+            for prefix in pg_digests.keys() | ch_digests.keys()
+            if pg_digests.get(prefix, EMPTY_RANGE_DIGEST) != ch_digests.get(prefix, EMPTY_RANGE_DIGEST)
+        )
+        results["ranges_compared"] += len(pg_digests.keys() | ch_digests.keys())
+        results["ranges_mismatched"] += len(mismatching)
+        if len(mismatching) > MAX_MISMATCHING_RANGES:
+            results["ranges_skipped"] += len(mismatching) - MAX_MISMATCHING_RANGES
+            logger.warn("Too many mismatching person ranges, only verifying some", depth=depth, count=len(mismatching))
+            mismatching = mismatching[:MAX_MISMATCHING_RANGES]
+
+        parent_prefixes = []
+        for prefix in mismatching:
+            size = max(pg_digests.get(prefix, EMPTY_RANGE_DIGEST)[0], ch_digests.get(prefix, EMPTY_RANGE_DIGEST)[0])
+            if size <= LEAF_SIZE or depth == MAX_DEPTH:
+                results += _range_integrity_statistics(prefix, team_ids)
+            else:
+                parent_prefixes.append(prefix)
+        depth += 1
+
+    if emit_results:
+        _emit_metrics(results, prefix="posthog_person_integrity_ranges_")
+
+    return results
+
+
+def _range_digests(
+    get_digests: Any, parent_prefixes: List[str], depth: int, team_ids: Optional[List[int]]
+) -> Dict[str, RangeDigest]:
+    person_digests: Dict[str, Tuple[int, int]] = {}
+    distinct_id_digests: Dict[str, Tuple[int, int]] = {}
+    for i in range(0, len(parent_prefixes), PREFIXES_PER_QUERY):
+        person_rows, distinct_id_rows = get_digests(parent_prefixes[i : i + PREFIXES_PER_QUERY], depth, team_ids)
+        for prefix, count, hash_sum in person_rows:
+            person_digests[prefix] = (count, int(hash_sum) % 2**64)
+        for prefix, count, hash_sum in distinct_id_rows:
+            distinct_id_digests[prefix] = (count, int(hash_sum) % 2**64)
+    return {
+        prefix: person_digests.get(prefix, (0, 0)) + distinct_id_digests.get(prefix, (0, 0))
+        for prefix in person_digests.keys() | distinct_id_digests.keys()
+    }
+
+
+def _pg_range_digests(
+    parent_prefixes: List[str], depth: int, team_ids: Optional[List[int]]
+) -> Tuple[List[Tuple], List[Tuple]]:
+    range_filter, params = _pg_range_filter(parent_prefixes, team_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(GET_PERSON_RANGE_DIGESTS_PG_QUERY.format(range_filter=range_filter), {"depth": depth, **params})
+        person_rows = cursor.fetchall()
+        cursor.execute(
+            GET_DISTINCT_ID_RANGE_DIGESTS_PG_QUERY.format(range_filter=range_filter), {"depth": depth, **params}
+        )
+        distinct_id_rows = cursor.fetchall()
+    return person_rows, distinct_id_rows
+
+
+def _ch_range_digests(
+    parent_prefixes: List[str], depth: int, team_ids: Optional[List[int]]
+) -> Tuple[List[Tuple], List[Tuple]]:
+    team_filter, range_filter, params = _ch_range_filter(parent_prefixes, team_ids, column="id")
+    person_rows = sync_execute(
+        GET_PERSON_RANGE_DIGESTS_CH_QUERY.format(team_filter=team_filter, range_filter=range_filter),
+        {"depth": depth, **params},
+    )
+    team_filter, range_filter, params = _ch_range_filter(parent_prefixes, team_ids, column="person_id")
+    distinct_id_rows = sync_execute(
+        GET_DISTINCT_ID_RANGE_DIGESTS_CH_QUERY.format(team_filter=team_filter, range_filter=range_filter),
+        {"depth": depth, **params},
+    )
+    return person_rows, distinct_id_rows
+
+
+def _range_integrity_statistics(prefix: str, team_ids: Optional[List[int]]) -> Counter:
+    range_filter, params = _pg_range_filter([prefix], team_ids)
+    person_data = list(Person.objects.raw(f"SELECT id, uuid, team_id FROM posthog_person WHERE {range_filter}", params))
+    result = (
+        _team_integrity_statistics([(person.id, person.uuid, person.team_id) for person in person_data])
+        if person_data
+        else Counter()
+    )
+
+    team_filter, ch_range_filter, ch_params = _ch_range_filter([prefix], team_ids, column="id")
+    ch_person_ids = sync_execute(
+        GET_PERSON_IDS_IN_RANGES_CH_QUERY.format(team_filter=team_filter, range_filter=ch_range_filter), ch_params
+    )
+    pg_person_uuids = {person.uuid for person in person_data}
+    for (uuid,) in ch_person_ids:
+        if uuid not in pg_person_uuids:
+            result["missing_in_postgres"] += 1
+            logger.info("Found person missing in postgres", uuid=uuid)
+    return result
+
+
+def _pg_range_filter(prefixes: List[str], team_ids: Optional[List[int]]) -> Tuple[str, Dict[str, Any]]:
+    # Filtering on uuid ranges rather than prefixes of uuid::text lets postgres use the uuid index
+    conditions = []
+    params: Dict[str, Any] = {}
+    for index, prefix in enumerate(prefixes):
+        start, end = _uuid_range(prefix)
+        condition = [f"uuid >= %(start_{index})s"]
+        params[f"start_{index}"] = start
+        if end is not None:
+            condition.append(f"uuid < %(end_{index})s")
+            params[f"end_{index}"] = end
+        conditions.append(" AND ".join(condition))
+    range_filter = "(" + " OR ".join(f"({condition})" for condition in conditions) + ")"
+    if team_ids is not None:
+        range_filter += " AND team_id = ANY(%(team_ids)s)"
+        params["team_ids"] = list(team_ids)
+    return range_filter, params
+
+
+def _ch_range_filter(
+    prefixes: List[str], team_ids: Optional[List[int]], column: str
+) -> Tuple[str, str, Dict[str, Any]]:
+    # Like in postgres, filtering on uuid ranges lets ClickHouse use the (team_id, id) sorting key of the person table
+    params: Dict[str, Any] = {}
+    team_filter = "1 = 1"
+    if team_ids is not None:
+        team_filter = "team_id IN %(team_ids)s"
+        params["team_ids"] = list(team_ids)
+    if prefixes == [""]:
+        return team_filter, "", params
+
+    conditions = []
+    for index, prefix in enumerate(prefixes):
+        start, end = _uuid_range(prefix)
+        condition = [f"{column} >= toUUID(%(start_{index})s)"]
+        params[f"start_{index}"] = str(start)
+        if end is not None:
+            condition.append(f"{column} < toUUID(%(end_{index})s)")
+            params[f"end_{index}"] = str(end)
+        conditions.append(" AND ".join(condition))
+    range_filter = "AND (" + " OR ".join(f"({condition})" for condition in conditions) + ")"
+    return team_filter, range_filter, params
+
+
+def _uuid_range(prefix: str) -> Tuple[UUID, Optional[UUID]]:
+    """Returns the range of uuids, as [start, end), whose hex representation starts with `prefix`"""
+    shift = 4 * (32 - len(prefix))
+    prefix_value = int(prefix, 16) if prefix else 0
+    end = (prefix_value + 1) << shift
+    return UUID(int=prefix_value << shift), UUID(int=end) if end < 2**128 else None
+
+
+def _emit_metrics(integrity_results: Counter, prefix: str = "posthog_person_integrity_") -> None:
     from statshog.defaults.django import statsd
 
     for key, value in integrity_results.items():
-        statsd.gauge(f"posthog_person_integrity_{key}", value)
+        statsd.gauge(f"{prefix}{key}", value)
 
 
 def _index_by(collection: List[Any], key_fn: Any, flat: bool = True) -> Dict:
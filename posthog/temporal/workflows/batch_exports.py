@@ -140,13 +140,14 @@ def iter_batch_records(batch) -> typing.Generator[dict[str, typing.Any], None, N
         # This is not backwards compatible, as elements should contain a parsed array.
         # However, parsing elements_chain is a mess, so we json.dump to at least be compatible with
         # schemas that use JSON-like types.
-        elements = json.dumps(record.get("elements_chain").decode())
+        elements_chain = record.get("elements_chain").decode()
+        elements = json.dumps(elements_chain)
 
         record = {
             "created_at": record.get("created_at").strftime("%Y-%m-%d %H:%M:%S.%f"),
             "distinct_id": record.get("distinct_id").decode(),
             "elements": elements,
-            "elements_chain": record.get("elements_chain").decode(),
+            "elements_chain": elements_chain,
             "event": record.get("event").decode(),
             "inserted_at": record.get("inserted_at").strftime("%Y-%m-%d %H:%M:%S.%f")
             if record.get("inserted_at")
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from time import sleep
 from typing import Optional
@@ -28,8 +29,21 @@ def fn_background(number: float) -> int:
     return value
 
 
+@cache_for(timedelta(seconds=1))
+def fn_slow(number: int) -> int:
+    sleep(0.2)
+    return mocked_dependency(number)
+
+
+@cache_for(timedelta(seconds=1), maxsize=2)
+def fn_bounded(number: int) -> int:
+    return mocked_dependency(number)
+
+
 class TestCacheUtils(APIBaseTest):
     def setUp(self):
+        fn_slow.cache_clear()
+        fn_bounded.cache_clear()
         mocked_dependency.reset_mock()
         mocked_dependency.return_value = 1
         order_of_events.reset_mock()
@@ -93,3 +107,32 @@ class TestCacheUtils(APIBaseTest):
             "Background task finished",
             "Post refresh call 1",
         ]
+
+    def test_concurrent_callers_compute_the_value_once(self) -> None:
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: fn_slow(1, use_cache=True), range(5)))
+
+        assert results == [1] * 5
+        assert mocked_dependency.call_count == 1
+
+    def test_least_recently_used_values_are_evicted(self) -> None:
+        fn_bounded(1, use_cache=True)
+        fn_bounded(2, use_cache=True)
+        fn_bounded(1, use_cache=True)
+        fn_bounded(3, use_cache=True)
+        assert mocked_dependency.call_count == 3
+
+        # 2 was used least recently
+        fn_bounded(1, use_cache=True)
+        fn_bounded(2, use_cache=True)
+        assert mocked_dependency.call_count == 4
+
+    def test_set_values_are_used_until_cleared(self) -> None:
+        fn_bounded.cache_set(5, 1)
+
+        assert fn_bounded(1, use_cache=True) == 5
+        assert mocked_dependency.call_count == 0
+
+        fn_bounded.cache_clear()
+        assert fn_bounded(1, use_cache=True) == 1
+        assert mocked_dependency.call_count == 1
@@ -1,6 +1,60 @@
-from posthog.models.element import Element, chain_to_elements, elements_to_string
+import re
+from typing import Any, Dict, List
+
+from posthog.models.element import Element, chain_to_elements, elements_to_string, parse_elements_chain
+from posthog.models.element.element import _parse_elements_chain_with_regexes
 from posthog.test.base import BaseTest, ClickhouseTestMixin
 
+# The regex based parser `parse_elements_chain` replaced, as it was, to check the new parser against
+parse_attributes_regex = re.compile(r"(?P<attribute>(?P<key>.*?)\=\"(?P<value>.*?[^\\])\")", re.MULTILINE)
+split_chain_regex = re.compile(r'(?:[^\s;"]|"(?:\\.|[^"])*")+')
+split_class_attributes = re.compile(r"(.*?)($|:([a-zA-Z\-\_0-9]*=.*))")
+
+
+def _original_parse_elements_chain(chain: str) -> List[Dict[str, Any]]:
+    elements = []
+    for idx, el_string in enumerate(re.findall(split_chain_regex, chain)):
+        el_string_split = re.findall(split_class_attributes, el_string)[0]
+        attributes = re.finditer(parse_attributes_regex, el_string_split[2]) if len(el_string_split) > 2 else []
+
+        element = Element(order=idx)
+
+        if el_string_split[0]:
+            tag_and_class = el_string_split[0].split(".", 1)
+            element.tag_name = tag_and_class[0]
+            if len(tag_and_class) > 1:
+                element.attr_class = [cl for cl in tag_and_class[1].split(".") if cl != ""]
+
+        for ii in attributes:
+            item = ii.groupdict()
+            if item["key"] == "href":
+                element.href = item["value"]
+            elif item["key"] == "nth-child":
+                element.nth_child = int(item["value"])
+            elif item["key"] == "nth-of-type":
+                element.nth_of_type = int(item["value"])
+            elif item["key"] == "text":
+                element.text = item["value"]
+            elif item["key"] == "attr_id":
+                element.attr_id = item["value"]
+            elif item["key"]:
+                element.attributes[item["key"]] = item["value"]
+
+        elements.append(
+            {
+                "text": element.text,
+                "tag_name": element.tag_name,
+                "attr_class": element.attr_class,
+                "href": element.href,
+                "attr_id": element.attr_id,
+                "nth_child": element.nth_child,
+                "nth_of_type": element.nth_of_type,
+                "attributes": element.attributes,
+                "order": element.order,
+            }
+        )
+    return elements
+
 
 class TestElement(ClickhouseTestMixin, BaseTest):
     def test_elements_to_string(self) -> None:
@@ -75,3 +129,70 @@ class TestElement(ClickhouseTestMixin, BaseTest):
         self.assertEqual(elements[0].tag_name, "a")
         self.assertEqual(elements[0].href, "/a-url")
         self.assertEqual(elements[0].attr_class, ["small", "xy:z"])
+
+    def test_parse_elements_chain(self):
+        self.assertEqual(
+            parse_elements_chain(
+                'a.small.xy:z:attr_id="nested"href="/a-url"nth-child="1"nth-of-type="0"text="a\\" b;c:d"'
+                ';div.btn:attr__style="min-height: 100vh;"attr__data-attr="x:y=\\"z\\""'
+            ),
+            [
+                {
+                    "text": 'a\\" b;c:d',
+                    "tag_name": "a",
+                    "attr_class": ["small", "xy:z"],
+                    "href": "/a-url",
+                    "attr_id": "nested",
+                    "nth_child": 1,
+                    "nth_of_type": 0,
+                    "attributes": {},
+                    "order": 0,
+                },
+                {
+                    "text": None,
+                    "tag_name": "div",
+                    "attr_class": ["btn"],
+                    "href": None,
+                    "attr_id": None,
+                    "nth_child": None,
+                    "nth_of_type": None,
+                    "attributes": {"attr__style": "min-height: 100vh;", "attr__data-attr": 'x:y=\\"z\\"'},
+                    "order": 1,
+                },
+            ],
+        )
+
+    def test_parse_elements_chain_matches_original_regex_parser(self):
+        chains = [
+            "",
+            "a........small",
+            'a.small:attr_id="nested"href="/a-url"nth-child="1"nth-of-type="0"text="a\\" b;c";div.btn.btn-primary:attr__style="min-height: 100vh;"',
+            'a.xy:z.small:nth-child="12"nth-of-type="3"attr__data-attr="k:v;w"',
+            'button:text="\\"quoted\\""attr__title="a;b:c=d"  span:nth-child="2"',
+            'button:text="unterminated;div:nth-child="1"',
+            'span:attr__data-attr="multi\nline"nth-child="2"',
+            ';;div:nth-child="1";',
+        ]
+        for chain in chains:
+            self.assertEqual(parse_elements_chain(chain), _original_parse_elements_chain(chain), chain)
+            self.assertEqual(_parse_elements_chain_with_regexes(chain), _original_parse_elements_chain(chain), chain)
+
+    def test_parse_elements_chain_returns_copies_of_cached_elements(self):
+        elements = parse_elements_chain('a.small:attr__prop="value"nth-child="1"')
+        elements[0]["attributes"]["prop"] = "changed"
+        elements[0]["attr_class"].append("changed")
+
+        self.assertEqual(
+            parse_elements_chain('a.small:attr__prop="value"nth-child="1"')[0],
+            {
+                "text": None,
+                "tag_name": "a",
+                "attr_class": ["small"],
+                "href": None,
+                "attr_id": None,
+                "nth_child": 1,
+                "nth_of_type": None,
+                "attributes": {"attr__prop": "value"},
+                "order": 0,
+            },
+        )
@@ -26,6 +26,7 @@ class TestUserAPI(APIBaseTest):
 
         # ensure the rate limit is reset for each test
         cache.clear()
+        rate_limit.reset_throttles()
 
         self.personal_api_key = generate_random_token_personal()
         PersonalAPIKey.objects.create(label="X", user=self.user, secure_value=hash_key_value(self.personal_api_key))
@@ -35,6 +36,7 @@ class TestUserAPI(APIBaseTest):
 
         # ensure the rate limit is reset for any subsequent non-rate-limit tests
         cache.clear()
+        rate_limit.reset_throttles()
 
     @patch("posthog.rate_limit.BurstRateThrottle.rate", new="5/minute")
     @patch("posthog.rate_limit.statsd.incr")
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from posthog import redis
+from posthog.redis_token_bucket import RedisTokenBucketLimiter
+
+
+@pytest.fixture(autouse=True)
+def limiter_settings(settings):
+    settings.RATE_LIMITER_FLUSH_EVERY_REQUESTS = 1
+    settings.RATE_LIMITER_FLUSH_INTERVAL_SECONDS = 1
+    redis.get_client().flushdb()
+    yield
+    redis.get_client().flushdb()
+
+
+def test_tokens_are_replenished_over_time():
+    limiter = RedisTokenBucketLimiter("test", rate=1, capacity=2)
+
+    with freeze_time("2023-05-01T12:00:00Z") as frozen_time:
+        assert [limiter.consume("key") for _ in range(3)] == [True, True, False]
+        assert limiter.consume("other_key")
+
+        frozen_time.tick(1)
+        assert [limiter.consume("key") for _ in range(2)] == [True, False]
+
+
+def test_buckets_are_shared_between_processes():
+    one_process = RedisTokenBucketLimiter("test", rate=0.1, capacity=5)
+    other_process = RedisTokenBucketLimiter("test", rate=0.1, capacity=5)
+
+    with freeze_time("2023-05-01T12:00:00Z"):
+        assert [one_process.consume("key") for _ in range(3)] == [True, True, True]
+        # The first flush tells the other process the bucket isn't full
+        assert [other_process.consume("key") for _ in range(3)] == [True, True, False]
+        # A process finds out at its next flush, having consumed a flush's worth of tokens too many
+        assert [one_process.consume("key") for _ in range(2)] == [True, False]
+
+
+def test_counts_are_flushed_every_few_requests(settings):
+    settings.RATE_LIMITER_FLUSH_EVERY_REQUESTS = 3
+    one_process = RedisTokenBucketLimiter("test", rate=0.1, capacity=5)
+    other_process = RedisTokenBucketLimiter("test", rate=0.1, capacity=5)
+
+    with freeze_time("2023-05-01T12:00:00Z"), patch.object(
+        RedisTokenBucketLimiter, "_take_from_redis", autospec=True, side_effect=RedisTokenBucketLimiter._take_from_redis
+    ) as take_from_redis:
+        assert [one_process.consume("key") for _ in range(4)] == [True, True, True, True]
+        assert take_from_redis.call_count == 1
+
+        assert [other_process.consume("key") for _ in range(3)] == [True, True, True]
+        assert take_from_redis.call_count == 2
+        # Flushing found the bucket empty
+        assert not other_process.consume("key")
+
+
+def test_processes_together_stay_within_rate(settings):
+    settings.RATE_LIMITER_FLUSH_EVERY_REQUESTS = 10
+    processes = [RedisTokenBucketLimiter("test", rate=10, capacity=10) for _ in range(4)]
+
+    admitted = 0
+    with freeze_time("2023-05-01T12:00:00Z") as frozen_time:
+        # Each process is asked for 100 requests per second for a minute
+        for _ in range(6000):
+            frozen_time.tick(0.01)
+            admitted += sum(process.consume("key") for process in processes)
+
+    # Besides the rate, only the initial buckets and a flush's worth of tokens per process are admitted
+    assert 600 <= admitted <= 600 + 5 * 10 + 4 * 10
+
+
+def test_limits_each_process_when_redis_is_unavailable():
+    limiter = RedisTokenBucketLimiter("test", rate=0.1, capacity=2)
+
+    with freeze_time("2023-05-01T12:00:00Z"), patch(
+        "posthog.redis_token_bucket.redis.get_client", side_effect=Exception
+    ):
+        assert [limiter.consume("key") for _ in range(3)] == [True, True, False]
+
+
+def test_reset_forgets_consumed_tokens():
+    limiter = RedisTokenBucketLimiter("test", rate=0.1, capacity=2)
+
+    with freeze_time("2023-05-01T12:00:00Z"):
+        assert [limiter.consume("key") for _ in range(3)] == [True, True, False]
+
+        limiter.reset()
+
+        assert not redis.get_client().keys("@posthog/token-bucket/test/*")
+        assert [limiter.consume("key") for _ in range(3)] == [True, True, False]
+
+
+def test_script_is_registered_once():
+    limiter = RedisTokenBucketLimiter("test", rate=1, capacity=5)
+
+    with patch("posthog.redis_token_bucket._consume_script", None), patch.object(
+        redis.get_client(), "register_script", wraps=redis.get_client().register_script
+    ) as register_script:
+        for _ in range(3):
+            limiter.consume("key")
+
+    assert register_script.call_count == 1